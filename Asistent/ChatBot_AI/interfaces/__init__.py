@@ -1,12 +1,13 @@
 """Интерфейсы для внешних зависимостей"""
 
 from .ai_interface import BaseAIProvider, GigaChatProvider
-from .search_interface import BaseSearchProvider, BlogSearchProvider
+from .search_interface import BaseSearchProvider, BlogSearchProvider, IcontainsBlogSearchProvider
 
 __all__ = [
     'BaseAIProvider',
     'GigaChatProvider',
     'BaseSearchProvider',
     'BlogSearchProvider',
+    'IcontainsBlogSearchProvider',
 ]
 
@@ -35,7 +35,50 @@ class BaseSearchProvider(ABC):
 
 
 class BlogSearchProvider(BaseSearchProvider):
-    """Провайдер поиска по статьям блога"""
+    """
+    Провайдер поиска по статьям блога через полнотекстовый индекс (blog.search_index)
+    
+    BM25F с весами полей: категория > теги > заголовок > описание > контент.
+    Пока индекс не построен, используется IcontainsBlogSearchProvider.
+    """
+    
+    def search_articles(self, query: str, limit: int = 3) -> List[Dict[str, Any]]:
+        """
+        Поиск статей блога по инвертированному индексу
+        
+        Args:
+            query: Поисковый запрос
+            limit: Максимальное количество результатов
+            
+        Returns:
+            List словарей с данными статей
+        """
+        try:
+            from blog.search_index import is_index_ready, search_post_ids, SearchResults
+            
+            if not is_index_ready():
+                return IcontainsBlogSearchProvider().search_articles(query, limit)
+            
+            ranked_ids = [post_id for post_id, _ in search_post_ids(query, limit=limit)]
+            articles = SearchResults(ranked_ids)[:limit]
+            
+            return [
+                {
+                    'id': article.id,
+                    'title': article.title,
+                    'url': article.get_absolute_url(),
+                    'description': article.description if article.description else ''
+                }
+                for article in articles
+            ]
+            
+        except Exception as e:
+            logger.error(f"Ошибка поиска статей: {e}")
+            return []
+
+
+class IcontainsBlogSearchProvider(BaseSearchProvider):
+    """Провайдер поиска по статьям блога через icontains (без индекса)"""
     
     def search_articles(self, query: str, limit: int = 3) -> List[Dict[str, Any]]:
         """
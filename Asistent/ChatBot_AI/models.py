@@ -184,9 +184,9 @@ class ChatbotFAQ(models.Model):
         return f"{self.question[:50]}{'...' if len(self.question) > 50 else ''}"
     
     def increment_usage(self):
-        """Увеличивает счетчик использования"""
+        """Увеличивает счетчик использования (атомарно: экземпляр может быть из кеша поиска)"""
+        ChatbotFAQ.objects.filter(pk=self.pk).update(usage_count=models.F('usage_count') + 1)
         self.usage_count += 1
-        self.save(update_fields=['usage_count'])
 
 
 class ChatMessage(models.Model):
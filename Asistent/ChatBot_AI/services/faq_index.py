@@ -0,0 +1,48 @@
+"""
+Общая инвалидация in-process индексов FAQ
+
+Индексы (матрица embeddings, автомат ключевых слов) строятся в памяти
+каждого процесса и перестраиваются, когда меняется общая версия в Django cache.
+Версию увеличивают сигналы ChatBot_AI при изменении FAQ.
+"""
+
+import logging
+from typing import Callable, List, Optional
+
+from utilits.versioned_snapshot import VersionedSnapshot, bump_version
+
+logger = logging.getLogger(__name__)
+
+FAQ_INDEX_VERSION_KEY = 'chatbot_faq_index_version'
+
+_registered: List['VersionedFAQCache'] = []
+
+
+class VersionedFAQCache(VersionedSnapshot):
+    """
+    Значение, построенное по FAQ и привязанное к общей версии.
+
+    Args:
+        builder: Функция без аргументов, строящая значение из БД
+        max_age: Принудительная перестройка через N секунд (None — только по версии)
+    """
+
+    version_key = FAQ_INDEX_VERSION_KEY
+
+    def __init__(self, builder: Callable, max_age: Optional[float] = None):
+        super().__init__(max_age=max_age)
+        self._builder = builder
+        _registered.append(self)
+
+    def build(self):
+        return self._builder()
+
+    def get(self):
+        return self.snapshot()
+
+
+def invalidate_faq_index():
+    """Сбрасывает индексы FAQ во всех процессах (через общую версию)"""
+    bump_version(FAQ_INDEX_VERSION_KEY)
+    for holder in _registered:
+        holder.reset()
@@ -1,52 +1,147 @@
 """
 Сервис для поиска в FAQ
+
+Ключевые слова и вопросы всех активных FAQ собираются в автомат Ахо–Корасик
+один раз на процесс. Поиск — один линейный проход по сообщению без запросов к БД.
 """
 
-from typing import Dict, Optional
+from bisect import bisect_right
+from collections import deque
+from typing import Dict, List, Optional
 import logging
 
+from .faq_index import VersionedFAQCache
+
 logger = logging.getLogger(__name__)
 
+# Порядок FAQ зависит и от usage_count, поэтому автомат периодически перестраивается
+FAQ_MATCHER_MAX_AGE = 60 * 10  # 10 минут
+
+_NO_MATCH = float('inf')
+
+
+class FAQMatcher:
+    """
+    Автомат Ахо–Корасик по ключевым словам и вопросам FAQ.
+
+    Каждому FAQ соответствует ранг — позиция в порядке (-priority, -usage_count).
+    В узле хранится лучший (минимальный) ранг среди всех шаблонов, оканчивающихся
+    в нём, включая цепочку суффиксных ссылок, поэтому проход по сообщению сразу
+    даёт FAQ с наивысшим приоритетом.
+    """
+
+    def __init__(self, faqs: List):
+        self.faqs = faqs
+        self._goto: List[Dict[str, int]] = [{}]
+        self._best: List[float] = [_NO_MATCH]
+        self._always = _NO_MATCH  # пустое ключевое слово совпадает с любым сообщением
+
+        # Вопросы в порядке рангов для обратной проверки «сообщение внутри вопроса»
+        questions = [faq.question.lower() for faq in faqs]
+        self._questions = '\x00'.join(questions)
+        self._question_offsets = []
+        offset = 0
+        for question in questions:
+            self._question_offsets.append(offset)
+            offset += len(question) + 1
+
+        for rank, faq in enumerate(faqs):
+            for pattern in list(faq.keywords or []) + [faq.question]:
+                self._add(str(pattern).lower(), rank)
+        self._link()
+
+    def _add(self, pattern: str, rank: int):
+        if not pattern:
+            self._always = min(self._always, rank)
+            return
+        node = 0
+        for char in pattern:
+            nxt = self._goto[node].get(char)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][char] = nxt
+                self._goto.append({})
+                self._best.append(_NO_MATCH)
+            node = nxt
+        if rank < self._best[node]:
+            self._best[node] = rank
+
+    def _link(self):
+        """Суффиксные ссылки (BFS) с объединением лучших рангов"""
+        self._fail = [0] * len(self._goto)
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(char, 0)
+                self._fail[child] = target if target != child else 0
+                if self._best[self._fail[child]] < self._best[child]:
+                    self._best[child] = self._best[self._fail[child]]
+
+    def match(self, message: str) -> Optional[object]:
+        """FAQ с наивысшим приоритетом, совпавший с сообщением, или None"""
+        text = message.lower()
+        best = self._always
+
+        goto, fail, node_best = self._goto, self._fail, self._best
+        node = 0
+        for char in text:
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            if node_best[node] < best:
+                best = node_best[node]
+                if best == 0:
+                    break
+
+        # Сообщение целиком содержится в вопросе: первое вхождение — лучший ранг
+        if best and '\x00' not in text:
+            position = self._questions.find(text)
+            if position != -1:
+                best = min(best, bisect_right(self._question_offsets, position) - 1)
+
+        return None if best == _NO_MATCH else self.faqs[best]
+
+    def __len__(self):
+        return len(self.faqs)
+
+
+def _build_faq_matcher() -> FAQMatcher:
+    from ..models import ChatbotFAQ
+
+    faqs = list(ChatbotFAQ.objects.filter(is_active=True).order_by('-priority', '-usage_count', 'id'))
+    matcher = FAQMatcher(faqs)
+    logger.info(f"📚 Автомат FAQ: {len(faqs)} записей, {len(matcher._goto)} состояний")
+    return matcher
+
+
+_faq_matcher = VersionedFAQCache(_build_faq_matcher, max_age=FAQ_MATCHER_MAX_AGE)
+
 
 class FAQSearchService:
     """Сервис поиска ответов в FAQ"""
-    
+
     @staticmethod
     def search(message: str) -> Optional[Dict]:
         """
         Поиск ответа в FAQ по ключевым словам
-        
+
         Args:
             message: Сообщение пользователя
-            
+
         Returns:
             Dict с ключами answer, url, faq_obj или None если не найдено
         """
-        from ..models import ChatbotFAQ
-        
-        message_lower = message.lower()
-        
-        # Получаем активные FAQ, отсортированные по приоритету
-        faqs = ChatbotFAQ.objects.filter(is_active=True).order_by('-priority', '-usage_count')
-        
-        for faq in faqs:
-            # Проверяем совпадение ключевых слов
-            if faq.keywords:
-                for keyword in faq.keywords:
-                    if keyword.lower() in message_lower:
-                        return {
-                            'answer': faq.answer,
-                            'url': faq.related_url if faq.related_url else None,
-                            'faq_obj': faq
-                        }
-            
-            # Проверяем совпадение с вопросом
-            if faq.question.lower() in message_lower or message_lower in faq.question.lower():
-                return {
-                    'answer': faq.answer,
-                    'url': faq.related_url if faq.related_url else None,
-                    'faq_obj': faq
-                }
-        
-        return None
+        faq = _faq_matcher.get().match(message)
+        if faq is None:
+            return None
 
+        return {
+            'answer': faq.answer,
+            'url': faq.related_url if faq.related_url else None,
+            'faq_obj': faq
+        }
@@ -3,11 +3,23 @@
 """
 
 import math
+import re
+import threading
+from collections import OrderedDict
 from typing import List, Tuple, Optional
 import logging
 
+import numpy as np
+
+from .faq_index import VersionedFAQCache
+
 logger = logging.getLogger(__name__)
 
+# Кеш embeddings запросов (LRU по нормализованному тексту)
+QUERY_EMBEDDING_CACHE_SIZE = 512
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
 
 def cosine_similarity(vec1: List[float], vec2: List[float]) -> float:
     """
@@ -41,6 +53,43 @@ def cosine_similarity(vec1: List[float], vec2: List[float]) -> float:
         return 0.0
 
 
+def normalize_query(query: str) -> str:
+    """Нормализация текста запроса для ключа кеша: регистр и пробелы"""
+    return _WHITESPACE_RE.sub(' ', (query or '').strip().lower())
+
+
+def _build_faq_matrix():
+    """
+    Матрица embeddings активных FAQ в памяти процесса.
+
+    Строки нормализованы, поэтому сходство со всеми FAQ — одно умножение
+    матрицы на вектор.
+    """
+    from Asistent.knowledge_cache import KnowledgeVectorIndex
+    from ..models import ChatbotFAQ
+
+    faqs = list(
+        ChatbotFAQ.objects.filter(is_active=True, embedding__isnull=False)
+        .exclude(embedding=[])
+    )
+    index = KnowledgeVectorIndex.build(
+        (faq.id, faq.embedding, '', faq.priority, None) for faq in faqs
+    )
+    logger.info(f"📊 Матрица FAQ: {len(index)} векторов (dim={index.dim})")
+    return index, {faq.id: faq for faq in faqs}
+
+
+_faq_matrix = VersionedFAQCache(_build_faq_matrix)
+_query_embeddings: 'OrderedDict[str, np.ndarray]' = OrderedDict()
+_query_lock = threading.Lock()
+
+
+def clear_query_embedding_cache():
+    """Очищает кеш embeddings запросов"""
+    with _query_lock:
+        _query_embeddings.clear()
+
+
 class SemanticSearchService:
     """Семантический поиск через embeddings"""
     
@@ -53,14 +102,42 @@ class SemanticSearchService:
             query: Запрос пользователя
             
         Returns:
-            List[float]: Вектор embeddings
+            List[float]: Вектор embeddings (пустой список при ошибке)
         """
+        vector = SemanticSearchService._query_vector(query)
+        return vector.tolist() if vector is not None else []
+
+    @staticmethod
+    def _query_vector(query: str) -> Optional[np.ndarray]:
+        """Embedding запроса как float32-вектор из кеша процесса (None при ошибке)"""
+        key = normalize_query(query)
+        if not key:
+            return None
+
+        with _query_lock:
+            cached = _query_embeddings.get(key)
+            if cached is not None:
+                _query_embeddings.move_to_end(key)
+                return cached
+
         try:
             from Asistent.gigachat_api import get_embeddings
-            return get_embeddings(query)
+            # Ключ кеша нормализован, а в модель уходит исходный текст (регистр значим)
+            embedding = get_embeddings(query.strip())
         except Exception as e:
             logger.error(f"Ошибка генерации embedding для запроса: {e}")
-            return []
+            return None
+        if not embedding:
+            return None
+
+        vector = np.asarray(embedding, dtype=np.float32)
+        vector.setflags(write=False)  # общий для потоков экземпляр из кеша
+        with _query_lock:
+            _query_embeddings[key] = vector
+            _query_embeddings.move_to_end(key)
+            while len(_query_embeddings) > QUERY_EMBEDDING_CACHE_SIZE:
+                _query_embeddings.popitem(last=False)
+        return vector
     
     @staticmethod
     def search_faq_semantic(query: str, min_similarity: float = 0.65, limit: int = 5) -> List[Tuple[any, float]]:
@@ -75,36 +152,17 @@ class SemanticSearchService:
         Returns:
             List[Tuple[FAQ, similarity_score]]: Список (FAQ, оценка сходства)
         """
-        from ..models import ChatbotFAQ
-        
-        # Генерируем embedding для запроса
-        query_embedding = SemanticSearchService.generate_query_embedding(query)
-        if not query_embedding:
+        # Генерируем embedding для запроса (повторные запросы берутся из кеша)
+        query_embedding = SemanticSearchService._query_vector(query)
+        if query_embedding is None:
             logger.warning("Не удалось сгенерировать embedding для запроса")
             return []
         
-        # Получаем все FAQ с embeddings
-        faqs = ChatbotFAQ.objects.filter(
-            is_active=True,
-            embedding__isnull=False
-        ).exclude(embedding=[])
-        
-        # Вычисляем сходство для каждого FAQ
-        results = []
-        for faq in faqs:
-            if not faq.embedding:
-                continue
-            
-            similarity = cosine_similarity(query_embedding, faq.embedding)
-            
-            # Фильтруем по порогу
-            if similarity >= min_similarity:
-                results.append((faq, similarity))
-        
-        # Сортируем по убыванию сходства
-        results.sort(key=lambda x: x[1], reverse=True)
+        # Матрица FAQ живёт в памяти процесса, БД читается только после изменений
+        index, faqs = _faq_matrix.get()
+        matches = index.search(query_embedding, top_k=limit, min_similarity=min_similarity)
         
-        return results[:limit]
+        return [(faqs[faq_id], similarity) for faq_id, similarity in matches if faq_id in faqs]
     
     @staticmethod
     def hybrid_search_faq(query: str) -> Optional[dict]:
@@ -2,9 +2,10 @@
 Сигналы для чат-бота
 
 Автоматическая генерация embeddings для FAQ
+и инвалидация in-process индексов поиска FAQ
 """
 
-from django.db.models.signals import post_save, pre_save
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
 import logging
 
@@ -87,3 +88,33 @@ def generate_faq_embedding(sender, instance, created, **kwargs):
     except Exception as e:
         logger.error("Ошибка в сигнале generate_faq_embedding: %s", e)
 
+
+@receiver(post_save, sender='ChatBot_AI.ChatbotFAQ')
+def invalidate_faq_indexes_on_save(sender, instance, update_fields=None, **kwargs):
+    """Сбрасывает индексы FAQ (счётчик использований на поиск не влияет)"""
+    if update_fields and set(update_fields) <= {'usage_count'}:
+        return
+
+    from .services.faq_index import invalidate_faq_index
+    invalidate_faq_index()
+
+
+@receiver(post_delete, sender='ChatBot_AI.ChatbotFAQ')
+def invalidate_faq_indexes_on_delete(sender, instance, **kwargs):
+    """Убирает удалённый FAQ из индексов поиска"""
+    from .services.faq_index import invalidate_faq_index
+    invalidate_faq_index()
+
+
+def _on_faq_embedding_stored(instance, embedding):
+    """store_embedding пишет через UPDATE без post_save — сбрасываем индексы явно"""
+    from .services.faq_index import invalidate_faq_index
+    invalidate_faq_index()
+
+
+def _register_embedding_listener():
+    from Asistent.services.embedding import register_embedding_listener
+    register_embedding_listener('ChatBot_AI.ChatbotFAQ', _on_faq_embedding_stored)
+
+
+_register_embedding_listener()
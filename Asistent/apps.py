@@ -21,6 +21,10 @@ class AsistentConfig(AppConfig):
         
         # Подключаем мониторинг в РЕАЛЬНОМ ВРЕМЕНИ (всегда!)
         import Asistent.ai_realtime_monitor
+        
+        # Векторный индекс базы знаний обновляется построчно при сохранении embeddings
+        from Asistent.knowledge_cache import register_embedding_hooks
+        register_embedding_hooks()
      
       
         # Автозапуск Django-Q только при runserver (не при миграциях, shell и т.д.)
@@ -6,7 +6,7 @@ from typing import Dict, List, Optional
 from datetime import datetime, timedelta
 from django.contrib.auth.models import User
 from django.utils import timezone
-from django.db.models import Sum, Avg, Count, Q
+from django.db.models import Count, Q
 
 logger = logging.getLogger(__name__)
 
@@ -52,8 +52,7 @@ class BonusCalculator:
         try:
             # Базовые метрики
             views = article.views or 0
-            likes = article.total_likes() if hasattr(article, 'total_likes') else 0
-            comments_count = article.comments.filter(active=True).count()
+            likes, comments_count = self._engagement(article)
             shares = getattr(article, 'shares', 0)
             
             # Расчет времени чтения (примерно 200 слов в минуту)
@@ -71,7 +70,7 @@ class BonusCalculator:
             quality_score = self._calculate_quality_score(article)
             
             # Свежесть статьи
-            age_days = (timezone.now() - article.created_at).days
+            age_days = (timezone.now() - article.created).days
             is_fresh = age_days <= 7
             
             # Трендовость (быстрый рост просмотров)
@@ -154,45 +153,9 @@ class BonusCalculator:
             Dict с детальной информацией о бонусах
         """
         try:
-            from blog.models import Post
-            
-            # Получаем статьи автора за период
             start_date = timezone.now() - timedelta(days=period_days)
-            articles = Post.objects.filter(
-                author=author,
-                is_published=True,
-                created_at__gte=start_date
-            )
-            
-            total_bonus = 0
-            articles_bonuses = []
-            
-            for article in articles:
-                article_bonus = self.calculate_article_bonus(article)
-                total_bonus += article_bonus['total_bonus']
-                articles_bonuses.append(article_bonus)
-            
-            # Статистика автора
-            stats = {
-                'total_articles': articles.count(),
-                'total_views': articles.aggregate(Sum('views'))['views__sum'] or 0,
-                'avg_views_per_article': articles.aggregate(Avg('views'))['views__avg'] or 0,
-                'total_comments': sum(a.comments.filter(active=True).count() for a in articles),
-            }
-            
-            result = {
-                'author_id': author.id,
-                'author_username': author.username,
-                'period_days': period_days,
-                'total_bonus': round(total_bonus, 2),
-                'articles_count': len(articles_bonuses),
-                'articles_bonuses': articles_bonuses,
-                'statistics': stats,
-                'calculated_at': timezone.now().isoformat()
-            }
-            
-            logger.info(f"Рассчитан бонус для автора {author.username}: {total_bonus} баллов")
-            return result
+            articles = self._load_articles(start_date, author=author)
+            return self._author_result(author, articles, period_days)
             
         except Exception as e:
             logger.error(f"Ошибка расчета бонуса для автора {author.id}: {e}")
@@ -202,6 +165,55 @@ class BonusCalculator:
                 'error': str(e)
             }
     
+    def _load_articles(self, start_date, author: User = None) -> List:
+        """
+        Опубликованные статьи за период (лайки и активные комментарии —
+        в счётчиках статьи, отдельные запросы не нужны)
+        """
+        from blog.models import Post
+        
+        posts = Post.objects.filter(status='published', created__gte=start_date)
+        if author is not None:
+            posts = posts.filter(author=author)
+        return list(posts)
+    
+    def _engagement(self, article):
+        """Лайки и активные комментарии статьи (денормализованные счётчики)"""
+        return article.likes_count, article.comments_count
+    
+    def _author_result(self, author: User, articles: List, period_days: int) -> Dict:
+        """Бонус автора по его уже загруженным статьям"""
+        total_bonus = 0
+        articles_bonuses = []
+        
+        for article in articles:
+            article_bonus = self.calculate_article_bonus(article)
+            total_bonus += article_bonus['total_bonus']
+            articles_bonuses.append(article_bonus)
+        
+        # Статистика автора
+        total_views = sum(article.views or 0 for article in articles)
+        stats = {
+            'total_articles': len(articles),
+            'total_views': total_views,
+            'avg_views_per_article': total_views / len(articles) if articles else 0,
+            'total_comments': sum(self._engagement(article)[1] for article in articles),
+        }
+        
+        result = {
+            'author_id': author.id,
+            'author_username': author.username,
+            'period_days': period_days,
+            'total_bonus': round(total_bonus, 2),
+            'articles_count': len(articles_bonuses),
+            'articles_bonuses': articles_bonuses,
+            'statistics': stats,
+            'calculated_at': timezone.now().isoformat()
+        }
+        
+        logger.info(f"Рассчитан бонус для автора {author.username}: {total_bonus} баллов")
+        return result
+    
     def calculate_all_authors_bonuses(self, period_days: int = 30) -> List[Dict]:
         """
         Рассчитывает бонусы для всех авторов за период
@@ -212,19 +224,18 @@ class BonusCalculator:
         Returns:
             Список результатов для каждого автора
         """
-        from blog.models import Post
-        
-        # Получаем уникальных авторов, которые публиковали за период
+        # Все статьи периода одним набором запросов, затем группировка по авторам
         start_date = timezone.now() - timedelta(days=period_days)
-        authors = User.objects.filter(
-            posts__is_published=True,
-            posts__created_at__gte=start_date
-        ).distinct()
+        articles_by_author = {}
+        for article in self._load_articles(start_date):
+            articles_by_author.setdefault(article.author_id, []).append(article)
+        authors = User.objects.in_bulk(list(articles_by_author))
         
-        results = []
-        for author in authors:
-            author_result = self.calculate_author_bonus(author, period_days)
-            results.append(author_result)
+        results = [
+            self._author_result(authors[author_id], articles, period_days)
+            for author_id, articles in articles_by_author.items()
+            if author_id in authors
+        ]
         
         # Сортируем по убыванию бонуса
         results.sort(key=lambda x: x.get('total_bonus', 0), reverse=True)
@@ -264,8 +275,7 @@ class BonusCalculator:
             
             # Engagement
             if hasattr(article, 'views') and article.views > 0:
-                likes = article.total_likes() if hasattr(article, 'total_likes') else 0
-                comments = article.comments.filter(active=True).count()
+                likes, comments = self._engagement(article)
                 engagement = (likes + comments) / article.views
                 
                 if engagement > 0.1:  # Высокий engagement
@@ -286,7 +296,7 @@ class BonusCalculator:
         
         # Можно добавить более сложную логику с отслеживанием просмотров по времени
         # Пока используем простую проверку: свежая статья с большим количеством просмотров
-        age_hours = (timezone.now() - article.created_at).total_seconds() / 3600
+        age_hours = (timezone.now() - article.created).total_seconds() / 3600
         
         if age_hours < 24 and article.views > 500:
             return True
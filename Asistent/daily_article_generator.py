@@ -3,13 +3,10 @@ from __future__ import annotations
 
 from typing import List, Optional
 
-from django.conf import settings
-from blog.models import Post
-import requests
 import logging
 
 from Asistent.pipeline.executor import execute_pipeline_by_slug
-from Asistent.services.yandex_webmaster import get_yandex_webmaster_client
+from Asistent.indexing_queue import enqueue_post
 
 logger = logging.getLogger(__name__)
 
@@ -39,58 +36,11 @@ def generate_daily_psychology_article(*_args, **_kwargs) -> dict:
 # Асинхронная индексация статьи
 # ========================================================================
 def submit_post_for_indexing(post_id: int):
-    """Асинхронная индексация статьи."""
+    """Ставит статью в очередь индексации (отправка пачками — Asistent.indexing_queue)."""
     try:
-        post = Post.objects.get(id=post_id, status='published')
-        post_url = f"{settings.SITE_URL.rstrip('/')}{post.get_absolute_url()}"
-
-        # Используем тот же код, что и раньше, но асинхронно
-        results = {k: False for k in ['yandex', 'google', 'bing', 'yahoo', 'indexnow']}
-
-        # Яндекс
-        try:
-            client = get_yandex_webmaster_client()
-            yandex_result = client.enqueue_recrawl(post_url)
-            results['yandex'] = bool(yandex_result.get('success'))
-            if not results['yandex']:
-                logger.error(f"Яндекс индексация: {yandex_result.get('error')}")
-        except Exception as e:
-            logger.error(f"Яндекс индексация: {e}")
-
-        # Google
-        try:
-            sitemap_url = f"{settings.SITE_URL}/sitemap.xml"
-            ping_url = f"https://www.google.com/ping?sitemap={sitemap_url}"
-            resp = requests.get(ping_url, timeout=10)
-            results['google'] = resp.status_code == 200
-        except Exception as e:
-            logger.error(f"Google: {e}")
-
-        # Bing / IndexNow
-        for key_name, api_url, result_key in [
-            ('BING_INDEXNOW_KEY', 'https://www.bing.com/indexnow', 'bing'),
-            ('INDEXNOW_KEY', 'https://api.indexnow.org/indexnow', 'indexnow')
-        ]:
-            try:
-                if hasattr(settings, key_name):
-                    key = getattr(settings, key_name)
-                    payload = {
-                        "host": settings.SITE_URL.replace('https://', '').replace('http://', ''),
-                        "key": key,
-                        "urlList": [post_url]
-                    }
-                    if key_name == 'INDEXNOW_KEY':
-                        payload["keyLocation"] = f"{settings.SITE_URL}/{key}.txt"
-                    resp = requests.post(api_url, json=payload, timeout=10)
-                    results[result_key] = resp.status_code == 200
-            except Exception as e:
-                logger.error(f"{result_key}: {e}")
-
-        results['yahoo'] = results['bing'] or results['indexnow']
-        logger.info(f"Индексация {post_url}: {results}")
-
-    except Post.DoesNotExist:
-        logger.error(f"Post {post_id} не найден")
+        result = enqueue_post(post_id)
+        if result:
+            logger.info(f"Индексация {result['url']}: в очереди ({result['queued']})")
     except Exception as e:
         logger.error(f"Ошибка индексации: {e}", exc_info=True)
 
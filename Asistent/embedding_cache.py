@@ -0,0 +1,208 @@
+"""
+Постоянный кеш embeddings по содержимому текста
+
+Ключ — (модель, sha256 нормализованного текста), вектор хранится в БД бинарно
+(float32 или float16 — EMBEDDING_CACHE_DTYPE). Повторная векторизация того же
+текста (перезаполнение базы знаний, пересохранение записей, одинаковые запросы
+в чат-боте) не тратит токены API и не ждёт сети.
+
+Вытеснение LRU: last_used_at обновляется не чаще раза в TOUCH_INTERVAL,
+при превышении EMBEDDING_CACHE_MAX_ENTRIES удаляются самые давние записи.
+Поле hits увеличивается вместе с last_used_at — это число интервалов,
+в которые запись использовалась, а не каждое попадание (попадание не пишет в БД).
+Счётчики попаданий/промахов общие для процессов (Django cache).
+"""
+import hashlib
+import logging
+import re
+import unicodedata
+from datetime import timedelta
+from typing import Dict, List, Optional
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+CACHE_DTYPE = getattr(settings, 'EMBEDDING_CACHE_DTYPE', 'float32')
+MAX_ENTRIES = getattr(settings, 'EMBEDDING_CACHE_MAX_ENTRIES', 100_000)
+TOUCH_INTERVAL = timedelta(hours=1)
+EVICT_EVERY_WRITES = 200  # проверка размера не на каждой записи
+
+STATS_KEYS = {
+    'hits': 'embedding_cache:hits',
+    'misses': 'embedding_cache:misses',
+    'writes': 'embedding_cache:writes',
+    'evicted': 'embedding_cache:evicted',
+}
+
+# Счётчики текущего процесса (например, чтобы команда не делала паузу после попадания в кеш)
+local_stats = {name: 0 for name in STATS_KEYS}
+
+_WHITESPACE_RE = re.compile(r'\s+')
+_writes_since_evict = 0
+
+
+def normalize_text(text: str) -> str:
+    """Нормализация текста для ключа: Unicode NFC, схлопывание пробелов"""
+    return _WHITESPACE_RE.sub(' ', unicodedata.normalize('NFC', text or '')).strip()
+
+
+def text_hash(text: str) -> str:
+    """SHA-256 нормализованного текста"""
+    return hashlib.sha256(normalize_text(text).encode('utf-8')).hexdigest()
+
+
+def _incr(stat: str, amount: int = 1):
+    if amount <= 0:
+        return
+    local_stats[stat] += amount
+    key = STATS_KEYS[stat]
+    try:
+        cache.add(key, 0, None)
+        cache.incr(key, amount)
+    except Exception:
+        pass
+
+
+def _encode(vector) -> bytes:
+    return np.asarray(vector, dtype=CACHE_DTYPE).tobytes()
+
+
+def _decode(entry) -> List[float]:
+    return np.frombuffer(bytes(entry.vector), dtype=entry.dtype).astype(np.float32).tolist()
+
+
+def lookup_many(texts: List[str], model_name: str) -> Dict[str, List[float]]:
+    """
+    Векторы из кеша для списка текстов (одним запросом).
+
+    Returns:
+        Dict[str, List[float]]: {исходный текст: вектор} только для найденных
+    """
+    from .models import EmbeddingCacheEntry
+
+    hashes = {}
+    for text in texts:
+        hashes.setdefault(text_hash(text), []).append(text)
+    if not hashes:
+        return {}
+
+    try:
+        entries = list(
+            EmbeddingCacheEntry.objects.filter(model_name=model_name, text_hash__in=list(hashes))
+        )
+    except Exception as e:
+        logger.warning(f"Кеш embeddings недоступен: {e}")
+        return {}
+
+    found = {}
+    stale_ids = []
+    touch_before = timezone.now() - TOUCH_INTERVAL
+    for entry in entries:
+        vector = _decode(entry)
+        for text in hashes[entry.text_hash]:
+            found[text] = vector
+        if entry.last_used_at < touch_before:
+            stale_ids.append(entry.pk)
+
+    if stale_ids:
+        from django.db.models import F
+        try:
+            EmbeddingCacheEntry.objects.filter(pk__in=stale_ids).update(
+                last_used_at=timezone.now(),
+                hits=F('hits') + 1,
+            )
+        except Exception as e:
+            logger.debug(f"Не удалось обновить статистику кеша embeddings: {e}")
+
+    _incr('hits', len(found))
+    _incr('misses', len(texts) - len(found))
+    return found
+
+
+def lookup(text: str, model_name: str) -> Optional[List[float]]:
+    """Вектор из кеша или None"""
+    return lookup_many([text], model_name).get(text)
+
+
+def save_many(vectors: Dict[str, List[float]], model_name: str) -> None:
+    """Сохраняет векторы {текст: вектор} (пустые пропускаются)"""
+    global _writes_since_evict
+    from .models import EmbeddingCacheEntry
+
+    rows = {}
+    for text, vector in vectors.items():
+        if vector is not None and len(vector):
+            key = text_hash(text)
+            rows[key] = EmbeddingCacheEntry(
+                model_name=model_name,
+                text_hash=key,
+                dtype=CACHE_DTYPE,
+                dimensions=len(vector),
+                vector=_encode(vector),
+            )
+    if not rows:
+        return
+
+    try:
+        EmbeddingCacheEntry.objects.bulk_create(list(rows.values()), ignore_conflicts=True)
+    except Exception as e:
+        logger.warning(f"Не удалось сохранить embeddings в кеш: {e}")
+        return
+
+    _incr('writes', len(rows))
+    _writes_since_evict += len(rows)
+    if _writes_since_evict >= EVICT_EVERY_WRITES:
+        _writes_since_evict = 0
+        evict()
+
+
+def save(text: str, vector: List[float], model_name: str) -> None:
+    """Сохраняет один вектор"""
+    save_many({text: vector}, model_name)
+
+
+def evict(max_entries: int = None) -> int:
+    """
+    Удаляет самые давно использованные записи сверх лимита.
+
+    Returns:
+        int: Количество удалённых записей
+    """
+    from .models import EmbeddingCacheEntry
+
+    max_entries = MAX_ENTRIES if max_entries is None else max_entries
+    try:
+        excess = EmbeddingCacheEntry.objects.count() - max_entries
+        if excess <= 0:
+            return 0
+        victim_ids = list(
+            EmbeddingCacheEntry.objects.order_by('last_used_at', 'pk').values_list('pk', flat=True)[:excess]
+        )
+        deleted, _ = EmbeddingCacheEntry.objects.filter(pk__in=victim_ids).delete()
+    except Exception as e:
+        logger.warning(f"Ошибка вытеснения кеша embeddings: {e}")
+        return 0
+
+    _incr('evicted', deleted)
+    logger.info(f"🧹 Кеш embeddings: вытеснено {deleted} записей (лимит {max_entries})")
+    return deleted
+
+
+def get_stats() -> dict:
+    """Счётчики попаданий/промахов и размер кеша"""
+    from .models import EmbeddingCacheEntry
+
+    stats = {name: cache.get(key, 0) for name, key in STATS_KEYS.items()}
+    lookups = stats['hits'] + stats['misses']
+    stats['hit_rate'] = round(stats['hits'] / lookups * 100, 2) if lookups else 0.0
+    try:
+        stats['entries'] = EmbeddingCacheEntry.objects.count()
+    except Exception:
+        stats['entries'] = None
+    stats['max_entries'] = MAX_ENTRIES
+    stats['dtype'] = CACHE_DTYPE
+    return stats
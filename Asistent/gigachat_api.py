@@ -1602,11 +1602,13 @@ class GigaChatSmartClient(GigaChatClient):
             logger.info(f"   🔄 Возвращено на модель {self.model}")
     
     """Получить векторное представление текста через GigaChat-Embeddings"""
-    @rate_limit_retry(max_retries=3, base_delay=5)
     def get_embeddings(self, text: str) -> List[float]:
         """
         Получить векторное представление текста через GigaChat-Embeddings
         
+        Запрос идёт через отдельный клиент embeddings (gigachat_embeddings):
+        модель и SDK-клиент чата при этом не меняются.
+        
         Args:
             text: Текст для векторизации
             
@@ -1616,86 +1618,21 @@ class GigaChatSmartClient(GigaChatClient):
         Raises:
             Exception: При ошибке API или недоступности сервиса
         """
-        if not self.client:
-            raise Exception("GigaChat клиент не инициализирован")
+        from .gigachat_embeddings import embed_text, prepare_embedding_text
         
         # Валидация: проверка на пустоту и минимальную длину
-        if not text or not text.strip():
-            logger.warning("Пустой текст для embeddings, возвращаем пустой вектор")
-            return []
-        
-        text_clean = text.strip()
-        if len(text_clean) < 10:
-            logger.warning(f"Слишком короткий текст для embeddings ({len(text_clean)} символов, минимум 10)")
+        text_clean = prepare_embedding_text(text)
+        if text_clean is None:
+            logger.warning("Пустой или слишком короткий текст для embeddings (минимум 10 символов)")
             return []
         
         try:
-            # Сохраняем оригинальную модель
-            original_model = self.model
-            
-            # Переключаемся на Embeddings модель
-            self.model = 'Embeddings'
-            self._initialize_client()
-            
-            logger.info(f"📊 Генерация embeddings для текста ({len(text)} символов)...")
-            
-            # Вызываем метод embeddings из SDK
-            # Совместимость с разными версиями SDK
-            try:
-                # Попытка 1: Новый API (SDK >= 0.1.25)
-                response = self.client.embeddings(
-                    model="Embeddings",
-                    input=[text[:8000]]
-                )
-            except (TypeError, Exception) as e:
-                logger.warning(f"   Попытка 1 не удалась: {e}")
-                
-                try:
-                    # Попытка 2: Прямой вызов с текстами
-                    response = self.client.embeddings([text[:8000]])
-                except Exception as e2:
-                    logger.warning(f"   Попытка 2 не удалась: {e2}")
-                    
-                    try:
-                        # Попытка 3: Через POST запрос напрямую
-                        logger.info("   🔄 Используем прямой API вызов...")
-                        response = self.client.stream(
-                            model="Embeddings",
-                            messages=[{"role": "user", "content": text[:8000]}]
-                        )
-                    except Exception as e3:
-                        logger.error(f"   ❌ Все попытки failed: {e3}")
-                        raise Exception(f"Embeddings API недоступен в текущей версии SDK")
-            
-            # Извлекаем вектор из ответа
-            if response and hasattr(response, 'data') and len(response.data) > 0:
-                embedding = response.data[0].embedding
-                logger.info(f"   ✅ Embedding получен: {len(embedding)} измерений")
-                
-                # Возвращаем оригинальную модель
-                self.model = original_model
-                self._initialize_client()
-                
-                return embedding
-            else:
-                logger.error("   ❌ Пустой ответ от Embeddings API")
-                
-                # Возвращаем оригинальную модель
-                self.model = original_model
-                self._initialize_client()
-                
-                return []
-                
+            logger.info(f"📊 Генерация embeddings для текста ({len(text_clean)} символов)...")
+            embedding = embed_text(text_clean)
+            logger.info(f"   ✅ Embedding получен: {len(embedding)} измерений")
+            return embedding
         except Exception as e:
             logger.error(f"   ❌ Ошибка получения embeddings: {e}")
-            
-            # Возвращаем оригинальную модель в случае ошибки
-            try:
-                self.model = original_model
-                self._initialize_client()
-            except:
-                pass
-            
             raise Exception(f"Ошибка GigaChat Embeddings API: {str(e)}")
 
 
@@ -1755,9 +1692,17 @@ def get_embeddings(text: str) -> List[float]:
         >>> len(vector)
         1024
     """
+    from .gigachat_embeddings import embed_text, prepare_embedding_text
+    
+    text_clean = prepare_embedding_text(text)
+    if text_clean is None:
+        logger.warning("Пустой или слишком короткий текст для embeddings (минимум 10 символов)")
+        return []
+    
     try:
-        client = get_gigachat_client()
-        return client.get_embeddings(text)
+        # Сначала кеш по содержимому; одиночные вызовы из разных потоков
+        # объединяются в пакетные запросы
+        return embed_text(text_clean)
     except Exception as e:
         logger.error(f"❌ Ошибка в get_embeddings(): {e}")
         return []
@@ -1786,20 +1731,17 @@ def get_embeddings_batch(texts: List[str]) -> List[List[float]]:
     if not texts:
         return []
     
+    from .gigachat_embeddings import embed_texts, prepare_embedding_text
+    
     try:
-        client = get_gigachat_client()
-        
-        if not client or not client.client:
-            logger.error("GigaChat клиент не инициализирован")
-            return [[] for _ in texts]
-        
         # Фильтруем и валидируем тексты
         valid_texts = []
         valid_indices = []
         
         for i, text in enumerate(texts):
-            if text and text.strip() and len(text.strip()) >= 10:
-                valid_texts.append(text.strip()[:8000])  # Обрезаем до 8K
+            text_clean = prepare_embedding_text(text)
+            if text_clean is not None:
+                valid_texts.append(text_clean)
                 valid_indices.append(i)
             else:
                 logger.warning(f"Пропуск текста {i}: пустой или слишком короткий")
@@ -1810,53 +1752,16 @@ def get_embeddings_batch(texts: List[str]) -> List[List[float]]:
         
         logger.info(f"📊 Batch генерация embeddings для {len(valid_texts)} текстов...")
         
-        # Сохраняем оригинальную модель
-        original_model = client.model
-        client.model = 'Embeddings'
-        client._initialize_client()
+        # Тексты из кеша не запрашиваются; чат-клиент не пересоздаётся
+        vectors = embed_texts(valid_texts)
         
-        try:
-            # Пакетный запрос к API
-            # Совместимость с разными версиями SDK
-            try:
-                # Новый API (SDK >= 0.1.25)
-                response = client.client.embeddings(
-                    model="Embeddings",
-                    input=valid_texts
-                )
-            except TypeError:
-                # Старый API (SDK < 0.1.25)
-                try:
-                    from gigachat.models import Embeddings as EmbeddingsModel
-                    response = client.client.embeddings(
-                        EmbeddingsModel(input=valid_texts)
-                    )
-                except Exception as e2:
-                    logger.error(f"   ❌ Не удалось вызвать batch embeddings API: {e2}")
-                    raise
-            
-            if response and hasattr(response, 'data'):
-                # Создаём результирующий список
-                results = [[] for _ in texts]
-                
-                # Заполняем векторами только валидные позиции
-                for i, data_item in enumerate(response.data):
-                    if i < len(valid_indices):
-                        original_idx = valid_indices[i]
-                        results[original_idx] = data_item.embedding
-                
-                success_count = sum(1 for r in results if r)
-                logger.info(f"   ✅ Batch успешно: {success_count}/{len(texts)} векторов")
-                
-                return results
-            else:
-                logger.error("   ❌ Пустой ответ от Batch Embeddings API")
-                return [[] for _ in texts]
-                
-        finally:
-            # Возвращаем оригинальную модель
-            client.model = original_model
-            client._initialize_client()
+        results = [[] for _ in texts]
+        for original_idx, vector in zip(valid_indices, vectors):
+            results[original_idx] = vector
+        
+        success_count = sum(1 for r in results if r)
+        logger.info(f"   ✅ Batch успешно: {success_count}/{len(texts)} векторов")
+        return results
             
     except Exception as e:
         logger.error(f"❌ Ошибка batch embeddings: {e}")
@@ -0,0 +1,296 @@
+"""
+Отдельный клиент GigaChat-Embeddings
+
+Раньше embeddings получались через общий чат-клиент: у singleton'а временно
+менялась модель на 'Embeddings' с пересозданием SDK-клиента (дважды за вызов),
+а параллельный чат-запрос из другого потока мог уйти не в ту модель.
+
+Здесь:
+- GigaChatEmbeddingsClient — собственный SDK-клиент с моделью Embeddings,
+  своим токеном (обновляется SDK под его же блокировкой) и пулом соединений;
+- EmbeddingBatcher — объединяет одиночные вызовы из разных потоков,
+  пришедшие в течение короткого окна, в один пакетный запрос к API;
+- embed_text / embed_texts — сначала постоянный кеш по содержимому
+  (embedding_cache), к API идут только новые тексты.
+"""
+import logging
+import os
+import threading
+import time
+from typing import List, Optional
+
+from django.conf import settings
+
+from . import embedding_cache
+from .gigachat_api import rate_limit_retry
+
+logger = logging.getLogger(__name__)
+
+EMBEDDINGS_MODEL = 'Embeddings'
+MIN_TEXT_LENGTH = 10
+MAX_TEXT_LENGTH = 8000
+
+POOL_SIZE = getattr(settings, 'GIGACHAT_EMBEDDINGS_POOL_SIZE', 4)
+MAX_BATCH_SIZE = getattr(settings, 'GIGACHAT_EMBEDDINGS_MAX_BATCH', 32)
+BATCH_WINDOW = getattr(settings, 'GIGACHAT_EMBEDDINGS_BATCH_WINDOW', 0.02)  # секунды
+
+
+def prepare_embedding_text(text: str) -> Optional[str]:
+    """Очищает текст для embeddings; None если текст пустой или слишком короткий"""
+    if not text or not text.strip():
+        return None
+    text = text.strip()
+    if len(text) < MIN_TEXT_LENGTH:
+        return None
+    return text[:MAX_TEXT_LENGTH]
+
+
+class GigaChatEmbeddingsClient:
+    """
+    Потокобезопасный клиент GigaChat-Embeddings.
+
+    SDK-клиент создаётся один раз; httpx внутри него держит пул соединений,
+    а семафор ограничивает число одновременных запросов размером пула.
+    """
+
+    def __init__(self, credentials: Optional[str] = None, pool_size: int = POOL_SIZE):
+        self.credentials = credentials or getattr(settings, 'GIGACHAT_API_KEY', os.getenv('GIGACHAT_API_KEY'))
+        self.pool_size = max(1, pool_size)
+        self._semaphore = threading.BoundedSemaphore(self.pool_size)
+        self._lock = threading.Lock()
+        self._sdk = None
+
+    def _get_sdk(self):
+        if self._sdk is None:
+            with self._lock:
+                if self._sdk is None:
+                    from gigachat import GigaChat
+
+                    options = dict(
+                        credentials=self.credentials,
+                        model=EMBEDDINGS_MODEL,
+                        verify_ssl_certs=False,
+                        scope="GIGACHAT_API_PERS",
+                    )
+                    try:
+                        self._sdk = GigaChat(max_connections=self.pool_size, **options)
+                    except TypeError:
+                        # Старые версии SDK не принимают max_connections
+                        self._sdk = GigaChat(**options)
+                    logger.info(f"GigaChat embeddings client initialized (pool={self.pool_size})")
+        return self._sdk
+
+    @staticmethod
+    def _request(sdk, texts: List[str]):
+        """Вызов API с учётом разных версий SDK"""
+        try:
+            return sdk.embeddings(texts, model=EMBEDDINGS_MODEL)
+        except TypeError:
+            from gigachat.models import Embeddings as EmbeddingsModel
+            return sdk.embeddings(EmbeddingsModel(input=texts, model=EMBEDDINGS_MODEL))
+
+    @rate_limit_retry(max_retries=3, base_delay=5)
+    def embed_many(self, texts: List[str]) -> List[List[float]]:
+        """
+        Один пакетный запрос к API для уже подготовленных текстов.
+
+        Returns:
+            List[List[float]]: Векторы в порядке texts
+
+        Raises:
+            Exception: При ошибке API или неполном ответе
+        """
+        if not texts:
+            return []
+
+        sdk = self._get_sdk()
+        with self._semaphore:
+            response = self._request(sdk, texts)
+
+        data = list(getattr(response, 'data', None) or [])
+        if len(data) != len(texts):
+            raise Exception(f"Embeddings API вернул {len(data)} векторов вместо {len(texts)}")
+        if all(getattr(item, 'index', None) is not None for item in data):
+            data.sort(key=lambda item: item.index)
+        return [item.embedding for item in data]
+
+    def close(self):
+        with self._lock:
+            if self._sdk is not None:
+                try:
+                    self._sdk.close()
+                except Exception:
+                    pass
+                self._sdk = None
+
+
+class _PendingEmbedding:
+    __slots__ = ('text', 'taken', 'done', 'result', 'error')
+
+    def __init__(self, text: str):
+        self.text = text
+        self.taken = False
+        self.done = False
+        self.result = None
+        self.error = None
+
+
+class EmbeddingBatcher:
+    """
+    Объединяет одиночные запросы embeddings из разных потоков в пакеты.
+
+    Фоновых потоков нет: первый вызвавший поток становится «лидером», ждёт
+    окно window (или пока не наберётся max_batch текстов), забирает пакет,
+    снимает с себя лидерство и только потом отправляет запрос. Пока пакет
+    в полёте, следующий поток с ещё не взятым текстом собирает новый пакет —
+    запросы идут параллельно (в пределах пула клиента), а не по очереди.
+    """
+
+    def __init__(self, client: GigaChatEmbeddingsClient, max_batch: int = MAX_BATCH_SIZE,
+                 window: float = BATCH_WINDOW):
+        self.client = client
+        self.max_batch = max(1, max_batch)
+        self.window = max(0.0, window)
+        self._cond = threading.Condition()
+        self._pending: List[_PendingEmbedding] = []
+        self._leader = False
+        self.batches_sent = 0
+        self.texts_sent = 0
+
+    def embed(self, text: str) -> List[float]:
+        """
+        Embedding одного подготовленного текста (см. prepare_embedding_text).
+
+        Raises:
+            Exception: Ошибка пакетного запроса, в который попал текст,
+                или API не вернул вектор
+        """
+        item = _PendingEmbedding(text)
+        with self._cond:
+            self._pending.append(item)
+            if len(self._pending) >= self.max_batch:
+                self._cond.notify_all()
+
+        while True:
+            with self._cond:
+                while not item.done and (item.taken or self._leader):
+                    self._cond.wait()
+                if item.done:
+                    break
+
+                self._leader = True
+                deadline = time.monotonic() + self.window
+                while len(self._pending) < self.max_batch:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch = self._pending[:self.max_batch]
+                del self._pending[:self.max_batch]
+                for pending in batch:
+                    pending.taken = True
+                self._leader = False
+                self._cond.notify_all()
+
+            try:
+                self._send(batch)
+            finally:
+                with self._cond:
+                    for pending in batch:
+                        pending.done = True
+                    self._cond.notify_all()
+
+        if item.error is not None:
+            raise item.error
+        if item.result is None:
+            raise Exception("Embeddings API не вернул вектор")
+        return item.result
+
+    def _send(self, batch: List[_PendingEmbedding]):
+        # Одинаковые тексты в пакете отправляются один раз
+        unique_texts = list(dict.fromkeys(pending.text for pending in batch))
+        try:
+            embeddings = self.client.embed_many(unique_texts)
+            if embeddings is None:
+                raise Exception("Embeddings API: попытки запроса исчерпаны")
+            vectors = dict(zip(unique_texts, embeddings))
+            with self._cond:  # пакеты отправляются параллельно
+                self.batches_sent += 1
+                self.texts_sent += len(unique_texts)
+            if len(batch) > 1:
+                logger.debug(f"📦 Embeddings: {len(batch)} запросов объединены в один ({len(unique_texts)} текстов)")
+        except Exception as e:
+            for pending in batch:
+                pending.error = e
+            return
+        for pending in batch:
+            pending.result = vectors[pending.text]
+
+
+_embeddings_client: Optional[GigaChatEmbeddingsClient] = None
+_embedding_batcher: Optional[EmbeddingBatcher] = None
+_singleton_lock = threading.Lock()
+
+
+def get_embeddings_client() -> GigaChatEmbeddingsClient:
+    """Общий клиент embeddings процесса"""
+    global _embeddings_client
+    if _embeddings_client is None:
+        with _singleton_lock:
+            if _embeddings_client is None:
+                _embeddings_client = GigaChatEmbeddingsClient()
+    return _embeddings_client
+
+
+def get_embedding_batcher() -> EmbeddingBatcher:
+    """Общий батчер одиночных запросов embeddings"""
+    global _embedding_batcher
+    if _embedding_batcher is None:
+        client = get_embeddings_client()
+        with _singleton_lock:
+            if _embedding_batcher is None:
+                _embedding_batcher = EmbeddingBatcher(client)
+    return _embedding_batcher
+
+
+def embed_text(text: str) -> List[float]:
+    """
+    Embedding подготовленного текста: кеш по содержимому, затем батчер.
+
+    Raises:
+        Exception: Ошибка API
+    """
+    cached = embedding_cache.lookup(text, EMBEDDINGS_MODEL)
+    if cached is not None:
+        return cached
+
+    vector = get_embedding_batcher().embed(text)
+    embedding_cache.save(text, vector, EMBEDDINGS_MODEL)
+    return vector
+
+
+def embed_texts(texts: List[str]) -> List[List[float]]:
+    """
+    Embeddings списка подготовленных текстов: найденные в кеше не запрашиваются,
+    остальные уходят пакетами по MAX_BATCH_SIZE.
+
+    Raises:
+        Exception: Ошибка API
+    """
+    vectors = embedding_cache.lookup_many(texts, EMBEDDINGS_MODEL)
+    missing = [text for text in dict.fromkeys(texts) if text not in vectors]
+
+    if missing:
+        client = get_embeddings_client()
+        fresh = {}
+        for start in range(0, len(missing), MAX_BATCH_SIZE):
+            chunk = missing[start:start + MAX_BATCH_SIZE]
+            embeddings = client.embed_many(chunk)
+            if embeddings is None:
+                raise Exception("Embeddings API: попытки запроса исчерпаны")
+            fresh.update(zip(chunk, embeddings))
+        embedding_cache.save_many(fresh, EMBEDDINGS_MODEL)
+        vectors.update(fresh)
+        logger.info(f"📦 Embeddings: {len(texts) - len(missing)} из кеша, {len(missing)} запрошено у API")
+
+    return [vectors[text] for text in texts]
@@ -0,0 +1,356 @@
+"""
+Очередь отправки URL в поисковые системы (IndexNow, Bing, Яндекс.Вебмастер)
+
+Раньше каждая статья и каждое изображение отправлялись отдельным запросом
+в каждый поисковик прямо в месте публикации (schedule.services,
+daily_article_generator, seo_advanced): один URL — один POST в IndexNow,
+один в Bing, пинг sitemap в Google; повторные публикации и перезапуски
+отправляли те же URL снова, ошибки и ответы 429 нигде не учитывались.
+
+Здесь:
+- enqueue_urls() кладёт пары (поисковик, URL) в IndexingSubmission без
+  дублей: URL, уже стоящий в очереди или отправленный менее
+  RESUBMIT_SECONDS назад, повторно не ставится;
+- flush_indexing_queue() (задача Django-Q, раз в минуту) отправляет в
+  IndexNow/Bing пачки до INDEXNOW_BATCH_SIZE URL одним POST, в Яндекс —
+  по одному URL (у API переобхода нет пакетной отправки), не больше
+  YANDEX_PER_FLUSH за запуск;
+- 429, 5xx и сетевые ошибки откладывают URL с экспоненциальной паузой
+  (next_attempt_at), после MAX_ATTEMPTS неудач или на 400/422 URL
+  помечается ошибкой; код ответа и текст ошибки сохраняются в строке.
+
+Адреса сервисов можно переопределить в INDEXING_ENDPOINTS (например,
+локальной заглушкой в тестах).
+"""
+import logging
+import os
+from collections import defaultdict
+from datetime import timedelta
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import urlsplit
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+ENGINE_INDEXNOW = 'indexnow'
+ENGINE_BING = 'bing'
+ENGINE_YANDEX = 'yandex'
+
+DEFAULT_ENDPOINTS = {
+    ENGINE_INDEXNOW: 'https://api.indexnow.org/indexnow',
+    ENGINE_BING: 'https://www.bing.com/indexnow',
+}
+KEY_SETTINGS = {
+    ENGINE_INDEXNOW: 'INDEXNOW_KEY',
+    ENGINE_BING: 'BING_INDEXNOW_KEY',
+}
+
+INDEXNOW_BATCH_SIZE = 10000  # лимит протокола IndexNow на один POST
+YANDEX_PER_FLUSH = getattr(settings, 'INDEXING_YANDEX_PER_FLUSH', 100)
+RESUBMIT_SECONDS = getattr(settings, 'INDEXING_RESUBMIT_SECONDS', 60 * 60 * 24)
+BACKOFF_BASE_SECONDS = 60
+BACKOFF_MAX_SECONDS = 60 * 60 * 6
+MAX_ATTEMPTS = 8
+PERMANENT_STATUSES = {400, 422}  # запрос/URL отвергнуты, повтор не поможет
+REQUEST_TIMEOUT = 30
+QUERY_CHUNK = 1000
+FLUSH_LOCK_KEY = 'indexing_queue_flush_lock'
+FLUSH_LOCK_TIMEOUT = 60 * 10
+
+
+def _site_url() -> str:
+    return getattr(settings, 'SITE_URL', 'https://idealimage.ru').rstrip('/')
+
+
+def _endpoints() -> Dict[str, str]:
+    return {**DEFAULT_ENDPOINTS, **(getattr(settings, 'INDEXING_ENDPOINTS', None) or {})}
+
+
+def _yandex_client():
+    from Asistent.services.yandex_webmaster import get_yandex_webmaster_client
+    return get_yandex_webmaster_client()
+
+
+def configured_engines() -> List[str]:
+    """Поисковики, для которых заданы ключи / доступы"""
+    engines = [engine for engine, key_name in KEY_SETTINGS.items() if getattr(settings, key_name, '')]
+    if _yandex_client().configured:
+        engines.append(ENGINE_YANDEX)
+    return engines
+
+
+def _chunks(items: list, size: int = QUERY_CHUNK):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+# ============================================================================
+# ПОСТАНОВКА В ОЧЕРЕДЬ
+# ============================================================================
+
+def enqueue_urls(urls: Iterable[str], engines: Optional[Iterable[str]] = None,
+                 resubmit_after: Optional[int] = RESUBMIT_SECONDS) -> int:
+    """
+    Ставит URL в очередь отправки без дублей.
+
+    Args:
+        urls: Абсолютные URL
+        engines: Поисковики (по умолчанию все настроенные)
+        resubmit_after: Через сколько секунд после успешной отправки URL
+            можно отправить снова; None — никогда (изображения)
+
+    Returns:
+        int: Количество поставленных в очередь пар (поисковик, URL)
+    """
+    from .models import IndexingSubmission
+
+    urls = list(dict.fromkeys(url for url in urls if url))
+    available = configured_engines()
+    engines = available if engines is None else [engine for engine in engines if engine in available]
+    if not urls or not engines:
+        return 0
+
+    now = timezone.now()
+    queued = 0
+    for engine in engines:
+        for chunk in _chunks(urls):
+            existing = {
+                url: (pk, status, submitted_at)
+                for url, pk, status, submitted_at in IndexingSubmission.objects.filter(
+                    engine=engine, url__in=chunk,
+                ).values_list('url', 'pk', 'status', 'last_submitted_at')
+            }
+            new_rows = [
+                IndexingSubmission(engine=engine, url=url, enqueued_at=now, next_attempt_at=now)
+                for url in chunk if url not in existing
+            ]
+            IndexingSubmission.objects.bulk_create(new_rows, ignore_conflicts=True)
+
+            requeue = []
+            if resubmit_after is not None:
+                threshold = now - timedelta(seconds=resubmit_after)
+                requeue = [
+                    pk for pk, status, submitted_at in existing.values()
+                    if status != 'pending' and (submitted_at is None or submitted_at <= threshold)
+                ]
+            if requeue:
+                IndexingSubmission.objects.filter(pk__in=requeue).update(
+                    status='pending', enqueued_at=now, next_attempt_at=now, attempts=0, last_error='',
+                )
+            queued += len(new_rows) + len(requeue)
+
+    if queued:
+        logger.info(f"🔎 В очередь индексации: {queued} (URL: {len(urls)}, поисковики: {', '.join(engines)})")
+    return queued
+
+
+def unknown_urls(urls: Iterable[str], engine: str) -> List[str]:
+    """URL, которых ещё нет в очереди поисковика (ни в каком статусе), в исходном порядке"""
+    from .models import IndexingSubmission
+
+    urls = list(dict.fromkeys(url for url in urls if url))
+    known = set()
+    for chunk in _chunks(urls):
+        known.update(
+            IndexingSubmission.objects.filter(engine=engine, url__in=chunk).values_list('url', flat=True)
+        )
+    return [url for url in urls if url not in known]
+
+
+def enqueue_post(post_id: int) -> Optional[dict]:
+    """
+    Ставит опубликованную статью в очередь индексации.
+
+    Returns:
+        dict: URL и количество поставленных пар или None, если статьи нет
+    """
+    from blog.models import Post
+
+    try:
+        post = Post.objects.only('pk', 'slug').get(id=post_id, status='published')
+    except Post.DoesNotExist:
+        logger.error(f"Post {post_id} не найден")
+        return None
+
+    post_url = f"{_site_url()}{post.get_absolute_url()}"
+    return {'url': post_url, 'queued': enqueue_urls([post_url])}
+
+
+def submit_image_urls(image_urls: List[str]) -> dict:
+    """
+    Ставит URL изображений в очередь IndexNow и сразу отправляет её.
+
+    Если очередь в этот момент отправляет другой процесс (или отправка
+    упала), URL остаются в очереди до плановой отправки: результат —
+    success=False с flush_skipped=True, а не «отправлено 0».
+
+    Returns:
+        dict: Результат в прежнем формате ({'success', 'queued', 'indexnow': {...}})
+    """
+    if ENGINE_INDEXNOW not in configured_engines():
+        return {'success': False, 'indexnow': {'success': False, 'error': 'not_configured_or_empty'}}
+
+    queued = enqueue_urls(image_urls, engines=[ENGINE_INDEXNOW], resubmit_after=None)
+    totals = flush_indexing_queue([ENGINE_INDEXNOW])
+    if ENGINE_INDEXNOW not in totals:
+        logger.info(f"⏳ IndexNow: {queued} URL изображений в очереди, отправка пропущена")
+        return {
+            'success': False,
+            'queued': queued,
+            'flush_skipped': True,
+            'indexnow': {'success': False, 'flush_skipped': True, 'error': 'flush_skipped'},
+        }
+    flushed = totals[ENGINE_INDEXNOW]
+    success = not flushed.get('failed') and not flushed.get('deferred')
+    return {
+        'success': success,
+        'queued': queued,
+        'indexnow': {'success': success, **flushed},
+    }
+
+
+# ============================================================================
+# ОТПРАВКА (Django-Q)
+# ============================================================================
+
+def _due(engine: str):
+    from .models import IndexingSubmission
+
+    return IndexingSubmission.objects.filter(
+        engine=engine, status='pending', next_attempt_at__lte=timezone.now(),
+    ).order_by('next_attempt_at', 'pk')
+
+
+def _mark_submitted(rows: List[tuple], status_code: Optional[int]) -> None:
+    from .models import IndexingSubmission
+
+    now = timezone.now()
+    for chunk in _chunks([pk for pk, _, _ in rows]):
+        IndexingSubmission.objects.filter(pk__in=chunk).update(
+            status='submitted', last_submitted_at=now, attempts=0,
+            last_status_code=status_code, last_error='',
+        )
+
+
+def _mark_failed(rows: List[tuple], status_code: Optional[int], error: str, permanent: bool = False) -> int:
+    """
+    Откладывает URL с экспоненциальной паузой или помечает ошибкой.
+
+    Returns:
+        int: Количество URL, помеченных ошибкой окончательно
+    """
+    from .models import IndexingSubmission
+
+    now = timezone.now()
+    by_attempts = defaultdict(list)
+    for pk, _, attempts in rows:
+        by_attempts[attempts + 1].append(pk)
+
+    failed = 0
+    for attempts, pks in by_attempts.items():
+        values = {'attempts': attempts, 'last_status_code': status_code, 'last_error': error[:255]}
+        if permanent or attempts >= MAX_ATTEMPTS:
+            values['status'] = 'failed'
+            failed += len(pks)
+        else:
+            delay = min(BACKOFF_BASE_SECONDS * 2 ** (attempts - 1), BACKOFF_MAX_SECONDS)
+            values['next_attempt_at'] = now + timedelta(seconds=delay)
+        for chunk in _chunks(pks):
+            IndexingSubmission.objects.filter(pk__in=chunk).update(**values)
+    return failed
+
+
+def _record_outcome(result: dict, rows: List[tuple], status_code: Optional[int], error: str) -> bool:
+    """Записывает исход отправки пачки; True — можно отправлять дальше"""
+    if status_code in (200, 202):
+        _mark_submitted(rows, status_code)
+        result['submitted'] += len(rows)
+        return True
+
+    failed = _mark_failed(rows, status_code, error, permanent=status_code in PERMANENT_STATUSES)
+    result['failed'] += failed
+    result['deferred'] += len(rows) - failed
+    return False
+
+
+def _flush_indexnow(engine: str, session: requests.Session) -> dict:
+    endpoint = _endpoints()[engine]
+    key = getattr(settings, KEY_SETTINGS[engine], '')
+    site_url = _site_url()
+    result = {'requests': 0, 'submitted': 0, 'deferred': 0, 'failed': 0}
+
+    while True:
+        rows = list(_due(engine).values_list('pk', 'url', 'attempts')[:INDEXNOW_BATCH_SIZE])
+        if not rows:
+            break
+
+        payload = {
+            'host': urlsplit(site_url).netloc,
+            'key': key,
+            'keyLocation': f'{site_url}/{key}.txt',
+            'urlList': [url for _, url, _ in rows],
+        }
+        try:
+            response = session.post(endpoint, json=payload, timeout=REQUEST_TIMEOUT)
+            status_code, error = response.status_code, response.text
+        except requests.RequestException as e:
+            status_code, error = None, str(e)
+        result['requests'] += 1
+
+        if not _record_outcome(result, rows, status_code, error):
+            logger.warning(f"⚠️ {engine}: пачка из {len(rows)} URL не принята ({status_code or error})")
+            break
+        if len(rows) < INDEXNOW_BATCH_SIZE:
+            break
+    return result
+
+
+def _flush_yandex() -> dict:
+    client = _yandex_client()
+    result = {'requests': 0, 'submitted': 0, 'deferred': 0, 'failed': 0}
+
+    for row in _due(ENGINE_YANDEX).values_list('pk', 'url', 'attempts')[:YANDEX_PER_FLUSH]:
+        response = client.enqueue_recrawl(row[1])
+        result['requests'] += 1
+        status_code = 200 if response.get('success') else response.get('status_code')
+        if not _record_outcome(result, [row], status_code, str(response.get('error') or '')) \
+                and (status_code is None or status_code == 429):
+            # Квота или сеть: остальные URL ждут следующего запуска без штрафа
+            break
+    return result
+
+
+def flush_indexing_queue(engines: Optional[Iterable[str]] = None) -> Dict[str, dict]:
+    """
+    Отправляет накопленные URL в поисковики (задача Django-Q, раз в минуту).
+
+    Returns:
+        dict: {поисковик: {'requests', 'submitted', 'deferred', 'failed'}}
+    """
+    if not cache.add(FLUSH_LOCK_KEY, os.getpid(), FLUSH_LOCK_TIMEOUT):
+        logger.info("⏭️ Очередь индексации уже отправляется")
+        return {}
+
+    totals: Dict[str, dict] = {}
+    try:
+        session = requests.Session()
+        available = configured_engines()
+        for engine in (available if engines is None else [e for e in engines if e in available]):
+            try:
+                totals[engine] = _flush_yandex() if engine == ENGINE_YANDEX else _flush_indexnow(engine, session)
+            except Exception as e:
+                logger.error(f"❌ Ошибка отправки очереди индексации ({engine}): {e}", exc_info=True)
+    finally:
+        cache.delete(FLUSH_LOCK_KEY)
+
+    for engine, result in totals.items():
+        if result['requests']:
+            logger.info(
+                f"🔎 {engine}: запросов {result['requests']}, отправлено {result['submitted']}, "
+                f"отложено {result['deferred']}, ошибок {result['failed']}"
+            )
+    return totals
@@ -1,224 +1,711 @@
 """
 Кэширование векторов базы знаний в памяти для быстрого поиска
-Поддерживает in-memory кэш (single process) и Django cache (multi-process)
+Режимы (settings.AI_KNOWLEDGE_INDEX_MODE):
+- 'mmap'   — общий индекс на диске (settings.AI_KNOWLEDGE_INDEX_DIR), все веб- и
+             qcluster-процессы открывают одни и те же .npy через memory map;
+- 'memory' — отдельная копия в памяти каждого процесса;
+- 'django' — массивы индекса в Django cache + счётчик версии.
+
+Векторы хранятся одной непрерывной матрицей float32 (n × d), строки заранее
+нормализованы. Поиск top-k — одно матрично-векторное произведение и
+np.argpartition, фильтр по категории — булева маска по массиву кодов.
+Индекс обновляется построчно при изменении записи (хуки services/embedding.py
+и сигналы AIKnowledgeBase), без полной перезагрузки из БД.
 """
+import json
+import os
+import shutil
+import threading
+import time
 import numpy as np
 import logging
-from typing import List, Tuple, Optional
+from typing import Dict, List, Optional, Tuple
 from django.core.cache import cache
 from django.conf import settings
 
 logger = logging.getLogger(__name__)
 
-# Глобальный кэш векторов в памяти процесса (для single-process)
-_KNOWLEDGE_VECTORS_CACHE = None
-_CACHE_VERSION = 0
-
-# Ключ для Django cache (для multi-process)
-DJANGO_CACHE_KEY = "ai_knowledge_vectors_v1"
+# Ключи для Django cache (для multi-process)
+DJANGO_CACHE_KEY = "ai_knowledge_index_v2"
+DJANGO_CACHE_VERSION_KEY = "ai_knowledge_index_version"
 DJANGO_CACHE_TIMEOUT = 60 * 15  # 15 минут
 
-# Режим кэширования: 'memory' или 'django'
+# Как часто (сек) процесс сверяет версию индекса с Django cache
+VERSION_CHECK_INTERVAL = 5
+
+# Режим кэширования: 'mmap', 'memory' или 'django'
 USE_DJANGO_CACHE = getattr(settings, 'AI_USE_DJANGO_CACHE', False)
+INDEX_MODE = getattr(settings, 'AI_KNOWLEDGE_INDEX_MODE', '') or ('django' if USE_DJANGO_CACHE else 'mmap')
 
+# Общий индекс на диске
+SNAPSHOT_POINTER = 'CURRENT'
+SNAPSHOT_KEEP_VERSIONS = 3
+SNAPSHOT_PENDING_KEY = 'ai_knowledge_snapshot_pending'
+# Холодный старт: индекс из БД строит один процесс, остальные ждут его версию
+SNAPSHOT_BUILD_LOCK_KEY = 'ai_knowledge_snapshot_build'
+SNAPSHOT_BUILD_LOCK_TIMEOUT = 60 * 5
+SNAPSHOT_BUILD_WAIT = 10
+SNAPSHOT_ARRAYS = ('ids', 'matrix', 'categories', 'priorities')
 
-def load_knowledge_vectors(force_reload=False, use_django_cache=None):
+
+class KnowledgeVectorIndex:
     """
-    Загружает все векторы из БД в память для быстрого поиска
-    
-    Args:
-        force_reload: Принудительная перезагрузка из БД
-        use_django_cache: True - Django cache (multi-process), False - in-memory
-                         None - автоопределение из settings
-        
-    Returns:
-        List[dict]: Список словарей с id, embedding, data
+    Векторный индекс базы знаний.
+
+    ids         — int64[n], id записей AIKnowledgeBase
+    matrix      — float32[n, d], L2-нормализованные embeddings
+    categories  — int16[n], коды категорий (см. category_codes)
+    priorities  — int16[n]
     """
-    global _KNOWLEDGE_VECTORS_CACHE, _CACHE_VERSION
-    
-    # Определяем режим кэширования
-    if use_django_cache is None:
-        use_django_cache = USE_DJANGO_CACHE
-    
-    # Режим 1: Django cache (для multi-process: gunicorn, uwsgi)
-    if use_django_cache:
-        return _load_from_django_cache(force_reload)
-    
-    # Режим 2: In-memory cache (для single-process: runserver)
-    return _load_from_memory_cache(force_reload)
-
-
-def _load_from_memory_cache(force_reload=False):
-    """Загрузка из in-memory кэша (single-process)"""
-    global _KNOWLEDGE_VECTORS_CACHE, _CACHE_VERSION
-    
-    # Проверяем нужна ли перезагрузка
-    if not force_reload and _KNOWLEDGE_VECTORS_CACHE is not None:
-        logger.info(f"📦 In-memory кэш: {len(_KNOWLEDGE_VECTORS_CACHE)} записей")
-        return _KNOWLEDGE_VECTORS_CACHE
-    
-    vectors = _fetch_vectors_from_db()
-    
-    if vectors:
-        _KNOWLEDGE_VECTORS_CACHE = vectors
-        _CACHE_VERSION += 1
-        logger.info(f"✅ In-memory кэш обновлён: {len(vectors)} векторов (v{_CACHE_VERSION})")
-    
-    return vectors
-
-
-def _load_from_django_cache(force_reload=False):
-    """Загрузка из Django cache (multi-process)"""
-    
-    # Проверяем кэш
-    if not force_reload:
-        cached = cache.get(DJANGO_CACHE_KEY)
-        if cached:
-            logger.info(f"📦 Django cache: {len(cached)} записей")
-            return cached
-    
-    vectors = _fetch_vectors_from_db()
-    
-    if vectors:
-        # Сохраняем в Django cache
-        cache.set(DJANGO_CACHE_KEY, vectors, DJANGO_CACHE_TIMEOUT)
-        logger.info(f"✅ Django cache обновлён: {len(vectors)} векторов (TTL {DJANGO_CACHE_TIMEOUT}s)")
-    
-    return vectors
-
-
-def _fetch_vectors_from_db():
-    """Общая функция загрузки векторов из БД"""
+
+    INITIAL_CAPACITY = 256
+
+    def __init__(self, dim: int = 0):
+        self.dim = dim
+        self.size = 0
+        self.version = 0
+        self.read_only = False
+        self.category_codes: Dict[str, int] = {}
+        self._row_by_id: Dict[int, int] = {}
+        self._items: Dict[int, object] = {}
+        self._lock = threading.RLock()
+        self._allocate(self.INITIAL_CAPACITY if dim else 0)
+
+    # ------------------------------------------------------------------
+    # Хранилище
+    # ------------------------------------------------------------------
+    def _allocate(self, capacity):
+        self._ids = np.zeros(capacity, dtype=np.int64)
+        self._matrix = np.zeros((capacity, self.dim), dtype=np.float32)
+        self._categories = np.zeros(capacity, dtype=np.int16)
+        self._priorities = np.zeros(capacity, dtype=np.int16)
+
+    def _grow(self):
+        capacity = max(self.INITIAL_CAPACITY, len(self._ids) * 2)
+        ids, matrix, categories, priorities = self._ids, self._matrix, self._categories, self._priorities
+        self._allocate(capacity)
+        self._ids[:self.size] = ids[:self.size]
+        self._matrix[:self.size] = matrix[:self.size]
+        self._categories[:self.size] = categories[:self.size]
+        self._priorities[:self.size] = priorities[:self.size]
+
+    @property
+    def ids(self):
+        return self._ids[:self.size]
+
+    @property
+    def matrix(self):
+        return self._matrix[:self.size]
+
+    @property
+    def categories(self):
+        return self._categories[:self.size]
+
+    @property
+    def priorities(self):
+        return self._priorities[:self.size]
+
+    def __len__(self):
+        return self.size
+
+    @staticmethod
+    def _normalize(embedding) -> Optional[np.ndarray]:
+        vector = np.asarray(embedding, dtype=np.float32).ravel()
+        if vector.size == 0:
+            return None
+        norm = float(np.linalg.norm(vector))
+        if norm == 0.0 or not np.isfinite(norm):
+            return None
+        return vector / norm
+
+    def _category_code(self, category: str) -> int:
+        code = self.category_codes.get(category)
+        if code is None:
+            code = len(self.category_codes) + 1
+            self.category_codes[category] = code
+        return code
+
+    # ------------------------------------------------------------------
+    # Построение и инкрементальные обновления
+    # ------------------------------------------------------------------
+    @classmethod
+    def build(cls, rows) -> 'KnowledgeVectorIndex':
+        """
+        Строит индекс из итерируемого (id, embedding, category, priority, item).
+        Размерность — самая частая среди векторов (остальные пропускаются).
+        """
+        rows = [row for row in rows if row[1]]
+        dims = {}
+        for row in rows:
+            dims[len(row[1])] = dims.get(len(row[1]), 0) + 1
+        index = cls(dim=max(dims, key=dims.get) if dims else 0)
+        if not index.dim:
+            return index
+
+        candidates = [row for row in rows if len(row[1]) == index.dim]
+        matrix = np.asarray([row[1] for row in candidates], dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1)
+        keep = np.flatnonzero((norms > 0) & np.isfinite(norms))
+
+        capacity = max(cls.INITIAL_CAPACITY, len(keep))
+        index._allocate(capacity)
+        index.size = len(keep)
+        index._matrix[:index.size] = matrix[keep] / norms[keep, None]
+        for row_no, source_no in enumerate(keep):
+            item_id, _, category, priority, item = candidates[source_no]
+            index._ids[row_no] = item_id
+            index._categories[row_no] = index._category_code(category)
+            index._priorities[row_no] = priority or 0
+            index._row_by_id[item_id] = row_no
+            if item is not None:
+                index._items[item_id] = item
+        index.version += 1
+        return index
+
+    def upsert(self, item_id: int, embedding, category: str, priority: int = 0, item=None) -> bool:
+        """Добавляет или заменяет одну строку индекса. O(d)."""
+        if self.read_only:
+            raise ValueError("Индекс открыт только для чтения (mmap)")
+        vector = self._normalize(embedding)
+        with self._lock:
+            if vector is None or (self.dim and vector.size != self.dim):
+                self.remove(item_id)
+                return False
+            if not self.dim:
+                self.dim = vector.size
+                self._allocate(self.INITIAL_CAPACITY)
+
+            row = self._row_by_id.get(item_id)
+            if row is None:
+                if self.size == len(self._ids):
+                    self._grow()
+                row = self.size
+                self.size += 1
+                self._row_by_id[item_id] = row
+                self._ids[row] = item_id
+            self._matrix[row] = vector
+            self._categories[row] = self._category_code(category)
+            self._priorities[row] = priority or 0
+            if item is not None:
+                self._items[item_id] = item
+            self.version += 1
+            return True
+
+    def remove(self, item_id: int) -> bool:
+        """Удаляет строку, перенося на её место последнюю. O(d)."""
+        if self.read_only:
+            raise ValueError("Индекс открыт только для чтения (mmap)")
+        with self._lock:
+            row = self._row_by_id.pop(item_id, None)
+            self._items.pop(item_id, None)
+            if row is None:
+                return False
+            last = self.size - 1
+            if row != last:
+                moved_id = int(self._ids[last])
+                self._ids[row] = moved_id
+                self._matrix[row] = self._matrix[last]
+                self._categories[row] = self._categories[last]
+                self._priorities[row] = self._priorities[last]
+                self._row_by_id[moved_id] = row
+            self.size = last
+            self.version += 1
+            return True
+
+    # ------------------------------------------------------------------
+    # Поиск
+    # ------------------------------------------------------------------
+    def search(self, query_embedding, top_k: int = 5, category: Optional[str] = None,
+               min_similarity: float = 0.0) -> List[Tuple[int, float]]:
+        """
+        Top-k по косинусной близости.
+
+        Returns:
+            List[Tuple[int, float]]: (id записи, схожесть) по убыванию
+        """
+        query = self._normalize(query_embedding)
+        if query is None or query.size != self.dim or top_k <= 0:
+            return []
+
+        with self._lock:
+            if not self.size:
+                return []
+            scores = self.matrix @ query
+            if category:
+                code = self.category_codes.get(category)
+                if code is None:
+                    return []
+                scores = np.where(self.categories == code, scores, -np.inf)
+            ids = self.ids.copy()
+
+        k = min(top_k, scores.size)
+        if k < scores.size:
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(scores.size)
+        top = top[np.argsort(-scores[top], kind='stable')]
+
+        return [
+            (int(ids[row]), float(scores[row]))
+            for row in top
+            if np.isfinite(scores[row]) and scores[row] >= min_similarity
+        ]
+
+    def get_items(self, ids):
+        """
+        ORM-экземпляры по id (недостающие догружаются одним запросом).
+        Записи, выключенные после построения индекса (mmap-версия обновляется
+        с задержкой), пропускаются.
+        """
+        missing = [item_id for item_id in ids if item_id not in self._items]
+        if missing:
+            from .models import AIKnowledgeBase
+            self._items.update(AIKnowledgeBase.objects.filter(is_active=True).in_bulk(missing))
+        return [self._items[item_id] for item_id in ids if item_id in self._items]
+
+    # ------------------------------------------------------------------
+    # Сериализация для Django cache (без ORM-объектов)
+    # ------------------------------------------------------------------
+    def to_payload(self) -> dict:
+        with self._lock:
+            return {
+                'dim': self.dim,
+                'ids': self.ids.copy(),
+                'matrix': self.matrix.copy(),
+                'categories': self.categories.copy(),
+                'priorities': self.priorities.copy(),
+                'category_codes': dict(self.category_codes),
+            }
+
+    @classmethod
+    def from_payload(cls, payload: dict, copy: bool = True) -> 'KnowledgeVectorIndex':
+        """
+        Индекс из массивов. copy=False — массивы используются как есть
+        (memory-mapped .npy), индекс становится read-only.
+        """
+        index = cls(dim=payload['dim'])
+        size = len(payload['ids'])
+        if copy:
+            index._allocate(max(cls.INITIAL_CAPACITY, size))
+            index._ids[:size] = payload['ids']
+            index._matrix[:size] = payload['matrix']
+            index._categories[:size] = payload['categories']
+            index._priorities[:size] = payload['priorities']
+        else:
+            index._ids = payload['ids']
+            index._matrix = payload['matrix']
+            index._categories = payload['categories']
+            index._priorities = payload['priorities']
+            index.read_only = True
+        index.size = size
+        index.category_codes = dict(payload['category_codes'])
+        index._row_by_id = {int(item_id): row for row, item_id in enumerate(payload['ids'])}
+        index.version += 1
+        return index
+
+
+# Глобальный индекс процесса
+_KNOWLEDGE_INDEX: Optional[KnowledgeVectorIndex] = None
+_INDEX_LOCK = threading.Lock()
+_SHARED_VERSION = None
+_VERSION_CHECKED_AT = 0.0
+
+
+def _fetch_index_from_db() -> KnowledgeVectorIndex:
+    """Строит индекс по всем активным записям с embeddings"""
     try:
         from .models import AIKnowledgeBase
-        
+
         logger.info("🔄 Загрузка векторов из БД...")
-        
+
         items = AIKnowledgeBase.objects.filter(
             is_active=True,
             embedding__isnull=False
         ).exclude(embedding=[])
-        
-        vectors = []
-        for item in items:
-            try:
-                # Преобразуем в numpy array
-                embedding_array = np.array(item.embedding)
-                
-                if len(embedding_array) == 0:
-                    continue
-                
-                vectors.append({
-                    'id': item.id,
-                    'embedding': embedding_array,
-                    'item': item,
-                    'title': item.title,
-                    'category': item.category,
-                    'priority': item.priority
-                })
-            except Exception as e:
-                logger.warning(f"Ошибка загрузки вектора для {item.id}: {e}")
-                continue
-        
-        logger.info(f"📊 Загружено {len(vectors)} векторов из БД")
-        return vectors
-        
+
+        index = KnowledgeVectorIndex.build(
+            (item.id, item.embedding, item.category, item.priority, item)
+            for item in items.iterator()
+        )
+        logger.info(f"📊 Загружено {len(index)} векторов из БД (dim={index.dim})")
+        return index
+
     except Exception as e:
         logger.error(f"❌ Ошибка загрузки векторов: {e}")
-        return []
+        return KnowledgeVectorIndex()
+
+
+def _publish_to_django_cache(index: KnowledgeVectorIndex):
+    """Публикует индекс для других процессов и увеличивает общую версию"""
+    global _SHARED_VERSION
+    try:
+        cache.set(DJANGO_CACHE_KEY, index.to_payload(), DJANGO_CACHE_TIMEOUT)
+        cache.add(DJANGO_CACHE_VERSION_KEY, 0, None)
+        _SHARED_VERSION = cache.incr(DJANGO_CACHE_VERSION_KEY)
+    except Exception as e:
+        logger.warning(f"Ошибка публикации индекса в Django cache: {e}")
+
+
+def _sync_with_django_cache():
+    """В django-режиме подхватывает индекс, обновлённый другим процессом"""
+    global _KNOWLEDGE_INDEX, _SHARED_VERSION, _VERSION_CHECKED_AT
+
+    now = time.monotonic()
+    if _KNOWLEDGE_INDEX is not None and now - _VERSION_CHECKED_AT < VERSION_CHECK_INTERVAL:
+        return
+    _VERSION_CHECKED_AT = now
+
+    shared_version = cache.get(DJANGO_CACHE_VERSION_KEY)
+    if _KNOWLEDGE_INDEX is not None and shared_version == _SHARED_VERSION:
+        return
+
+    payload = cache.get(DJANGO_CACHE_KEY)
+    if payload:
+        _KNOWLEDGE_INDEX = KnowledgeVectorIndex.from_payload(payload)
+        _SHARED_VERSION = shared_version
+        logger.info(f"📦 Django cache: индекс v{shared_version}, {len(_KNOWLEDGE_INDEX)} записей")
+    else:
+        _KNOWLEDGE_INDEX = _fetch_index_from_db()
+        _publish_to_django_cache(_KNOWLEDGE_INDEX)
+
+
+# ============================================================================
+# ОБЩИЙ ИНДЕКС НА ДИСКЕ (memory-mapped .npy)
+# ============================================================================
+#
+#   AI_KNOWLEDGE_INDEX_DIR/ (по умолчанию SHARED_CACHE_DIR/knowledge_index, вне MEDIA_ROOT)
+#       CURRENT                  — имя актуальной версии (атомарная замена)
+#       v1718000000000/ids.npy, matrix.npy, categories.npy, priorities.npy, meta.json
+#
+# Писатель собирает новую версию во временном каталоге, переименовывает его
+# и только потом подменяет CURRENT. Читатели открывают массивы с mmap_mode='r':
+# страницы разделяются всеми процессами через page cache ОС.
+
+_SNAPSHOT_VERSION = None
+
+
+def _snapshot_root():
+    root = getattr(settings, 'AI_KNOWLEDGE_INDEX_DIR', '')
+    if not root:
+        shared = getattr(settings, 'SHARED_CACHE_DIR', '') or os.path.join(settings.BASE_DIR, 'cache')
+        root = os.path.join(shared, 'knowledge_index')
+    return root
+
+
+def _read_snapshot_pointer():
+    try:
+        with open(os.path.join(_snapshot_root(), SNAPSHOT_POINTER), 'r', encoding='utf-8') as fh:
+            return fh.read().strip() or None
+    except OSError:
+        return None
+
+
+def write_index_snapshot(index: Optional[KnowledgeVectorIndex] = None) -> Optional[str]:
+    """
+    Записывает индекс новой версией на диск и атомарно переключает CURRENT.
+
+    Args:
+        index: Готовый индекс (по умолчанию строится из БД)
+
+    Returns:
+        Имя записанной версии или None
+    """
+    if index is None:
+        index = _fetch_index_from_db()
+
+    root = _snapshot_root()
+    os.makedirs(root, exist_ok=True)
+    version = f"v{time.time_ns() // 1_000_000}"
+    tmp_dir = os.path.join(root, f".{version}.{os.getpid()}.tmp")
+    final_dir = os.path.join(root, version)
+
+    try:
+        os.makedirs(tmp_dir)
+        payload = index.to_payload()
+        for name in SNAPSHOT_ARRAYS:
+            np.save(os.path.join(tmp_dir, f"{name}.npy"), np.ascontiguousarray(payload[name]))
+        with open(os.path.join(tmp_dir, 'meta.json'), 'w', encoding='utf-8') as fh:
+            json.dump({
+                'version': version,
+                'dim': payload['dim'],
+                'count': len(payload['ids']),
+                'category_codes': payload['category_codes'],
+                'created_at': time.time(),
+            }, fh, ensure_ascii=False)
+        os.rename(tmp_dir, final_dir)
+
+        pointer_tmp = os.path.join(root, f".{SNAPSHOT_POINTER}.{os.getpid()}.tmp")
+        with open(pointer_tmp, 'w', encoding='utf-8') as fh:
+            fh.write(version)
+        os.replace(pointer_tmp, os.path.join(root, SNAPSHOT_POINTER))
+    except Exception as e:
+        logger.error(f"❌ Ошибка записи индекса базы знаний на диск: {e}")
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        return None
+
+    _cleanup_old_snapshots(root, keep=version)
+    logger.info(f"💾 Индекс базы знаний записан: {version} ({len(index)} векторов, dim={index.dim})")
+    return version
 
 
-def find_similar_cached(query_embedding: np.ndarray, top_k: int = 5, 
+def _cleanup_old_snapshots(root, keep):
+    """Удаляет старые версии (процессы с открытым mmap продолжают работать — файл жив до закрытия)"""
+    versions = sorted(
+        name for name in os.listdir(root)
+        if name.startswith('v') and os.path.isdir(os.path.join(root, name))
+    )
+    for name in versions[:-SNAPSHOT_KEEP_VERSIONS]:
+        if name != keep:
+            shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+
+
+def open_index_snapshot(version: str) -> Optional[KnowledgeVectorIndex]:
+    """Открывает версию индекса через memory map (без копирования в память процесса)"""
+    folder = os.path.join(_snapshot_root(), version)
+    try:
+        with open(os.path.join(folder, 'meta.json'), 'r', encoding='utf-8') as fh:
+            meta = json.load(fh)
+        payload = {
+            name: np.load(os.path.join(folder, f"{name}.npy"), mmap_mode='r')
+            for name in SNAPSHOT_ARRAYS
+        }
+    except (OSError, ValueError) as e:
+        logger.warning(f"Не удалось открыть индекс {version}: {e}")
+        return None
+
+    payload['dim'] = meta['dim']
+    payload['category_codes'] = meta['category_codes']
+    index = KnowledgeVectorIndex.from_payload(payload, copy=False)
+    index.version = meta.get('created_at', 0)
+    return index
+
+
+def _sync_with_snapshot():
+    """В mmap-режиме подхватывает новую версию индекса, записанную любым процессом"""
+    global _KNOWLEDGE_INDEX, _SNAPSHOT_VERSION, _VERSION_CHECKED_AT
+
+    now = time.monotonic()
+    if _KNOWLEDGE_INDEX is not None and now - _VERSION_CHECKED_AT < VERSION_CHECK_INTERVAL:
+        return
+    _VERSION_CHECKED_AT = now
+
+    version = _read_snapshot_pointer()
+    if _KNOWLEDGE_INDEX is not None and version == _SNAPSHOT_VERSION:
+        return
+
+    index = open_index_snapshot(version) if version else None
+    if index is None:
+        # Холодный старт без файлов: строит один процесс, остальные ждут его версию
+        version = _build_snapshot_once()
+        index = open_index_snapshot(version) if version else None
+    if index is None:
+        if _KNOWLEDGE_INDEX is None:
+            _KNOWLEDGE_INDEX = _fetch_index_from_db()
+        return
+
+    _KNOWLEDGE_INDEX = index
+    _SNAPSHOT_VERSION = version
+    logger.info(f"📦 Индекс базы знаний (mmap): {version}, {len(index)} записей")
+
+
+def _build_snapshot_once() -> Optional[str]:
+    """
+    Строит и записывает индекс под блокировкой cache.add.
+    Если индекс уже строит другой процесс — ждёт до SNAPSHOT_BUILD_WAIT секунд
+    появления его версии в CURRENT.
+
+    Returns:
+        Имя версии или None (тогда процесс временно работает со своей копией из БД)
+    """
+    try:
+        acquired = cache.add(SNAPSHOT_BUILD_LOCK_KEY, os.getpid(), SNAPSHOT_BUILD_LOCK_TIMEOUT)
+    except Exception:
+        acquired = True  # кэш недоступен — блокировать некому
+
+    if acquired:
+        try:
+            return write_index_snapshot()
+        finally:
+            try:
+                cache.delete(SNAPSHOT_BUILD_LOCK_KEY)
+            except Exception:
+                pass
+
+    logger.info("⏳ Индекс базы знаний строит другой процесс, ожидаем версию")
+    deadline = time.monotonic() + SNAPSHOT_BUILD_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(0.2)
+        version = _read_snapshot_pointer()
+        if version:
+            return version
+    return None
+
+
+def schedule_snapshot_rebuild():
+    """
+    Ставит пересборку индекса на диске в очередь Django-Q.
+    Серия правок подряд схлопывается в одну пересборку.
+    """
+    try:
+        if not cache.add(SNAPSHOT_PENDING_KEY, 1, 60):
+            return
+    except Exception:
+        pass
+
+    try:
+        from django_q.tasks import async_task
+        async_task(
+            'Asistent.knowledge_cache.rebuild_index_snapshot',
+            task_name='ai_knowledge_snapshot',
+            group='ai_knowledge_index',
+        )
+    except Exception as e:
+        logger.warning(f"Django-Q недоступен, пересобираем индекс синхронно: {e}")
+        rebuild_index_snapshot()
+
+
+def rebuild_index_snapshot():
+    """Задача Django-Q: пересобрать индекс из БД и опубликовать новую версию"""
+    try:
+        cache.delete(SNAPSHOT_PENDING_KEY)
+    except Exception:
+        pass
+    version = write_index_snapshot()
+    return {'success': bool(version), 'version': version}
+
+
+def get_knowledge_index(force_reload=False, use_django_cache=None) -> KnowledgeVectorIndex:
+    """
+    Возвращает векторный индекс базы знаний процесса
+
+    Args:
+        force_reload: Принудительная перезагрузка из БД
+        use_django_cache: True - Django cache (multi-process), False - in-memory
+                         None - автоопределение из settings
+    """
+    global _KNOWLEDGE_INDEX, _SNAPSHOT_VERSION
+
+    if use_django_cache is None:
+        use_django_cache = INDEX_MODE == 'django'
+    use_snapshot = INDEX_MODE == 'mmap' and not use_django_cache
+
+    with _INDEX_LOCK:
+        if force_reload and use_snapshot:
+            _SNAPSHOT_VERSION = None
+            write_index_snapshot()
+            _sync_with_snapshot()
+        elif force_reload:
+            _KNOWLEDGE_INDEX = _fetch_index_from_db()
+            if use_django_cache:
+                _publish_to_django_cache(_KNOWLEDGE_INDEX)
+        elif use_snapshot:
+            _sync_with_snapshot()
+        elif use_django_cache:
+            _sync_with_django_cache()
+        elif _KNOWLEDGE_INDEX is None:
+            _KNOWLEDGE_INDEX = _fetch_index_from_db()
+            logger.info(f"✅ In-memory индекс построен: {len(_KNOWLEDGE_INDEX)} векторов")
+        return _KNOWLEDGE_INDEX
+
+
+def load_knowledge_vectors(force_reload=False, use_django_cache=None):
+    """Совместимость: загружает индекс и возвращает его"""
+    return get_knowledge_index(force_reload=force_reload, use_django_cache=use_django_cache)
+
+
+def find_similar_cached(query_embedding: np.ndarray, top_k: int = 5,
                        category: Optional[str] = None, min_similarity: float = 0.0):
     """
     Быстрый поиск похожих записей по кэшированным векторам
-    
+
     Args:
         query_embedding: Вектор запроса (numpy array)
         top_k: Количество результатов
         category: Фильтр по категории
         min_similarity: Минимальный порог сходства
-        
+
     Returns:
         List[Tuple[AIKnowledgeBase, float]]: Список (запись, схожесть)
     """
-    # Загружаем кэш если ещё не загружен
-    vectors_cache = load_knowledge_vectors()
-    
-    if not vectors_cache:
+    index = get_knowledge_index()
+
+    if not len(index):
         logger.warning("Кэш векторов пуст")
         return []
-    
-    similarities = []
-    
+
     try:
-        # Нормализуем запросный вектор один раз
-        query_norm = np.linalg.norm(query_embedding)
-        if query_norm == 0:
-            return []
-        
-        query_normalized = query_embedding / query_norm
-        
-        for vec_data in vectors_cache:
-            # Фильтр по категории
-            if category and vec_data['category'] != category:
-                continue
-            
-            try:
-                item_embedding = vec_data['embedding']
-                
-                # Проверяем размерность
-                if item_embedding.shape != query_embedding.shape:
-                    continue
-                
-                # Нормализуем вектор записи
-                item_norm = np.linalg.norm(item_embedding)
-                if item_norm == 0:
-                    continue
-                
-                item_normalized = item_embedding / item_norm
-                
-                # Косинусная близость = скалярное произведение нормализованных векторов
-                similarity = float(np.dot(query_normalized, item_normalized))
-                
-                # Фильтруем по порогу
-                if similarity >= min_similarity:
-                    similarities.append((vec_data['item'], similarity))
-                    
-            except Exception as e:
-                logger.warning(f"Ошибка расчёта similarity для {vec_data['id']}: {e}")
-                continue
-        
-        # Сортируем по убыванию
-        similarities.sort(key=lambda x: x[1], reverse=True)
-        
-        logger.info(f"🎯 Найдено {len(similarities[:top_k])} похожих записей (кэшированный поиск)")
-        return similarities[:top_k]
-        
+        hits = index.search(query_embedding, top_k=top_k, category=category, min_similarity=min_similarity)
+        items = {item.id: item for item in index.get_items([item_id for item_id, _ in hits])}
+        results = [(items[item_id], similarity) for item_id, similarity in hits if item_id in items]
+        logger.debug(f"🎯 Найдено {len(results)} похожих записей (кэшированный поиск)")
+        return results
     except Exception as e:
         logger.error(f"❌ Ошибка кэшированного поиска: {e}")
         return []
 
 
+def sync_knowledge_item(instance):
+    """
+    Обновляет одну запись в индексе (создание, правка, смена is_active/категории).
+    Вызывается из сигналов и из хука services.embedding.store_embedding.
+    """
+    if INDEX_MODE == 'mmap':
+        schedule_snapshot_rebuild()
+        return
+
+    index = _KNOWLEDGE_INDEX
+    if index is None:
+        return  # Индекс ещё не строился — построится при первом поиске
+
+    if instance.is_active and instance.embedding:
+        index.upsert(instance.id, instance.embedding, instance.category, instance.priority, item=instance)
+    else:
+        index.remove(instance.id)
+
+    if INDEX_MODE == 'django':
+        _publish_to_django_cache(index)
+
+
+def remove_knowledge_item(item_id):
+    """Удаляет запись из индекса (post_delete)"""
+    if INDEX_MODE == 'mmap':
+        schedule_snapshot_rebuild()
+        return
+
+    index = _KNOWLEDGE_INDEX
+    if index is None:
+        return
+    if index.remove(item_id) and INDEX_MODE == 'django':
+        _publish_to_django_cache(index)
+
+
+def _on_embedding_stored(instance, embedding):
+    sync_knowledge_item(instance)
+
+
+def register_embedding_hooks():
+    """Подписывает индекс на сохранение embeddings AIKnowledgeBase"""
+    from .services.embedding import register_embedding_listener
+    register_embedding_listener('Asistent.AIKnowledgeBase', _on_embedding_stored)
+
+
 def clear_knowledge_cache():
     """
     Очищает кэш векторов (при обновлении базы знаний)
     Очищает и in-memory, и Django cache
     """
-    global _KNOWLEDGE_VECTORS_CACHE, _CACHE_VERSION
-    
-    count = 0
-    
-    # Очищаем in-memory кэш
-    if _KNOWLEDGE_VECTORS_CACHE is not None:
-        count = len(_KNOWLEDGE_VECTORS_CACHE)
-        _KNOWLEDGE_VECTORS_CACHE = None
-        _CACHE_VERSION += 1
-        logger.info(f"🗑️ In-memory кэш очищен ({count} записей, v{_CACHE_VERSION})")
-    
-    # Очищаем Django cache
+    global _KNOWLEDGE_INDEX, _SHARED_VERSION
+
+    if _KNOWLEDGE_INDEX is not None:
+        count = len(_KNOWLEDGE_INDEX)
+        _KNOWLEDGE_INDEX = None
+        logger.info(f"🗑️ In-memory индекс очищен ({count} записей)")
+
     try:
         cache.delete(DJANGO_CACHE_KEY)
+        cache.add(DJANGO_CACHE_VERSION_KEY, 0, None)
+        cache.incr(DJANGO_CACHE_VERSION_KEY)
+        _SHARED_VERSION = None
         logger.info(f"🗑️ Django cache очищен (ключ: {DJANGO_CACHE_KEY})")
     except Exception as e:
         logger.warning(f"Ошибка очистки Django cache: {e}")
@@ -227,31 +714,29 @@ def clear_knowledge_cache():
 def get_cache_stats():
     """
     Возвращает статистику кэша
-    
+
     Returns:
         dict: Статистика кэша
     """
-    global _KNOWLEDGE_VECTORS_CACHE, _CACHE_VERSION
-    
-    if _KNOWLEDGE_VECTORS_CACHE is None:
+    index = _KNOWLEDGE_INDEX
+
+    if index is None:
         return {
             'loaded': False,
             'count': 0,
-            'version': _CACHE_VERSION,
+            'version': 0,
             'memory_mb': 0
         }
-    
-    # Приблизительный расчёт памяти
-    memory_bytes = sum(
-        vec['embedding'].nbytes 
-        for vec in _KNOWLEDGE_VECTORS_CACHE
-    )
-    
+
     return {
         'loaded': True,
-        'count': len(_KNOWLEDGE_VECTORS_CACHE),
-        'version': _CACHE_VERSION,
-        'memory_mb': round(memory_bytes / (1024 * 1024), 2)
+        'mode': INDEX_MODE,
+        'snapshot': _SNAPSHOT_VERSION,
+        'count': len(index),
+        'dim': index.dim,
+        'version': index.version,
+        'categories': len(index.category_codes),
+        'memory_mb': round(index.matrix.nbytes / (1024 * 1024), 2)
     }
 
 
@@ -261,8 +746,8 @@ def warmup_cache():
     Можно вызвать в apps.py -> ready()
     """
     logger.info("🔥 Прогрев кэша векторов...")
-    load_knowledge_vectors(force_reload=True)
-    
+    get_knowledge_index(force_reload=True)
+
     stats = get_cache_stats()
     if stats['loaded']:
         logger.info(
@@ -271,4 +756,3 @@ def warmup_cache():
         )
     else:
         logger.warning("⚠️ Не удалось прогреть кэш")
-
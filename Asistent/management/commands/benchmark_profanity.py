@@ -0,0 +1,98 @@
+"""
+Management команда для замера проверки текста на мат на длинных статьях
+
+Сравнивает скомпилированный словарь (ProfanityMatcher: один проход + O(1)
+поиск по индексам) с прежней схемой: отдельное регулярное выражение на
+каждое слово словаря и нечёткое сравнение обфусцированных фрагментов.
+"""
+import random
+import re
+import time
+from difflib import SequenceMatcher
+
+from django.core.management.base import BaseCommand
+from django.utils.html import strip_tags
+
+from Asistent.profanity_checker import ProfanityChecker, ProfanityMatcher
+
+LEGACY_OBFUSCATION_PATTERNS = [
+    r'(\w)[*]+(\w)',
+    r'(\w)[-]+(\w)',
+    r'(\w)[.]+(\w)',
+    r'(\w)\s+(\w)',
+]
+
+FILLER_WORDS = (
+    'сегодня звёзды советуют спокойно планировать день и уделить время близким людям '
+    'вечером возможны приятные новости а выходные подходят для прогулок и отдыха на природе'
+).split()
+
+
+def _legacy_check(text, words):
+    """Прежняя схема проверки (без логирования)"""
+    clean_text = strip_tags(text).lower()
+    found = []
+    for word in words:
+        if len(word) < 3:
+            continue
+        if re.search(r'\b' + re.escape(word.lower()) + r'\b', clean_text, re.IGNORECASE) and word not in found:
+            found.append(word)
+    for pattern in LEGACY_OBFUSCATION_PATTERNS:
+        for match in re.findall(pattern, clean_text):
+            potential_word = ''.join(match)
+            if len(potential_word) < 3:
+                continue
+            for profanity in words:
+                if len(profanity) >= 3 and SequenceMatcher(None, potential_word, profanity).ratio() >= 0.7:
+                    if potential_word not in found:
+                        found.append(potential_word)
+    return found
+
+
+class Command(BaseCommand):
+    help = 'Замерить проверку длинных статей на мат: скомпилированный словарь против прежней схемы'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--words', type=int, default=20000, help='Слов в статье (по умолчанию: 20000)')
+        parser.add_argument('--articles', type=int, default=5, help='Статей (по умолчанию: 5)')
+        parser.add_argument('--repeat', type=int, default=3, help='Повторов замера (по умолчанию: 3)')
+
+    def handle(self, *args, **options):
+        rng = random.Random(42)
+        dictionary = ProfanityChecker.dictionary()
+        articles = []
+        for _ in range(options['articles']):
+            words = [rng.choice(FILLER_WORDS) for _ in range(options['words'])]
+            for position in rng.sample(range(len(words)), 5):
+                words[position] = rng.choice(dictionary)
+            paragraphs = [' '.join(words[i:i + 80]) for i in range(0, len(words), 80)]
+            articles.append(''.join(f'<p>{paragraph}</p>' for paragraph in paragraphs))
+
+        started = time.perf_counter()
+        matcher = ProfanityMatcher(dictionary)
+        build_time = time.perf_counter() - started
+        self.stdout.write(
+            f'Словарь: {len(matcher.exact)} слов, масок {len(matcher.masked)}, '
+            f'сборка {build_time * 1000:.1f} мс'
+        )
+
+        compiled_time = min(self._measure(lambda text: matcher.find(strip_tags(text)), articles)
+                            for _ in range(options['repeat']))
+        legacy_time = self._measure(lambda text: _legacy_check(text, dictionary), articles)
+
+        count = len(articles)
+        self.stdout.write(self.style.SUCCESS(
+            f'[OK] Скомпилированный словарь: {compiled_time / count * 1000:.1f} мс на статью '
+            f'({options["words"]} слов)'
+        ))
+        self.stdout.write(
+            f'Прежняя схема: {legacy_time / count * 1000:.1f} мс на статью, '
+            f'ускорение x{legacy_time / compiled_time:.1f}'
+        )
+
+    @staticmethod
+    def _measure(check, articles):
+        started = time.perf_counter()
+        for text in articles:
+            check(text)
+        return time.perf_counter() - started
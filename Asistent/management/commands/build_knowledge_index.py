@@ -0,0 +1,55 @@
+"""
+Management команда для сборки общего векторного индекса базы знаний на диске
+Веб-процессы и qcluster открывают его через memory map (settings.AI_KNOWLEDGE_INDEX_DIR)
+"""
+from django.core.management.base import BaseCommand
+from Asistent.knowledge_cache import (
+    INDEX_MODE,
+    _fetch_index_from_db,
+    open_index_snapshot,
+    write_index_snapshot,
+)
+import time
+
+
+class Command(BaseCommand):
+    help = 'Собирает векторный индекс базы знаний AI в memory-mapped файлы'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help='Открыть записанную версию через mmap и проверить количество записей'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write('=' * 70)
+        self.stdout.write(self.style.SUCCESS('  💾 СБОРКА ВЕКТОРНОГО ИНДЕКСА БАЗЫ ЗНАНИЙ'))
+        self.stdout.write('=' * 70)
+
+        if INDEX_MODE != 'mmap':
+            self.stdout.write(self.style.WARNING(
+                f"⚠️ AI_KNOWLEDGE_INDEX_MODE='{INDEX_MODE}': файлы будут записаны, "
+                f"но процессы их не используют"
+            ))
+
+        started = time.time()
+        index = _fetch_index_from_db()
+        version = write_index_snapshot(index)
+
+        if not version:
+            self.stdout.write(self.style.ERROR('❌ Не удалось записать индекс'))
+            return
+
+        self.stdout.write(f"📊 Векторов: {len(index)}, размерность: {index.dim}")
+        self.stdout.write(f"📂 Категорий: {len(index.category_codes)}")
+        self.stdout.write(f"⏱️ Время: {time.time() - started:.2f} сек")
+
+        if options.get('verify'):
+            opened = open_index_snapshot(version)
+            if opened is None or len(opened) != len(index):
+                self.stdout.write(self.style.ERROR('❌ Проверка версии не пройдена'))
+                return
+            self.stdout.write('✅ Проверка mmap пройдена')
+
+        self.stdout.write(self.style.SUCCESS(f"✅ Активная версия: {version}"))
@@ -0,0 +1,42 @@
+"""
+Management команда для построения MinHash-сигнатур и LSH-индекса статей
+Нужна один раз для архива; дальше сигнатуры обновляются при сохранении статей
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from Asistent.text_signatures import update_post_signature
+
+
+class Command(BaseCommand):
+    help = 'Строит MinHash-сигнатуры и корзины LSH для проверки уникальности текстов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch', type=int, default=500, help='Статей за один запрос (по умолчанию: 500)')
+        parser.add_argument(
+            '--rebuild',
+            action='store_true',
+            help='Пересчитать сигнатуры всех статей, даже если текст не изменился'
+        )
+
+    def handle(self, *args, **options):
+        from blog.models import Post
+
+        queryset = Post.objects.only('id', 'content').order_by('id')
+        if not options['rebuild']:
+            queryset = queryset.filter(text_signature__isnull=True)
+
+        started = time.time()
+        total = updated = 0
+        for post in queryset.iterator(chunk_size=options['batch']):
+            total += 1
+            if update_post_signature(post, force=options['rebuild']):
+                updated += 1
+            if total % 1000 == 0:
+                self.stdout.write(f'   ... {total} статей')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Статей обработано: {total}, сигнатур обновлено: {updated}, '
+            f'время: {time.time() - started:.1f} сек'
+        ))
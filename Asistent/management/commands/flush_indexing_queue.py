@@ -0,0 +1,60 @@
+"""
+Management команда для отправки очереди индексации в поисковые системы
+"""
+from django.core.management.base import BaseCommand
+
+from Asistent.indexing_queue import RESUBMIT_SECONDS, enqueue_urls, flush_indexing_queue
+
+FLUSH_FUNC = 'Asistent.indexing_queue.flush_indexing_queue'
+
+
+class Command(BaseCommand):
+    help = 'Отправить накопленные URL в IndexNow / Bing / Яндекс пачками'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--setup-schedule',
+            action='store_true',
+            help='Создать расписание Django-Q (каждую минуту)'
+        )
+        parser.add_argument(
+            '--url',
+            action='append',
+            default=[],
+            help='Поставить URL в очередь перед отправкой (можно несколько раз)'
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Ставить --url в очередь, даже если он недавно отправлялся'
+        )
+
+    def handle(self, *args, **options):
+        if options['setup_schedule']:
+            from django_q.models import Schedule
+
+            schedule, created = Schedule.objects.update_or_create(
+                func=FLUSH_FUNC,
+                defaults={
+                    'name': 'Indexing queue flush',
+                    'schedule_type': Schedule.MINUTES,
+                    'minutes': 1,
+                    'repeats': -1,
+                }
+            )
+            state = 'создано' if created else 'обновлено'
+            self.stdout.write(self.style.SUCCESS(f'[OK] Расписание отправки очереди индексации {state}'))
+            return
+
+        if options['url']:
+            queued = enqueue_urls(options['url'], resubmit_after=0 if options['force'] else RESUBMIT_SECONDS)
+            self.stdout.write(f'В очередь поставлено: {queued}')
+
+        results = flush_indexing_queue()
+        if not results:
+            self.stdout.write('Нет настроенных поисковиков или очередь уже отправляется')
+        for engine, result in results.items():
+            self.stdout.write(self.style.SUCCESS(
+                f"[OK] {engine}: запросов {result['requests']}, отправлено {result['submitted']}, "
+                f"отложено {result['deferred']}, ошибок {result['failed']}"
+            ))
@@ -5,6 +5,7 @@ Management команда для генерации/регенерации embed
 from django.core.management.base import BaseCommand
 from Asistent.models import AIKnowledgeBase
 from Asistent.gigachat_api import get_embeddings, get_embeddings_batch
+from Asistent import embedding_cache
 import time
 
 
@@ -97,8 +98,10 @@ class Command(BaseCommand):
                 
                 try:
                     start_time = time.time()
+                    misses_before = embedding_cache.local_stats['misses']
                     embeddings = get_embeddings_batch(batch_texts)
                     elapsed = time.time() - start_time
+                    api_called = embedding_cache.local_stats['misses'] != misses_before
                     
                     # Сохраняем результаты
                     for i, (item, embedding) in enumerate(zip(batch_items, embeddings)):
@@ -114,7 +117,8 @@ class Command(BaseCommand):
                             self.stdout.write(f"   ❌ {item.title[:40]}... (пустой)")
                     
                     self.stdout.write(self.style.SUCCESS(f"   📊 Batch завершён за {elapsed:.2f}s"))
-                    time.sleep(1)  # Пауза между batch
+                    if api_called:
+                        time.sleep(1)  # Пауза между batch (не нужна, если всё взято из кеша)
                     
                 except Exception as e:
                     error_count += len(batch_items)
@@ -131,8 +135,10 @@ class Command(BaseCommand):
                     self.stdout.write(f"[{i}/{total}] 📝 {item.title[:50]}...")
                     
                     start_time = time.time()
+                    misses_before = embedding_cache.local_stats['misses']
                     embedding = get_embeddings(text)
                     elapsed = time.time() - start_time
+                    api_called = embedding_cache.local_stats['misses'] != misses_before
                     
                     if embedding and len(embedding) > 0:
                         item._skip_embedding_generation = True
@@ -143,10 +149,12 @@ class Command(BaseCommand):
                         success_count += 1
                         self.stdout.write(
                             self.style.SUCCESS(
-                                f"   ✅ Успешно ({len(embedding)} измерений, {elapsed:.2f}s)"
+                                f"   ✅ Успешно ({len(embedding)} измерений, {elapsed:.2f}s"
+                                f"{'' if api_called else ', из кеша'})"
                             )
                         )
-                        time.sleep(0.5)
+                        if api_called:
+                            time.sleep(0.5)
                     else:
                         error_count += 1
                         self.stdout.write(self.style.ERROR(f"   ❌ Пустой embedding"))
@@ -168,6 +176,10 @@ class Command(BaseCommand):
         self.stdout.write(f"✅ Успешно обработано: {success_count}")
         self.stdout.write(f"❌ Ошибок: {error_count}")
         self.stdout.write(f"📋 Всего: {total}")
+        self.stdout.write(
+            f"🧮 Кеш embeddings: {embedding_cache.local_stats['hits']} попаданий, "
+            f"{embedding_cache.local_stats['misses']} запросов к API"
+        )
         self.stdout.write('')
         
         # Статистика по категориям
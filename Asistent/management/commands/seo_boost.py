@@ -7,6 +7,7 @@ from django.utils import timezone
 from datetime import timedelta
 from blog.models import Post
 from Asistent.seo_advanced import AdvancedSEOOptimizer, ZODIAC_SIGNS
+from Asistent.indexing_queue import flush_indexing_queue
 import logging
 import re
 
@@ -195,16 +196,24 @@ class Command(BaseCommand):
                     submit_result = optimizer.submit_to_search_engines(post)
                     
                     if submit_result['yandex']['success']:
-                        self.stdout.write(self.style.SUCCESS('   [OK] Яндекс: отправлено'))
+                        self.stdout.write(self.style.SUCCESS('   [OK] Яндекс: в очереди на отправку'))
                         stats['submitted'] += 1
                     else:
-                        self.stdout.write('   [WARN] Яндекс: ошибка')
+                        self.stdout.write('   [WARN] Яндекс: не настроен')
                 
             except Exception as e:
                 stats['errors'] += 1
                 self.stdout.write(self.style.ERROR(f'   [ERROR] Ошибка: {e}'))
                 logger.error(f"Ошибка обработки {post.id}: {e}")
         
+        # Отправляем накопленную очередь индексации пачками
+        if mode in ['all', 'submit']:
+            for engine, result in flush_indexing_queue().items():
+                self.stdout.write(
+                    f'[SUBMIT] {engine}: отправлено {result["submitted"]}, '
+                    f'отложено {result["deferred"]}, ошибок {result["failed"]}'
+                )
+        
         # Финальная статистика
         self.stdout.write('\n' + '='*80)
         self.stdout.write(self.style.SUCCESS('>>> ОПТИМИЗАЦИЯ ЗАВЕРШЕНА <<<'))
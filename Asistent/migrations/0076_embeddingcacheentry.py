@@ -0,0 +1,32 @@
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Asistent', '0075_remove_aischedulerun_schedule_delete_aischedule_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmbeddingCacheEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model_name', models.CharField(max_length=50, verbose_name='Модель embeddings')),
+                ('text_hash', models.CharField(max_length=64, verbose_name='SHA-256 текста')),
+                ('dtype', models.CharField(default='float32', max_length=8, verbose_name='Тип элементов')),
+                ('dimensions', models.PositiveIntegerField(verbose_name='Размерность')),
+                ('vector', models.BinaryField(verbose_name='Вектор')),
+                ('hits', models.PositiveIntegerField(default=0, verbose_name='Попаданий')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Создано')),
+                ('last_used_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='Последнее использование')),
+            ],
+            options={
+                'verbose_name': '🧮 Кеш embeddings',
+                'verbose_name_plural': '🧮 Кеш embeddings',
+                'db_table': 'asistent_embedding_cache',
+                'unique_together': {('model_name', 'text_hash')},
+            },
+        ),
+    ]
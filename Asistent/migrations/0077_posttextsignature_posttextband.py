@@ -0,0 +1,41 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Asistent', '0076_embeddingcacheentry'),
+        ('blog', '0032_post_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostTextSignature',
+            fields=[
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='text_signature', serialize=False, to='blog.post', verbose_name='Статья')),
+                ('content_hash', models.CharField(max_length=64, verbose_name='SHA-256 очищенного текста')),
+                ('shingles_count', models.PositiveIntegerField(default=0, verbose_name='Шинглов')),
+                ('signature', models.BinaryField(verbose_name='MinHash-сигнатура (uint32)')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Обновлено')),
+            ],
+            options={
+                'verbose_name': '🧬 Сигнатура текста',
+                'verbose_name_plural': '🧬 Сигнатуры текстов',
+                'db_table': 'asistent_post_text_signature',
+            },
+        ),
+        migrations.CreateModel(
+            name='PostTextBand',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.BigIntegerField(db_index=True, verbose_name='Корзина')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='text_bands', to='blog.post', verbose_name='Статья')),
+            ],
+            options={
+                'verbose_name': '🧬 Корзина LSH',
+                'verbose_name_plural': '🧬 Корзины LSH',
+                'db_table': 'asistent_post_text_band',
+            },
+        ),
+    ]
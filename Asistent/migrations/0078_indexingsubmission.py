@@ -0,0 +1,34 @@
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Asistent', '0077_posttextsignature_posttextband'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IndexingSubmission',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('engine', models.CharField(choices=[('indexnow', 'IndexNow'), ('bing', 'Bing IndexNow'), ('yandex', 'Яндекс.Вебмастер')], max_length=20, verbose_name='Поисковик')),
+                ('url', models.CharField(max_length=500, verbose_name='URL')),
+                ('status', models.CharField(choices=[('pending', 'В очереди'), ('submitted', 'Отправлен'), ('failed', 'Ошибка')], default='pending', max_length=10, verbose_name='Статус')),
+                ('enqueued_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Поставлен в очередь')),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Следующая попытка')),
+                ('last_submitted_at', models.DateTimeField(blank=True, null=True, verbose_name='Последняя отправка')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Неудачных попыток подряд')),
+                ('last_status_code', models.PositiveSmallIntegerField(blank=True, null=True, verbose_name='HTTP-код ответа')),
+                ('last_error', models.CharField(blank=True, max_length=255, verbose_name='Последняя ошибка')),
+            ],
+            options={
+                'verbose_name': '🔎 URL в очереди индексации',
+                'verbose_name_plural': '🔎 Очередь индексации',
+                'db_table': 'asistent_indexing_submission',
+                'indexes': [models.Index(fields=['engine', 'status', 'next_attempt_at'], name='asistent_in_engine_57451e_idx')],
+                'unique_together': {('engine', 'url')},
+            },
+        ),
+    ]
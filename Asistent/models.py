@@ -602,49 +602,22 @@ class AIKnowledgeBase(models.Model):
                 # Fallback на текстовый поиск
                 return AIKnowledgeBase._fallback_text_search(query_text, top_k, category)
             
-            # Получаем все активные записи с embeddings
-            items = AIKnowledgeBase.objects.filter(
-                is_active=True,
-                embedding__isnull=False
-            ).exclude(embedding=[])
+            # Векторный индекс (pre-normalized float32 матрица в памяти процесса)
+            from .knowledge_cache import find_similar_cached
+            from django.db.models import F
             
-            if category:
-                items = items.filter(category=category)
+            similarities = find_similar_cached(
+                query_embedding,
+                top_k=top_k,
+                category=category,
+                min_similarity=min_similarity,
+            )
             
-            similarities = []
-            
-            for item in items:
-                try:
-                    item_embedding = np.array(item.embedding)
-                    
-                    # Проверяем размерность векторов
-                    if item_embedding.shape != query_embedding.shape:
-                        continue
-                    
-                    # Косинусная близость = dot(A, B) / (norm(A) * norm(B))
-                    dot_product = np.dot(query_embedding, item_embedding)
-                    norm_query = np.linalg.norm(query_embedding)
-                    norm_item = np.linalg.norm(item_embedding)
-                    
-                    if norm_query == 0 or norm_item == 0:
-                        continue
-                    
-                    similarity = dot_product / (norm_query * norm_item)
-                    
-                    # Фильтруем по минимальному порогу
-                    if similarity >= min_similarity:
-                        similarities.append((item, float(similarity)))
-                        
-                except Exception as e:
-                    logger.warning(f"Ошибка расчёта similarity для {item.id}: {e}")
-                    continue
-            
-            # Сортируем по убыванию схожести
-            similarities.sort(key=lambda x: x[1], reverse=True)
-            
-            # Увеличиваем счётчик использований для найденных записей
-            for item, _ in similarities[:top_k]:
-                item.increment_usage()
+            # Увеличиваем счётчик использований найденных записей одним запросом
+            if similarities:
+                AIKnowledgeBase.objects.filter(
+                    pk__in=[item.pk for item, _ in similarities]
+                ).update(usage_count=F('usage_count') + 1)
             
             logger.info(f"✅ Найдено {len(similarities[:top_k])} похожих записей")
             return similarities[:top_k]
@@ -1903,6 +1876,121 @@ class SystemLog(models.Model):
         return f"{self.level} [{self.logger_name}] {self.message[:50]}... ({self.timestamp.strftime('%Y-%m-%d %H:%M:%S')})"
 
 
+"""Кеш embeddings по хешу нормализованного текста"""
+class EmbeddingCacheEntry(models.Model):
+    """
+    Сохранённый вектор для (модель, sha256 нормализованного текста).
+    Вектор хранится бинарно (float16/float32), вытеснение — по last_used_at (LRU).
+    """
+    
+    model_name = models.CharField(max_length=50, verbose_name="Модель embeddings")
+    text_hash = models.CharField(max_length=64, verbose_name="SHA-256 текста")
+    dtype = models.CharField(max_length=8, default='float32', verbose_name="Тип элементов")
+    dimensions = models.PositiveIntegerField(verbose_name="Размерность")
+    vector = models.BinaryField(verbose_name="Вектор")
+    hits = models.PositiveIntegerField(default=0, verbose_name="Попаданий")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Создано")
+    last_used_at = models.DateTimeField(default=timezone.now, db_index=True, verbose_name="Последнее использование")
+    
+    class Meta:
+        verbose_name = '🧮 Кеш embeddings'
+        verbose_name_plural = '🧮 Кеш embeddings'
+        db_table = 'asistent_embedding_cache'
+        unique_together = ('model_name', 'text_hash')
+    
+    def __str__(self):
+        return f"{self.model_name}:{self.text_hash[:12]} ({self.dimensions}, {self.dtype})"
+
+
+"""MinHash-сигнатуры статей для поиска почти-дубликатов"""
+class PostTextSignature(models.Model):
+    """
+    MinHash-сигнатура текста статьи (шинглы по 3 слова).
+    Обновляется при сохранении статьи, см. Asistent/text_signatures.py.
+    """
+    
+    post = models.OneToOneField(
+        'blog.Post',
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='text_signature',
+        verbose_name="Статья"
+    )
+    content_hash = models.CharField(max_length=64, verbose_name="SHA-256 очищенного текста")
+    shingles_count = models.PositiveIntegerField(default=0, verbose_name="Шинглов")
+    signature = models.BinaryField(verbose_name="MinHash-сигнатура (uint32)")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Обновлено")
+    
+    class Meta:
+        verbose_name = '🧬 Сигнатура текста'
+        verbose_name_plural = '🧬 Сигнатуры текстов'
+        db_table = 'asistent_post_text_signature'
+    
+    def __str__(self):
+        return f"Post #{self.post_id}: {self.shingles_count} шинглов"
+
+
+class PostTextBand(models.Model):
+    """Корзина LSH: хеш (номер полосы, значения полосы сигнатуры) → статья"""
+    
+    post = models.ForeignKey(
+        'blog.Post',
+        on_delete=models.CASCADE,
+        related_name='text_bands',
+        verbose_name="Статья"
+    )
+    bucket = models.BigIntegerField(db_index=True, verbose_name="Корзина")
+    
+    class Meta:
+        verbose_name = '🧬 Корзина LSH'
+        verbose_name_plural = '🧬 Корзины LSH'
+        db_table = 'asistent_post_text_band'
+    
+    def __str__(self):
+        return f"Post #{self.post_id}: {self.bucket}"
+
+
+"""Очередь отправки URL в поисковые системы"""
+class IndexingSubmission(models.Model):
+    """
+    URL в очереди на отправку в поисковую систему (IndexNow, Яндекс.Вебмастер).
+    Одна строка на пару (поисковик, URL), см. Asistent/indexing_queue.py.
+    """
+    
+    ENGINE_CHOICES = [
+        ('indexnow', 'IndexNow'),
+        ('bing', 'Bing IndexNow'),
+        ('yandex', 'Яндекс.Вебмастер'),
+    ]
+    STATUS_CHOICES = [
+        ('pending', 'В очереди'),
+        ('submitted', 'Отправлен'),
+        ('failed', 'Ошибка'),
+    ]
+    
+    engine = models.CharField(max_length=20, choices=ENGINE_CHOICES, verbose_name="Поисковик")
+    url = models.CharField(max_length=500, verbose_name="URL")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending', verbose_name="Статус")
+    enqueued_at = models.DateTimeField(default=timezone.now, verbose_name="Поставлен в очередь")
+    next_attempt_at = models.DateTimeField(default=timezone.now, verbose_name="Следующая попытка")
+    last_submitted_at = models.DateTimeField(null=True, blank=True, verbose_name="Последняя отправка")
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name="Неудачных попыток подряд")
+    last_status_code = models.PositiveSmallIntegerField(null=True, blank=True, verbose_name="HTTP-код ответа")
+    last_error = models.CharField(max_length=255, blank=True, verbose_name="Последняя ошибка")
+    
+    class Meta:
+        verbose_name = '🔎 URL в очереди индексации'
+        verbose_name_plural = '🔎 Очередь индексации'
+        db_table = 'asistent_indexing_submission'
+        unique_together = ('engine', 'url')
+        indexes = [
+            models.Index(fields=['engine', 'status', 'next_attempt_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.engine}: {self.url} ({self.status})"
+
+
 # ============================================
 # Импорты моделей модерации из moderations
 # Упрощённая версия v2.0
@@ -1,13 +1,139 @@
 """
 Проверка и очистка текста от мата и ненормативной лексики
+
+Словарь компилируется один раз в ProfanityMatcher (версия — хеш списка слов,
+собранные индексы кешируются в общем Django cache для всех процессов):
+- текст проходится одним регулярным выражением-токенизатором (слова,
+  слова со звёздочками/точками/дефисами, буквы через пробел);
+- каждый токен проверяется O(1)-поиском в трёх индексах: точные формы,
+  нормализованные формы (латиница-двойники → кириллица, ё → е, без
+  разделителей) и маски со звёздочками (х*й, п**да, с**а).
 """
+import hashlib
 import re
 import logging
-from typing import Tuple, List
+from itertools import combinations
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
 from django.utils.html import strip_tags
 
 logger = logging.getLogger(__name__)
 
+MATCHER_CACHE_PREFIX = 'profanity_matcher'
+MATCHER_CACHE_TIMEOUT = 60 * 60 * 24
+MIN_WORD_LENGTH = 3
+MAX_MASKED_LETTERS = 2
+
+# Латинские буквы, похожие на кириллические
+_LOOKALIKES = str.maketrans({
+    'a': 'а', 'b': 'в', 'c': 'с', 'e': 'е', 'h': 'н', 'k': 'к', 'm': 'м', 'o': 'о',
+    'p': 'р', 't': 'т', 'x': 'х', 'y': 'у', 'ё': 'е', '0': 'о', '3': 'з', '6': 'б',
+})
+_SEPARATORS_RE = re.compile(r'[\s.\-_]+')
+# Один проход: буквы через разделитель («б л я т ь», «с.у.к.а») или слово с *, ., -, _
+_SCAN_RE = re.compile(
+    r'(?<![\w*])\w(?:[\s.\-_]+\w(?![\w*])){2,}'
+    r'|[\w*]+(?:[.\-_]+[\w*]+)*'
+)
+
+
+def dictionary_version(words: Iterable[str]) -> Tuple[List[str], str]:
+    """Отсортированный словарь (без коротких слов) и его версия"""
+    words = sorted({word.lower() for word in words if len(word) >= MIN_WORD_LENGTH})
+    return words, hashlib.sha1('|'.join(words).encode('utf-8')).hexdigest()[:12]
+
+
+def normalize_word(word: str) -> str:
+    """Нормальная форма: нижний регистр, двойники латиницы → кириллица, ё → е, без разделителей"""
+    return _SEPARATORS_RE.sub('', word.lower()).translate(_LOOKALIKES)
+
+
+class ProfanityMatcher:
+    """Скомпилированный словарь: токенизатор и индексы точных, нормализованных и маскированных форм"""
+
+    def __init__(self, words: Iterable[str]):
+        words, self.version = dictionary_version(words)
+        self.exact: FrozenSet[str] = frozenset(words)
+        self.normalized: Dict[str, str] = {}
+        self.masked: Dict[str, str] = {}
+        for word in words:
+            form = normalize_word(word)
+            self.normalized.setdefault(form, word)
+            # Маски: 1–2 скрытые буквы внутри слова и «цензурная» форма (первая и последняя буквы)
+            inner = range(1, len(form) - 1)
+            for count in range(1, MAX_MASKED_LETTERS + 1):
+                for positions in combinations(inner, count):
+                    chars = list(form)
+                    for position in positions:
+                        chars[position] = '*'
+                    self.masked.setdefault(''.join(chars), word)
+            self.masked.setdefault(form[0] + '*' * (len(form) - 2) + form[-1], word)
+
+    def _match_token(self, token: str) -> bool:
+        if token in self.exact:
+            return True
+        form = normalize_word(token)
+        if len(form) < MIN_WORD_LENGTH:
+            return False
+        if '*' in form:
+            return form in self.masked
+        return form in self.normalized
+
+    def _match_parts(self, token: str) -> List[str]:
+        """Совпадения токена: сам токен или, для составного («хуй-то», «сука.»), его части"""
+        if self._match_token(token):
+            return [token]
+        if len(token) > MIN_WORD_LENGTH and _SEPARATORS_RE.search(token):
+            return [part for part in _SEPARATORS_RE.split(token) if part and self._match_token(part)]
+        return []
+
+    def find(self, text: str) -> List[str]:
+        """Найденные в тексте формы (как написаны, в нижнем регистре), без повторов"""
+        found: Dict[str, None] = {}
+        checked = set()  # в статье слова повторяются — каждый токен проверяется один раз
+        for token in _SCAN_RE.findall(text.lower()):
+            if token in checked:
+                continue
+            checked.add(token)
+            for part in self._match_parts(token):
+                found.setdefault(part)
+        return list(found)
+
+
+_matcher: Optional[ProfanityMatcher] = None
+
+
+def get_matcher(words: Optional[List[str]] = None) -> ProfanityMatcher:
+    """
+    Скомпилированный словарь текущей версии.
+
+    Собранный объект живёт в процессе; при смене списка слов (версии)
+    берётся из общего кеша или собирается заново.
+    """
+    global _matcher
+    words = ProfanityChecker.dictionary() if words is None else words
+    version = dictionary_version(words)[1]
+    if _matcher is not None and _matcher.version == version:
+        return _matcher
+
+    key = f'{MATCHER_CACHE_PREFIX}:{version}'
+    matcher = None
+    try:
+        matcher = cache.get(key)
+    except Exception as e:
+        logger.debug(f"Кеш словаря мата недоступен: {e}")
+    if matcher is None:
+        matcher = ProfanityMatcher(words)
+        try:
+            cache.set(key, matcher, MATCHER_CACHE_TIMEOUT)
+        except Exception as e:
+            logger.debug(f"Не удалось сохранить словарь мата в кеш: {e}")
+        logger.info(f"Словарь мата скомпилирован: {len(matcher.exact)} слов, версия {matcher.version}")
+    _matcher = matcher
+    return matcher
+
 
 class ProfanityChecker:
     """Проверка текста на мат и ненормативную лексику"""
@@ -39,17 +165,17 @@ class ProfanityChecker:
         # НЕ добавляйте: 'ад', 'гад', 'зараза', 'хрен', 'чёрт' - это НЕ мат!
     ]
     
-    # Варианты написания через звездочки, дефисы и т.д.
-    OBFUSCATION_PATTERNS = [
-        r'(\w)[*]+(\w)',  # х*н
-        r'(\w)[-]+(\w)',  # х-рен
-        r'(\w)[.]+(\w)',  # х.рен
-        r'(\w)\s+(\w)',   # х рен (с пробелом)
-    ]
-    
     def __init__(self):
-        # Загружаем дополнительные слова из базы знаний AI
-        self.profanity_list = self._load_profanity_list()
+        self.matcher = get_matcher()
+    
+    @property
+    def profanity_list(self) -> List[str]:
+        return sorted(self.matcher.exact)
+    
+    @classmethod
+    def dictionary(cls) -> List[str]:
+        """Словарь: PROFANITY_WORDS + PROFANITY_EXTRA_WORDS из настроек"""
+        return list(cls.PROFANITY_WORDS) + list(getattr(settings, 'PROFANITY_EXTRA_WORDS', []))
     
     def check_text(self, text: str) -> Tuple[bool, List[str]]:
         """
@@ -64,43 +190,8 @@ class ProfanityChecker:
         if not text:
             return False, []
         
-        # Очищаем от HTML
-        clean_text = strip_tags(text).lower()
-        
-        found_words = []
-        
-        # Проверяем каждое слово из списка
-        for word in self.profanity_list:
-            # ВАЖНО: Ищем ТОЛЬКО ПОЛНЫЕ СЛОВА с границами \b (не части слов!)
-            # Минимум 3 символа чтобы избежать ложных срабатываний на части слов
-            if len(word) < 3:
-                continue
-                
-            # Ищем точное совпадение слова (с границами слов)
-            pattern = r'\b' + re.escape(word.lower()) + r'\b'
-            if re.search(pattern, clean_text, re.IGNORECASE):
-                if word not in found_words:
-                    found_words.append(word)
-        
-        # Проверяем обфусцированные варианты
-        for pattern in self.OBFUSCATION_PATTERNS:
-            matches = re.findall(pattern, clean_text)
-            for match in matches:
-                potential_word = ''.join(match)
-                
-                # Пропускаем слишком короткие части (< 3 символов)
-                if len(potential_word) < 3:
-                    continue
-                
-                # Проверяем похожесть на мат
-                for profanity in self.profanity_list:
-                    # Проверяем только с полными словами (не короче 3 символов)
-                    if len(profanity) < 3:
-                        continue
-                        
-                    if self._is_similar(potential_word, profanity):
-                        if potential_word not in found_words:
-                            found_words.append(potential_word)
+        # Очищаем от HTML; ищем только полные слова (один проход по тексту)
+        found_words = self.matcher.find(strip_tags(text))
         
         has_profanity = len(found_words) > 0
         
@@ -204,24 +295,12 @@ class ProfanityChecker:
         # Оставляем первую и последнюю букву, остальное звездочки
         return word[0] + '*' * (len(word) - 2) + word[-1]
     
-    def _is_similar(self, word1: str, word2: str, threshold: float = 0.7) -> bool:
-        """Проверяет похожесть двух слов (для обфусцированных вариантов)"""
-        from difflib import SequenceMatcher
-        
-        similarity = SequenceMatcher(None, word1.lower(), word2.lower()).ratio()
-        return similarity >= threshold
-    
     def _load_profanity_list(self) -> List[str]:
         """Загружает список мата ТОЛЬКО из локального списка PROFANITY_WORDS"""
-        profanity_list = list(self.PROFANITY_WORDS)
-        
         # ВАЖНО: НЕ загружаем из базы знаний!
         # База знаний содержит объяснения и примеры, а не только список мата
         # Это приводило к ложным срабатываниям на части слов типа "хи", "уи"
-        
-        logger.info(f"Загружено {len(profanity_list)} матерных слов из локального списка")
-        
-        return profanity_list
+        return self.dictionary()
 
 
 def check_profanity(text: str) -> dict:
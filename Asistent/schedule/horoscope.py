@@ -1,9 +1,20 @@
 """
 Генерация гороскопов через промпт-шаблон
 Упрощенная версия - использует UniversalContentGenerator
+
+Знаки генерируются параллельно пулом из HOROSCOPE_MAX_WORKERS потоков
+(payload 'max_workers' переопределяет): общий астро- и погодный контекст
+дня считается один раз до запуска, лимиты GigaChat соблюдает сам клиент
+(cooldown-файлы моделей общие для всех потоков). При max_workers=1 —
+прежний последовательный режим с generation_delay между знаками.
 """
 import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, Any
+
+from django.conf import settings
+from django.db import connections
 from django.utils import timezone
 
 from Asistent.generators.universal import UniversalContentGenerator, GeneratorConfig, GeneratorMode
@@ -12,6 +23,77 @@ from Asistent.constants import ZODIAC_SIGNS
 
 logger = logging.getLogger(__name__)
 
+HOROSCOPE_MAX_WORKERS = getattr(settings, 'HOROSCOPE_MAX_WORKERS', 4)
+
+
+def _generate_sign(schedule: AISchedule, payload: Dict[str, Any], zodiac_sign: str, retry_count: int) -> Dict[str, Any]:
+    """
+    Генерация гороскопа одного знака.
+
+    Returns:
+        dict: zodiac_sign, post_id, error, seconds
+    """
+    started = time.perf_counter()
+    post_id = None
+    error = None
+    try:
+        # Создаем конфигурацию генератора
+        config = GeneratorConfig.for_auto()
+        config.timeout = 300
+        config.retry_count = retry_count
+
+        # Создаем генератор
+        generator = UniversalContentGenerator(
+            template=schedule.prompt_template,
+            config=config,
+            schedule_id=schedule.id
+        )
+
+        # Параметры для генерации
+        schedule_payload = {
+            'target_date_offset': payload.get('target_date_offset', 1),
+            'title_template': payload.get('title_template'),
+            'base_tags': payload.get('base_tags', ['гороскоп', 'прогноз на завтра']),
+            'category': schedule.category.title if schedule.category else None,
+            'zodiac_sign': zodiac_sign
+        }
+
+        # Генерируем
+        result = generator.generate(schedule_payload=schedule_payload)
+        if result.success and result.post_id:
+            post_id = result.post_id
+        else:
+            error = result.error or 'Неизвестная ошибка'
+    except Exception as e:
+        error = f"Ошибка генерации для {zodiac_sign}: {str(e)}"
+        logger.error(f"   ❌ {error}", exc_info=True)
+
+    seconds = time.perf_counter() - started
+    if post_id:
+        logger.info(f"   ✅ Гороскоп для {zodiac_sign} создан за {seconds:.1f}с (Post ID={post_id})")
+    else:
+        logger.error(f"   ❌ Ошибка генерации для {zodiac_sign}: {error}")
+    return {'zodiac_sign': zodiac_sign, 'post_id': post_id, 'error': error, 'seconds': round(seconds, 2)}
+
+
+def _generate_sign_in_worker(*args) -> Dict[str, Any]:
+    """_generate_sign в потоке пула: соединения с БД потока закрываются по завершении"""
+    try:
+        return _generate_sign(*args)
+    finally:
+        connections.close_all()
+
+
+def _prime_shared_context() -> None:
+    """Общий астро- и погодный контекст дня — один раз на все знаки"""
+    try:
+        from Asistent.services.astro_context import prime_daily_context
+
+        prime_daily_context()
+    except Exception as e:
+        # Каждый знак всё равно соберёт контекст сам
+        logger.warning(f"   ⚠️ Не удалось заранее подготовить астроконтекст: {e}")
+
 
 def generate_horoscope_from_prompt_template(schedule_id: int) -> Dict[str, Any]:
     """
@@ -21,7 +103,8 @@ def generate_horoscope_from_prompt_template(schedule_id: int) -> Dict[str, Any]:
         schedule_id: ID расписания AISchedule
     
     Returns:
-        dict: Результат генерации с ключами success, created_posts, errors
+        dict: Результат генерации с ключами success, created_posts, errors,
+              timings ({знак: секунды}), elapsed (секунды на весь запуск)
     """
     logger.info(f"🔮 [Гороскоп] Запуск генерации для расписания ID={schedule_id}")
     
@@ -56,70 +139,48 @@ def generate_horoscope_from_prompt_template(schedule_id: int) -> Dict[str, Any]:
         signs_to_generate = [s for s in ZODIAC_SIGNS if s not in skip_signs]
         total_signs = len(signs_to_generate)
         
-        logger.info(f"   📋 Первый проход: генерация всех {total_signs} гороскопов...")
-        
-        created_posts = []
-        errors = []
-        
-        # Генерируем каждый гороскоп
-        for idx, zodiac_sign in enumerate(signs_to_generate, 1):
-            logger.info(f"   [{idx}/{total_signs}] Генерация гороскопа для {zodiac_sign}...")
-            
-            try:
-                # Создаем конфигурацию генератора
-                config = GeneratorConfig.for_auto()
-                config.timeout = 300
-                config.retry_count = retry_count
-                
-                # Создаем генератор
-                generator = UniversalContentGenerator(
-                    template=schedule.prompt_template,
-                    config=config,
-                    schedule_id=schedule.id
-                )
-                
-                # Параметры для генерации
-                schedule_payload = {
-                    'target_date_offset': payload.get('target_date_offset', 1),
-                    'title_template': payload.get('title_template'),
-                    'base_tags': payload.get('base_tags', ['гороскоп', 'прогноз на завтра']),
-                    'category': schedule.category.title if schedule.category else None,
-                    'zodiac_sign': zodiac_sign
-                }
-                
-                # Генерируем
-                result = generator.generate(schedule_payload=schedule_payload)
-                
-                if result.success and result.post_id:
-                    from blog.models import Post
-                    post = Post.objects.get(id=result.post_id)
-                    created_posts.append(post)
-                    logger.info(f"   ✅ Гороскоп для {zodiac_sign} создан: {post.title}")
-                else:
-                    error_msg = result.error or 'Неизвестная ошибка'
-                    errors.append(f"{zodiac_sign}: {error_msg}")
-                    logger.error(f"   ❌ Ошибка генерации для {zodiac_sign}: {error_msg}")
-                
+        max_workers = max(1, min(int(payload.get('max_workers', HOROSCOPE_MAX_WORKERS)), total_signs or 1))
+        logger.info(f"   📋 Генерация {total_signs} гороскопов, потоков: {max_workers}")
+
+        started = time.perf_counter()
+        if max_workers == 1:
+            sign_results = []
+            for idx, zodiac_sign in enumerate(signs_to_generate, 1):
+                logger.info(f"   [{idx}/{total_signs}] Генерация гороскопа для {zodiac_sign}...")
+                sign_results.append(_generate_sign(schedule, payload, zodiac_sign, retry_count))
                 # Задержка между гороскопами (кроме последнего)
                 if idx < total_signs:
-                    import time
                     time.sleep(generation_delay)
-            
-            except Exception as e:
-                error_msg = f"Ошибка генерации для {zodiac_sign}: {str(e)}"
-                errors.append(error_msg)
-                logger.error(f"   ❌ {error_msg}", exc_info=True)
-        
+        else:
+            _prime_shared_context()
+            with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='horoscope') as executor:
+                sign_results = list(executor.map(
+                    lambda zodiac_sign: _generate_sign_in_worker(schedule, payload, zodiac_sign, retry_count),
+                    signs_to_generate,
+                ))
+        elapsed = time.perf_counter() - started
+
+        from blog.models import Post
+        posts = Post.objects.in_bulk([item['post_id'] for item in sign_results if item['post_id']])
+        created_posts = [posts[item['post_id']] for item in sign_results if item['post_id'] in posts]
+        errors = [f"{item['zodiac_sign']}: {item['error']}" for item in sign_results if item['error']]
+        timings = {item['zodiac_sign']: item['seconds'] for item in sign_results}
+
         # Результат
         success = len(created_posts) > 0 and len(errors) == 0
         
-        logger.info(f"   ✅ Генерация завершена: создано {len(created_posts)}/{total_signs}, ошибок: {len(errors)}")
+        logger.info(
+            f"   ✅ Генерация завершена за {elapsed:.1f}с: создано {len(created_posts)}/{total_signs}, "
+            f"ошибок: {len(errors)}, самый долгий знак: {max(timings.values(), default=0):.1f}с"
+        )
         
         return {
             'success': success,
             'created_posts': created_posts,
             'created_count': len(created_posts),
             'errors': errors,
+            'timings': timings,
+            'elapsed': round(elapsed, 2),
             'status': 'success' if success else 'partial' if created_posts else 'failed'
         }
     
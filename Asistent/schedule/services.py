@@ -15,6 +15,9 @@ from django.utils.html import strip_tags
 
 # Импорты для обратной совместимости и fallback
 from Asistent.gigachat_api import get_gigachat_client, RateLimitCooldown
+from Asistent.indexing_queue import (
+    ENGINE_INDEXNOW, enqueue_post, enqueue_urls, flush_indexing_queue, submit_image_urls, unknown_urls,
+)
 from Asistent.models import AIGeneratedArticle
 from Asistent.parsers.universal_parser import UniversalParser
 from Asistent.seo_advanced import AdvancedSEOOptimizer
@@ -22,7 +25,6 @@ from Asistent.constants import ZODIAC_SIGNS
 from Asistent.utils import resolve_dynamic_params
 from Asistent.formatting import render_markdown, MarkdownPreset
 from Asistent.services.telegram_client import get_telegram_client
-from Asistent.services.yandex_webmaster import get_yandex_webmaster_client
 from blog.models import Category, Post
 
 from .context import ScheduleContext
@@ -45,6 +47,7 @@ MONTH_NAMES = [
 WEEKDAY_NAMES = [
     'понедельник', 'вторник', 'среда', 'четверг', 'пятница', 'суббота', 'воскресенье'
 ]
+BULK_MEDIA_IMAGES_PER_RUN = getattr(settings, 'BULK_MEDIA_IMAGES_PER_RUN', 100)
 
 """Генерация статей через промпт-шаблон"""
 class PromptGenerationWorkflow:
@@ -1026,90 +1029,39 @@ def submit_new_posts_to_search_engines():
     """
     Отправка новых статей в поисковые системы.
     Перенесено из Asistent.tasks для унифицированного доступа.
+    URL ставятся в очередь индексации одним вызовом и отправляются пачками.
     """
     try:
         recent_posts = Post.objects.filter(
             status='published',
             created__gte=timezone.now() - timedelta(hours=2)
-        )
+        ).only('pk', 'slug')
 
-        if not recent_posts.exists():
+        site_url = settings.SITE_URL.rstrip('/')
+        post_urls = [f"{site_url}{post.get_absolute_url()}" for post in recent_posts]
+
+        if not post_urls:
             logger.info("ℹ️ Нет новых статей для отправки")
             return {'success': True, 'submitted': 0}
 
-        submitted_count = 0
-
-        for post in recent_posts:
-            try:
-                result = submit_post_for_indexing(post.id)
-                if result:
-                    submitted_count += 1
-            except Exception as e:
-                logger.error("❌ Ошибка отправки %s: %s", post.id, e)
-                continue
+        queued = enqueue_urls(post_urls)
+        flushed = flush_indexing_queue()
 
-        logger.info("✅ Отправлено статей: %s", submitted_count)
-        return {'success': True, 'submitted': submitted_count}
+        logger.info("✅ Статей в очереди индексации: %s (новых пар: %s)", len(post_urls), queued)
+        return {'success': True, 'submitted': len(post_urls), 'queued': queued, 'flushed': flushed}
 
     except Exception as e:
         logger.error("❌ Ошибка в submit_new_posts_to_search_engines: %s", e)
         return {'success': False, 'error': str(e)}
 
-"""Асинхронная индексация статьи"""
+"""Индексация статьи через очередь отправки"""
 def submit_post_for_indexing(post_id: int):
     """
-    Асинхронная индексация статьи.
-    Возвращает словарь результатов, совпадающий со старой функцией.
+    Ставит статью в очередь индексации (Asistent.indexing_queue).
+    Возвращает {'url', 'queued'} или None, если статья не найдена.
     """
     try:
-        post = Post.objects.get(id=post_id, status='published')
-        post_url = f"{settings.SITE_URL.rstrip('/')}{post.get_absolute_url()}"
-
-        results = {k: False for k in ['yandex', 'google', 'bing', 'yahoo', 'indexnow']}
-
-        try:
-            client = get_yandex_webmaster_client()
-            yandex_result = client.enqueue_recrawl(post_url)
-            results['yandex'] = bool(yandex_result.get('success'))
-            if not results['yandex']:
-                logger.error("Яндекс индексация: %s", yandex_result.get('error'))
-        except Exception as e:
-            logger.error("Яндекс индексация: %s", e)
-
-        try:
-            sitemap_url = f"{settings.SITE_URL}/sitemap.xml"
-            ping_url = f"https://www.google.com/ping?sitemap={sitemap_url}"
-            resp = requests.get(ping_url, timeout=10)
-            results['google'] = resp.status_code == 200
-        except Exception as e:
-            logger.error("Google: %s", e)
-
-        for key_name, api_url, result_key in [
-            ('BING_INDEXNOW_KEY', 'https://www.bing.com/indexnow', 'bing'),
-            ('INDEXNOW_KEY', 'https://api.indexnow.org/indexnow', 'indexnow')
-        ]:
-            try:
-                if hasattr(settings, key_name):
-                    key = getattr(settings, key_name)
-                    payload = {
-                        "host": settings.SITE_URL.replace('https://', '').replace('http://', ''),
-                        "key": key,
-                        "urlList": [post_url]
-                    }
-                    if key_name == 'INDEXNOW_KEY':
-                        payload["keyLocation"] = f"{settings.SITE_URL}/{key}.txt"
-                    resp = requests.post(api_url, json=payload, timeout=10)
-                    results[result_key] = resp.status_code == 200
-            except Exception as e:
-                logger.error("%s: %s", result_key, e)
-
-        results['yahoo'] = results['bing'] or results['indexnow']
-        logger.info("Индексация %s: %s", post_url, results)
-        return results
-
-    except Post.DoesNotExist:
-        logger.error("Post %s не найден", post_id)
-        return None
+        return enqueue_post(post_id)
     except Exception as e:
         logger.error("Ошибка индексации: %s", e, exc_info=True)
         return None
@@ -1154,6 +1106,9 @@ def auto_seo_optimize_new_articles():
 def bulk_media_images_indexing():
     """
     Поэтапная индексация изображений из MEDIA папки.
+    За запуск в очередь ставится не больше BULK_MEDIA_IMAGES_PER_RUN новых
+    изображений: уже поставленные (в любом статусе) пропускаются, поэтому
+    каждый запуск продвигается дальше по папке, а не отправляет одни и те же.
     """
     import os
     from pathlib import Path
@@ -1170,30 +1125,32 @@ def bulk_media_images_indexing():
         image_extensions = {'.webp', '.jpg', '.jpeg', '.png', '.gif'}
         image_urls: List[str] = []
 
-        for root, _, files in os.walk(media_path):
-            for file in files:
+        for root, dirs, files in os.walk(media_path):
+            dirs.sort()  # стабильный порядок обхода между запусками
+            for file in sorted(files):
                 if Path(file).suffix.lower() in image_extensions:
                     relative_path = Path(root).relative_to(settings.MEDIA_ROOT)
                     image_url = f"{settings.SITE_URL.rstrip('/')}/media/{relative_path}/{file}"
                     image_urls.append(image_url)
 
-                    if len(image_urls) >= 100:
-                        break
-
-            if len(image_urls) >= 100:
-                break
-
-        if not image_urls:
-            logger.info("ℹ️ Нет изображений для индексации")
-            return {'success': True, 'indexed': 0}
+        pending = unknown_urls(image_urls, ENGINE_INDEXNOW)
+        batch = pending[:BULK_MEDIA_IMAGES_PER_RUN]
+        if not batch:
+            logger.info("ℹ️ Нет новых изображений для индексации")
+            return {'success': True, 'indexed': 0, 'remaining': 0}
 
-        result = submit_images_to_search_engines(image_urls)
+        result = submit_images_to_search_engines(batch)
 
-        logger.info("✅ Отправлено изображений: %s", len(image_urls))
+        logger.info(
+            "✅ Изображений в очереди индексации: %s (осталось новых: %s)",
+            result.get('queued', 0), len(pending) - len(batch),
+        )
         return {
             'success': True,
-            'indexed': len(image_urls),
-            'indexnow': result.get('indexnow', {}).get('success', False)
+            'indexed': result.get('queued', 0),
+            'remaining': len(pending) - len(batch),
+            'indexnow': result.get('indexnow', {}).get('success', False),
+            'flush_skipped': result.get('flush_skipped', False),
         }
 
     except Exception as e:
@@ -1203,24 +1160,11 @@ def bulk_media_images_indexing():
 """Отправка изображений в IndexNow"""
 def submit_images_to_search_engines(image_urls: List[str]) -> Dict:
     """
-    Вынесенная вспомогательная функция (ранее часть seo_advanced). 
-    Сейчас упрощенная отправка через IndexNow.
+    Вынесенная вспомогательная функция (ранее часть seo_advanced).
+    Ставит изображения в очередь IndexNow без повторов и отправляет пачками.
     """
     try:
-        if not hasattr(settings, 'INDEXNOW_KEY'):
-            return {'success': False, 'reason': 'INDEXNOW_KEY not set'}
-
-        api_url = "https://api.indexnow.org/indexnow"
-        payload = {
-            "host": settings.SITE_URL.replace('https://', '').replace('http://', '').rstrip('/'),
-            "key": settings.INDEXNOW_KEY,
-            "keyLocation": f"{settings.SITE_URL.rstrip('/')}/indexnow-{settings.INDEXNOW_KEY}.txt",
-            "urlList": image_urls
-        }
-        headers = {"Content-Type": "application/json"}
-        response = requests.post(api_url, json=payload, headers=headers, timeout=10)
-        success = response.status_code in [200, 202]
-        return {'success': success, 'status': response.status_code, 'indexnow': {'success': success}}
+        return submit_image_urls(image_urls)
     except Exception as e:
         logger.warning("⚠️ Ошибка отправки изображений в IndexNow: %s", e)
         return {'success': False, 'error': str(e)}
@@ -297,11 +297,12 @@ def run_system_task(schedule, now, task_name):
 
 def generate_all_horoscopes() -> Dict[str, Any]:
     """
-    Генерирует все 12 гороскопов последовательно.
+    Генерирует все 12 гороскопов.
     Запускается по расписанию каждый день в 10:00.
     
     Использует существующую инфраструктуру:
-    - run_specific_schedule() для каждого расписания
+    - run_specific_schedule() для каждого расписания (знаки внутри
+      расписания генерируются параллельно, см. schedule/horoscope.py)
     - Приоритизация гороскопов
     - Уведомления через send_schedule_notification
     
@@ -311,18 +312,21 @@ def generate_all_horoscopes() -> Dict[str, Any]:
             - created_posts: List[int] - ID созданных постов
             - errors: List[Dict] - список ошибок
             - total: int - общее количество расписаний
+            - timings: Dict[int, Dict[str, float]] - время по знакам для каждого расписания
+            - elapsed: float - общее время, секунд
     """
     import time
     
     logger.info("🔮 [Гороскопы] Запуск генерации всех 12 гороскопов")
+    started = time.perf_counter()
     
-    # Получаем все активные расписания гороскопов
-    schedules = AISchedule.objects.filter(
+    # Получаем все активные расписания гороскопов (один запрос)
+    schedules = list(AISchedule.objects.filter(
         prompt_template__category='horoscope',
         is_active=True
-    ).order_by('id')
+    ).order_by('id'))
     
-    if not schedules.exists():
+    if not schedules:
         logger.error("❌ Активные расписания гороскопов не найдены")
         return {
             'success': False,
@@ -334,8 +338,9 @@ def generate_all_horoscopes() -> Dict[str, Any]:
     
     created_posts = []
     errors = []
+    timings = {}
     
-    logger.info(f"📋 Найдено расписаний: {schedules.count()}")
+    logger.info(f"📋 Найдено расписаний: {len(schedules)}")
     
     # Устанавливаем приоритет гороскопов
     now = timezone.now()
@@ -349,6 +354,8 @@ def generate_all_horoscopes() -> Dict[str, Any]:
             try:
                 # Используем существующую функцию run_specific_schedule
                 result = run_specific_schedule(schedule.id)
+                if result.get('timings'):
+                    timings[schedule.id] = result['timings']
                 
                 if result.get('success'):
                     # Используем список всех созданных постов, если он есть
@@ -380,10 +387,6 @@ def generate_all_horoscopes() -> Dict[str, Any]:
                     'error': error_msg
                 })
                 logger.error(f"   ❌ Исключение: {error_msg}", exc_info=True)
-            
-            # Задержка между запусками (чтобы не перегрузить API)
-            if schedule != schedules.last():
-                time.sleep(3)
     
     finally:
         # Снимаем приоритет после завершения
@@ -391,9 +394,10 @@ def generate_all_horoscopes() -> Dict[str, Any]:
         logger.debug("   🔓 Приоритет гороскопов будет снят автоматически")
     
     success = len(errors) == 0
+    elapsed = time.perf_counter() - started
     
     logger.info(
-        f"✅ Генерация всех гороскопов завершена: "
+        f"✅ Генерация всех гороскопов завершена за {elapsed:.1f}с: "
         f"успешно={len(created_posts)}, ошибок={len(errors)}"
     )
     
@@ -401,5 +405,7 @@ def generate_all_horoscopes() -> Dict[str, Any]:
         'success': success,
         'created_posts': created_posts,
         'errors': errors,
-        'total': schedules.count()
+        'total': len(schedules),
+        'timings': timings,
+        'elapsed': round(elapsed, 2),
     }
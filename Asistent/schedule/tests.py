@@ -322,6 +322,69 @@ class HoroscopeGenerationTests(TestCase):
         self.assertEqual(retry_delay, 5)
 
 
+class HoroscopeFanoutTests(TestCase):
+    """Параллельная генерация знаков в generate_horoscope_from_prompt_template"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='horoscope_admin', password='x')
+        self.category = Category.objects.create(title='Гороскопы', slug='horoscopes')
+        self.prompt_template = PromptTemplate.objects.create(
+            name='DAILY_HOROSCOPE_PROMPT',
+            template='Гороскоп для {zodiac_sign} на {date}',
+            category='horoscope',
+            is_active=True,
+            created_by=self.user,
+        )
+
+    def test_horoscope_fanout_runs_signs_concurrently(self):
+        """Знаки генерируются параллельно: общее время ≈ самому долгому знаку, а не сумме"""
+        import threading
+        import time
+        from unittest.mock import patch
+
+        from blog.models import Post
+        from Asistent.constants import ZODIAC_SIGNS
+        from .horoscope import generate_horoscope_from_prompt_template
+
+        schedule = AISchedule.objects.create(
+            name='Параллельные гороскопы',
+            strategy_type='prompt',
+            prompt_template=self.prompt_template,
+            category=self.category,
+            schedule_kind='daily',
+            articles_per_run=12,
+            payload_template={'max_workers': 12, 'generation_delay': 20},
+            is_active=True
+        )
+        posts = {
+            sign: Post.objects.create(title=sign, slug=f'sign-{index}', category=self.category)
+            for index, sign in enumerate(ZODIAC_SIGNS)
+        }
+        threads = set()
+
+        def fake_generate(schedule, payload, zodiac_sign, retry_count):
+            threads.add(threading.get_ident())
+            time.sleep(0.2)
+            if zodiac_sign == ZODIAC_SIGNS[-1]:
+                return {'zodiac_sign': zodiac_sign, 'post_id': None, 'error': 'boom', 'seconds': 0.2}
+            return {'zodiac_sign': zodiac_sign, 'post_id': posts[zodiac_sign].id, 'error': None, 'seconds': 0.2}
+
+        with patch('Asistent.schedule.horoscope._generate_sign', side_effect=fake_generate), \
+                patch('Asistent.schedule.horoscope._prime_shared_context') as prime:
+            started = time.perf_counter()
+            result = generate_horoscope_from_prompt_template(schedule.id)
+            elapsed = time.perf_counter() - started
+
+        prime.assert_called_once()
+        self.assertLess(elapsed, 1.5)
+        self.assertGreater(len(threads), 1)
+        self.assertEqual(result['created_count'], 11)
+        self.assertEqual([post.title for post in result['created_posts']], ZODIAC_SIGNS[:-1])
+        self.assertEqual(result['errors'], [f'{ZODIAC_SIGNS[-1]}: boom'])
+        self.assertEqual(set(result['timings']), set(ZODIAC_SIGNS))
+        self.assertEqual(result['status'], 'partial')
+
+
 class ScheduleIntegrationTests(TestCase):
     """Интеграционные тесты системы расписаний"""
     
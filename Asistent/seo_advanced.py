@@ -19,6 +19,9 @@ from django.db.models import Count, Q
 from bs4 import BeautifulSoup
 from Asistent.prompt_registry import PromptRegistry
 from Asistent.faq_service import generate_faq_bundle
+from Asistent.indexing_queue import (
+    ENGINE_BING, ENGINE_INDEXNOW, ENGINE_YANDEX, configured_engines, enqueue_urls, submit_image_urls,
+)
 from Asistent.services.yandex_webmaster import get_yandex_webmaster_client
 from Asistent.constants import ZODIAC_SIGNS
 
@@ -703,33 +706,29 @@ class AdvancedSEOOptimizer:
     
     def submit_to_search_engines(self, post) -> Dict:
         """
-        Отправляет статью в поисковые системы
+        Ставит статью в очередь отправки в поисковые системы
         - Яндекс Вебмастер API
-        - Google Search Console API
+        - IndexNow / Bing
+        
+        Отправка идёт пачками задачей flush_indexing_queue (Asistent.indexing_queue).
         
         Args:
             post: Объект статьи
         
         Returns:
-            Dict с результатами отправки
+            Dict с результатами постановки в очередь
         """
         logger.info(f"Отправка в поисковики: {post.title}")
         
+        post_url = f"{settings.SITE_URL.rstrip('/')}{post.get_absolute_url()}"
+        engines = configured_engines()
+        queued = enqueue_urls([post_url], engines=engines)
+        
         results = {
-            'yandex': {'success': False},
-            'google': {'success': False}
+            engine: {'success': engine in engines}
+            for engine in (ENGINE_YANDEX, ENGINE_INDEXNOW, ENGINE_BING)
         }
-        
-        post_url = f"{settings.SITE_URL}{post.get_absolute_url()}"
-        
-        # 1. Яндекс Вебмастер
-        if hasattr(settings, 'YANDEX_WEBMASTER_TOKEN') and settings.YANDEX_WEBMASTER_TOKEN:
-            yandex_result = self._submit_to_yandex(post_url)
-            results['yandex'] = yandex_result
-        
-        # 2. Google Search Console
-        # (требует OAuth2, сложнее настроить)
-        # Пока используем sitemap - Google сам найдет через него
+        results['queued'] = queued
         
         return results
     
@@ -890,41 +889,16 @@ class AdvancedSEOOptimizer:
     # ========================================================================
     def submit_images_to_search_engines(self, image_urls: List[str]) -> Dict:
         """
-        Отправляет список URL изображений в поисковые системы:
-        - IndexNow (Bing и др.) при наличии ключа
-        - Пинг sitemap как fallback
+        Отправляет список URL изображений в IndexNow через очередь индексации:
+        без повторов уже отправленных, пачками до 10 000 URL.
         """
-        results: Dict[str, Dict] = {}
         try:
-            host = settings.SITE_URL.replace('https://', '').replace('http://', '')
-            indexnow_key = getattr(settings, 'BING_INDEXNOW_KEY', '')
-            if indexnow_key and image_urls:
-                payload = {
-                    "host": host,
-                    "key": indexnow_key,
-                    "urlList": image_urls
-                }
-                resp = requests.post("https://api.indexnow.org/indexnow", json=payload, timeout=10)
-                results['indexnow'] = {
-                    'success': resp.status_code == 200,
-                    'status_code': resp.status_code
-                }
-                if resp.status_code == 200:
-                    logger.info(f"✅ IndexNow: отправлено {len(image_urls)} изображений")
-                else:
-                    logger.warning(f"⚠️ IndexNow: {resp.status_code}")
-            else:
-                results['indexnow'] = {'success': False, 'error': 'not_configured_or_empty'}
+            results = submit_image_urls(image_urls)
+            if results['indexnow'].get('submitted'):
+                logger.info(f"✅ IndexNow: отправлено {results['indexnow']['submitted']} изображений")
         except Exception as e:
-            results['indexnow'] = {'success': False, 'error': str(e)}
+            results = {'success': False, 'indexnow': {'success': False, 'error': str(e)}}
             logger.error(f"❌ IndexNow ошибка: {e}")
 
-        # Sitemap ping как резерв
-        try:
-            sm = self.submit_sitemap_to_search_engines()
-            results['sitemap'] = sm
-        except Exception as e:
-            results['sitemap'] = {'success': False, 'error': str(e)}
-
         return results
 
@@ -1,13 +1,13 @@
 """
 Сервис подготовки астроконтекста и погодных данных для ежедневных гороскопов.
-Получает эфемериды через публичный API JPL Horizons и формирует структуру
-переменных для промпта.
+Эфемериды считаются локально (см. services/ephemeris.py); публичный API
+JPL Horizons используется только для необязательной сверки
+(ASTRO_HORIZONS_CROSSCHECK). Формирует структуру переменных для промпта.
 """
 
 from __future__ import annotations
 
 import logging
-import math
 from dataclasses import dataclass
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Tuple
@@ -17,6 +17,8 @@ import requests
 from django.conf import settings
 from django.core.cache import cache
 
+from .ephemeris import angular_distance, ascendant as ecliptic_ascendant, compute_ephemeris
+
 logger = logging.getLogger(__name__)
 
 
@@ -92,10 +94,18 @@ ASPECTS = {
 }
 ASPECT_ORB = getattr(settings, "ASTRO_ASPECT_ORB_DEGREES", 3.0)
 
+# Сверка локальных эфемерид с Horizons (сетевые запросы, по умолчанию выключена)
+HORIZONS_CROSSCHECK = getattr(settings, "ASTRO_HORIZONS_CROSSCHECK", False)
+HORIZONS_TOLERANCE = getattr(settings, "ASTRO_HORIZONS_TOLERANCE_DEGREES", 0.5)
+
 # Кеширование эфемерид на сутки
-EPHEMERIS_CACHE_PREFIX = "astro_ephemeris"
+EPHEMERIS_CACHE_PREFIX = "astro_ephemeris:v2"
 EPHEMERIS_CACHE_TIMEOUT = 60 * 60 * 12  # 12 часов
 
+# Общий для всех знаков базовый контекст (эфемериды, асцендент, погода)
+BASE_CONTEXT_CACHE_PREFIX = "astro_base_context"
+BASE_CONTEXT_CACHE_TIMEOUT = 60 * 60  # 1 час
+
 
 @dataclass
 class PlanetPosition:
@@ -187,6 +197,15 @@ class AstrologyContextBuilder:
         tomorrow_local = (now_local + timedelta(days=1)).replace(hour=8, minute=0, second=0, microsecond=0)
         tomorrow_utc = tomorrow_local.astimezone(ZoneInfo("UTC"))
 
+        cache_key = (
+            f"{BASE_CONTEXT_CACHE_PREFIX}:{self.city}:{self.latitude}:{self.longitude}:"
+            f"{tomorrow_local.date().isoformat()}"
+        )
+        cached = cache.get(cache_key)
+        if cached:
+            self._base_context = cached
+            return cached
+
         weekday_index = tomorrow_local.weekday()
 
         planets = self._get_ephemeris()
@@ -234,6 +253,7 @@ class AstrologyContextBuilder:
             "planets_in_houses": "",
         }
 
+        cache.set(cache_key, base, timeout=BASE_CONTEXT_CACHE_TIMEOUT)
         self._base_context = base
         return base
 
@@ -258,33 +278,52 @@ class AstrologyContextBuilder:
             0,
             tzinfo=ZoneInfo("UTC"),
         )
-        logger.info("🔭 Получаем эфемериды JPL Horizons на %s (UTC)", target_dt.isoformat())
+        logger.info("🔭 Считаем эфемериды на %s (UTC)", target_dt.isoformat())
 
-        jd = self._julian_day(target_dt)
-        positions: Dict[str, PlanetPosition] = {}
+        ephemeris = compute_ephemeris(target_dt, bodies=list(PLANET_COMMANDS))
+        positions = {
+            name: PlanetPosition(name=name, longitude=longitude, latitude=latitude)
+            for name, (longitude, latitude) in ephemeris.at(0).items()
+        }
+        if HORIZONS_CROSSCHECK:
+            self._crosscheck_with_horizons(positions, target_dt)
+        cache.set(cache_key, positions, timeout=EPHEMERIS_CACHE_TIMEOUT)
+        self._ephemeris = positions
+        return positions
+
+    def _crosscheck_with_horizons(self, positions: Dict[str, PlanetPosition], target_dt: datetime) -> None:
+        """Сверка с JPL Horizons: расхождения больше допуска пишутся в лог, результат не меняется"""
         for name, command in PLANET_COMMANDS.items():
             try:
-                positions[name] = self._fetch_planet_position(command, target_dt, jd)
+                reference = self._fetch_planet_position(command, target_dt)
             except Exception as exc:
-                logger.error("❌ Не удалось получить эфемериды %s: %s", name, exc)
-        if positions:
-            cache.set(cache_key, positions, timeout=EPHEMERIS_CACHE_TIMEOUT)
-        self._ephemeris = positions
-        return positions
+                logger.warning("⚠️ Сверка с Horizons для %s не выполнена: %s", name, exc)
+                continue
+            deviation = float(angular_distance(positions[name].longitude, reference.longitude))
+            if deviation > HORIZONS_TOLERANCE:
+                logger.warning(
+                    "⚠️ Расхождение эфемерид %s с Horizons: %.3f° (локально %.3f°, Horizons %.3f°)",
+                    name, deviation, positions[name].longitude, reference.longitude,
+                )
+            else:
+                logger.debug("✅ %s совпадает с Horizons (расхождение %.3f°)", name, deviation)
 
     # ------------------------------------------------------------------ #
     # Вычисления
     # ------------------------------------------------------------------ #
 
-    def _fetch_planet_position(self, command: str, target_dt: datetime, jd: float) -> PlanetPosition:
+    def _fetch_planet_position(self, command: str, target_dt: datetime) -> PlanetPosition:
+        """Видимые эклиптические долгота и широта тела на дату из JPL Horizons (ObsEcLon/ObsEcLat)"""
         params = {
             "format": "json",
             "COMMAND": command,
-            "EPHEM_TYPE": "VECTORS",
+            "EPHEM_TYPE": "OBSERVER",
             "CENTER": "500@399",  # геоцентрические координаты
-            "START_TIME": target_dt.strftime("%Y-%m-%d"),
-            "STOP_TIME": (target_dt + timedelta(days=1)).strftime("%Y-%m-%d"),
-            "STEP_SIZE": "'1 d'",
+            "START_TIME": target_dt.strftime("'%Y-%m-%d %H:%M'"),
+            "STOP_TIME": (target_dt + timedelta(hours=1)).strftime("'%Y-%m-%d %H:%M'"),
+            "STEP_SIZE": "'1 h'",
+            "QUANTITIES": "'31'",
+            "CSV_FORMAT": "YES",
         }
 
         response = requests.get(HORIZONS_URL, params=params, timeout=30)
@@ -302,17 +341,9 @@ class AstrologyContextBuilder:
             raise ValueError(f"Некорректный ответ Horizons для {command}")
 
         segment = block.split("$$SOE")[1].split("$$EOE")[0].strip().splitlines()
-        # Берем первую строку с координатами (после строки с датой)
-        coord_line = None
-        for line in segment:
-            if line.strip().startswith("X"):
-                coord_line = line
-                break
-        if not coord_line:
+        if not segment:
             raise ValueError("Не удалось найти координаты в ответе Horizons")
-
-        coords = self._parse_vector_line(coord_line)
-        longitude, latitude = self._convert_to_ecliptic(coords, jd)
+        longitude, latitude = self._parse_observer_line(segment[0])
 
         return PlanetPosition(
             name=command,
@@ -321,49 +352,21 @@ class AstrologyContextBuilder:
         )
 
     @staticmethod
-    def _parse_vector_line(line: str) -> Tuple[float, float, float]:
-        # X =..., Y =..., Z =...
-        parts = line.replace("=", " ").split()
-        values = {}
-        for i in range(0, len(parts) - 1, 2):
-            key = parts[i]
+    def _parse_observer_line(line: str) -> Tuple[float, float]:
+        # Дата, флаги освещённости, ObsEcLon, ObsEcLat
+        values = []
+        for part in line.split(","):
             try:
-                values[key] = float(parts[i + 1])
+                values.append(float(part))
             except ValueError:
                 continue
-        return values.get("X", 0.0), values.get("Y", 0.0), values.get("Z", 0.0)
-
-    def _convert_to_ecliptic(self, coords: Tuple[float, float, float], jd: float) -> Tuple[float, float]:
-        x, y, z = coords
-        t_centuries = (jd - 2451545.0) / 36525.0
-        epsilon = math.radians(23.439291 - 0.0130042 * t_centuries)
-
-        x_ecl = x
-        y_ecl = y * math.cos(epsilon) + z * math.sin(epsilon)
-        z_ecl = -y * math.sin(epsilon) + z * math.cos(epsilon)
-
-        longitude = math.degrees(math.atan2(y_ecl, x_ecl)) % 360
-        latitude = math.degrees(math.atan2(z_ecl, math.sqrt(x_ecl ** 2 + y_ecl ** 2)))
-        return longitude, latitude
+        if len(values) < 2:
+            raise ValueError(f"Не удалось разобрать строку Horizons: {line!r}")
+        return values[-2] % 360, values[-1]
 
     def _calculate_ascendant(self, dt_utc: datetime) -> float:
         jd = self._julian_day(dt_utc)
-        t_centuries = (jd - 2451545.0) / 36525.0
-        epsilon = math.radians(23.439291 - 0.0130042 * t_centuries)
-
-        gst = (280.46061837 + 360.98564736629 * (jd - 2451545.0)) % 360
-        lst = (gst + self.longitude) % 360
-
-        lst_rad = math.radians(lst)
-        lat_rad = math.radians(self.latitude)
-
-        numerator = -math.cos(lst_rad)
-        denominator = math.sin(lst_rad) * math.cos(epsilon) + math.tan(lat_rad) * math.sin(epsilon)
-        asc = math.degrees(math.atan2(numerator, denominator))
-        if asc < 0:
-            asc += 180
-        asc = (asc + 180) % 360  # перевод в диапазон 0-360
-        return asc
+        return float(ecliptic_ascendant([jd], self.latitude, self.longitude)[0])
 
     @staticmethod
     def _julian_day(dt: datetime) -> float:
@@ -403,8 +406,7 @@ class AstrologyContextBuilder:
             right = planets.get(right_key)
             if not left or not right:
                 continue
-            delta = abs(left.longitude - right.longitude)
-            delta = min(delta, 360 - delta)
+            delta = float(angular_distance(left.longitude, right.longitude))
             for aspect_angle, aspect_name in ASPECTS.items():
                 if abs(delta - aspect_angle) <= ASPECT_ORB:
                     orb = abs(delta - aspect_angle)
@@ -511,5 +513,15 @@ class AstrologyContextBuilder:
         return f"{date_obj.day} {MONTH_ACCUSATIVE[date_obj.month - 1]} {date_obj.year}"
 
 
-__all__ = ["AstrologyContextBuilder"]
+def prime_daily_context(**kwargs) -> Dict[str, str]:
+    """
+    Рассчитать общий базовый контекст дня один раз и положить в кэш.
+
+    Вызывается перед параллельной генерацией гороскопов: builder каждого
+    знака берёт эфемериды и погоду из кэша, а не запрашивает их заново.
+    """
+    return AstrologyContextBuilder(**kwargs)._get_base_context()
+
+
+__all__ = ["AstrologyContextBuilder", "prime_daily_context"]
 
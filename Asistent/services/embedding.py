@@ -1,8 +1,35 @@
 import logging
-from typing import Dict, Iterable, Optional, Sequence
+from typing import Callable, Dict, Iterable, List, Optional, Sequence
 
 logger = logging.getLogger(__name__)
 
+# Подписчики на изменение embedding: {app_label.ModelName: [callback(instance, embedding)]}
+_embedding_listeners: Dict[str, List[Callable]] = {}
+
+
+def register_embedding_listener(model_label: str, callback: Callable) -> None:
+    """
+    Подписывает callback на сохранение нового embedding для модели.
+
+    Используется in-memory индексами (например, knowledge_cache), чтобы
+    обновлять одну строку вместо полной перезагрузки из БД.
+    """
+    callbacks = _embedding_listeners.setdefault(model_label, [])
+    if callback not in callbacks:
+        callbacks.append(callback)
+
+
+def notify_embedding_changed(instance, embedding) -> None:
+    """
+    Уведомляет подписчиков о новом embedding экземпляра модели.
+    """
+    label = instance._meta.label
+    for callback in _embedding_listeners.get(label, ()):
+        try:
+            callback(instance, embedding)
+        except Exception as exc:
+            logger.warning("⚠️ Ошибка обработчика embedding для %s: %s", label, exc)
+
 
 def cache_previous_state(
     cache: Dict[int, Dict[str, object]],
@@ -76,6 +103,8 @@ def store_embedding(
 
     setattr(instance, skip_flag, True)
     model_cls.objects.filter(pk=instance.pk).update(**{field_name: embedding})
+    setattr(instance, field_name, embedding)
+    notify_embedding_changed(instance, embedding)
     return True
 
 
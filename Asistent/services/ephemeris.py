@@ -0,0 +1,424 @@
+"""
+Локальные эфемериды для астроконтекста гороскопов (NumPy, без сети).
+
+Раньше положение каждой планеты запрашивалось отдельным синхронным
+запросом к JPL Horizons (таймаут 30 с) — генерация гороскопов зависела от
+доступности внешнего сервиса. Здесь всё считается аналитически и
+векторно: один вызов даёт долготы всех тел, фазу Луны, асцендент и аспекты
+сразу для массива моментов (одна дата или целый диапазон).
+
+Модель:
+- планеты — кеплеровы элементы JPL «Approximate Positions of the Planets»
+  (таблица 1, 1800–2050 гг.), уравнение Кеплера решается методом Ньютона;
+  геоцентрические координаты с поправкой за время распространения света
+  и аберрацию (положения Земли и планеты берутся на момент t − τ);
+- Солнце — из орбиты барицентра Земля–Луна;
+- Луна — усечённый ряд ELP по Meeus, «Astronomical Algorithms», гл. 47;
+- долготы приводятся к равноденствию даты (прецессия + главные члены
+  нутации), как видимые эклиптические долготы Horizons (ObsEcLon).
+
+Точность в интервале 1950–2050 гг.: Солнце и Луна — сотые доли градуса,
+планеты — до ~0.1°; для знаков, градусов в знаке и аспектов с орбом в
+несколько градусов этого достаточно.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+J2000 = 2451545.0
+DAYS_PER_CENTURY = 36525.0
+LIGHT_TIME_DAYS_PER_AU = 0.0057755183
+
+BODIES = ("Sun", "Moon", "Mercury", "Venus", "Mars", "Jupiter", "Saturn", "Uranus", "Neptune")
+
+# a [а.е.], e, I, L, долгота перигелия, долгота узла [°] и их изменения за столетие
+PLANET_ELEMENTS = {
+    "Mercury": (
+        (0.38709927, 0.20563593, 7.00497902, 252.25032350, 77.45779628, 48.33076593),
+        (0.00000037, 0.00001906, -0.00594749, 149472.67411175, 0.16047689, -0.12534081),
+    ),
+    "Venus": (
+        (0.72333566, 0.00677672, 3.39467605, 181.97909950, 131.60246718, 76.67984255),
+        (0.00000390, -0.00004107, -0.00078890, 58517.81538729, 0.00268329, -0.27769418),
+    ),
+    "Earth": (
+        (1.00000261, 0.01671123, -0.00001531, 100.46457166, 102.93768193, 0.0),
+        (0.00000562, -0.00004392, -0.01294668, 35999.37244981, 0.32327364, 0.0),
+    ),
+    "Mars": (
+        (1.52371034, 0.09339410, 1.84969142, -4.55343205, -23.94362959, 49.55953891),
+        (0.00001847, 0.00007882, -0.00813131, 19140.30268499, 0.44441088, -0.29257343),
+    ),
+    "Jupiter": (
+        (5.20288700, 0.04838624, 1.30439695, 34.39644051, 14.72847983, 100.47390909),
+        (-0.00011607, -0.00013253, -0.00183714, 3034.74612775, 0.21252668, 0.20469106),
+    ),
+    "Saturn": (
+        (9.53667594, 0.05386179, 2.48599187, 49.95424423, 92.59887831, 113.66242448),
+        (-0.00125060, -0.00050991, 0.00193609, 1222.49362201, -0.41897216, -0.28867794),
+    ),
+    "Uranus": (
+        (19.18916464, 0.04725744, 0.77263783, 313.23810451, 170.95427630, 74.01692503),
+        (-0.00196176, -0.00004397, -0.00242939, 428.48202785, 0.40805281, 0.04240589),
+    ),
+    "Neptune": (
+        (30.06992276, 0.00859048, 1.77004347, -55.12002969, 44.96476227, 131.78422574),
+        (0.00026291, 0.00005105, 0.00035372, 218.45945325, -0.32241464, -0.00508664),
+    ),
+}
+
+# Члены ряда долготы Луны: множители D, M, M', F и коэффициент [1e-6 °] (Meeus, табл. 47.A)
+MOON_LONGITUDE_TERMS = np.array([
+    (0, 0, 1, 0, 6288774), (2, 0, -1, 0, 1274027), (2, 0, 0, 0, 658314),
+    (0, 0, 2, 0, 213618), (0, 1, 0, 0, -185116), (0, 0, 0, 2, -114332),
+    (2, 0, -2, 0, 58793), (2, -1, -1, 0, 57066), (2, 0, 1, 0, 53322),
+    (2, -1, 0, 0, 45758), (0, 1, -1, 0, -40923), (1, 0, 0, 0, -34720),
+    (0, 1, 1, 0, -30383), (2, 0, 0, -2, 15327), (0, 0, 1, 2, -12528),
+    (0, 0, 1, -2, 10980), (4, 0, -1, 0, 10675), (0, 0, 3, 0, 10034),
+    (4, 0, -2, 0, 8548), (2, 1, -1, 0, -7888), (2, 1, 0, 0, -6766),
+    (1, 0, -1, 0, -5163), (1, 1, 0, 0, 4987), (2, -1, 1, 0, 4036),
+    (2, 0, 2, 0, 3994), (4, 0, 0, 0, 3861), (2, 0, -3, 0, 3665),
+    (0, 1, -2, 0, -2689), (2, 0, -1, 2, -2602), (2, -1, -2, 0, 2390),
+    (1, 0, 1, 0, -2348), (2, -2, 0, 0, 2236), (0, 1, 2, 0, -2120),
+    (0, 2, 0, 0, -2069), (2, -2, -1, 0, 2048), (2, 0, 1, -2, -1773),
+    (2, 0, 0, 2, -1595), (4, -1, -1, 0, 1215), (0, 0, 2, 2, -1110),
+    (3, 0, -1, 0, -892), (2, 1, 1, 0, -810), (4, -1, -2, 0, 759),
+    (0, 2, -1, 0, -713), (2, 2, -1, 0, -700), (2, 1, -2, 0, 691),
+    (2, -1, 0, -2, 596), (4, 0, 1, 0, 549), (0, 0, 4, 0, 537),
+    (4, -1, 0, 0, 520), (1, 0, -2, 0, -487), (2, 1, 0, -2, -399),
+    (0, 0, 2, -2, -381), (1, 1, 1, 0, 351), (3, 0, -2, 0, -340),
+    (4, 0, -3, 0, 330), (2, -1, 2, 0, 327), (0, 2, 1, 0, -323),
+    (1, 1, -1, 0, 299), (2, 0, 3, 0, 294),
+], dtype=float)
+
+# Члены ряда широты Луны (Meeus, табл. 47.B, главные)
+MOON_LATITUDE_TERMS = np.array([
+    (0, 0, 0, 1, 5128122), (0, 0, 1, 1, 280602), (0, 0, 1, -1, 277693),
+    (2, 0, 0, -1, 173237), (2, 0, -1, 1, 55413), (2, 0, -1, -1, 46271),
+    (2, 0, 0, 1, 32573), (0, 0, 2, 1, 17198), (2, 0, 1, -1, 9266),
+    (0, 0, 2, -1, 8822), (2, -1, 0, -1, 8216), (2, 0, -2, -1, 4324),
+    (2, 0, 1, 1, 4200), (2, 1, 0, -1, -3359), (2, -1, -1, 1, 2463),
+    (2, -1, 0, 1, 2211), (2, -1, -1, -1, 2065), (0, 1, -1, -1, -1870),
+    (4, 0, -1, -1, 1828), (0, 1, 0, 1, -1794), (0, 0, 0, 3, -1749),
+    (0, 1, -1, 1, -1565), (1, 0, 0, 1, -1491), (0, 1, 1, 1, -1475),
+], dtype=float)
+
+ASPECT_ANGLES = {
+    0: "соединение",
+    60: "секстиль",
+    90: "квадрат",
+    120: "тригон",
+    180: "оппозиция",
+}
+
+Moment = Union[datetime, date]
+
+
+# ---------------------------------------------------------------------- #
+# Время
+# ---------------------------------------------------------------------- #
+
+def julian_day(moments: Union[Moment, Iterable[Moment]]) -> np.ndarray:
+    """Юлианские дни (UT) для момента или последовательности моментов; naive datetime — UTC"""
+    if isinstance(moments, (datetime, date)):
+        moments = [moments]
+    values = []
+    for moment in moments:
+        if not isinstance(moment, datetime):
+            moment = datetime(moment.year, moment.month, moment.day, 12, tzinfo=dt_timezone.utc)
+        elif moment.tzinfo is None:
+            moment = moment.replace(tzinfo=dt_timezone.utc)
+        values.append(moment.timestamp() / 86400.0 + 2440587.5)
+    return np.asarray(values, dtype=float)
+
+
+def delta_t_seconds(jd_ut: np.ndarray) -> np.ndarray:
+    """ΔT = TT − UT (полиномы Espenak–Meeus для 1961–2150 гг.)"""
+    year = 2000.0 + (np.asarray(jd_ut, dtype=float) - J2000) / 365.25
+    t_1975 = year - 1975
+    t_2000 = year - 2000
+    return np.select(
+        [year < 1986, year < 2005, year < 2050],
+        [
+            45.45 + 1.067 * t_1975 - t_1975 ** 2 / 260 - t_1975 ** 3 / 718,
+            63.86 + 0.3345 * t_2000 - 0.060374 * t_2000 ** 2 + 0.0017275 * t_2000 ** 3
+            + 0.000651814 * t_2000 ** 4 + 0.00002373599 * t_2000 ** 5,
+            62.92 + 0.32217 * t_2000 + 0.005589 * t_2000 ** 2,
+        ],
+        -20 + 32 * ((year - 1820) / 100) ** 2 - 0.5628 * (2150 - year),
+    )
+
+
+def date_range(start: Moment, end: Moment, step: timedelta = timedelta(days=1)) -> List[datetime]:
+    """Моменты от start до end включительно с шагом step (date → полдень UTC)"""
+    if not isinstance(start, datetime):
+        start = datetime(start.year, start.month, start.day, 12, tzinfo=dt_timezone.utc)
+    if not isinstance(end, datetime):
+        end = datetime(end.year, end.month, end.day, 12, tzinfo=dt_timezone.utc)
+    count = int((end - start) / step) + 1
+    return [start + step * index for index in range(max(count, 0))]
+
+
+# ---------------------------------------------------------------------- #
+# Небесная механика
+# ---------------------------------------------------------------------- #
+
+def _heliocentric(name: str, t: np.ndarray) -> np.ndarray:
+    """Гелиоцентрические эклиптические координаты J2000 [а.е.], форма (3, n)"""
+    base, rate = PLANET_ELEMENTS[name]
+    a, e, inclination, mean_longitude, perihelion, node = (
+        base[index] + rate[index] * t for index in range(6)
+    )
+    mean_anomaly = np.radians((mean_longitude - perihelion + 180.0) % 360.0 - 180.0)
+    eccentric = mean_anomaly + e * np.sin(mean_anomaly)
+    for _ in range(6):
+        eccentric -= (eccentric - e * np.sin(eccentric) - mean_anomaly) / (1 - e * np.cos(eccentric))
+
+    x_orbit = a * (np.cos(eccentric) - e)
+    y_orbit = a * np.sqrt(1 - e * e) * np.sin(eccentric)
+
+    omega = np.radians(perihelion - node)
+    node = np.radians(node)
+    inclination = np.radians(inclination)
+    cos_w, sin_w = np.cos(omega), np.sin(omega)
+    cos_n, sin_n = np.cos(node), np.sin(node)
+    cos_i, sin_i = np.cos(inclination), np.sin(inclination)
+    return np.array([
+        (cos_w * cos_n - sin_w * sin_n * cos_i) * x_orbit + (-sin_w * cos_n - cos_w * sin_n * cos_i) * y_orbit,
+        (cos_w * sin_n + sin_w * cos_n * cos_i) * x_orbit + (-sin_w * sin_n + cos_w * cos_n * cos_i) * y_orbit,
+        sin_w * sin_i * x_orbit + cos_w * sin_i * y_orbit,
+    ])
+
+
+def _geocentric(name: str, t: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Видимые геоцентрические долгота и широта J2000 [°] с учётом времени света и аберрации"""
+    earth = _heliocentric("Earth", t)
+    vector = -earth if name == "Sun" else _heliocentric(name, t) - earth
+    light_time = LIGHT_TIME_DAYS_PER_AU * np.linalg.norm(vector, axis=0) / DAYS_PER_CENTURY
+    # Оба тела на момент t − τ: время распространения света + годичная аберрация (первый порядок)
+    earth = _heliocentric("Earth", t - light_time)
+    vector = -earth if name == "Sun" else _heliocentric(name, t - light_time) - earth
+    longitude = np.degrees(np.arctan2(vector[1], vector[0])) % 360.0
+    latitude = np.degrees(np.arctan2(vector[2], np.hypot(vector[0], vector[1])))
+    return longitude, latitude
+
+
+def _moon(t: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Геометрические долгота и широта Луны на равноденствие даты [°]"""
+    mean_longitude = 218.3164477 + 481267.88123421 * t - 0.0015786 * t ** 2 + t ** 3 / 538841 - t ** 4 / 65194000
+    elongation = 297.8501921 + 445267.1114034 * t - 0.0018819 * t ** 2 + t ** 3 / 545868 - t ** 4 / 113065000
+    sun_anomaly = 357.5291092 + 35999.0502909 * t - 0.0001536 * t ** 2 + t ** 3 / 24490000
+    moon_anomaly = 134.9633964 + 477198.8675055 * t + 0.0087414 * t ** 2 + t ** 3 / 69699 - t ** 4 / 14712000
+    latitude_arg = 93.2720950 + 483202.0175233 * t - 0.0036539 * t ** 2 - t ** 3 / 3526000 + t ** 4 / 863310000
+    eccentricity = 1 - 0.002516 * t - 0.0000074 * t ** 2
+
+    arguments = np.radians(np.stack([elongation, sun_anomaly, moon_anomaly, latitude_arg]))
+
+    def series(terms: np.ndarray) -> np.ndarray:
+        angles = terms[:, :4] @ arguments
+        factors = eccentricity[np.newaxis, :] ** np.abs(terms[:, 1])[:, np.newaxis]
+        return (terms[:, 4:5] * factors * np.sin(angles)).sum(axis=0)
+
+    a1 = np.radians(119.75 + 131.849 * t)
+    a2 = np.radians(53.09 + 479264.290 * t)
+    a3 = np.radians(313.45 + 481266.484 * t)
+    mean_longitude_rad = np.radians(mean_longitude)
+    latitude_arg_rad = arguments[3]
+    moon_anomaly_rad = arguments[2]
+
+    sum_longitude = (
+        series(MOON_LONGITUDE_TERMS)
+        + 3958 * np.sin(a1) + 1962 * np.sin(mean_longitude_rad - latitude_arg_rad) + 318 * np.sin(a2)
+    )
+    sum_latitude = (
+        series(MOON_LATITUDE_TERMS)
+        - 2235 * np.sin(mean_longitude_rad) + 382 * np.sin(a3)
+        + 175 * np.sin(a1 - latitude_arg_rad) + 175 * np.sin(a1 + latitude_arg_rad)
+        + 127 * np.sin(mean_longitude_rad - moon_anomaly_rad) - 115 * np.sin(mean_longitude_rad + moon_anomaly_rad)
+    )
+    return (mean_longitude + sum_longitude / 1e6) % 360.0, sum_latitude / 1e6
+
+
+def _precession(t: np.ndarray) -> np.ndarray:
+    """Общая прецессия по долготе от J2000 к равноденствию даты [°]"""
+    return (5028.796195 * t + 1.1054348 * t ** 2) / 3600.0
+
+
+def _nutation(t: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Нутация в долготе и наклоне (главные члены) [°]"""
+    node = np.radians(125.04452 - 1934.136261 * t)
+    sun = np.radians(280.4665 + 36000.7698 * t)
+    moon = np.radians(218.3165 + 481267.8813 * t)
+    longitude = (-17.20 * np.sin(node) - 1.32 * np.sin(2 * sun) - 0.23 * np.sin(2 * moon) + 0.21 * np.sin(2 * node)) / 3600
+    obliquity = (9.20 * np.cos(node) + 0.57 * np.cos(2 * sun) + 0.10 * np.cos(2 * moon) - 0.09 * np.cos(2 * node)) / 3600
+    return longitude, obliquity
+
+
+def true_obliquity(t: np.ndarray) -> np.ndarray:
+    """Истинный наклон эклиптики [°]"""
+    mean = 23.439291111 - (46.8150 * t + 0.00059 * t ** 2 - 0.001813 * t ** 3) / 3600
+    return mean + _nutation(t)[1]
+
+
+def sidereal_time(jd_ut: np.ndarray, longitude: float = 0.0) -> np.ndarray:
+    """Местное звёздное время [°] (среднее гринвичское + восточная долгота)"""
+    days = np.asarray(jd_ut, dtype=float) - J2000
+    t = days / DAYS_PER_CENTURY
+    gmst = 280.46061837 + 360.98564736629 * days + 0.000387933 * t ** 2 - t ** 3 / 38710000
+    return (gmst + longitude) % 360.0
+
+
+def ascendant(jd_ut: np.ndarray, latitude: float, longitude: float) -> np.ndarray:
+    """Эклиптическая долгота асцендента (восходящая точка эклиптики) [°]"""
+    jd_ut = np.asarray(jd_ut, dtype=float)
+    t = (jd_ut - J2000) / DAYS_PER_CENTURY
+    lst = np.radians(sidereal_time(jd_ut, longitude))
+    epsilon = np.radians(true_obliquity(t))
+    phi = np.radians(latitude)
+    result = np.degrees(np.arctan2(
+        np.cos(lst),
+        -(np.sin(lst) * np.cos(epsilon) + np.tan(phi) * np.sin(epsilon)),
+    ))
+    return result % 360.0
+
+
+def positions_at_jd(jd_tt: np.ndarray, bodies: Sequence[str] = BODIES) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+    """
+    Видимые геоцентрические эклиптические координаты на равноденствие даты.
+
+    Args:
+        jd_tt: юлианские дни в шкале TT (массив)
+        bodies: имена тел из BODIES
+
+    Returns:
+        {тело: (долготы, широты)} — массивы той же длины, что jd_tt
+    """
+    jd_tt = np.atleast_1d(np.asarray(jd_tt, dtype=float))
+    t = (jd_tt - J2000) / DAYS_PER_CENTURY
+    shift = _precession(t) + _nutation(t)[0]
+    result = {}
+    for name in bodies:
+        if name == "Moon":
+            longitude, latitude = _moon(t)
+            result[name] = ((longitude + _nutation(t)[0]) % 360.0, latitude)
+        else:
+            longitude, latitude = _geocentric(name, t)
+            result[name] = ((longitude + shift) % 360.0, latitude)
+    return result
+
+
+def angular_distance(left: np.ndarray, right: np.ndarray) -> np.ndarray:
+    """Угол между долготами, 0–180°"""
+    delta = np.abs(np.asarray(left) - np.asarray(right)) % 360.0
+    return np.minimum(delta, 360.0 - delta)
+
+
+# ---------------------------------------------------------------------- #
+# Результат
+# ---------------------------------------------------------------------- #
+
+@dataclass
+class Ephemeris:
+    """Эфемериды для набора моментов (все массивы длины len(moments))"""
+
+    moments: List[datetime]
+    jd_ut: np.ndarray
+    longitudes: Dict[str, np.ndarray]
+    latitudes: Dict[str, np.ndarray]
+    ascendant: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return len(self.jd_ut)
+
+    @property
+    def moon_elongation(self) -> np.ndarray:
+        """Элонгация Луны от Солнца по долготе, 0–360° (0 — новолуние, 180 — полнолуние)"""
+        return (self.longitudes["Moon"] - self.longitudes["Sun"]) % 360.0
+
+    @property
+    def moon_illumination(self) -> np.ndarray:
+        """Освещённая доля диска Луны (приближённо, по элонгации)"""
+        return (1 - np.cos(np.radians(self.moon_elongation))) / 2
+
+    def aspects(
+        self,
+        pairs: Sequence[Tuple[str, str]],
+        orb: float,
+        aspect_angles: Dict[int, str] = ASPECT_ANGLES,
+    ) -> List[List[Tuple[str, str, int, float]]]:
+        """
+        Мажорные аспекты пар тел по каждому моменту.
+
+        Returns:
+            list: для каждого момента — [(тело, тело, угол аспекта, орб), ...];
+                  для пары берётся первый аспект из aspect_angles в пределах орба
+        """
+        angles = np.array(list(aspect_angles), dtype=float)
+        result: List[List[Tuple[str, str, int, float]]] = [[] for _ in range(len(self))]
+        for left, right in pairs:
+            if left not in self.longitudes or right not in self.longitudes:
+                continue
+            distance = angular_distance(self.longitudes[left], self.longitudes[right])
+            deviation = np.abs(distance[:, np.newaxis] - angles[np.newaxis, :])
+            within = deviation <= orb
+            first = within.argmax(axis=1)
+            for index in np.flatnonzero(within.any(axis=1)):
+                aspect_index = first[index]
+                result[index].append((left, right, int(angles[aspect_index]), float(deviation[index, aspect_index])))
+        return result
+
+    def at(self, index: int) -> Dict[str, Tuple[float, float]]:
+        """{тело: (долгота, широта)} для одного момента"""
+        return {
+            name: (float(self.longitudes[name][index]), float(self.latitudes[name][index]))
+            for name in self.longitudes
+        }
+
+
+def compute_ephemeris(
+    moments: Union[Moment, Iterable[Moment]],
+    bodies: Sequence[str] = BODIES,
+    latitude: Optional[float] = None,
+    longitude: Optional[float] = None,
+) -> Ephemeris:
+    """
+    Эфемериды на момент или набор моментов одним векторным расчётом.
+
+    Args:
+        moments: datetime/date или их последовательность (naive — UTC, date — полдень UTC)
+        bodies: тела из BODIES
+        latitude, longitude: координаты наблюдателя для асцендента (если заданы)
+    """
+    if isinstance(moments, (datetime, date)):
+        moments = [moments]
+    moments = list(moments)
+    jd_ut = julian_day(moments)
+    jd_tt = jd_ut + delta_t_seconds(jd_ut) / 86400.0
+    positions = positions_at_jd(jd_tt, bodies)
+    return Ephemeris(
+        moments=moments,
+        jd_ut=jd_ut,
+        longitudes={name: values[0] for name, values in positions.items()},
+        latitudes={name: values[1] for name, values in positions.items()},
+        ascendant=ascendant(jd_ut, latitude, longitude) if latitude is not None and longitude is not None else None,
+    )
+
+
+__all__ = [
+    "ASPECT_ANGLES",
+    "BODIES",
+    "Ephemeris",
+    "angular_distance",
+    "ascendant",
+    "compute_ephemeris",
+    "date_range",
+    "delta_t_seconds",
+    "julian_day",
+    "positions_at_jd",
+    "sidereal_time",
+]
@@ -282,13 +282,8 @@ def generate_knowledge_embedding(sender, instance, created, **kwargs):
             model_cls=AIKnowledgeBase,
             skip_flag='_skip_embedding_generation',
         ):
+            # Векторный индекс обновляется хуком store_embedding (knowledge_cache)
             logger.info("   ✅ Embeddings сохранён: %s измерений", len(embedding))
-
-            try:
-                from .knowledge_cache import clear_knowledge_cache
-                clear_knowledge_cache()
-            except ImportError:
-                pass
         else:
             logger.warning("   ⚠️ Не удалось получить embeddings для '%s'", instance.title)
             
@@ -297,6 +292,32 @@ def generate_knowledge_embedding(sender, instance, created, **kwargs):
         # Не пробрасываем исключение - не блокируем сохранение записи
 
 
+"""Синхронизирует векторный индекс базы знаний с записью"""
+@receiver(post_save, sender='Asistent.AIKnowledgeBase')
+def sync_knowledge_index_on_save(sender, instance, update_fields=None, **kwargs):
+    """
+    Обновляет строку векторного индекса при смене is_active/категории/приоритета.
+    Новые embeddings приходят через хук store_embedding.
+    """
+    if update_fields and set(update_fields) <= {'usage_count'}:
+        return
+    try:
+        from .knowledge_cache import sync_knowledge_item
+        sync_knowledge_item(instance)
+    except Exception as e:
+        logger.warning("⚠️ Не удалось обновить векторный индекс для %s: %s", instance.pk, e)
+
+
+@receiver(post_delete, sender='Asistent.AIKnowledgeBase')
+def remove_knowledge_from_index(sender, instance, **kwargs):
+    """Удаляет запись из векторного индекса"""
+    try:
+        from .knowledge_cache import remove_knowledge_item
+        remove_knowledge_item(instance.pk)
+    except Exception as e:
+        logger.warning("⚠️ Не удалось удалить запись %s из векторного индекса: %s", instance.pk, e)
+
+
 # ============================================
 # Embeddings для ChatbotFAQ
 # ПЕРЕНЕСЕНО В ChatBot_AI.signals
@@ -344,4 +365,19 @@ def generate_message_embedding(sender, instance, created, **kwargs):
             logger.warning("   ⚠️ Не удалось получить embedding для сообщения")
             
     except Exception as e:
-        logger.error("   ❌ Ошибка генерации embedding для сообщения: %s", e)
\ No newline at end of file
+        logger.error("   ❌ Ошибка генерации embedding для сообщения: %s", e)
+
+# ============================================
+# MinHash-сигнатуры статей (проверка уникальности)
+# ============================================
+
+"""Обновляет MinHash-сигнатуру и корзины LSH статьи при изменении текста"""
+@receiver(post_save, sender='blog.Post')
+def update_post_text_signature(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or (update_fields and 'content' not in update_fields):
+        return
+    try:
+        from .text_signatures import update_post_signature
+        update_post_signature(instance)
+    except Exception as e:
+        logger.warning("⚠️ Не удалось обновить сигнатуру текста статьи %s: %s", instance.pk, e)
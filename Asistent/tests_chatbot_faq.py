@@ -0,0 +1,184 @@
+"""
+Тесты поиска FAQ чат-бота: автомат ключевых слов, семантическая матрица
+и кеш embeddings запросов
+"""
+from types import SimpleNamespace
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase
+
+from Asistent.ChatBot_AI.models import ChatbotFAQ
+from Asistent.ChatBot_AI.services import semantic_search
+from Asistent.ChatBot_AI.services.faq_index import invalidate_faq_index
+from Asistent.ChatBot_AI.services.faq_service import FAQMatcher, FAQSearchService
+from Asistent.ChatBot_AI.services.semantic_search import SemanticSearchService
+
+
+def make_faq(question, embedding=None, **extra):
+    faq = ChatbotFAQ(question=question, answer=f'Ответ: {question}', embedding=embedding, **extra)
+    faq._skip_embedding_generation = True  # без обращения к GigaChat
+    faq.save()
+    return faq
+
+
+def faq_stub(question, *keywords):
+    return SimpleNamespace(question=question, keywords=list(keywords))
+
+
+def substring_match(faqs, message):
+    """Прежний FAQSearchService.search: перебор FAQ по рангу и проверки «in»"""
+    message_lower = message.lower()
+    for faq in faqs:
+        for keyword in faq.keywords or []:
+            if keyword.lower() in message_lower:
+                return faq
+        if faq.question.lower() in message_lower or message_lower in faq.question.lower():
+            return faq
+    return None
+
+
+class FAQMatcherTests(TestCase):
+    """Автомат Ахо–Корасик даёт тот же FAQ, что и прежний перебор подстрок"""
+
+    FIXTURES = [
+        faq_stub('Как стать автором?', 'стать автором', 'заявк'),
+        faq_stub('Как получить выплату?', 'выплат', 'деньги', 'гонорар'),
+        faq_stub('Где мои бонусы?', 'бонус', 'баллы'),
+        faq_stub('Как написать статью', 'статья', 'стать'),
+        faq_stub('Правила сайта', 'правил', 'модерац'),
+        faq_stub('Контакты', 'связаться', 'почта', 'e-mail'),
+    ]
+
+    MESSAGES = [
+        'Хочу стать автором журнала',
+        'КОГДА БУДЕТ ВЫПЛАТА?',
+        'а где мои Бонусы и баллы',
+        'как написать статью про уход',
+        'Статья не прошла модерацию',
+        'напишите на почту',
+        'как стать',
+        'правила сайта',
+        'стать',
+        'где мои',
+        'ничего общего',
+        'Деньги за статью и гонорар',
+        'e-mail для связи',
+        '',
+    ]
+
+    def test_parity_with_substring_search(self):
+        matcher = FAQMatcher(self.FIXTURES)
+        for message in self.MESSAGES:
+            self.assertIs(matcher.match(message), substring_match(self.FIXTURES, message), message)
+
+    def test_overlapping_and_nested_keywords(self):
+        faqs = [
+            faq_stub('Первый', 'ор'),         # суффикс чужого ключа
+            faq_stub('Второй', 'автор'),
+            faq_stub('Третий', 'авторство'),  # содержит ключ второго
+            faq_stub('Четвёртый', 'she', 'hers'),
+            faq_stub('Пятый', 'he', 'his'),
+        ]
+        matcher = FAQMatcher(faqs)
+        self.assertIs(matcher.match('авторство'), faqs[0])  # лучший ранг по суффиксной ссылке
+        self.assertIs(FAQMatcher(faqs[1:3]).match('авторство'), faqs[1])
+        self.assertIs(FAQMatcher(faqs[2:3] + faqs[1:2]).match('авторство'), faqs[2])
+        self.assertIs(matcher.match('ushers'), faqs[3])
+        self.assertIs(matcher.match('this'), faqs[4])
+        self.assertIsNone(matcher.match('авт'))
+        for message in ('авторство', 'ushers', 'this', 'ahis she', 'hhe', 'ор'):
+            self.assertIs(matcher.match(message), substring_match(faqs, message), message)
+
+    def test_cyrillic_case_folding(self):
+        faqs = [faq_stub('Ёлочные игрушки', 'ЁЛКА'), faq_stub('Уход за Кожей', 'Крем')]
+        matcher = FAQMatcher(faqs)
+        self.assertIs(matcher.match('купить ёлка'), faqs[0])
+        self.assertIsNone(matcher.match('КУПИТЬ ЁЛКУ'))
+        self.assertIs(matcher.match('какой КРЕМ выбрать'), faqs[1])
+        self.assertIs(matcher.match('УХОД ЗА КОЖЕЙ'), faqs[1])
+        self.assertIs(matcher.match('кожей'), faqs[1])  # сообщение внутри вопроса
+
+    def test_empty_keyword_matches_everything(self):
+        faqs = [faq_stub('Первый', 'ключ'), faq_stub('Всегда', '')]
+        matcher = FAQMatcher(faqs)
+        self.assertIs(matcher.match('что угодно'), faqs[1])
+        self.assertIs(matcher.match('ключ'), faqs[0])
+
+    def test_search_service_uses_priority_order(self):
+        cache.clear()
+        invalidate_faq_index()
+        self.addCleanup(invalidate_faq_index)
+        low = make_faq('Общий вопрос', keywords=['статья'], priority=10)
+        high = make_faq('Важный вопрос', keywords=['статья'], priority=90)
+
+        with self.assertNumQueries(1):
+            result = FAQSearchService.search('Моя СТАТЬЯ')
+            FAQSearchService.search('Моя статья')
+        self.assertEqual(result['faq_obj'], high)
+        self.assertEqual(FAQSearchService.search('общий вопрос')['faq_obj'], low)
+        self.assertIsNone(FAQSearchService.search('ничего'))
+
+
+class SemanticFAQSearchTests(TestCase):
+    """Матрица embeddings FAQ в памяти процесса и её сброс по общей версии"""
+
+    def setUp(self):
+        cache.clear()
+        invalidate_faq_index()
+        semantic_search.clear_query_embedding_cache()
+        self.addCleanup(semantic_search.clear_query_embedding_cache)
+        self.addCleanup(invalidate_faq_index)
+
+        patcher = mock.patch('Asistent.gigachat_api.get_embeddings', return_value=[1.0, 0.0, 0.0])
+        self.get_embeddings = patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.author_faq = make_faq('Как стать автором?', [1.0, 0.1, 0.0])
+        self.payout_faq = make_faq('Как получить выплату?', [0.6, 0.8, 0.0])
+        make_faq('Без embedding')
+
+    def test_query_is_embedded_as_typed_and_memoized_by_normalized_key(self):
+        first = SemanticSearchService.generate_query_embedding('  Как стать Автором  ')
+        self.assertEqual(first, [1.0, 0.0, 0.0])
+        self.get_embeddings.assert_called_once_with('Как стать Автором')
+
+        SemanticSearchService.generate_query_embedding('как   стать автором')
+        self.assertEqual(self.get_embeddings.call_count, 1)
+
+        self.assertEqual(SemanticSearchService.generate_query_embedding('   '), [])
+        self.assertEqual(self.get_embeddings.call_count, 1)
+
+    def test_matrix_is_built_once_and_ranked(self):
+        results = SemanticSearchService.search_faq_semantic('автор', min_similarity=0.5)
+        self.assertEqual([faq for faq, _ in results], [self.author_faq, self.payout_faq])
+        self.assertGreater(results[0][1], results[1][1])
+
+        with self.assertNumQueries(0):
+            again = SemanticSearchService.search_faq_semantic('автор', min_similarity=0.5, limit=1)
+        self.assertEqual([faq for faq, _ in again], [self.author_faq])
+
+    def test_faq_change_invalidates_matrix(self):
+        SemanticSearchService.search_faq_semantic('автор')
+
+        # Сохранение FAQ увеличивает общую версию и сбрасывает матрицу
+        self.author_faq.is_active = False
+        self.author_faq._skip_embedding_generation = True
+        self.author_faq.save()
+        results = SemanticSearchService.search_faq_semantic('автор', min_similarity=0.5)
+        self.assertEqual([faq for faq, _ in results], [self.payout_faq])
+
+    def test_version_bump_from_other_process_rebuilds_matrix(self):
+        from utilits.versioned_snapshot import bump_version
+
+        SemanticSearchService.search_faq_semantic('автор')
+        ChatbotFAQ.objects.filter(pk=self.payout_faq.pk).update(embedding=[1.0, 0.0, 0.0])
+
+        # Без смены версии процесс продолжает работать со своей матрицей
+        results = SemanticSearchService.search_faq_semantic('автор')
+        self.assertEqual(results[0][0], self.author_faq)
+
+        bump_version(semantic_search._faq_matrix.version_key)
+        with mock.patch('utilits.versioned_snapshot.VERSION_CHECK_INTERVAL', 0):
+            results = SemanticSearchService.search_faq_semantic('автор')
+        self.assertEqual(results[0][0], self.payout_faq)
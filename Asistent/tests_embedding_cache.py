@@ -0,0 +1,93 @@
+"""
+Тесты постоянного кеша embeddings по содержимому текста
+"""
+from datetime import timedelta
+from unittest import mock
+
+import numpy as np
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+
+from Asistent import embedding_cache
+from Asistent.models import EmbeddingCacheEntry
+
+MODEL = 'test-embeddings'
+
+
+class EmbeddingCacheTests(TestCase):
+    """Промах → запись → попадание, float16, вытеснение LRU и редкая запись статистики"""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_miss_store_hit(self):
+        vector = [0.25, -0.5, 1.0]
+        self.assertEqual(embedding_cache.lookup_many(['Привет,  мир'], MODEL), {})
+        self.assertEqual(cache.get(embedding_cache.STATS_KEYS['misses']), 1)
+
+        embedding_cache.save('Привет,  мир', vector, MODEL)
+        self.assertEqual(EmbeddingCacheEntry.objects.count(), 1)
+
+        # Ключ — нормализованный текст: пробелы не важны, исходные тексты возвращаются как есть
+        found = embedding_cache.lookup_many(['Привет, мир', ' Привет,\nмир ', 'другое'], MODEL)
+        self.assertEqual(found, {'Привет, мир': vector, ' Привет,\nмир ': vector})
+        self.assertEqual(cache.get(embedding_cache.STATS_KEYS['hits']), 2)
+        self.assertEqual(cache.get(embedding_cache.STATS_KEYS['misses']), 2)
+
+        # Другая модель — другой ключ
+        self.assertIsNone(embedding_cache.lookup('Привет, мир', 'other-model'))
+
+    def test_float16_round_trip(self):
+        vector = np.linspace(-1, 1, 64).tolist()
+        with mock.patch.object(embedding_cache, 'CACHE_DTYPE', 'float16'):
+            embedding_cache.save('текст', vector, MODEL)
+        entry = EmbeddingCacheEntry.objects.get()
+        self.assertEqual((entry.dtype, entry.dimensions, len(bytes(entry.vector))), ('float16', 64, 128))
+
+        # Запись читается по своему dtype, даже если настройка сменилась
+        restored = embedding_cache.lookup('текст', MODEL)
+        self.assertEqual(len(restored), 64)
+        np.testing.assert_allclose(restored, vector, atol=1e-3)
+
+    def test_hit_writes_only_once_per_touch_interval(self):
+        embedding_cache.save('свежий', [1.0, 0.0], MODEL)
+        with self.assertNumQueries(1):
+            self.assertIsNotNone(embedding_cache.lookup('свежий', MODEL))
+        self.assertEqual(EmbeddingCacheEntry.objects.get().hits, 0)
+
+        old = timezone.now() - embedding_cache.TOUCH_INTERVAL - timedelta(minutes=1)
+        EmbeddingCacheEntry.objects.update(last_used_at=old)
+        with self.assertNumQueries(2):
+            embedding_cache.lookup('свежий', MODEL)
+        entry = EmbeddingCacheEntry.objects.get()
+        self.assertEqual(entry.hits, 1)
+        self.assertGreater(entry.last_used_at, old)
+
+        with self.assertNumQueries(1):
+            embedding_cache.lookup('свежий', MODEL)
+
+    def test_evicts_least_recently_used(self):
+        now = timezone.now()
+        embedding_cache.save_many({f'текст {n}': [float(n), 1.0] for n in range(4)}, MODEL)
+        for n in range(4):
+            EmbeddingCacheEntry.objects.filter(text_hash=embedding_cache.text_hash(f'текст {n}')).update(
+                last_used_at=now - timedelta(days=n),
+            )
+
+        self.assertEqual(embedding_cache.evict(max_entries=2), 2)
+        self.assertEqual(embedding_cache.evict(max_entries=2), 0)
+        self.assertEqual(
+            set(embedding_cache.lookup_many([f'текст {n}' for n in range(4)], MODEL)),
+            {'текст 0', 'текст 1'},
+        )
+        self.assertEqual(cache.get(embedding_cache.STATS_KEYS['evicted']), 2)
+
+    def test_eviction_runs_every_n_writes(self):
+        with mock.patch.object(embedding_cache, 'EVICT_EVERY_WRITES', 3), \
+                mock.patch.object(embedding_cache, '_writes_since_evict', 0), \
+                mock.patch.object(embedding_cache, 'evict') as evict:
+            embedding_cache.save_many({'a': [1.0], 'b': [1.0]}, MODEL)
+            evict.assert_not_called()
+            embedding_cache.save('c', [1.0], MODEL)
+            evict.assert_called_once_with()
@@ -0,0 +1,92 @@
+"""
+Тесты клиента GigaChat-Embeddings: объединение запросов в пакеты
+"""
+import threading
+import time
+
+from django.test import TestCase
+
+from Asistent.gigachat_embeddings import EmbeddingBatcher
+
+
+class FakeEmbeddingsClient:
+    """Заглушка клиента: вектор = [длина текста], пакеты можно задержать"""
+
+    def __init__(self, release=None, result=True):
+        self.calls = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.release = release
+        self.result = result
+        self._lock = threading.Lock()
+
+    def embed_many(self, texts):
+        with self._lock:
+            self.calls.append(list(texts))
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            if self.release is not None:
+                self.release.wait(5)
+            if not self.result:
+                return None  # rate_limit_retry исчерпал попытки
+            return [[float(len(text))] for text in texts]
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+class EmbeddingBatcherTests(TestCase):
+    """EmbeddingBatcher: пакеты из одновременных вызовов, параллельная отправка"""
+
+    def _run(self, batcher, texts):
+        results, errors = {}, {}
+
+        def worker(text):
+            try:
+                results[text] = batcher.embed(text)
+            except Exception as e:
+                errors[text] = e
+
+        threads = [threading.Thread(target=worker, args=(text,)) for text in texts]
+        for thread in threads:
+            thread.start()
+        return threads, results, errors
+
+    def test_concurrent_calls_are_batched_and_deduplicated(self):
+        client = FakeEmbeddingsClient()
+        batcher = EmbeddingBatcher(client, max_batch=8, window=0.2)
+        texts = [f'текст {i}' for i in range(6)] + ['текст 0']
+
+        threads, results, errors = self._run(batcher, texts)
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual(errors, {})
+        self.assertEqual(results['текст 3'], [7.0])
+        self.assertEqual(len(client.calls), 1)
+        self.assertEqual(sorted(client.calls[0]), sorted(set(texts)))
+
+    def test_next_batch_is_sent_while_previous_is_in_flight(self):
+        release = threading.Event()
+        client = FakeEmbeddingsClient(release=release)
+        batcher = EmbeddingBatcher(client, max_batch=2, window=0.01)
+
+        threads, results, errors = self._run(batcher, [f'текст {i}' for i in range(6)])
+        deadline = time.monotonic() + 5
+        while client.max_in_flight < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        in_flight = client.max_in_flight
+        release.set()
+        for thread in threads:
+            thread.join(5)
+
+        self.assertGreaterEqual(in_flight, 2)
+        self.assertEqual(errors, {})
+        self.assertEqual(len(results), 6)
+
+    def test_exhausted_retries_raise_instead_of_returning_none(self):
+        batcher = EmbeddingBatcher(FakeEmbeddingsClient(result=False), max_batch=4, window=0)
+
+        with self.assertRaises(Exception):
+            batcher.embed('какой-то текст')
@@ -0,0 +1,132 @@
+"""
+Тесты очереди индексации (IndexNow) на локальной заглушке сервиса
+"""
+import json
+from typing import Any, Dict, List
+
+from django.test import TestCase
+
+
+class IndexingQueueTests(TestCase):
+    """Очередь индексации: пачки, дедупликация и пауза после ошибки на локальной заглушке IndexNow"""
+
+    def setUp(self):
+        import threading
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        from django.core.cache import cache
+
+        cache.clear()
+        self.received: List[Dict[str, Any]] = []
+        self.responses: List[int] = []
+        test = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers['Content-Length']))
+                test.received.append(json.loads(body))
+                self.send_response(test.responses.pop(0) if test.responses else 200)
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+        from django.test import override_settings
+
+        endpoint = f'http://127.0.0.1:{self.server.server_port}/indexnow'
+        settings_override = override_settings(
+            INDEXNOW_KEY='testkey', BING_INDEXNOW_KEY='',
+            INDEXING_ENDPOINTS={'indexnow': endpoint},
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_urls_are_batched_deduplicated_and_retried_with_backoff(self):
+        from unittest import mock
+
+        from django.utils import timezone
+
+        from Asistent import indexing_queue
+        from Asistent.models import IndexingSubmission
+
+        urls = [f'https://idealimage.ru/blog/post/p{i}/' for i in range(5)]
+        with mock.patch.object(indexing_queue, 'INDEXNOW_BATCH_SIZE', 3), \
+                mock.patch.object(indexing_queue, 'configured_engines', return_value=['indexnow']):
+            self.assertEqual(indexing_queue.enqueue_urls(urls + urls[:2]), 5)
+            self.assertEqual(indexing_queue.enqueue_urls(urls), 0)
+
+            # Первая пачка — 503: её три URL откладываются, второй запрос не делается
+            self.responses = [503]
+            result = indexing_queue.flush_indexing_queue()['indexnow']
+            self.assertEqual((result['requests'], result['deferred']), (1, 3))
+            self.assertEqual(len(self.received[0]['urlList']), 3)
+            self.assertEqual(self.received[0]['key'], 'testkey')
+            deferred = IndexingSubmission.objects.filter(attempts=1)
+            self.assertEqual(deferred.count(), 3)
+            self.assertGreater(deferred.first().next_attempt_at, timezone.now())
+            self.assertEqual(deferred.first().last_status_code, 503)
+
+            # Пауза не истекла — уходят только два оставшихся
+            result = indexing_queue.flush_indexing_queue()['indexnow']
+            self.assertEqual(result['submitted'], 2)
+
+            deferred.update(next_attempt_at=timezone.now())
+            result = indexing_queue.flush_indexing_queue()['indexnow']
+            self.assertEqual((result['requests'], result['submitted']), (1, 3))
+
+            self.assertEqual(IndexingSubmission.objects.filter(status='submitted').count(), 5)
+            self.assertEqual(indexing_queue.enqueue_urls(urls), 0)
+            self.assertEqual(indexing_queue.enqueue_urls(urls[:1], resubmit_after=0), 1)
+
+    def test_image_submit_reports_skipped_flush(self):
+        from unittest import mock
+
+        from django.core.cache import cache
+
+        from Asistent import indexing_queue
+
+        urls = [f'https://idealimage.ru/media/images/{i}.webp' for i in range(3)]
+        with mock.patch.object(indexing_queue, 'configured_engines', return_value=['indexnow']):
+            cache.add(indexing_queue.FLUSH_LOCK_KEY, 1, 60)
+            result = indexing_queue.submit_image_urls(urls)
+            self.assertEqual(
+                (result['success'], result['queued'], result['flush_skipped']), (False, 3, True)
+            )
+            self.assertFalse(result['indexnow']['success'])
+            self.assertEqual(self.received, [])
+
+            cache.delete(indexing_queue.FLUSH_LOCK_KEY)
+            result = indexing_queue.submit_image_urls(urls)
+            self.assertEqual((result['success'], result['queued'], result['indexnow']['submitted']), (True, 0, 3))
+
+    def test_bulk_media_indexing_advances_by_per_run_cap(self):
+        import os
+        import tempfile
+        from unittest import mock
+
+        from django.test import override_settings
+
+        from Asistent import indexing_queue
+        from Asistent.models import IndexingSubmission
+        from Asistent.schedule import services
+
+        with tempfile.TemporaryDirectory() as media_root:
+            os.makedirs(os.path.join(media_root, 'images', '2024'))
+            for i in range(5):
+                open(os.path.join(media_root, 'images', '2024', f'{i}.webp'), 'wb').close()
+            open(os.path.join(media_root, 'images', 'notes.txt'), 'wb').close()
+
+            with override_settings(MEDIA_ROOT=media_root, SITE_URL='https://idealimage.ru'), \
+                    mock.patch.object(services, 'BULK_MEDIA_IMAGES_PER_RUN', 2), \
+                    mock.patch.object(indexing_queue, 'configured_engines', return_value=['indexnow']):
+                runs = [services.bulk_media_images_indexing() for _ in range(4)]
+
+        self.assertEqual([run['indexed'] for run in runs], [2, 2, 1, 0])
+        self.assertEqual([run['remaining'] for run in runs], [3, 1, 0, 0])
+        self.assertEqual(IndexingSubmission.objects.filter(status='submitted').count(), 5)
+        self.assertEqual(sum(len(request['urlList']) for request in self.received), 5)
@@ -0,0 +1,221 @@
+"""
+Тесты векторного индекса базы знаний и его общей версии на диске
+"""
+import os
+import shutil
+import tempfile
+import time
+from unittest import mock
+
+import numpy as np
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from Asistent import knowledge_cache
+from Asistent.knowledge_cache import KnowledgeVectorIndex
+
+
+def _rows(*vectors, category='faq'):
+    return [(item_id, vector, category, 0, None) for item_id, vector in vectors]
+
+
+class KnowledgeVectorIndexTests(SimpleTestCase):
+    """Построение, построчные обновления и top-k на известных векторах"""
+
+    def test_build_normalizes_and_skips_bad_rows(self):
+        index = KnowledgeVectorIndex.build(_rows(
+            (1, [3.0, 4.0, 0.0]),
+            (2, [0.0, 0.0, 0.0]),   # нулевой вектор
+            (3, [1.0, 0.0]),        # другая размерность
+            (4, []),                # нет embedding
+            (5, [0.0, 0.0, 2.0]),
+        ))
+        self.assertEqual(index.dim, 3)
+        self.assertEqual(index.ids.tolist(), [1, 5])
+        self.assertEqual(index.matrix.dtype, np.float32)
+        np.testing.assert_allclose(index.matrix[0], [0.6, 0.8, 0.0], rtol=1e-6)
+        np.testing.assert_allclose(np.linalg.norm(index.matrix, axis=1), [1.0, 1.0], rtol=1e-6)
+
+    def test_build_picks_most_common_dimension(self):
+        index = KnowledgeVectorIndex.build(_rows((1, [1.0, 0.0]), (2, [0.0, 1.0]), (3, [1.0, 0.0, 0.0])))
+        self.assertEqual(index.dim, 2)
+        self.assertEqual(index.ids.tolist(), [1, 2])
+
+    def test_top_k_order(self):
+        index = KnowledgeVectorIndex.build(_rows(
+            (10, [1.0, 0.0]),
+            (20, [0.8, 0.6]),
+            (30, [0.0, 1.0]),
+            (40, [-1.0, 0.0]),
+        ))
+        hits = index.search([1.0, 0.0], top_k=3)
+        self.assertEqual([item_id for item_id, _ in hits], [10, 20, 30])
+        np.testing.assert_allclose([score for _, score in hits], [1.0, 0.8, 0.0], atol=1e-6)
+
+        # По умолчанию min_similarity=0.0 отсекает противоположные векторы
+        self.assertEqual([item_id for item_id, _ in index.search([1.0, 0.0], top_k=10)], [10, 20, 30])
+        self.assertEqual(
+            [item_id for item_id, _ in index.search([1.0, 0.0], top_k=10, min_similarity=-1.0)],
+            [10, 20, 30, 40],
+        )
+        self.assertEqual([item_id for item_id, _ in index.search([1.0, 0.0], top_k=10, min_similarity=0.5)], [10, 20])
+        self.assertEqual(index.search([1.0, 0.0, 0.0], top_k=3), [])  # чужая размерность
+        self.assertEqual(index.search([1.0, 0.0], top_k=0), [])
+
+    def test_category_filter(self):
+        index = KnowledgeVectorIndex.build(
+            _rows((1, [1.0, 0.0]), (2, [0.9, 0.1]), category='faq')
+            + _rows((3, [0.95, 0.05]), category='правила')
+        )
+        self.assertEqual([item_id for item_id, _ in index.search([1.0, 0.0], top_k=5, category='правила')], [3])
+        self.assertEqual([item_id for item_id, _ in index.search([1.0, 0.0], top_k=5, category='faq')], [1, 2])
+        self.assertEqual(index.search([1.0, 0.0], top_k=5, category='нет такой'), [])
+
+    def test_upsert_adds_replaces_and_grows(self):
+        index = KnowledgeVectorIndex()
+        self.assertTrue(index.upsert(1, [0.0, 1.0], 'faq'))
+        self.assertEqual(index.dim, 2)
+
+        for item_id in range(2, KnowledgeVectorIndex.INITIAL_CAPACITY + 10):
+            index.upsert(item_id, [0.0, 1.0], 'faq')
+        self.assertEqual(len(index), KnowledgeVectorIndex.INITIAL_CAPACITY + 9)
+
+        version = index.version
+        self.assertTrue(index.upsert(1, [2.0, 0.0], 'faq'))
+        self.assertGreater(index.version, version)
+        self.assertEqual(len(index), KnowledgeVectorIndex.INITIAL_CAPACITY + 9)
+        self.assertEqual(index.search([1.0, 0.0], top_k=1)[0][0], 1)
+
+        # Вектор чужой размерности удаляет строку
+        self.assertFalse(index.upsert(1, [1.0, 0.0, 0.0], 'faq'))
+        self.assertNotIn(1, index.ids.tolist())
+
+    def test_remove_moves_last_row(self):
+        index = KnowledgeVectorIndex.build(_rows((1, [1.0, 0.0]), (2, [0.0, 1.0]), (3, [0.6, 0.8])))
+        self.assertTrue(index.remove(1))
+        self.assertFalse(index.remove(1))
+        self.assertEqual(index.ids.tolist(), [3, 2])
+        np.testing.assert_allclose(index.matrix[0], [0.6, 0.8], rtol=1e-6)
+        self.assertEqual([item_id for item_id, _ in index.search([0.0, 1.0], top_k=2)], [2, 3])
+
+        index.upsert(3, [1.0, 0.0], 'faq')
+        self.assertEqual(index.search([1.0, 0.0], top_k=1)[0][0], 3)
+
+    def test_payload_round_trip(self):
+        index = KnowledgeVectorIndex.build(_rows((1, [1.0, 0.0]), (2, [0.0, 1.0])))
+        copy = KnowledgeVectorIndex.from_payload(index.to_payload())
+        self.assertEqual(copy.ids.tolist(), [1, 2])
+        self.assertEqual(copy.search([0.0, 1.0], top_k=1), index.search([0.0, 1.0], top_k=1))
+
+
+class KnowledgeItemsTests(TestCase):
+    """get_items догружает из БД только активные записи"""
+
+    def test_get_items_skips_inactive(self):
+        from django.contrib.auth.models import User
+        from Asistent.models import AIKnowledgeBase
+
+        author = User.objects.create_user('kb-author')
+        active, inactive = AIKnowledgeBase.objects.bulk_create([
+            AIKnowledgeBase(category='faq', title='Активная', content='a', created_by=author),
+            AIKnowledgeBase(category='faq', title='Выключенная', content='b', created_by=author, is_active=False),
+        ])
+        index = KnowledgeVectorIndex.build(_rows((active.id, [1.0, 0.0]), (inactive.id, [0.9, 0.1])))
+
+        with self.assertNumQueries(1):
+            items = index.get_items([item_id for item_id, _ in index.search([1.0, 0.0], top_k=2)])
+        self.assertEqual([item.id for item in items], [active.id])
+
+
+class IndexSnapshotTests(SimpleTestCase):
+    """Запись версии индекса, открытие через mmap и переключение CURRENT"""
+
+    def setUp(self):
+        cache.clear()
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+        override = override_settings(AI_KNOWLEDGE_INDEX_DIR=self.root)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def _index(self, *vectors):
+        return KnowledgeVectorIndex.build(_rows(*vectors))
+
+    def test_default_root_is_outside_media_root(self):
+        with override_settings(AI_KNOWLEDGE_INDEX_DIR=''):
+            root = os.path.abspath(knowledge_cache._snapshot_root())
+        self.assertFalse(root.startswith(os.path.abspath(settings.MEDIA_ROOT) + os.sep))
+
+    def test_write_and_open_snapshot(self):
+        index = self._index((1, [1.0, 0.0]), (2, [0.0, 2.0]))
+        version = knowledge_cache.write_index_snapshot(index)
+
+        self.assertEqual(knowledge_cache._read_snapshot_pointer(), version)
+        folder = os.path.join(self.root, version)
+        self.assertEqual(
+            sorted(os.listdir(folder)),
+            ['categories.npy', 'ids.npy', 'matrix.npy', 'meta.json', 'priorities.npy'],
+        )
+
+        opened = knowledge_cache.open_index_snapshot(version)
+        self.assertTrue(opened.read_only)
+        self.assertEqual(opened.dim, 2)
+        self.assertEqual(opened.ids.tolist(), [1, 2])
+        self.assertEqual([item_id for item_id, _ in opened.search([0.1, 1.0], top_k=2)], [2, 1])
+        self.assertEqual(opened.search([1.0, 0.0], top_k=1, category='faq')[0][0], 1)
+        with self.assertRaises(ValueError):
+            opened.upsert(3, [1.0, 1.0], 'faq')
+
+    def test_current_pointer_swap(self):
+        first = knowledge_cache.write_index_snapshot(self._index((1, [1.0, 0.0])))
+        with mock.patch.object(knowledge_cache, '_KNOWLEDGE_INDEX', None), \
+                mock.patch.object(knowledge_cache, '_SNAPSHOT_VERSION', None), \
+                mock.patch.object(knowledge_cache, '_VERSION_CHECKED_AT', 0.0):
+            knowledge_cache._sync_with_snapshot()
+            self.assertEqual(knowledge_cache._SNAPSHOT_VERSION, first)
+            self.assertEqual(knowledge_cache._KNOWLEDGE_INDEX.ids.tolist(), [1])
+
+            time.sleep(0.002)  # имя версии — миллисекунды
+            second = knowledge_cache.write_index_snapshot(self._index((1, [1.0, 0.0]), (5, [0.0, 1.0])))
+            self.assertNotEqual(first, second)
+            self.assertEqual(knowledge_cache._read_snapshot_pointer(), second)
+
+            # До истечения интервала проверки процесс продолжает работать со старой версией
+            knowledge_cache._sync_with_snapshot()
+            self.assertEqual(knowledge_cache._SNAPSHOT_VERSION, first)
+
+            knowledge_cache._VERSION_CHECKED_AT = 0.0
+            knowledge_cache._sync_with_snapshot()
+            self.assertEqual(knowledge_cache._SNAPSHOT_VERSION, second)
+            self.assertEqual(knowledge_cache._KNOWLEDGE_INDEX.ids.tolist(), [1, 5])
+
+        # Старая версия остаётся на диске для процессов с открытым mmap
+        self.assertTrue(os.path.isdir(os.path.join(self.root, first)))
+
+    def test_old_versions_are_pruned(self):
+        versions = []
+        for item_id in range(knowledge_cache.SNAPSHOT_KEEP_VERSIONS + 2):
+            versions.append(knowledge_cache.write_index_snapshot(self._index((item_id + 1, [1.0, 0.0]))))
+            time.sleep(0.002)
+        kept = sorted(name for name in os.listdir(self.root) if name.startswith('v'))
+        self.assertEqual(kept, versions[-knowledge_cache.SNAPSHOT_KEEP_VERSIONS:])
+
+    def test_cold_start_builds_once_under_lock(self):
+        index = self._index((1, [1.0, 0.0]))
+        with mock.patch.object(knowledge_cache, '_fetch_index_from_db', return_value=index) as fetch:
+            version = knowledge_cache._build_snapshot_once()
+        self.assertEqual(fetch.call_count, 1)
+        self.assertEqual(knowledge_cache._read_snapshot_pointer(), version)
+        self.assertIsNone(cache.get(knowledge_cache.SNAPSHOT_BUILD_LOCK_KEY))
+
+    def test_cold_start_waits_for_other_builder(self):
+        cache.add(knowledge_cache.SNAPSHOT_BUILD_LOCK_KEY, 'other', 60)
+        with mock.patch.object(knowledge_cache, 'SNAPSHOT_BUILD_WAIT', 0.3), \
+                mock.patch.object(knowledge_cache, '_fetch_index_from_db') as fetch:
+            self.assertIsNone(knowledge_cache._build_snapshot_once())
+
+            version = knowledge_cache.write_index_snapshot(self._index((1, [1.0, 0.0])))
+            self.assertEqual(knowledge_cache._build_snapshot_once(), version)
+        fetch.assert_not_called()
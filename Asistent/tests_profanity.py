@@ -0,0 +1,31 @@
+"""
+Тесты скомпилированного словаря нецензурной лексики
+"""
+from django.test import TestCase
+
+
+class ProfanityMatcherTests(TestCase):
+    """Скомпилированный словарь: обходы фильтра ловятся, обычные слова — нет"""
+
+    def test_obfuscated_forms_are_detected(self):
+        from Asistent.profanity_checker import ProfanityChecker
+
+        checker = ProfanityChecker()
+        for text in ("ну ты и х*й", "п**да рулю", "б л я т ь", "с.у.к.а", "сука-то какая", "xyй", "ёбаный"):
+            has_profanity, found = checker.check_text(text)
+            self.assertTrue(has_profanity, text)
+            self.assertTrue(found, text)
+
+        for text in ("Сукин сын", "страховка мебели", "я и ты вместе"):
+            self.assertEqual(checker.check_text(text), (False, []), text)
+
+    def test_matcher_is_rebuilt_only_when_dictionary_changes(self):
+        from Asistent.profanity_checker import ProfanityChecker, get_matcher
+
+        words = ProfanityChecker.dictionary()
+        matcher = get_matcher(words)
+        self.assertIs(get_matcher(words), matcher)
+
+        extended = get_matcher(words + ["тестослово"])
+        self.assertNotEqual(extended.version, matcher.version)
+        self.assertTrue(extended.find("это тестослово"))
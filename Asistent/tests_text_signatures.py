@@ -0,0 +1,72 @@
+"""
+Тесты индекса MinHash/LSH для проверки уникальности текстов
+"""
+from django.test import TestCase
+
+
+class TextSignatureIndexTests(TestCase):
+    """LSH-индекс MinHash-сигнатур для проверки уникальности (Asistent/text_signatures.py)"""
+
+    WORDS = (
+        "луна солнце звезда небо море лес река гора поле город утро вечер ночь день ветер дождь снег "
+        "цветок дерево камень огонь вода путь дом окно дверь книга письмо песня танец сон мечта"
+    ).split()
+
+    def _text(self, seed: int, length: int = 300) -> str:
+        import random
+
+        rng = random.Random(seed)
+        return " ".join(rng.choice(self.WORDS) for _ in range(length))
+
+    def setUp(self):
+        from django.contrib.auth.models import User
+
+        from blog.models import Category, Post
+
+        author = User.objects.create_user(username="sig_author", password="x")
+        category = Category.objects.create(title="Сигнатуры", slug="signatures")
+        self.original_text = self._text(1)
+        self.original = Post.objects.create(
+            title="Оригинал", content=f"<p>{self.original_text}</p>", category=category,
+            author=author, status="published",
+        )
+        for seed in range(2, 40):
+            Post.objects.create(
+                title=f"Статья {seed}", content=self._text(seed), category=category,
+                author=author, status="published",
+            )
+        self.category, self.author = category, author
+
+    def test_signatures_are_updated_on_save(self):
+        from Asistent.models import PostTextBand, PostTextSignature
+        from Asistent.text_signatures import BANDS, unindexed_post_ids
+
+        self.assertEqual(PostTextSignature.objects.count(), 39)
+        self.assertEqual(unindexed_post_ids(), [])
+        bands = PostTextBand.objects.filter(post=self.original).count()
+        self.assertTrue(0 < bands <= BANDS)
+
+        signature = PostTextSignature.objects.get(post=self.original).signature
+        self.original.content = self._text(99)
+        self.original.save()
+        self.assertNotEqual(PostTextSignature.objects.get(post=self.original).signature, signature)
+
+    def test_near_duplicate_is_found_through_index(self):
+        from blog.models import Post
+        from Asistent.text_signatures import find_candidates
+        from Asistent.text_uniqueness_checker import TextUniquenessChecker
+
+        words = self.original_text.split()
+        words[::25] = ["правка"] * len(words[::25])  # ~4% слов изменено
+        copy = Post(title="Копия", content=" ".join(words), category=self.category, author=self.author)
+
+        candidates = find_candidates(" ".join(words))
+        self.assertIn(self.original.pk, candidates)
+        self.assertLess(len(candidates), 39)
+
+        is_unique, uniqueness, message = TextUniquenessChecker().check_uniqueness(copy)
+        self.assertFalse(is_unique)
+        self.assertIn(f"#{self.original.pk}", message)
+
+        fresh = Post(title="Новая", content=self._text(1000), category=self.category, author=self.author)
+        self.assertTrue(TextUniquenessChecker().check_uniqueness(fresh)[0])
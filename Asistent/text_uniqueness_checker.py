@@ -1,13 +1,17 @@
 """
 Проверка уникальности текста статей
 Проверяет на дубли в базе и (опционально) в интернете
+
+Дубли в базе ищутся по всему архиву через LSH-индекс MinHash-сигнатур
+(Asistent/text_signatures.py); точное сходство считается только для
+кандидатов из индекса.
 """
 import logging
 from typing import Tuple, Dict
-from django.utils.html import strip_tags
-import re
 from difflib import SequenceMatcher
 
+from .text_signatures import clean_text as clean_post_text, find_candidates, unindexed_post_ids
+
 logger = logging.getLogger(__name__)
 
 
@@ -61,16 +65,7 @@ class TextUniquenessChecker:
     
     def _clean_text(self, content: str) -> str:
         """Очищает текст от HTML и лишних символов"""
-        # Удаляем HTML теги
-        text = strip_tags(content)
-        
-        # Удаляем множественные пробелы
-        text = re.sub(r'\s+', ' ', text)
-        
-        # Удаляем специальные символы но оставляем знаки препинания
-        text = text.strip()
-        
-        return text
+        return clean_post_text(content)
     
     def _check_database_duplicates(self, post, clean_text: str) -> Tuple[float, str]:
         """
@@ -82,9 +77,11 @@ class TextUniquenessChecker:
         try:
             from blog.models import Post
             
-            # Получаем все опубликованные статьи кроме текущей
-            other_posts = Post.objects.exclude(pk=post.pk if post.pk else None)
-            other_posts = other_posts.filter(status='published')[:200]  # Последние 200
+            # Кандидаты из LSH-индекса по всему архиву + ещё не проиндексированные статьи
+            candidate_ids = find_candidates(clean_text, exclude_pk=post.pk)
+            candidate_ids += unindexed_post_ids(exclude_pk=post.pk)
+            other_posts = Post.objects.filter(pk__in=candidate_ids).only('id', 'title', 'content')
+            logger.info(f"   🧬 Кандидатов на сравнение: {len(candidate_ids)}")
             
             max_similarity = 0.0
             most_similar_post = None
@@ -183,13 +183,20 @@ class SearchPageView(ListView):
     def get_queryset(self):
         query = self.request.GET.get('query')
         if query:
-            # Искать только среди опубликованных статей
-            return Post.objects.filter(
+            from blog.search_index import is_index_ready, search_post_ids, SearchResults
+
+            queryset = Post.objects.filter(status='published').select_related('author', 'category').prefetch_related('tags')
+
+            # Полнотекстовый индекс (BM25): загружаются только статьи текущей страницы
+            if is_index_ready():
+                return SearchResults([post_id for post_id, _ in search_post_ids(query)], queryset)
+
+            # Индекс ещё не построен (rebuild_search_index) — прежний поиск
+            return queryset.filter(
                 Q(title__icontains=query) | 
                 Q(description__icontains=query) | 
-                Q(content__icontains=query),
-                status='published'
-            ).select_related('author', 'category').prefetch_related('tags').order_by('-created')
+                Q(content__icontains=query)
+            ).order_by('-created')
         return Post.objects.none()
         
     def get_context_data(self, **kwargs):
@@ -0,0 +1,353 @@
+"""
+Общий для процессов кеш на SQLite (WAL)
+
+LocMemCache живёт в памяти каждого процесса: у каждого воркера Passenger и
+у qcluster свой кеш, поэтому блокировки (cache.add), счётчики (cache.incr)
+и кеш страниц не видны соседним процессам. DatabaseCache на MySQL отключён
+из-за блокировок.
+
+SQLiteCache хранит данные в одном файле на диске хоста:
+- WAL: читатели не блокируют писателя и друг друга;
+- add / incr / decr атомарны между процессами (BEGIN IMMEDIATE);
+- истёкшие записи не отдаются и удаляются при очистке;
+- размер ограничен MAX_ENTRIES и MAX_BYTES (вытесняются ближайшие к истечению
+  и самые старые записи), проверка — раз в CULL_EVERY записей;
+- если база занята дольше BUSY_TIMEOUT (или недоступен диск), кеш деградирует:
+  чтение — промах, запись пропускается, в лог — предупреждение.
+
+Настройка:
+    CACHES = {
+        'default': {
+            'BACKEND': 'IdealImage_PDJ.cache_backends.SQLiteCache',
+            'LOCATION': '/path/to/cache/default.sqlite3',
+            'TIMEOUT': 3600,
+            'OPTIONS': {'MAX_ENTRIES': 20000, 'MAX_BYTES': 256 * 1024 * 1024},
+        },
+    }
+"""
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS cache_entries (
+        key TEXT PRIMARY KEY,
+        value BLOB NOT NULL,
+        expires REAL,
+        written REAL NOT NULL
+    ) WITHOUT ROWID
+    """,
+    "CREATE INDEX IF NOT EXISTS cache_entries_expires ON cache_entries (expires)",
+    "CREATE INDEX IF NOT EXISTS cache_entries_written ON cache_entries (written)",
+)
+
+# Запись жива: без срока (NULL) или срок ещё не наступил
+ALIVE = "(expires IS NULL OR expires > ?)"
+
+# Не чаще раза в N секунд на процесс пишем в лог о занятой базе
+BUSY_WARNING_INTERVAL = 60
+
+
+def degrade(fallback):
+    """
+    Ошибка SQLite (database is locked, диск) не доходит до cache_page и сессий:
+    метод возвращает fallback(*args, **kwargs) — промах для чтения, пропуск записи.
+    """
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, *args, **kwargs):
+            try:
+                return method(self, *args, **kwargs)
+            except sqlite3.OperationalError as e:
+                self._report_error(method.__name__, e)
+                return fallback(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class SQLiteCache(BaseCache):
+    """
+    Кеш Django в файле SQLite, общий для всех процессов одного хоста.
+
+    Соединение своё у каждого потока и пересоздаётся после fork
+    (Passenger запускает воркеры форком уже импортированного приложения).
+    """
+
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self.path = location
+        options = params.get('OPTIONS', {})
+        self._max_bytes = int(options.get('MAX_BYTES', 0)) or None
+        self._cull_every = max(1, int(options.get('CULL_EVERY', 100)))
+        self._busy_timeout = float(options.get('BUSY_TIMEOUT', 5.0))
+        self._local = threading.local()
+        self._schema_ready = False
+        self._schema_lock = threading.Lock()
+        self._writes = 0
+        self._warned_at = 0.0
+
+    def _report_error(self, operation: str, error: Exception):
+        now = time.monotonic()
+        if now - self._warned_at >= BUSY_WARNING_INTERVAL:
+            self._warned_at = now
+            logger.warning(f"Кеш {self.path}: {operation} пропущен ({error})")
+
+    # ------------------------------------------------------------------
+    # Соединение
+    # ------------------------------------------------------------------
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # isolation_level=None: транзакции открываются явно (BEGIN IMMEDIATE)
+        conn = sqlite3.connect(self.path, timeout=self._busy_timeout, isolation_level=None,
+                               check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        if not self._schema_ready:
+            with self._schema_lock:
+                if not self._schema_ready:
+                    for statement in SCHEMA:
+                        conn.execute(statement)
+                    self._schema_ready = True
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    @contextmanager
+    def _write(self):
+        """Транзакция с блокировкой записи: чтение-изменение-запись атомарны между процессами"""
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+            conn.execute("COMMIT")
+        except BaseException:
+            # COMMIT тоже может упереться в busy timeout — транзакция не должна остаться открытой
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+
+    def close(self, **kwargs):
+        # Соединения переиспользуются между запросами (как у LocMemCache — без закрытия)
+        pass
+
+    # ------------------------------------------------------------------
+    # Сериализация
+    # ------------------------------------------------------------------
+
+    def _dumps(self, value) -> bytes:
+        return pickle.dumps(value, self.pickle_protocol)
+
+    @staticmethod
+    def _loads(blob):
+        return pickle.loads(blob)
+
+    # ------------------------------------------------------------------
+    # API кеша
+    # ------------------------------------------------------------------
+
+    @degrade(lambda key, default=None, version=None: default)
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        row = self._connection().execute(
+            f"SELECT value FROM cache_entries WHERE key = ? AND {ALIVE}", (key, time.time())
+        ).fetchone()
+        return default if row is None else self._loads(row[0])
+
+    @degrade(lambda *args, **kwargs: {})
+    def get_many(self, keys, version=None):
+        key_map = {self.make_and_validate_key(key, version=version): key for key in keys}
+        if not key_map:
+            return {}
+        result = {}
+        items = list(key_map)
+        now = time.time()
+        conn = self._connection()
+        # Ограничение SQLite на число параметров
+        for start in range(0, len(items), 500):
+            chunk = items[start:start + 500]
+            placeholders = ', '.join('?' * len(chunk))
+            rows = conn.execute(
+                f"SELECT key, value FROM cache_entries WHERE key IN ({placeholders}) AND {ALIVE}",
+                (*chunk, now),
+            )
+            for key, value in rows:
+                result[key_map[key]] = self._loads(value)
+        return result
+
+    @degrade(lambda *args, **kwargs: False)
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        row = self._connection().execute(
+            f"SELECT 1 FROM cache_entries WHERE key = ? AND {ALIVE}", (key, time.time())
+        ).fetchone()
+        return row is not None
+
+    @degrade(lambda *args, **kwargs: None)
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        blob = self._dumps(value)
+        with self._write() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO cache_entries (key, value, expires, written) VALUES (?, ?, ?, ?)",
+                (key, blob, self.get_backend_timeout(timeout), time.time()),
+            )
+        self._after_write(1)
+
+    @degrade(lambda data, *args, **kwargs: list(data))
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        expires = self.get_backend_timeout(timeout)
+        now = time.time()
+        rows = [
+            (self.make_and_validate_key(key, version=version), self._dumps(value), expires, now)
+            for key, value in data.items()
+        ]
+        if not rows:
+            return []
+        with self._write() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO cache_entries (key, value, expires, written) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+        self._after_write(len(rows))
+        return []
+
+    @degrade(lambda *args, **kwargs: False)
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        """
+        Записывает значение, только если ключа нет (или он истёк). Атомарно между процессами.
+        При занятой базе — False (блокировка не взята).
+        """
+        key = self.make_and_validate_key(key, version=version)
+        blob = self._dumps(value)
+        now = time.time()
+        with self._write() as conn:
+            conn.execute(
+                "DELETE FROM cache_entries WHERE key = ? AND expires IS NOT NULL AND expires <= ?",
+                (key, now),
+            )
+            added = conn.execute(
+                "INSERT OR IGNORE INTO cache_entries (key, value, expires, written) VALUES (?, ?, ?, ?)",
+                (key, blob, self.get_backend_timeout(timeout), now),
+            ).rowcount == 1
+        if added:
+            self._after_write(1)
+        return added
+
+    @degrade(lambda *args, **kwargs: False)
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        now = time.time()
+        with self._write() as conn:
+            updated = conn.execute(
+                f"UPDATE cache_entries SET expires = ? WHERE key = ? AND {ALIVE}",
+                (self.get_backend_timeout(timeout), key, now),
+            ).rowcount
+        return updated == 1
+
+    @degrade(lambda key, delta=1, version=None: delta)
+    def incr(self, key, delta=1, version=None):
+        """
+        Атомарное увеличение (срок жизни записи сохраняется).
+        При занятой базе увеличение пропускается и возвращается delta.
+        """
+        key = self.make_and_validate_key(key, version=version)
+        with self._write() as conn:
+            row = conn.execute(
+                f"SELECT value FROM cache_entries WHERE key = ? AND {ALIVE}", (key, time.time())
+            ).fetchone()
+            if row is None:
+                raise ValueError("Key '%s' not found" % key)
+            new_value = self._loads(row[0]) + delta
+            conn.execute(
+                "UPDATE cache_entries SET value = ? WHERE key = ?", (self._dumps(new_value), key)
+            )
+        return new_value
+
+    @degrade(lambda *args, **kwargs: False)
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        with self._write() as conn:
+            deleted = conn.execute("DELETE FROM cache_entries WHERE key = ?", (key,)).rowcount
+        return deleted == 1
+
+    @degrade(lambda *args, **kwargs: None)
+    def delete_many(self, keys, version=None):
+        items = [self.make_and_validate_key(key, version=version) for key in keys]
+        if not items:
+            return
+        with self._write() as conn:
+            conn.executemany("DELETE FROM cache_entries WHERE key = ?", [(key,) for key in items])
+
+    @degrade(lambda *args, **kwargs: None)
+    def clear(self):
+        with self._write() as conn:
+            conn.execute("DELETE FROM cache_entries")
+
+    # ------------------------------------------------------------------
+    # Ограничение размера
+    # ------------------------------------------------------------------
+
+    def _after_write(self, count: int):
+        self._writes += count
+        if self._writes >= self._cull_every:
+            self._writes = 0
+            try:
+                self.cull()
+            except sqlite3.Error as e:
+                logger.warning(f"Ошибка очистки кеша {self.path}: {e}")
+
+    def cull(self) -> int:
+        """
+        Удаляет истёкшие записи; при превышении MAX_ENTRIES / MAX_BYTES —
+        долю 1/CULL_FREQUENCY записей (сначала ближайшие к истечению, затем самые старые).
+
+        Returns:
+            int: Количество удалённых записей
+        """
+        removed = 0
+        with self._write() as conn:
+            removed += conn.execute(
+                "DELETE FROM cache_entries WHERE expires IS NOT NULL AND expires <= ?", (time.time(),)
+            ).rowcount
+
+            count, size = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(value)), 0) FROM cache_entries"
+            ).fetchone()
+            over_limit = count > self._max_entries or (self._max_bytes and size > self._max_bytes)
+            if over_limit and count:
+                if self._cull_frequency == 0:
+                    removed += conn.execute("DELETE FROM cache_entries").rowcount
+                else:
+                    victims = max(count // self._cull_frequency, count - self._max_entries)
+                    removed += conn.execute(
+                        """
+                        DELETE FROM cache_entries WHERE key IN (
+                            SELECT key FROM cache_entries
+                            ORDER BY expires IS NULL, expires, written
+                            LIMIT ?
+                        )
+                        """,
+                        (victims,),
+                    ).rowcount
+        if removed:
+            logger.debug(f"🧹 Кеш {os.path.basename(self.path)}: удалено {removed} записей")
+        return removed
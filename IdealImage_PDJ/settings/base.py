@@ -34,6 +34,9 @@ DISABLE_AI = config('DISABLE_AI', default=False, cast=bool)
 # IndexNow / Bing IndexNow keys
 INDEXNOW_KEY = config('INDEXNOW_KEY', default='')
 BING_INDEXNOW_KEY = config('BING_INDEXNOW_KEY', default='')
+# Очередь индексации (Asistent.indexing_queue): повторная отправка URL не чаще раза в N секунд
+INDEXING_RESUBMIT_SECONDS = config('INDEXING_RESUBMIT_SECONDS', default=60 * 60 * 24, cast=int)
+INDEXING_YANDEX_PER_FLUSH = config('INDEXING_YANDEX_PER_FLUSH', default=100, cast=int)
 
 # Настройки астрологического контекста для гороскопов
 ASTRO_DEFAULT_CITY = config('ASTRO_DEFAULT_CITY', default='Москва')
@@ -41,6 +44,10 @@ ASTRO_DEFAULT_LATITUDE = config('ASTRO_DEFAULT_LATITUDE', default=55.7558, cast=
 ASTRO_DEFAULT_LONGITUDE = config('ASTRO_DEFAULT_LONGITUDE', default=37.6173, cast=float)
 ASTRO_DEFAULT_TIMEZONE = config('ASTRO_DEFAULT_TIMEZONE', default='Europe/Moscow')
 ASTRO_ASPECT_ORB_DEGREES = config('ASTRO_ASPECT_ORB_DEGREES', default=3.0, cast=float)
+ASTRO_HORIZONS_CROSSCHECK = config('ASTRO_HORIZONS_CROSSCHECK', default=False, cast=bool)
+ASTRO_HORIZONS_TOLERANCE_DEGREES = config('ASTRO_HORIZONS_TOLERANCE_DEGREES', default=0.5, cast=float)
+# Параллельная генерация гороскопов: число одновременно генерируемых знаков
+HOROSCOPE_MAX_WORKERS = config('HOROSCOPE_MAX_WORKERS', default=4, cast=int)
 
 # Application definition
 
@@ -86,12 +93,21 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'blog.middleware_canonical.CanonicalURLMiddleware',  # Обработка GET-параметров и canonical URLs
     'blog.middleware_404.Smart404Middleware',  # Умная обработка 404 ошибок
-    'blog.middleware_lazy_loading.LazyLoadingMiddleware',  # Автоматический lazy loading для изображений
+    'blog.view_counter.ViewCounterMiddleware',  # Просмотры статей (включая кэш страниц) с отложенной записью
+    'blog.html_rewriter.HtmlRewriteMiddleware',  # Пост-обработка HTML за один проход: lazy loading, canonical, рекламные слоты
     'IdealImage_PDJ.middleware.MediaMimeTypeMiddleware',  # Правильный Content-Type для WebP и медиа
 ]
 
 ROOT_URLCONF = 'IdealImage_PDJ.urls'
 
+# Процессоры HtmlRewriteMiddleware (выполняются за один проход по HTML)
+HTML_POSTPROCESSORS = [
+    'blog.html_rewriter.LazyImageProcessor',
+    'blog.html_rewriter.CanonicalLinkProcessor',
+    'blog.html_rewriter.AdSlotProcessor',
+]
+HTML_REWRITE_CACHE_BYTES = config('HTML_REWRITE_CACHE_BYTES', default=32 * 1024 * 1024, cast=int)
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -142,25 +158,61 @@ DATABASES = {
 # Кэширование: LocMemCache (оптимизированный для production без Redis)
 # LocMemCache работает в памяти процесса
 # ВАЖНО: Для production с несколькими воркерами лучше использовать DatabaseCache
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-        'LOCATION': 'unique-snowflake',
-        'TIMEOUT': 3600,  # 1 час (уменьшено для более частого обновления)
-        'OPTIONS': {
-            'MAX_ENTRIES': 20000,  # Увеличено для большего кэша
+# Общий кеш для всех воркеров Passenger и qcluster (файл SQLite в режиме WAL):
+# блокировки cache.add, счётчики cache.incr и кеш страниц видны всем процессам хоста.
+# SHARED_CACHE_ENABLED=False — прежний LocMemCache в памяти каждого процесса.
+SHARED_CACHE_ENABLED = config('SHARED_CACHE_ENABLED', default=True, cast=bool)
+SHARED_CACHE_DIR = config('SHARED_CACHE_DIR', default=os.path.join(BASE_DIR, 'cache'))
+# Очередь показов/кликов рекламы (обрабатывается задачей advertising.event_spool.drain_events)
+AD_EVENTS_SPOOL_DIR = config('AD_EVENTS_SPOOL_DIR', default=os.path.join(SHARED_CACHE_DIR, 'ad_events'))
+# Очередь просмотров статей (обрабатывается задачей blog.view_counter.flush_views)
+POST_VIEWS_SPOOL_DIR = config('POST_VIEWS_SPOOL_DIR', default=os.path.join(SHARED_CACHE_DIR, 'post_views'))
+POST_VIEWS_SPILL_SECONDS = config('POST_VIEWS_SPILL_SECONDS', default=5, cast=int)
+# Собранные sitemap (индекс + шарды, задача blog.tasks.build_sitemaps)
+SITEMAP_DIR = config('SITEMAP_DIR', default=os.path.join(SHARED_CACHE_DIR, 'sitemaps'))
+SITEMAP_GZIP = config('SITEMAP_GZIP', default=False, cast=bool)
+
+if SHARED_CACHE_ENABLED:
+    CACHES = {
+        'default': {
+            'BACKEND': 'IdealImage_PDJ.cache_backends.SQLiteCache',
+            'LOCATION': os.path.join(SHARED_CACHE_DIR, 'default.sqlite3'),
+            'TIMEOUT': 3600,  # 1 час
+            'OPTIONS': {
+                'MAX_ENTRIES': 20000,
+                'MAX_BYTES': config('SHARED_CACHE_MAX_BYTES', default=256 * 1024 * 1024, cast=int),
+            }
+        },
+        # Дополнительный кэш для страниц (более долгий TTL)
+        'pages': {
+            'BACKEND': 'IdealImage_PDJ.cache_backends.SQLiteCache',
+            'LOCATION': os.path.join(SHARED_CACHE_DIR, 'pages.sqlite3'),
+            'TIMEOUT': 1800,  # 30 минут для страниц
+            'OPTIONS': {
+                'MAX_ENTRIES': 5000,
+                'MAX_BYTES': config('SHARED_CACHE_PAGES_MAX_BYTES', default=256 * 1024 * 1024, cast=int),
+            }
         }
-    },
-    # Дополнительный кэш для страниц (более долгий TTL)
-    'pages': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-        'LOCATION': 'pages-cache',
-        'TIMEOUT': 1800,  # 30 минут для страниц
-        'OPTIONS': {
-            'MAX_ENTRIES': 5000,
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'unique-snowflake',
+            'TIMEOUT': 3600,  # 1 час (уменьшено для более частого обновления)
+            'OPTIONS': {
+                'MAX_ENTRIES': 20000,  # Увеличено для большего кэша
+            }
+        },
+        'pages': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'pages-cache',
+            'TIMEOUT': 1800,
+            'OPTIONS': {
+                'MAX_ENTRIES': 5000,
+            }
         }
     }
-}
 
 # Старый DatabaseCache (отключен из-за проблем с блокировками MySQL)
 # CACHES = {
@@ -631,6 +683,23 @@ INTEGRATION_ALERT_COOLDOWN_MINUTES = config('INTEGRATION_ALERT_COOLDOWN_MINUTES'
 GIGACHAT_API_KEY = config('GIGACHAT_API_KEY', default='')
 GIGACHAT_MODEL = config('GIGACHAT_MODEL', default='GigaChat-Max')
 
+# Отдельный клиент GigaChat-Embeddings: одновременные запросы и объединение
+# одиночных вызовов в пакет (окно в секундах)
+GIGACHAT_EMBEDDINGS_POOL_SIZE = config('GIGACHAT_EMBEDDINGS_POOL_SIZE', default=4, cast=int)
+GIGACHAT_EMBEDDINGS_MAX_BATCH = config('GIGACHAT_EMBEDDINGS_MAX_BATCH', default=32, cast=int)
+GIGACHAT_EMBEDDINGS_BATCH_WINDOW = config('GIGACHAT_EMBEDDINGS_BATCH_WINDOW', default=0.02, cast=float)
+
+# Постоянный кеш embeddings по sha256 текста: float32 или float16 (вдвое компактнее)
+EMBEDDING_CACHE_DTYPE = config('EMBEDDING_CACHE_DTYPE', default='float32')
+EMBEDDING_CACHE_MAX_ENTRIES = config('EMBEDDING_CACHE_MAX_ENTRIES', default=100000, cast=int)
+
+# Векторный индекс базы знаний: 'mmap' (общие файлы в AI_KNOWLEDGE_INDEX_DIR),
+# 'memory' (копия в каждом процессе) или 'django' (через CACHES['default']).
+# Пусто — 'django' при AI_USE_DJANGO_CACHE=True, иначе 'mmap'
+AI_KNOWLEDGE_INDEX_MODE = config('AI_KNOWLEDGE_INDEX_MODE', default='')
+# Не внутри MEDIA_ROOT: матрица embeddings и meta.json не должны раздаваться веб-сервером
+AI_KNOWLEDGE_INDEX_DIR = config('AI_KNOWLEDGE_INDEX_DIR', default=os.path.join(SHARED_CACHE_DIR, 'knowledge_index'))
+
 # Unsplash API для поиска бесплатных изображений
 UNSPLASH_ACCESS_KEY = config('UNSPLASH_ACCESS_KEY', default='')
 
@@ -0,0 +1,100 @@
+"""
+Тесты общего кеша на SQLite (IdealImage_PDJ.cache_backends)
+"""
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from IdealImage_PDJ.cache_backends import SQLiteCache
+
+
+class SQLiteCacheTests(SimpleTestCase):
+    """SQLiteCache: атомарность между соединениями, срок жизни, вытеснение, занятая база"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.path = os.path.join(self.directory, 'cache.sqlite3')
+
+    def make_cache(self, **options):
+        return SQLiteCache(self.path, {'TIMEOUT': 300, 'OPTIONS': options})
+
+    def _in_threads(self, target, count=8):
+        threads = [threading.Thread(target=target) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(10)
+
+    def test_add_and_incr_are_atomic_across_connections(self):
+        caches = [self.make_cache(), self.make_cache()]
+        caches[0].set('counter', 0)
+        added = []
+
+        def worker():
+            # Каждый поток — своё соединение, два экземпляра — как два процесса
+            for index in range(25):
+                caches[index % 2].incr('counter')
+            added.append(caches[0].add('lock', os.getpid(), 60))
+
+        self._in_threads(worker)
+
+        self.assertEqual(caches[1].get('counter'), 8 * 25)
+        self.assertEqual(added.count(True), 1)
+        with self.assertRaises(ValueError):
+            caches[0].incr('missing')
+
+    def test_expired_entries_are_not_returned_and_can_be_re_added(self):
+        cache = self.make_cache()
+        cache.set('short', 'value', 0.05)
+        cache.set('forever', 'value', None)
+        self.assertEqual(cache.get('short'), 'value')
+
+        time.sleep(0.1)
+        self.assertIsNone(cache.get('short'))
+        self.assertFalse(cache.has_key('short'))
+        self.assertTrue(cache.add('short', 'again', 60))
+        self.assertEqual(cache.get_many(['short', 'forever']), {'short': 'again', 'forever': 'value'})
+
+    def test_cull_keeps_size_under_max_bytes(self):
+        cache = self.make_cache(MAX_BYTES=10000, CULL_EVERY=1, MAX_ENTRIES=1000)
+        for index in range(40):
+            cache.set(f'key-{index}', os.urandom(1000))
+
+        size = sqlite3.connect(self.path).execute(
+            "SELECT COALESCE(SUM(LENGTH(value)), 0) FROM cache_entries"
+        ).fetchone()[0]
+        self.assertLess(size, 10000 + 2000)
+        self.assertIsNone(cache.get('key-0'))
+        self.assertIsNotNone(cache.get('key-39'))
+
+    def test_locked_database_degrades_instead_of_raising(self):
+        cache = self.make_cache(BUSY_TIMEOUT=0.05)
+        cache.set('key', 'value')
+
+        holder = sqlite3.connect(self.path, timeout=0, isolation_level=None)
+        holder.execute("BEGIN IMMEDIATE")
+        try:
+            cache.set('key', 'other')
+            self.assertFalse(cache.add('new', 1))
+            self.assertEqual(cache.incr('key_missing_or_not', 1), 1)
+            self.assertFalse(cache.delete('key'))
+            # WAL: читатели не ждут писателя
+            self.assertEqual(cache.get('key'), 'value')
+        finally:
+            holder.execute("ROLLBACK")
+            holder.close()
+
+        # Транзакция соединения кеша не осталась открытой
+        cache.set('key', 'after')
+        self.assertEqual(cache.get('key'), 'after')
+
+        with mock.patch.object(cache, '_connection', side_effect=sqlite3.OperationalError('database is locked')):
+            self.assertEqual(cache.get('key', 'default'), 'default')
+            self.assertEqual(cache.get_many(['key']), {})
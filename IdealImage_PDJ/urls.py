@@ -3,7 +3,7 @@ from django.conf import settings
 from django.conf.urls.static import static
 from django.http import HttpResponse
 from django.urls import path, include, re_path
-from blog.views_sitemap import image_sitemap
+from blog.views_sitemap import sitemap_file
 from blog.sitemaps import CategorySitemap, PostSitemap, TagSitemap, AuthorSitemap, ImageSitemap
 from django.views.static import serve
 from django.views.generic import RedirectView
@@ -19,7 +19,9 @@ sitemaps = {
 urlpatterns = [
     path('ckeditor/', include('ckeditor_uploader.urls')),
     path('admin/', admin.site.urls),
-    path('sitemap.xml', image_sitemap, {'sitemaps': sitemaps}, name='sitemap'),
+    # Индекс и шарды собирает blog.sitemap_builder (до первой сборки — карта в процессе)
+    path('sitemap.xml', sitemap_file, {'name': 'sitemap.xml', 'sitemaps': sitemaps}, name='sitemap'),
+    re_path(r'^sitemaps/(?P<name>sitemap-[a-z]+-\d{4}\.xml(?:\.gz)?)$', sitemap_file, name='sitemap_shard'),
     path(
         '283ceba4f0c54817a342d7c177dedd19.txt',
         lambda request: HttpResponse("283ceba4f0c54817a342d7c177dedd19", content_type="text/plain"),
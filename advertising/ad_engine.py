@@ -0,0 +1,242 @@
+"""
+Движок выбора баннеров
+
+Раньше тег show_ad на каждый промах кеша делал запросы AdPlace, баннеров и
+расписаний (AdSchedule.can_show ещё и писал в БД), а кешировал на 5 минут
+HTML уже выбранного баннера — ротация по весам фактически выбирала одного
+победителя на 5 минут на процесс.
+
+Здесь:
+- снимок всех активных мест, баннеров и расписаний строится в памяти процесса
+  (3 запроса) и перестраивается по общей версии в Django cache (сигналы) или
+  раз в SNAPSHOT_MAX_AGE секунд (дневные лимиты показов);
+- для места вычисляется набор допустимых сейчас баннеров (даты кампании,
+  день недели и время расписания, дневной лимит) вместе с моментом, до которого
+  набор не изменится, и таблица Уолкера (alias method) для выбора по весу;
+- выбор на каждый запрос — O(1) без запросов к БД;
+- кешируется только HTML каждого баннера (в снимке).
+"""
+import logging
+import random
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from django.utils import timezone
+
+from utilits.versioned_snapshot import VersionedSnapshot as BaseVersionedSnapshot, bump_version
+
+logger = logging.getLogger(__name__)
+
+AD_ENGINE_VERSION_KEY = 'ad_engine_version'
+SNAPSHOT_MAX_AGE = 60  # лимиты показов за день обновляются в БД сигналами
+
+_rng = random.Random()
+
+
+class AliasTable:
+    """
+    Выбор индекса с вероятностью, пропорциональной весу, за O(1)
+    (метод Уолкера, вариант Vose).
+    """
+
+    __slots__ = ('_prob', '_alias', '_size')
+
+    def __init__(self, weights: List[float]):
+        size = len(weights)
+        total = float(sum(weights))
+        if not size or total <= 0:
+            raise ValueError("Нужен хотя бы один положительный вес")
+
+        scaled = [weight * size / total for weight in weights]
+        prob = [1.0] * size
+        alias = list(range(size))
+        small = [i for i, value in enumerate(scaled) if value < 1.0]
+        large = [i for i, value in enumerate(scaled) if value >= 1.0]
+        while small and large:
+            less, more = small.pop(), large.pop()
+            prob[less] = scaled[less]
+            alias[less] = more
+            scaled[more] -= 1.0 - scaled[less]
+            (small if scaled[more] < 1.0 else large).append(more)
+        # Остатки (из-за погрешности округления) — вероятность 1
+
+        self._prob = prob
+        self._alias = alias
+        self._size = size
+
+    def sample(self, rng=_rng) -> int:
+        point = rng.random() * self._size
+        index = int(point)
+        return index if point - index < self._prob[index] else self._alias[index]
+
+    def __len__(self):
+        return self._size
+
+
+class _Window:
+    """Окно расписания баннера (скопированные поля AdSchedule)"""
+
+    __slots__ = ('day_of_week', 'start_time', 'end_time', 'exhausted_on')
+
+    def __init__(self, schedule):
+        self.day_of_week = schedule.day_of_week
+        self.start_time = schedule.start_time
+        self.end_time = schedule.end_time
+        # Дата, на которую дневной лимит уже выбран (как в AdSchedule.can_show)
+        limit = schedule.max_impressions_per_day
+        self.exhausted_on = (
+            schedule.last_reset_date
+            if limit is not None and schedule.last_reset_date is not None
+            and schedule.current_impressions >= limit
+            else None
+        )
+
+    def allows(self, now: datetime) -> bool:
+        if self.day_of_week is not None and self.day_of_week != now.weekday():
+            return False
+        if not (self.start_time <= now.time() <= self.end_time):
+            return False
+        return self.exhausted_on != now.date()
+
+
+class PlaceRotation:
+    """Баннеры одного места и текущая таблица выбора"""
+
+    def __init__(self, place, banners: list, windows: Dict[int, List[_Window]]):
+        self.place = place
+        self.banners = banners
+        self.windows = windows
+        self._html: Dict[int, str] = {}
+        self._state: Tuple[Optional[datetime], list, Optional[AliasTable]] = (None, [], None)
+
+    def _eligible(self, now: datetime) -> list:
+        today = now.date()
+        eligible = []
+        for banner in self.banners:
+            campaign = banner.campaign
+            if not (campaign.start_date <= today <= campaign.end_date):
+                continue
+            windows = self.windows.get(banner.id)
+            if banner.unlimited_impressions or not windows:
+                eligible.append(banner)
+            elif any(window.allows(now) for window in windows):
+                eligible.append(banner)
+        return eligible
+
+    def _next_change(self, now: datetime) -> datetime:
+        """Ближайший момент, когда набор допустимых баннеров может измениться"""
+        midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time(), now.tzinfo)
+        candidates = [midnight]
+        for windows in self.windows.values():
+            for window in windows:
+                start = datetime.combine(now.date(), window.start_time, now.tzinfo)
+                # Конец окна включительно — набор меняется сразу после end_time
+                end = datetime.combine(now.date(), window.end_time, now.tzinfo) + timedelta(microseconds=1)
+                candidates.extend(moment for moment in (start, end) if moment > now)
+        return min(candidates)
+
+    def choose(self, now: datetime):
+        """Баннер, выбранный по весу среди допустимых сейчас, или None"""
+        valid_until, eligible, table = self._state
+        if valid_until is None or now >= valid_until:
+            eligible = self._eligible(now)
+            table = AliasTable([banner.weight for banner in eligible]) if eligible else None
+            self._state = (self._next_change(now), eligible, table)
+        if table is None:
+            return None
+        return eligible[table.sample()]
+
+    def render(self, banner) -> str:
+        html = self._html.get(banner.id)
+        if html is None:
+            from .templatetags.ad_tags import render_banner_html
+            html = render_banner_html(banner, self.place)
+            self._html[banner.id] = html
+        return html
+
+
+def build_snapshot() -> Dict[str, PlaceRotation]:
+    """Снимок ротации всех активных мест (3 запроса)"""
+    from .models import AdBanner, AdPlace, AdSchedule
+
+    places = {place.id: place for place in AdPlace.objects.filter(is_active=True)}
+    banners_by_place: Dict[int, list] = {place_id: [] for place_id in places}
+    banners = AdBanner.objects.filter(
+        place_id__in=list(places),
+        is_active=True,
+        campaign__is_active=True,
+    ).select_related('campaign')
+    for banner in banners:
+        banner.place = places[banner.place_id]
+        banners_by_place[banner.place_id].append(banner)
+
+    windows: Dict[int, List[_Window]] = {}
+    banner_place = {banner.id: banner.place_id for items in banners_by_place.values() for banner in items}
+    for schedule in AdSchedule.objects.filter(is_active=True, banner_id__in=list(banner_place)):
+        windows.setdefault(schedule.banner_id, []).append(_Window(schedule))
+
+    snapshot = {}
+    for place_id, place in places.items():
+        place_banners = banners_by_place[place_id]
+        snapshot[place.code] = PlaceRotation(
+            place,
+            place_banners,
+            {banner.id: windows[banner.id] for banner in place_banners if banner.id in windows},
+        )
+    logger.debug(f"📢 Снимок рекламы: {len(snapshot)} мест, {len(banner_place)} баннеров")
+    return snapshot
+
+
+# Все снимки процесса: invalidate_ad_engine сбрасывает их сразу, не дожидаясь проверки версии
+_snapshots: list = []
+
+
+class VersionedSnapshot(BaseVersionedSnapshot):
+    """
+    Снимок рекламы в памяти процесса, привязанный к AD_ENGINE_VERSION_KEY
+    и перестраиваемый не реже раза в max_age секунд. Подклассы задают build().
+    """
+
+    version_key = AD_ENGINE_VERSION_KEY
+
+    def __init__(self, max_age: float = SNAPSHOT_MAX_AGE):
+        super().__init__(max_age=max_age)
+        _snapshots.append(self)
+
+
+class AdDecisionEngine(VersionedSnapshot):
+    """Снимок ротации баннеров"""
+
+    def build(self) -> Dict[str, PlaceRotation]:
+        return build_snapshot()
+
+    def select(self, place_code: str, now: Optional[datetime] = None):
+        """
+        Выбрать баннер для места.
+
+        Returns:
+            Tuple[AdBanner, PlaceRotation] или None, если показывать нечего
+        """
+        rotation = self.snapshot().get(place_code)
+        if rotation is None:
+            return None
+        banner = rotation.choose(now or timezone.now())
+        return None if banner is None else (banner, rotation)
+
+    def render(self, place_code: str, now: Optional[datetime] = None) -> str:
+        """HTML выбранного баннера или пустая строка"""
+        selected = self.select(place_code, now)
+        if selected is None:
+            return ''
+        banner, rotation = selected
+        return rotation.render(banner)
+
+
+ad_engine = AdDecisionEngine()
+
+
+def invalidate_ad_engine():
+    """Перестроить снимки рекламы во всех процессах (через общую версию)"""
+    bump_version(AD_ENGINE_VERSION_KEY)
+    for snapshot in _snapshots:
+        snapshot.reset()
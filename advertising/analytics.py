@@ -0,0 +1,146 @@
+"""
+Запросы к почасовым агрегатам рекламы (AdPerformanceML)
+
+Агрегаты ведёт event_spool при обработке очереди показов и кликов.
+Все функции фильтруют по индексированной дате, поэтому время ответа зависит
+от длины периода, а не от объёма сырых AdImpression / AdClick.
+
+Доход в агрегатах хранится без округления (CPM показа дробнее копейки);
+функции отсюда округляют его до копеек только в готовом результате.
+"""
+from datetime import timedelta
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Dict, Iterator, List, Optional
+
+from django.db.models import Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+ZERO = Decimal('0.00')
+KOPECK = Decimal('0.01')
+
+
+def _money(value) -> Decimal:
+    return (value or ZERO).quantize(KOPECK, rounding=ROUND_HALF_UP)
+
+
+def _ctr(impressions: int, clicks: int) -> float:
+    return (clicks / impressions * 100) if impressions else 0
+
+
+def period_queryset(date_from, date_to=None):
+    """Строки агрегатов за период [date_from, date_to]"""
+    from .models import AdPerformanceML
+
+    queryset = AdPerformanceML.objects.filter(date__gte=date_from)
+    if date_to is not None:
+        queryset = queryset.filter(date__lte=date_to)
+    return queryset
+
+
+def period_totals(date_from, date_to=None) -> dict:
+    """Показы, клики, CTR и доход за период"""
+    totals = period_queryset(date_from, date_to).aggregate(
+        impressions=Coalesce(Sum('impressions'), 0),
+        clicks=Coalesce(Sum('clicks'), 0),
+        revenue=Sum('revenue'),
+    )
+    totals['revenue'] = _money(totals['revenue'])
+    totals['ctr'] = _ctr(totals['impressions'], totals['clicks'])
+    return totals
+
+
+def top_places(date_from, limit: int = 5) -> list:
+    """Места с наибольшим числом кликов (объекты AdPlace с total_impressions / total_clicks)"""
+    from .models import AdPlace
+
+    rows = list(
+        period_queryset(date_from)
+        .filter(ad_place__isnull=False)
+        .values('ad_place')
+        .annotate(total_impressions=Sum('impressions'), total_clicks=Sum('clicks'))
+        .order_by('-total_clicks')[:limit]
+    )
+    places = AdPlace.objects.in_bulk([row['ad_place'] for row in rows])
+    result = []
+    for row in rows:
+        place = places.get(row['ad_place'])
+        if place is not None:
+            place.total_impressions = row['total_impressions']
+            place.total_clicks = row['total_clicks']
+            result.append(place)
+    return result
+
+
+def revenue_by_day(days: int, today=None) -> List[dict]:
+    """Доход по дням за последние N дней (для графика), включая дни без событий"""
+    today = today or timezone.now().date()
+    first_day = today - timedelta(days=days - 1)
+    daily = dict(
+        period_queryset(first_day).values('date').annotate(total=Sum('revenue')).values_list('date', 'total')
+    )
+    return [
+        {'date': day.strftime('%d.%m'), 'revenue': float(_money(daily.get(day)))}
+        for day in (first_day + timedelta(days=offset) for offset in range(days))
+    ]
+
+
+def totals_by_advertiser(date_from, advertiser_ids: Optional[List[int]] = None) -> Dict[int, dict]:
+    """
+    Показы и клики по рекламодателям (баннеры и контекстная реклама).
+
+    Returns:
+        Dict[int, dict]: {advertiser_id: {'impressions', 'clicks', 'revenue', 'ctr'}}
+    """
+    queryset = period_queryset(date_from)
+    result: Dict[int, dict] = {}
+    for path in ('banner__campaign__advertiser', 'context_ad__campaign__advertiser'):
+        rows = queryset.filter(**{f'{path}__isnull': False})
+        if advertiser_ids is not None:
+            rows = rows.filter(**{f'{path}__in': advertiser_ids})
+        grouped = rows.values(path).annotate(
+            impressions=Sum('impressions'), clicks=Sum('clicks'), revenue=Sum('revenue')
+        )
+        for row in grouped:
+            totals = result.setdefault(row[path], {'impressions': 0, 'clicks': 0, 'revenue': ZERO})
+            totals['impressions'] += row['impressions'] or 0
+            totals['clicks'] += row['clicks'] or 0
+            totals['revenue'] += row['revenue'] or ZERO
+    for totals in result.values():
+        totals['revenue'] = _money(totals['revenue'])
+        totals['ctr'] = _ctr(totals['impressions'], totals['clicks'])
+    return result
+
+
+# Группировка CSV: поля подписи (первое непустое) и подпись по умолчанию
+EXPORT_GROUPS = {
+    'day': ((), ''),
+    'place': (('ad_place__code',), 'Контекстная реклама'),
+    'banner': (('banner__name', 'context_ad__anchor_text'), ''),
+}
+
+
+def export_rows(date_from, date_to=None, group: str = 'day') -> Iterator[list]:
+    """
+    Строки для CSV: дата, [место / объявление], показы, клики, CTR, доход.
+    Читаются потоково (iterator), в памяти не накапливаются.
+    """
+    fields, default_label = EXPORT_GROUPS.get(group, EXPORT_GROUPS['day'])
+    rows = (
+        period_queryset(date_from, date_to)
+        .values('date', *fields)
+        .annotate(impressions=Sum('impressions'), clicks=Sum('clicks'), revenue=Sum('revenue'))
+        .order_by('date', *fields)
+    )
+    for row in rows.iterator(chunk_size=2000):
+        impressions = row['impressions'] or 0
+        clicks = row['clicks'] or 0
+        label = [next((row[field] for field in fields if row[field]), default_label)] if fields else []
+        yield [
+            row['date'].isoformat(),
+            *label,
+            impressions,
+            clicks,
+            f"{_ctr(impressions, clicks):.2f}",
+            f"{_money(row['revenue'])}",
+        ]
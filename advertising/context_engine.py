@@ -0,0 +1,225 @@
+"""
+Вставка контекстной рекламы в текст статей
+
+Раньше фильтр process_content_with_ads брал 10 объявлений и для каждого
+переводил в нижний регистр весь (растущий) текст статьи, а вставлял ссылку
+через str.replace — в том числе внутрь атрибутов тегов и существующих ссылок.
+
+Здесь:
+- фразы всех активных объявлений компилируются в одно регулярное выражение
+  по префиксному дереву (trie): совпадение ищется за один проход по тексту
+  без перебора объявлений, число объявлений не ограничено;
+- просматриваются только текстовые узлы HTML вне ссылок, заголовков, кода,
+  скриптов и стилей;
+- план вставки (позиции и объявления) кешируется по (статья, хеш текста,
+  версия набора объявлений) — закешированная статья не сканируется повторно;
+- снимок объявлений живёт в памяти процесса и перестраивается по общей
+  версии рекламы (см. ad_engine.VersionedSnapshot).
+"""
+import hashlib
+import logging
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.core.cache import cache
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.html import escape
+
+from .ad_engine import VersionedSnapshot
+
+logger = logging.getLogger(__name__)
+
+PLAN_CACHE_PREFIX = 'context_ad_plan'
+PLAN_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Внутри этих тегов ссылки не вставляются
+SKIP_TAGS = frozenset({
+    'a', 'button', 'code', 'pre', 'script', 'style', 'textarea', 'select', 'option', 'title',
+    'h1', 'h2', 'h3', 'h4', 'h5', 'h6',
+})
+
+_MARKUP_RE = re.compile(r'<!--.*?-->|<[^>]*>', re.S)
+_TAG_RE = re.compile(r'<\s*(/?)\s*([a-zA-Z][a-zA-Z0-9]*)')
+
+# План: ((начало, конец, id объявления), ...) по возрастанию позиции
+Plan = Tuple[Tuple[int, int, int], ...]
+
+
+def normalize_phrase(phrase: str) -> str:
+    """Ключ фразы: нижний регистр, пробелы схлопнуты"""
+    return ' '.join(phrase.lower().split())
+
+
+def compile_phrases(phrases: Iterable[str]) -> Optional[re.Pattern]:
+    """
+    Одно регулярное выражение по префиксному дереву фраз.
+
+    Общие префиксы разбираются один раз, из вложенных фраз выбирается самая
+    длинная; совпадение — только по границам слов, без учёта регистра,
+    пробел во фразе соответствует любому пробельному промежутку.
+    """
+    trie: dict = {}
+    for phrase in phrases:
+        if not phrase:
+            continue
+        node = trie
+        for char in phrase:
+            node = node.setdefault(char, {})
+        node[''] = {}
+    if not trie:
+        return None
+
+    def emit(node: dict) -> str:
+        branches = [
+            (r'\s+' if char == ' ' else re.escape(char)) + emit(child)
+            for char, child in sorted(node.items()) if char
+        ]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        # Конец более короткой фразы: продолжение необязательно (жадно — сначала длинная)
+        return f'(?:{body})?' if '' in node else body
+
+    return re.compile(r'(?<!\w)' + emit(trie) + r'(?!\w)', re.IGNORECASE)
+
+
+def text_segments(content: str):
+    """Границы текстовых узлов (start, end) вне SKIP_TAGS, комментариев и самих тегов"""
+    skip_depth = 0
+    position = 0
+    for markup in _MARKUP_RE.finditer(content):
+        if not skip_depth and markup.start() > position:
+            yield position, markup.start()
+        position = markup.end()
+        tag = _TAG_RE.match(markup.group())
+        if tag is None or tag.group(2).lower() not in SKIP_TAGS:
+            continue
+        if tag.group(1):
+            skip_depth = max(0, skip_depth - 1)
+        elif not markup.group().endswith('/>'):
+            skip_depth += 1
+    if not skip_depth and position < len(content):
+        yield position, len(content)
+
+
+class _ContextAd:
+    """Поля объявления, нужные для вставки"""
+
+    __slots__ = ('id', 'key', 'anchor_text', 'max_insertions', 'click_url')
+
+    def __init__(self, ad):
+        self.id = ad.id
+        self.key = normalize_phrase(ad.keyword_phrase)
+        self.anchor_text = ad.anchor_text
+        self.max_insertions = max(1, ad.max_insertions_per_article or 1)
+        self.click_url = reverse('advertising:context_click', args=[ad.id])
+
+    def link(self) -> str:
+        return (
+            f'<a href="{self.click_url}" class="ad-context-link" data-ad-click="{self.id}" '
+            f'data-ad-type="context" data-ad-context="{self.id}" target="_blank">{escape(self.anchor_text)}</a>'
+        )
+
+
+class ContextAdSnapshot:
+    """Активные объявления (по убыванию приоритета) и скомпилированный поиск фраз"""
+
+    def __init__(self, ads: List[_ContextAd]):
+        self.ads = ads
+        self.by_id: Dict[int, _ContextAd] = {ad.id: ad for ad in ads}
+        self.pattern = compile_phrases({ad.key for ad in ads})
+        signature = '|'.join(f'{ad.id}:{ad.key}:{ad.max_insertions}' for ad in ads)
+        # Версия набора: меняется только при изменении того, что влияет на план
+        self.version = hashlib.md5(signature.encode('utf-8')).hexdigest()[:12]
+
+    def plan(self, content: str, max_ads: int) -> Plan:
+        """Один проход по текстовым узлам, затем распределение вхождений по приоритету"""
+        if self.pattern is None or max_ads <= 0:
+            return ()
+        occurrences: Dict[str, List[Tuple[int, int]]] = {}
+        for start, end in text_segments(content):
+            for match in self.pattern.finditer(content, start, end):
+                occurrences.setdefault(normalize_phrase(match.group()), []).append(match.span())
+
+        plan = []
+        used: Dict[str, int] = {}
+        for ad in self.ads:
+            spans = occurrences.get(ad.key)
+            if not spans:
+                continue
+            taken = used.get(ad.key, 0)
+            count = min(ad.max_insertions, len(spans) - taken, max_ads - len(plan))
+            if count <= 0:
+                continue
+            plan.extend((start, end, ad.id) for start, end in spans[taken:taken + count])
+            used[ad.key] = taken + count
+            if len(plan) >= max_ads:
+                break
+        return tuple(sorted(plan))
+
+    def apply(self, content: str, plan: Plan) -> str:
+        parts = []
+        position = 0
+        for start, end, ad_id in plan:
+            ad = self.by_id.get(ad_id)
+            if ad is None:
+                continue
+            parts.append(content[position:start])
+            parts.append(ad.link())
+            position = end
+        parts.append(content[position:])
+        return ''.join(parts)
+
+
+def build_context_snapshot() -> ContextAdSnapshot:
+    """Снимок активных объявлений (1 запрос)"""
+    from django.db.models import Q
+
+    from .models import ContextAd
+
+    today = timezone.now().date()  # как в AdCampaign.is_active_now
+    queryset = ContextAd.objects.filter(
+        # Срок действия — только у временных вставок (как в ContextAd.is_active_now)
+        Q(insertion_type='permanent') | Q(expire_date__isnull=True) | Q(expire_date__gte=today),
+        is_active=True,
+        campaign__is_active=True,
+        campaign__start_date__lte=today,
+        campaign__end_date__gte=today,
+    ).order_by('-priority', '-created_at', 'id')
+    ads = [_ContextAd(ad) for ad in queryset if ad.keyword_phrase.strip()]
+    logger.debug(f"📢 Снимок контекстной рекламы: {len(ads)} объявлений")
+    return ContextAdSnapshot(ads)
+
+
+class ContextAdEngine(VersionedSnapshot):
+    """Вставка контекстной рекламы с кешем плана"""
+
+    def build(self) -> ContextAdSnapshot:
+        return build_context_snapshot()
+
+    def insert(self, content: str, max_ads: int = 3, post_id: Optional[int] = None) -> str:
+        """
+        Вставить ссылки контекстной рекламы в HTML статьи.
+
+        Args:
+            content: HTML статьи
+            max_ads: максимум вставок
+            post_id: id статьи (часть ключа кеша плана)
+        """
+        if not content:
+            return content
+        snapshot = self.snapshot()
+        if not snapshot.ads:
+            return content
+
+        digest = hashlib.md5(content.encode('utf-8')).hexdigest()
+        key = f'{PLAN_CACHE_PREFIX}:{post_id or 0}:{digest}:{snapshot.version}:{max_ads}'
+        plan = cache.get(key)
+        if plan is None:
+            plan = snapshot.plan(content, max_ads)
+            cache.set(key, plan, PLAN_CACHE_TIMEOUT)
+        return snapshot.apply(content, plan)
+
+
+context_ad_engine = ContextAdEngine()
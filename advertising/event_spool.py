@@ -0,0 +1,438 @@
+"""
+Очередь событий рекламы (показы и клики)
+
+Раньше каждый показ и клик — это INSERT в MySQL на пути запроса плюс сигналы,
+которые ещё несколькими запросами обновляли счётчики баннера, кампании,
+рекламодателя и расписаний.
+
+Теперь view дописывает событие одной строкой JSON в файл-очередь
+(utilits.spool.FileSpool, O_APPEND), а задача Django-Q
+drain_events раз в минуту:
+- забирает файл (переименованием), пачкой создаёт AdImpression / AdClick;
+- одним UPDATE на объект увеличивает счётчики баннеров, контекста, вставок,
+  расписаний и расход кампаний (то, что делали сигналы post_save);
+- ведёт почасовые агрегаты в AdPerformanceML (место / баннер / контекст /
+  устройство / тип пользователя / категория) — их читают дашборд и ML-модель.
+
+Файл обрабатывается в одной транзакции и удаляется после коммита. Файл,
+который не удалось обработать, переименовывается в .failed и возвращается
+в очередь через FAILED_RETRY_SECONDS (транзакция откатывается целиком,
+поэтому повтор не удваивает счётчики).
+
+Доход в агрегатах — расход рекламодателей: цена клика плюс CPM показов
+(cost_per_impression / 1000), как в spent_amount кампании. Он копится без
+округления (6 знаков), до копеек округляется только при выводе (analytics).
+"""
+import logging
+import os
+import re
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+from decimal import Decimal
+from typing import Dict, List
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from utilits.spool import FileSpool
+
+logger = logging.getLogger(__name__)
+
+SPOOL_DIR = getattr(settings, 'AD_EVENTS_SPOOL_DIR', None) or os.path.join(settings.BASE_DIR, 'cache', 'ad_events')
+SPOOL_NAME = 'events'
+FAILED_RETRY_SECONDS = getattr(settings, 'AD_EVENTS_FAILED_RETRY_SECONDS', 60 * 60)
+ROTATE_GRACE = 1.0
+DRAIN_LOCK_KEY = 'ad_events_drain_lock'
+DRAIN_LOCK_TIMEOUT = 60 * 10
+REBUILD_LOCK_TIMEOUT = 60 * 60
+REBUILD_LOCK_WAIT = 60  # секунды ожидания, пока drain_events отпустит блокировку
+
+MAX_UA_LENGTH = 500
+MAX_URL_LENGTH = 1000
+MAX_CTR = Decimal('100.00')
+CPM_DIVISOR = Decimal('1000')
+
+_TABLET_RE = re.compile(r'ipad|tablet|kindle|silk|playbook|(android(?!.*mobile))', re.IGNORECASE)
+_MOBILE_RE = re.compile(r'mobi|iphone|ipod|android|blackberry|opera mini|windows phone', re.IGNORECASE)
+
+
+def detect_device(user_agent: str) -> str:
+    """Тип устройства для AdPerformanceML: desktop / mobile / tablet"""
+    if not user_agent:
+        return 'desktop'
+    if _TABLET_RE.search(user_agent):
+        return 'tablet'
+    if _MOBILE_RE.search(user_agent):
+        return 'mobile'
+    return 'desktop'
+
+
+# ============================================================================
+# ЗАПИСЬ (на пути запроса)
+# ============================================================================
+
+def _spool() -> FileSpool:
+    return FileSpool(
+        SPOOL_DIR, SPOOL_NAME, 'событий рекламы', DRAIN_LOCK_KEY, lock_timeout=DRAIN_LOCK_TIMEOUT,
+        rotate_grace=ROTATE_GRACE, failed_retry_seconds=FAILED_RETRY_SECONDS,
+    )
+
+
+def _base_event(kind: str, request, ip_address: str) -> dict:
+    user = getattr(request, 'user', None)
+    return {
+        'k': kind,
+        'ts': time.time(),
+        'u': user.pk if user is not None and user.is_authenticated else None,
+        's': (request.session.session_key or '') if hasattr(request, 'session') else '',
+        'ip': ip_address,
+        'ua': request.META.get('HTTP_USER_AGENT', '')[:MAX_UA_LENGTH],
+    }
+
+
+def record_impression(request, ip_address: str, banner_id=None, context_ad_id=None, insertion_id=None,
+                      viewport_position: str = '', time_visible: int = 0) -> None:
+    """Ставит показ в очередь (при недоступной очереди — сразу в БД)"""
+    event = _base_event('i', request, ip_address)
+    event.update(b=banner_id, c=context_ad_id, n=insertion_id, vp=viewport_position[:10], tv=time_visible)
+    if not _spool().append(event):
+        drain_events_list([event])
+
+
+def record_click(request, ip_address: str, redirect_url: str, banner_id=None, context_ad_id=None,
+                 insertion_id=None) -> None:
+    """Ставит клик в очередь (при недоступной очереди — сразу в БД)"""
+    event = _base_event('c', request, ip_address)
+    event.update(
+        b=banner_id, c=context_ad_id, n=insertion_id,
+        r=request.META.get('HTTP_REFERER', '')[:MAX_URL_LENGTH],
+        to=redirect_url[:MAX_URL_LENGTH],
+    )
+    if not _spool().append(event):
+        drain_events_list([event])
+
+
+# ============================================================================
+# ОБРАБОТКА (Django-Q)
+# ============================================================================
+
+def drain_events(retry_failed: bool = False) -> dict:
+    """
+    Обрабатывает накопленные события (задача Django-Q, раз в минуту).
+
+    Args:
+        retry_failed: Вернуть в обработку все отложенные файлы, не дожидаясь FAILED_RETRY_SECONDS
+
+    Returns:
+        dict: Количество файлов, показов, кликов и отложенных (.failed) файлов
+    """
+    totals = {'files': 0, 'impressions': 0, 'clicks': 0, 'failed': 0}
+    drained = _spool().drain(drain_events_list, retry_failed=retry_failed)
+    if drained is None:
+        return totals
+
+    for result in drained['results']:
+        totals['files'] += 1
+        totals['impressions'] += result['impressions']
+        totals['clicks'] += result['clicks']
+    totals['failed'] = drained['failed']
+    if totals['files']:
+        logger.info(
+            f"📥 События рекламы: {totals['impressions']} показов, {totals['clicks']} кликов "
+            f"({totals['files']} файл.)"
+        )
+    return totals
+
+
+def _event_time(event: dict) -> datetime:
+    return datetime.fromtimestamp(event['ts'], tz=dt_timezone.utc)
+
+
+def drain_events_list(events: List[dict]) -> dict:
+    """Записывает пачку событий: сырые записи, счётчики и почасовые агрегаты (одна транзакция)"""
+    from django.contrib.auth import get_user_model
+    from .models import AdBanner, AdClick, AdImpression, AdInsertion, ContextAd
+
+    if not events:
+        return {'impressions': 0, 'clicks': 0}
+
+    def ids(key):
+        return {event[key] for event in events if event.get(key)}
+
+    banners = AdBanner.objects.select_related('campaign').in_bulk(ids('b'))
+    context_ads = ContextAd.objects.in_bulk(ids('c'))
+    insertions = AdInsertion.objects.select_related('context_ad', 'post__category').in_bulk(ids('n'))
+    users = dict(
+        get_user_model().objects.filter(pk__in=ids('u')).values_list('pk', 'profile__is_author')
+    )
+
+    impressions, clicks = [], []
+    for event in events:
+        banner = banners.get(event.get('b'))
+        insertion = insertions.get(event.get('n'))
+        context_ad = context_ads.get(event.get('c'))
+        if insertion is not None:
+            context_ad = context_ad or insertion.context_ad
+        is_click = event.get('k') == 'c'
+
+        # Показы — только активных объявлений (как раньше в track_impression)
+        if not is_click:
+            if banner is not None and not banner.is_active:
+                banner = None
+            if insertion is not None and not insertion.is_active:
+                insertion = context_ad = None
+            if context_ad is not None and not context_ad.is_active:
+                context_ad = None
+        if banner is None and context_ad is None:
+            continue
+
+        event['_banner'], event['_context'], event['_insertion'] = banner, context_ad, insertion
+        user_id = event.get('u') if event.get('u') in users else None
+        common = dict(
+            ad_banner=banner,
+            context_ad=context_ad if banner is None else None,
+            ad_insertion=insertion if banner is None else None,
+            user_id=user_id,
+            session_key=event.get('s') or '',
+            ip_address=event.get('ip') or '0.0.0.0',
+            user_agent=event.get('ua') or '',
+        )
+        if is_click:
+            clicks.append((event, AdClick(
+                clicked_at=_event_time(event),
+                referer=event.get('r') or '',
+                redirect_url=event.get('to') or '',
+                **common,
+            )))
+        else:
+            impressions.append((event, AdImpression(
+                shown_at=_event_time(event),
+                viewport_position=event.get('vp') or '',
+                time_visible=int(event.get('tv') or 0),
+                **common,
+            )))
+
+    with transaction.atomic():
+        AdImpression.objects.bulk_create([obj for _, obj in impressions], batch_size=1000)
+        AdClick.objects.bulk_create([obj for _, obj in clicks], batch_size=1000)
+        _apply_counters(impressions, clicks)
+        _apply_rollups(impressions, clicks, users)
+
+    return {'impressions': len(impressions), 'clicks': len(clicks)}
+
+
+def _apply_counters(impressions: list, clicks: list) -> None:
+    """Счётчики и расход (раньше — сигналы post_save на каждое событие)"""
+    from .models import AdBanner, AdCampaign, AdInsertion, AdSchedule, Advertiser, ContextAd
+
+    banner_counts = defaultdict(lambda: [0, 0])
+    context_counts = defaultdict(lambda: [0, 0])
+    insertion_counts = defaultdict(lambda: [0, 0])
+    campaign_spend = defaultdict(Decimal)
+    banner_shown_at = defaultdict(list)
+
+    for column, items in ((0, impressions), (1, clicks)):
+        for event, obj in items:
+            banner, context_ad, insertion = event['_banner'], event['_context'], event['_insertion']
+            if banner is not None:
+                banner_counts[banner.pk][column] += 1
+                campaign = banner.campaign
+                if column:
+                    campaign_spend[campaign.pk] += campaign.cost_per_click
+                else:
+                    banner_shown_at[banner.pk].append(obj.shown_at)
+                    if campaign.cost_per_impression > 0:
+                        campaign_spend[campaign.pk] += campaign.cost_per_impression / CPM_DIVISOR
+            else:
+                context_counts[context_ad.pk][column] += 1
+                if column:
+                    campaign_spend[context_ad.campaign_id] += context_ad.cost_per_click
+            if insertion is not None and banner is None:
+                insertion_counts[insertion.pk][column] += 1
+
+    for pk, (shown, clicked) in banner_counts.items():
+        AdBanner.objects.filter(pk=pk).update(impressions=F('impressions') + shown, clicks=F('clicks') + clicked)
+    for pk, (shown, clicked) in context_counts.items():
+        ContextAd.objects.filter(pk=pk).update(impressions=F('impressions') + shown, clicks=F('clicks') + clicked)
+    for pk, (shown, clicked) in insertion_counts.items():
+        AdInsertion.objects.filter(pk=pk).update(views=F('views') + shown, clicks=F('clicks') + clicked)
+
+    campaign_spend = {pk: amount for pk, amount in campaign_spend.items() if amount}
+    for pk, amount in campaign_spend.items():
+        AdCampaign.objects.filter(pk=pk).update(spent_amount=F('spent_amount') + amount)
+    advertiser_ids = set(
+        AdCampaign.objects.filter(pk__in=list(campaign_spend)).values_list('advertiser_id', flat=True)
+    )
+    for advertiser in Advertiser.objects.filter(pk__in=advertiser_ids):
+        advertiser.update_total_spent()
+
+    # Дневные лимиты расписаний: показы, попавшие в окно расписания
+    if banner_shown_at:
+        schedules = AdSchedule.objects.filter(is_active=True, banner_id__in=list(banner_shown_at))
+        for schedule in schedules:
+            schedule.reset_counter_if_needed()
+            shown = sum(
+                1 for moment in banner_shown_at[schedule.banner_id]
+                if (schedule.day_of_week is None or schedule.day_of_week == moment.weekday())
+                and schedule.start_time <= moment.time() <= schedule.end_time
+            )
+            if shown:
+                AdSchedule.objects.filter(pk=schedule.pk).update(
+                    current_impressions=F('current_impressions') + shown
+                )
+
+
+def _rollup_key(event: dict, moment: datetime, users: Dict[int, bool]) -> tuple:
+    banner, context_ad, insertion = event['_banner'], event['_context'], event['_insertion']
+    local = timezone.localtime(moment)
+    user_id = event.get('u')
+    if user_id in users:
+        user_type = 'author' if users[user_id] else 'registered'
+    else:
+        user_type = 'guest'
+    category = ''
+    if banner is None and insertion is not None and insertion.post.category_id:
+        category = insertion.post.category.title[:100]
+    return (
+        banner.place_id if banner is not None else None,
+        banner.pk if banner is not None else None,
+        context_ad.pk if banner is None else None,
+        local.date(),
+        local.hour,
+        detect_device(event.get('ua')),
+        user_type,
+        category,
+    )
+
+
+def _event_revenue(event: dict, is_click: bool) -> Decimal:
+    banner, context_ad = event['_banner'], event['_context']
+    if banner is not None:
+        campaign = banner.campaign
+        return campaign.cost_per_click if is_click else campaign.cost_per_impression / CPM_DIVISOR
+    return context_ad.cost_per_click if is_click else Decimal('0')
+
+
+ROLLUP_KEY_FIELDS = (
+    'ad_place_id', 'banner_id', 'context_ad_id', 'date', 'hour', 'device_type', 'user_type', 'category',
+)
+
+
+def _apply_rollups(impressions: list, clicks: list, users: Dict[int, bool]) -> None:
+    """Добавляет события к почасовым агрегатам AdPerformanceML"""
+    deltas = defaultdict(lambda: [0, 0, Decimal('0')])
+    for is_click, items in ((False, impressions), (True, clicks)):
+        for event, obj in items:
+            moment = obj.clicked_at if is_click else obj.shown_at
+            delta = deltas[_rollup_key(event, moment, users)]
+            delta[1 if is_click else 0] += 1
+            delta[2] += _event_revenue(event, is_click)
+    merge_rollups(deltas)
+
+
+def merge_rollups(deltas: Dict[tuple, list]) -> None:
+    """
+    Прибавляет {ключ: [показы, клики, доход]} к строкам AdPerformanceML.
+    Ключ — значения ROLLUP_KEY_FIELDS. Вызывается под блокировкой DRAIN_LOCK_KEY.
+    Доход прибавляется без округления.
+    """
+    from .models import AdPerformanceML
+
+    if not deltas:
+        return
+
+    existing = AdPerformanceML.objects.filter(
+        date__in={key[3] for key in deltas},
+        hour__in={key[4] for key in deltas},
+    )
+    rows = {tuple(getattr(row, field) for field in ROLLUP_KEY_FIELDS): row for row in existing}
+
+    to_create, to_update = [], []
+    for key, (shown, clicked, revenue) in deltas.items():
+        row = rows.get(key)
+        if row is None:
+            row = AdPerformanceML(**dict(zip(ROLLUP_KEY_FIELDS, key)), day_of_week=key[3].weekday())
+            to_create.append(row)
+        else:
+            to_update.append(row)
+        row.impressions += shown
+        row.clicks += clicked
+        row.revenue += revenue
+        row.ctr = min(
+            (Decimal(row.clicks) * 100 / row.impressions).quantize(Decimal('0.01')) if row.impressions else Decimal('0.00'),
+            MAX_CTR,
+        )
+
+    AdPerformanceML.objects.bulk_create(to_create, batch_size=1000)
+    if to_update:
+        AdPerformanceML.objects.bulk_update(to_update, ['impressions', 'clicks', 'revenue', 'ctr'], batch_size=1000)
+
+
+def rebuild_rollups(date_from, date_to=None) -> int:
+    """
+    Пересчитывает агрегаты AdPerformanceML по сырым AdImpression / AdClick
+    за период (для данных, записанных до появления очереди).
+
+    Держит DRAIN_LOCK_KEY: иначе drain_events, прошедший между чтением сырых
+    событий и заменой агрегатов, добавил бы строки, которые пересчёт затрёт.
+
+    Returns:
+        int: Количество строк агрегатов
+
+    Raises:
+        RuntimeError: Очередь обрабатывается дольше REBUILD_LOCK_WAIT секунд
+    """
+    deadline = time.monotonic() + REBUILD_LOCK_WAIT
+    while not cache.add(DRAIN_LOCK_KEY, os.getpid(), REBUILD_LOCK_TIMEOUT):
+        if time.monotonic() >= deadline:
+            raise RuntimeError("Очередь событий рекламы обрабатывается, повторите пересчёт позже")
+        time.sleep(1)
+    try:
+        return _rebuild_rollups(date_from, date_to)
+    finally:
+        cache.delete(DRAIN_LOCK_KEY)
+
+
+def _rebuild_rollups(date_from, date_to=None) -> int:
+    from django.contrib.auth import get_user_model
+    from .models import AdClick, AdImpression, AdPerformanceML
+
+    date_to = date_to or timezone.localdate()
+    start = timezone.make_aware(datetime.combine(date_from, datetime.min.time()))
+    end = timezone.make_aware(datetime.combine(date_to + timedelta(days=1), datetime.min.time()))
+    related = ('ad_banner__campaign', 'context_ad', 'ad_insertion__post__category')
+
+    deltas = defaultdict(lambda: [0, 0, Decimal('0')])
+    user_ids = set()
+    sources = (
+        (False, AdImpression.objects.filter(shown_at__gte=start, shown_at__lt=end), 'shown_at'),
+        (True, AdClick.objects.filter(clicked_at__gte=start, clicked_at__lt=end), 'clicked_at'),
+    )
+    for _, queryset, _ in sources:
+        user_ids.update(queryset.exclude(user_id=None).values_list('user_id', flat=True).distinct())
+    users = dict(get_user_model().objects.filter(pk__in=user_ids).values_list('pk', 'profile__is_author'))
+
+    for is_click, queryset, time_field in sources:
+        for obj in queryset.select_related(*related).iterator(chunk_size=2000):
+            if obj.ad_banner is None and obj.context_ad is None:
+                continue
+            event = {
+                '_banner': obj.ad_banner,
+                '_context': obj.context_ad,
+                '_insertion': obj.ad_insertion,
+                'u': obj.user_id,
+                'ua': obj.user_agent,
+            }
+            delta = deltas[_rollup_key(event, getattr(obj, time_field), users)]
+            delta[1 if is_click else 0] += 1
+            delta[2] += _event_revenue(event, is_click)
+
+    with transaction.atomic():
+        AdPerformanceML.objects.filter(date__gte=date_from, date__lte=date_to).delete()
+        merge_rollups(deltas)
+    return len(deltas)
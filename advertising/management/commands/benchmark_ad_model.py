@@ -0,0 +1,119 @@
+"""
+Management команда для замера скорости прогноза ML модели рекламы
+"""
+import time
+
+import numpy as np
+import pandas as pd
+from django.core.management.base import BaseCommand
+
+from advertising.ml_optimizer import (
+    DEVICE_TYPES, USER_TYPES, AdPlacementOptimizer, build_candidate_frame, feature_levels,
+)
+
+
+def _synthetic_history(place_codes, days, rng):
+    """История как у collect_training_data: место × день × час × устройство × тип пользователя"""
+    frame = pd.concat(
+        [build_candidate_frame(place_codes, day % 7, DEVICE_TYPES, USER_TYPES) for day in range(days)],
+        ignore_index=True,
+    )
+    base_ctr = dict(zip(place_codes, rng.uniform(0.5, 4.0, len(place_codes))))
+    prime = ((frame['hour'] >= 9) & (frame['hour'] <= 21)).to_numpy()
+    frame['ctr'] = frame['ad_place__code'].map(base_ctr).to_numpy() * (1 + 0.5 * prime) + rng.normal(0, 0.3, len(frame))
+    frame['impressions'] = rng.integers(10, 500, len(frame))
+    frame['clicks'] = (frame['impressions'] * frame['ctr'].clip(lower=0) / 100).round()
+    frame['revenue'] = frame['clicks'] * 5 + frame['impressions'] * 0.05
+    frame['effectiveness_score'] = 0
+    frame['date'] = None
+    return frame
+
+
+class Command(BaseCommand):
+    help = 'Замерить скорость прогноза рекомендаций: вся сетка одной матрицей против прогноза по строке'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--places',
+            type=int,
+            default=30,
+            help='Количество мест в синтетической сетке (по умолчанию: 30)'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Повторов замера (берётся лучший, по умолчанию: 5)'
+        )
+        parser.add_argument(
+            '--sample',
+            type=int,
+            default=50,
+            help='Строк для замера прогноза по одной (по умолчанию: 50)'
+        )
+        parser.add_argument(
+            '--saved',
+            action='store_true',
+            help='Использовать обученные модели и активные места из БД вместо синтетики'
+        )
+    
+    def handle(self, *args, **options):
+        optimizer = AdPlacementOptimizer()
+        
+        if options['saved']:
+            from advertising.models import AdPlace
+            
+            place_codes = list(AdPlace.objects.filter(is_active=True).values_list('code', flat=True))
+            try:
+                optimizer.ctr_model, optimizer.revenue_model, optimizer.feature_columns = optimizer.load_models()
+            except FileNotFoundError:
+                self.stdout.write(self.style.ERROR('Модели не обучены — запустите train_ad_model'))
+                return
+        else:
+            from sklearn.ensemble import GradientBoostingRegressor, RandomForestRegressor
+            
+            rng = np.random.default_rng(42)
+            place_codes = [f'place_{index}' for index in range(options['places'])]
+            self.stdout.write(f'Обучение моделей на синтетических данных ({len(place_codes)} мест)...')
+            X, y_ctr, y_revenue = optimizer.prepare_features(_synthetic_history(place_codes, 14, rng))
+            # Те же параметры, что в train_ctr_model / train_revenue_model
+            optimizer.ctr_model = RandomForestRegressor(
+                n_estimators=100, max_depth=10, random_state=42, n_jobs=-1
+            ).fit(X, y_ctr)
+            optimizer.revenue_model = GradientBoostingRegressor(
+                n_estimators=100, max_depth=5, learning_rate=0.1, random_state=42
+            ).fit(X, y_revenue)
+        
+        if not place_codes:
+            self.stdout.write(self.style.ERROR('Нет активных мест'))
+            return
+        
+        feature_columns = optimizer.feature_columns
+        frame = build_candidate_frame(
+            place_codes, 0,
+            feature_levels(feature_columns, 'device_type_', DEVICE_TYPES),
+            feature_levels(feature_columns, 'user_type_', USER_TYPES),
+        )
+        rows = len(frame)
+        
+        # Вся сетка: одна матрица, один predict на модель
+        timings = []
+        for _ in range(max(1, options['repeat'])):
+            started = time.perf_counter()
+            optimizer.score_places(place_codes, day_of_week=0)
+            timings.append(time.perf_counter() - started)
+        vectorized_ms = min(timings) * 1000
+        
+        # Прогноз по строке (как цикл по парам): замер на выборке, оценка на всю сетку
+        sample = frame.head(max(1, min(options['sample'], rows)))
+        started = time.perf_counter()
+        for index in range(len(sample)):
+            optimizer.score_candidates(sample.iloc[index:index + 1])
+        per_row_ms = (time.perf_counter() - started) * 1000 / len(sample)
+        
+        self.stdout.write(f'Мест: {len(place_codes)}, строк сетки: {rows}, признаков: {len(feature_columns)}')
+        self.stdout.write(self.style.SUCCESS(f'[OK] Вся сетка одной матрицей: {vectorized_ms:.1f} мс'))
+        self.stdout.write(
+            f'По строке: {per_row_ms:.2f} мс/строка, оценка на сетку {per_row_ms * rows / 1000:.1f} с '
+            f'(в {per_row_ms * rows / max(vectorized_ms, 1e-6):.0f} раз медленнее)'
+        )
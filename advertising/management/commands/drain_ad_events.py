@@ -0,0 +1,68 @@
+"""
+Management команда для обработки очереди событий рекламы
+"""
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from advertising.event_spool import drain_events, rebuild_rollups
+
+DRAIN_FUNC = 'advertising.event_spool.drain_events'
+
+
+class Command(BaseCommand):
+    help = 'Записать накопленные показы/клики в БД и обновить почасовые агрегаты'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--setup-schedule',
+            action='store_true',
+            help='Создать расписание Django-Q (каждую минуту)'
+        )
+        parser.add_argument(
+            '--rebuild-rollups',
+            type=int,
+            metavar='DAYS',
+            help='Пересчитать агрегаты AdPerformanceML по сырым данным за N дней'
+        )
+        parser.add_argument(
+            '--retry-failed',
+            action='store_true',
+            help='Сразу повторить обработку отложенных (.failed) файлов очереди'
+        )
+
+    def handle(self, *args, **options):
+        if options['setup_schedule']:
+            from django_q.models import Schedule
+
+            schedule, created = Schedule.objects.update_or_create(
+                func=DRAIN_FUNC,
+                defaults={
+                    'name': 'Ad events drain',
+                    'schedule_type': Schedule.MINUTES,
+                    'minutes': 1,
+                    'repeats': -1,
+                }
+            )
+            state = 'создано' if created else 'обновлено'
+            self.stdout.write(self.style.SUCCESS(f'[OK] Расписание обработки событий рекламы {state}'))
+            return
+
+        if options['rebuild_rollups']:
+            date_from = timezone.localdate() - timedelta(days=options['rebuild_rollups'])
+            self.stdout.write(f'Пересчёт агрегатов с {date_from}...')
+            try:
+                rows = rebuild_rollups(date_from)
+            except RuntimeError as e:
+                self.stdout.write(self.style.ERROR(f'[ERROR] {e}'))
+                return
+            self.stdout.write(self.style.SUCCESS(f'[OK] Строк агрегатов: {rows}'))
+            return
+
+        result = drain_events(retry_failed=options['retry_failed'])
+        self.stdout.write(self.style.SUCCESS(
+            f"[OK] Файлов: {result['files']}, показов: {result['impressions']}, кликов: {result['clicks']}"
+        ))
+        if result['failed']:
+            self.stdout.write(self.style.WARNING(f"[WARN] Отложенных файлов: {result['failed']}"))
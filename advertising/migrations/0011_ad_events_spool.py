@@ -0,0 +1,30 @@
+# Generated by Django 5.1 on 2026-10-17 04:32
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('advertising', '0010_adstxtsettings'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='adclick',
+            name='clicked_at',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now, editable=False, verbose_name='Дата клика'),
+        ),
+        migrations.AlterField(
+            model_name='adimpression',
+            name='shown_at',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now, editable=False, verbose_name='Дата показа'),
+        ),
+        migrations.AlterField(
+            model_name='adperformanceml',
+            name='ad_place',
+            field=models.ForeignKey(blank=True, help_text='Пусто для контекстной рекламы', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='ml_records', to='advertising.adplace', verbose_name='Место размещения'),
+        ),
+    ]
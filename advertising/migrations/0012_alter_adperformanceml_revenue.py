@@ -0,0 +1,19 @@
+# Generated by Django 5.1 on 2026-10-17 05:34
+
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('advertising', '0011_ad_events_spool'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='adperformanceml',
+            name='revenue',
+            field=models.DecimalField(decimal_places=6, default=Decimal('0.00'), help_text='Без округления: CPM показа дробнее копейки, округляется при выводе', max_digits=16, verbose_name='Доход'),
+        ),
+    ]
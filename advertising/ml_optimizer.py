@@ -1,16 +1,132 @@
 """
 Модуль машинного обучения для оптимизации размещения рекламы
+
+Прогноз строится одной матрицей признаков на всю сетку кандидатов
+(место × час × устройство × тип пользователя), выровненной по сохранённым
+при обучении feature_columns, — по одному вызову predict на модель.
+Модели загружаются один раз на процесс и перечитываются, только когда
+файл на диске изменился (переобучение).
 """
 import logging
+import os
+import threading
 import pandas as pd
 import numpy as np
 from datetime import timedelta
 from decimal import Decimal
+from typing import Dict, List, Tuple
+from django.conf import settings
 from django.utils import timezone
 from django.db.models import Avg
 
 logger = logging.getLogger(__name__)
 
+CTR_MODEL_FILE = 'ctr_model.pkl'
+REVENUE_MODEL_FILE = 'revenue_model.pkl'
+FEATURE_COLUMNS_FILE = 'feature_columns.pkl'
+MODEL_META_FILE = 'model_meta.pkl'
+
+CATEGORICAL_FEATURES = ['ad_place__code', 'category', 'device_type', 'user_type']
+TARGET_COLUMNS = ['date', 'impressions', 'clicks', 'ctr', 'revenue', 'effectiveness_score']
+
+# Значения по умолчанию для сетки кандидатов (как пишет event_spool)
+DEVICE_TYPES = ('desktop', 'mobile', 'tablet')
+USER_TYPES = ('guest', 'registered', 'author')
+
+# Уверенность: R² модели × доля «достаточной» истории места (неделя почасовых строк)
+MIN_SAMPLES_PER_PLACE = 24 * 7
+DEFAULT_CONFIDENCE = 50
+CENTS = Decimal('0.01')
+
+_artifact_cache: Dict[str, Tuple[int, object]] = {}
+_artifact_lock = threading.Lock()
+
+
+def get_models_dir() -> str:
+    """Каталог моделей (абсолютный путь — не зависит от рабочего каталога воркера)"""
+    return os.path.join(settings.MEDIA_ROOT, 'ml_models')
+
+
+def load_artifact(name: str):
+    """
+    Загрузить сохранённый объект (модель, список признаков) с кешем на процесс.
+
+    Кеш привязан к mtime файла: после переобучения объект перечитывается
+    при следующем обращении без перезапуска воркеров.
+
+    Raises:
+        FileNotFoundError: если модель ещё не обучена
+    """
+    path = os.path.join(get_models_dir(), name)
+    mtime = os.stat(path).st_mtime_ns
+    cached = _artifact_cache.get(path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+
+    with _artifact_lock:
+        cached = _artifact_cache.get(path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        import joblib
+
+        value = joblib.load(path)
+        _artifact_cache[path] = (mtime, value)
+        logger.info(f"🧠 Загружен {name}")
+        return value
+
+
+def save_artifact(name: str, value):
+    """Сохранить объект в каталог моделей"""
+    import joblib
+
+    models_dir = get_models_dir()
+    os.makedirs(models_dir, exist_ok=True)
+    joblib.dump(value, os.path.join(models_dir, name))
+
+
+def engineer_features(data: pd.DataFrame) -> pd.DataFrame:
+    """
+    Признаки модели: one-hot категорий и производные от часа / дня недели.
+    Общая часть обучения и прогноза — столбцы совпадают по построению.
+    """
+    df = pd.get_dummies(data, columns=[col for col in CATEGORICAL_FEATURES if col in data.columns])
+    hour = df['hour'].to_numpy(dtype=float)
+    df['is_weekend'] = (df['day_of_week'].to_numpy() >= 5).astype(int)
+    df['is_prime_time'] = ((hour >= 9) & (hour <= 21)).astype(int)
+    df['hour_sin'] = np.sin(2 * np.pi * hour / 24)
+    df['hour_cos'] = np.cos(2 * np.pi * hour / 24)
+    return df
+
+
+def feature_levels(feature_columns: List[str], prefix: str, default) -> tuple:
+    """Значения категории, известные модели (по именам one-hot столбцов)"""
+    values = tuple(col[len(prefix):] for col in feature_columns if col.startswith(prefix))
+    return values or tuple(default)
+
+
+def build_candidate_frame(place_codes: List[str], day_of_week: int, devices, user_types,
+                          hours=range(24), category: str = '') -> pd.DataFrame:
+    """Декартово произведение место × час × устройство × тип пользователя (без циклов Python)"""
+    hours = np.asarray(list(hours))
+    grid = np.meshgrid(
+        np.arange(len(place_codes)), hours, np.arange(len(devices)), np.arange(len(user_types)),
+        indexing='ij',
+    )
+    place_idx, hour, device_idx, user_idx = (axis.ravel() for axis in grid)
+    return pd.DataFrame({
+        'ad_place__code': np.asarray(place_codes, dtype=object)[place_idx],
+        'hour': hour,
+        'day_of_week': day_of_week,
+        'category': category,
+        'device_type': np.asarray(devices, dtype=object)[device_idx],
+        'user_type': np.asarray(user_types, dtype=object)[user_idx],
+    })
+
+
+def align_features(frame: pd.DataFrame, feature_columns: List[str]) -> pd.DataFrame:
+    """Матрица признаков в порядке обучения; неизвестные модели значения — нулевые столбцы"""
+    return engineer_features(frame).reindex(columns=feature_columns, fill_value=0).astype('float64')
+
 
 class AdPlacementOptimizer:
     """Оптимизатор размещения рекламы на основе ML"""
@@ -78,25 +194,10 @@ class AdPlacementOptimizer:
         Returns:
             X, y_ctr, y_revenue
         """
-        df = data.copy()
-        
-        # One-hot encoding для категориальных признаков
-        df = pd.get_dummies(df, columns=[
-            'ad_place__code',
-            'category',
-            'device_type',
-            'user_type'
-        ])
-        
-        # Feature engineering
-        df['is_weekend'] = df['day_of_week'].apply(lambda x: 1 if x >= 5 else 0)
-        df['is_prime_time'] = df['hour'].apply(lambda x: 1 if 9 <= x <= 21 else 0)
-        df['hour_sin'] = np.sin(2 * np.pi * df['hour'] / 24)
-        df['hour_cos'] = np.cos(2 * np.pi * df['hour'] / 24)
+        df = engineer_features(data)
         
         # Удаляем ненужные столбцы
-        columns_to_drop = ['date', 'impressions', 'clicks', 'ctr', 'revenue', 'effectiveness_score']
-        X = df.drop(columns=[col for col in columns_to_drop if col in df.columns])
+        X = df.drop(columns=[col for col in TARGET_COLUMNS if col in df.columns])
         
         # Целевые переменные
         y_ctr = df['ctr'] if 'ctr' in df.columns else None
@@ -107,6 +208,16 @@ class AdPlacementOptimizer:
         
         return X, y_ctr, y_revenue
     
+    def _update_meta(self, data, **metrics):
+        """Метрики и объём истории по местам — для оценки уверенности прогноза"""
+        try:
+            meta = load_artifact(MODEL_META_FILE)
+        except FileNotFoundError:
+            meta = {}
+        meta = {**meta, **metrics}
+        meta['samples_by_place'] = data['ad_place__code'].dropna().value_counts().to_dict()
+        save_artifact(MODEL_META_FILE, meta)
+    
     def train_ctr_model(self):
         """
         Обучить модель предсказания CTR
@@ -118,8 +229,6 @@ class AdPlacementOptimizer:
             from sklearn.ensemble import RandomForestRegressor
             from sklearn.model_selection import train_test_split
             from sklearn.metrics import mean_absolute_error, r2_score
-            import joblib
-            import os
             
             # Собираем данные
             data = self.collect_training_data()
@@ -155,11 +264,9 @@ class AdPlacementOptimizer:
             r2 = r2_score(y_test, y_pred)
             
             # Сохраняем модель
-            models_dir = 'media/ml_models'
-            os.makedirs(models_dir, exist_ok=True)
-            
-            joblib.dump(self.ctr_model, f'{models_dir}/ctr_model.pkl')
-            joblib.dump(self.feature_columns, f'{models_dir}/feature_columns.pkl')
+            save_artifact(CTR_MODEL_FILE, self.ctr_model)
+            save_artifact(FEATURE_COLUMNS_FILE, self.feature_columns)
+            self._update_meta(data, ctr_r2=float(r2))
             
             logger.info(f"Модель CTR обучена: MAE={mae:.4f}, R²={r2:.4f}")
             
@@ -184,8 +291,6 @@ class AdPlacementOptimizer:
             from sklearn.ensemble import GradientBoostingRegressor
             from sklearn.model_selection import train_test_split
             from sklearn.metrics import mean_absolute_error, r2_score
-            import joblib
-            import os
             
             # Собираем данные
             data = self.collect_training_data()
@@ -220,11 +325,10 @@ class AdPlacementOptimizer:
             mae = mean_absolute_error(y_test, y_pred)
             r2 = r2_score(y_test, y_pred)
             
-            # Сохраняем модель
-            models_dir = 'media/ml_models'
-            os.makedirs(models_dir, exist_ok=True)
-            
-            joblib.dump(self.revenue_model, f'{models_dir}/revenue_model.pkl')
+            # Сохраняем модель (признаки те же — обе модели учатся на одной выборке)
+            save_artifact(REVENUE_MODEL_FILE, self.revenue_model)
+            save_artifact(FEATURE_COLUMNS_FILE, self.feature_columns)
+            self._update_meta(data, revenue_r2=float(r2))
             
             logger.info(f"Модель revenue обучена: MAE={mae:.4f}, R²={r2:.4f}")
             
@@ -238,6 +342,88 @@ class AdPlacementOptimizer:
             logger.error(f"Ошибка при обучении модели revenue: {str(e)}")
             return {'error': str(e)}
     
+    def load_models(self):
+        """
+        Модели и список признаков: заданные в объекте (после обучения / в бенчмарке)
+        или из кеша процесса.
+        
+        Raises:
+            FileNotFoundError: если модели ещё не обучены
+        """
+        if self.ctr_model is not None and self.revenue_model is not None and self.feature_columns:
+            return self.ctr_model, self.revenue_model, self.feature_columns
+        return (
+            load_artifact(CTR_MODEL_FILE),
+            load_artifact(REVENUE_MODEL_FILE),
+            load_artifact(FEATURE_COLUMNS_FILE),
+        )
+    
+    def score_candidates(self, frame):
+        """
+        Прогноз для всех строк сетки: по одному predict на модель.
+        
+        Returns:
+            DataFrame: исходные столбцы + ctr, revenue
+        """
+        ctr_model, revenue_model, feature_columns = self.load_models()
+        X = align_features(frame, feature_columns)
+        scored = frame.copy()
+        scored['ctr'] = np.clip(ctr_model.predict(X), 0, 100)
+        scored['revenue'] = np.clip(revenue_model.predict(X), 0, None)
+        return scored
+    
+    def confidence_for(self, place_codes):
+        """Уверенность 0-100 по местам: R² худшей модели × достаточность истории места"""
+        try:
+            meta = load_artifact(MODEL_META_FILE)
+        except FileNotFoundError:
+            return np.full(len(place_codes), DEFAULT_CONFIDENCE, dtype=int)
+        
+        scores = [meta[key] for key in ('ctr_r2', 'revenue_r2') if meta.get(key) is not None]
+        r2 = min(max(min(scores), 0.0), 1.0) if scores else DEFAULT_CONFIDENCE / 100
+        samples = meta.get('samples_by_place', {})
+        support = np.minimum(
+            np.array([samples.get(code, 0) for code in place_codes], dtype=float) / MIN_SAMPLES_PER_PLACE,
+            1.0,
+        )
+        return np.rint(100 * r2 * support).astype(int)
+    
+    def score_places(self, place_codes, day_of_week=None):
+        """
+        Прогноз по местам на сутки: вся сетка место × 24 часа × устройство × тип
+        пользователя оценивается одной матрицей.
+        
+        Args:
+            place_codes: коды мест
+            day_of_week: день недели (по умолчанию — сегодня)
+        
+        Returns:
+            DataFrame (индекс — код места): predicted_ctr (среднее по сетке),
+            predicted_revenue (сумма за сутки), best_hour, best_device, confidence
+        """
+        _, _, feature_columns = self.load_models()
+        if day_of_week is None:
+            day_of_week = timezone.localdate().weekday()
+        
+        frame = build_candidate_frame(
+            list(place_codes),
+            day_of_week,
+            feature_levels(feature_columns, 'device_type_', DEVICE_TYPES),
+            feature_levels(feature_columns, 'user_type_', USER_TYPES),
+        )
+        scored = self.score_candidates(frame)
+        
+        grouped = scored.groupby('ad_place__code', sort=False)
+        summary = pd.DataFrame({
+            'predicted_ctr': grouped['ctr'].mean(),
+            'predicted_revenue': grouped['revenue'].sum(),
+        })
+        best = scored.loc[grouped['ctr'].idxmax()].set_index('ad_place__code')
+        summary['best_hour'] = best['hour']
+        summary['best_device'] = best['device_type']
+        summary['confidence'] = self.confidence_for(list(summary.index))
+        return summary
+    
     def predict_performance(self, ad_place, banner=None, context=None):
         """
         Предсказать эффективность размещения
@@ -245,34 +431,32 @@ class AdPlacementOptimizer:
         Args:
             ad_place: объект AdPlace
             banner: объект AdBanner (опционально)
-            context: dict с контекстом
+            context: dict с контекстом (hour, day_of_week, device_type, user_type);
+                не заданные значения перебираются по всей сетке
         
         Returns:
-            dict с предсказаниями
+            dict с предсказаниями (CTR — среднее, доход — сумма по сетке)
         """
         try:
-            import joblib
-            
-            # Загружаем модели если не загружены
-            if self.ctr_model is None:
-                self.ctr_model = joblib.load('media/ml_models/ctr_model.pkl')
-                self.feature_columns = joblib.load('media/ml_models/feature_columns.pkl')
-            
-            if self.revenue_model is None:
-                self.revenue_model = joblib.load('media/ml_models/revenue_model.pkl')
-            
-            # TODO: Подготовить признаки для предсказания
-            # Это требует контекста (текущее время, устройство и т.д.)
-            
-            # Заглушка - возвращаем средние значения
-            predicted_ctr = 2.5
-            predicted_revenue = 100.0
-            confidence = 75
+            context = context or {}
+            _, _, feature_columns = self.load_models()
+            
+            def values(key, default):
+                return (context[key],) if context.get(key) is not None else default
+            
+            frame = build_candidate_frame(
+                [ad_place.code],
+                context.get('day_of_week', timezone.localdate().weekday()),
+                values('device_type', feature_levels(feature_columns, 'device_type_', DEVICE_TYPES)),
+                values('user_type', feature_levels(feature_columns, 'user_type_', USER_TYPES)),
+                hours=values('hour', range(24)),
+            )
+            scored = self.score_candidates(frame)
             
             return {
-                'predicted_ctr': predicted_ctr,
-                'predicted_revenue': predicted_revenue,
-                'confidence': confidence
+                'predicted_ctr': round(float(scored['ctr'].mean()), 2),
+                'predicted_revenue': round(float(scored['revenue'].sum()), 2),
+                'confidence': int(self.confidence_for([ad_place.code])[0])
             }
         
         except Exception as e:
@@ -283,61 +467,84 @@ class AdPlacementOptimizer:
                 'confidence': 0
             }
     
-    def generate_recommendations(self, top_n=10):
+    def generate_recommendations(self, top_n=10, day_of_week=None):
         """
         Генерация рекомендаций по размещению
         
+        Модели не зависят от кампании, поэтому сетка оценивается один раз по
+        местам, а пары кампания × место ранжируются по прогнозу места
+        (места, где у кампании уже есть активный баннер, пропускаются).
+        
         Args:
             top_n: количество рекомендаций
+            day_of_week: день недели для прогноза (по умолчанию — сегодня)
         
         Returns:
             int: количество созданных рекомендаций
         """
         try:
-            from .models import AdPlace, AdCampaign, AdRecommendation
+            from .models import AdPlace, AdCampaign, AdBanner, AdRecommendation
             
-            places = AdPlace.objects.filter(is_active=True)
-            campaigns = AdCampaign.objects.filter(is_active=True)
+            places = list(AdPlace.objects.filter(is_active=True))
+            campaigns = list(AdCampaign.objects.filter(is_active=True))
             
-            if not places.exists() or not campaigns.exists():
+            if not places or not campaigns:
                 logger.warning("Нет данных для генерации рекомендаций")
                 return 0
             
-            recommendations = []
+            try:
+                summary = self.score_places([place.code for place in places], day_of_week)
+            except FileNotFoundError:
+                logger.warning("ML модели не обучены — запустите train_ad_model")
+                return 0
+            
+            occupied = set(
+                AdBanner.objects.filter(
+                    is_active=True, campaign__in=campaigns
+                ).values_list('campaign_id', 'place_id')
+            )
             
-            # Для каждой кампании и места генерируем предсказание
-            for campaign in campaigns:
-                for place in places:
-                    prediction = self.predict_performance(place)
-                    
-                    recommendations.append({
-                        'campaign': campaign,
-                        'place': place,
-                        'confidence_score': prediction['confidence'],
-                        'predicted_ctr': Decimal(str(prediction['predicted_ctr'])),
-                        'predicted_revenue': Decimal(str(prediction['predicted_revenue']))
-                    })
-            
-            # Сортируем по predicted_revenue
-            recommendations.sort(key=lambda x: x['predicted_revenue'], reverse=True)
-            
-            # Сохраняем топ-N
-            created_count = 0
-            for rec in recommendations[:top_n]:
-                AdRecommendation.objects.create(
-                    recommended_for='banner',
-                    place=rec['place'],
-                    campaign=rec['campaign'],
-                    confidence_score=rec['confidence_score'],
-                    predicted_ctr=rec['predicted_ctr'],
-                    predicted_revenue=rec['predicted_revenue'],
-                    recommendation_reason=f"ML модель предсказывает высокий доход ({rec['predicted_revenue']}₽) для этого размещения"
-                )
-                created_count += 1
-            
-            logger.info(f"Создано рекомендаций: {created_count}")
-            
-            return created_count
+            # Места по убыванию прогноза дохода; кампании — по остатку бюджета
+            ranked_places = sorted(
+                places,
+                key=lambda place: (summary.at[place.code, 'predicted_revenue'],
+                                   summary.at[place.code, 'predicted_ctr']),
+                reverse=True,
+            )
+            ranked_campaigns = sorted(
+                campaigns, key=lambda campaign: campaign.get_remaining_budget(), reverse=True
+            )
+            
+            recommendations = []
+            for place in ranked_places:
+                row = summary.loc[place.code]
+                predicted_ctr = Decimal(float(row['predicted_ctr'])).quantize(CENTS)
+                predicted_revenue = Decimal(float(row['predicted_revenue'])).quantize(CENTS)
+                for campaign in ranked_campaigns:
+                    if (campaign.id, place.id) in occupied:
+                        continue
+                    recommendations.append(AdRecommendation(
+                        recommended_for='banner',
+                        place=place,
+                        campaign=campaign,
+                        confidence_score=int(row['confidence']),
+                        predicted_ctr=predicted_ctr,
+                        predicted_revenue=predicted_revenue,
+                        recommendation_reason=(
+                            f"ML модель предсказывает доход {predicted_revenue}₽ в сутки и CTR {predicted_ctr}% "
+                            f"(лучшее время: {int(row['best_hour']):02d}:00, {row['best_device']})"
+                        )
+                    ))
+                    if len(recommendations) >= top_n:
+                        break
+                if len(recommendations) >= top_n:
+                    break
+            
+            AdRecommendation.objects.bulk_create(recommendations)
+            
+            logger.info(f"Создано рекомендаций: {len(recommendations)}")
+            
+            return len(recommendations)
         
         except Exception as e:
             logger.error(f"Ошибка при генерации рекомендаций: {str(e)}")
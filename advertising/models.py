@@ -864,8 +864,10 @@ class AdClick(models.Model):
         blank=True,
         verbose_name='User Agent'
     )
+    # Время события из очереди (event_spool), поэтому не auto_now_add
     clicked_at = models.DateTimeField(
-        auto_now_add=True,
+        default=timezone.now,
+        editable=False,
         verbose_name='Дата клика',
         db_index=True
     )
@@ -947,8 +949,10 @@ class AdImpression(models.Model):
         blank=True,
         verbose_name='User Agent'
     )
+    # Время события из очереди (event_spool), поэтому не auto_now_add
     shown_at = models.DateTimeField(
-        auto_now_add=True,
+        default=timezone.now,
+        editable=False,
         verbose_name='Дата показа',
         db_index=True
     )
@@ -999,8 +1003,11 @@ class AdPerformanceML(models.Model):
     ad_place = models.ForeignKey(
         AdPlace,
         on_delete=models.CASCADE,
+        null=True,
+        blank=True,
         related_name='ml_records',
-        verbose_name='Место размещения'
+        verbose_name='Место размещения',
+        help_text='Пусто для контекстной рекламы'
     )
     banner = models.ForeignKey(
         AdBanner,
@@ -1045,10 +1052,11 @@ class AdPerformanceML(models.Model):
         verbose_name='CTR (%)'
     )
     revenue = models.DecimalField(
-        max_digits=12,
-        decimal_places=2,
+        max_digits=16,
+        decimal_places=6,
         default=Decimal('0.00'),
-        verbose_name='Доход'
+        verbose_name='Доход',
+        help_text='Без округления: CPM показа дробнее копейки, округляется при выводе'
     )
     category = models.CharField(
         max_length=100,
@@ -1088,7 +1096,8 @@ class AdPerformanceML(models.Model):
         ]
     
     def __str__(self):
-        return f"{self.ad_place.name} - {self.date} {self.hour}:00"
+        place = self.ad_place.name if self.ad_place_id else 'Контекст'
+        return f"{place} - {self.date} {self.hour}:00"
 
 
 class AdRecommendation(models.Model):
@@ -4,7 +4,11 @@
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from django.core.cache import cache
-from .models import AdClick, AdImpression, AdCampaign, ExternalScript, AdsTxtSettings
+from .ad_engine import invalidate_ad_engine
+from .models import (
+    AdClick, AdImpression, AdCampaign, ExternalScript, AdsTxtSettings,
+    AdPlace, AdBanner, AdSchedule, ContextAd,
+)
 
 
 @receiver(post_save, sender=AdClick)
@@ -81,6 +85,35 @@ def update_impression_counters(sender, instance, created, **kwargs):
 
 # ============ ИНВАЛИДАЦИЯ КЭША ============
 
+# Поля-счётчики: их обновление не меняет состав ротации (дневные лимиты
+# подхватываются при плановом обновлении снимка)
+AD_COUNTER_FIELDS = frozenset({
+    'impressions', 'clicks', 'spent_amount', 'current_impressions', 'last_reset_date',
+})
+
+
+@receiver(post_save, sender=AdPlace)
+@receiver(post_save, sender=AdBanner)
+@receiver(post_save, sender=AdCampaign)
+@receiver(post_save, sender=AdSchedule)
+@receiver(post_save, sender=ContextAd)
+def invalidate_ad_engine_on_save(sender, instance, update_fields=None, **kwargs):
+    """Перестраивает снимки рекламы при изменении мест, баннеров, кампаний, расписаний, контекстных объявлений"""
+    if update_fields and set(update_fields) <= AD_COUNTER_FIELDS:
+        return
+    invalidate_ad_engine()
+
+
+@receiver(post_delete, sender=AdPlace)
+@receiver(post_delete, sender=AdBanner)
+@receiver(post_delete, sender=AdCampaign)
+@receiver(post_delete, sender=AdSchedule)
+@receiver(post_delete, sender=ContextAd)
+def invalidate_ad_engine_on_delete(sender, instance, **kwargs):
+    """Перестраивает снимки рекламы при удалении"""
+    invalidate_ad_engine()
+
+
 @receiver(post_save, sender=ExternalScript)
 @receiver(post_delete, sender=ExternalScript)
 def invalidate_external_scripts_cache(sender, instance, **kwargs):
@@ -3,14 +3,15 @@ Template tags для отображения рекламы на сайте
 """
 from django import template
 from django.utils.safestring import mark_safe
-from django.utils import timezone
 from django.urls import reverse
 from django.core.cache import cache
 from urllib.parse import quote
 import random
 import json
 
-from ..models import AdPlace, AdBanner, ContextAd
+from ..ad_engine import ad_engine
+from ..context_engine import context_ad_engine
+from ..models import AdPlace, AdBanner
 
 register = template.Library()
 
@@ -21,79 +22,8 @@ def show_ad(place_code):
     Показать баннер в указанном месте
     Использование: {% show_ad 'header_banner' %}
     """
-    # Пробуем получить из кэша
-    cache_key = f'ad_place_{place_code}'
-    html = cache.get(cache_key)
-    
-    if html is not None:
-        return mark_safe(html)
-    
-    try:
-        place = AdPlace.objects.get(code=place_code, is_active=True)
-    except AdPlace.DoesNotExist:
-        return ''
-    
-    # Получаем активные баннеры для этого места
-    banners = AdBanner.objects.filter(
-        place=place,
-        is_active=True,
-        campaign__is_active=True
-    ).select_related('campaign')
-    
-    # Фильтруем по датам кампании
-    today = timezone.now().date()
-    active_banners = [
-        b for b in banners
-        if b.campaign.start_date <= today <= b.campaign.end_date
-    ]
-    
-    if not active_banners:
-        return ''
-    
-    # Разделяем баннеры на безлимитные и с расписанием
-    unlimited_banners = [b for b in active_banners if b.unlimited_impressions]
-    scheduled_banners = [b for b in active_banners if not b.unlimited_impressions]
-    
-    # Безлимитные баннеры добавляем сразу
-    valid_banners = list(unlimited_banners)
-    
-    # Для баннеров с выключенным безлимитным режимом проверяем расписание
-    for banner in scheduled_banners:
-        schedules = banner.schedules.filter(is_active=True)
-        
-        if not schedules.exists():
-            # Нет расписания - показываем всегда (по умолчанию безлимитно)
-            valid_banners.append(banner)
-        else:
-            # Есть расписание - проверяем
-            for schedule in schedules:
-                if schedule.can_show():
-                    valid_banners.append(banner)
-                    break
-    
-    if not valid_banners:
-        return ''
-    
-    # Выбираем баннер по весу (для A/B тестирования)
-    total_weight = sum(b.weight for b in valid_banners)
-    random_weight = random.randint(1, total_weight)
-    
-    current_weight = 0
-    selected_banner = valid_banners[0]
-    
-    for banner in valid_banners:
-        current_weight += banner.weight
-        if random_weight <= current_weight:
-            selected_banner = banner
-            break
-    
-    # Генерируем HTML
-    html = render_banner_html(selected_banner, place)
-    
-    # Кэшируем на 5 минут
-    cache.set(cache_key, html, 300)
-    
-    return mark_safe(html)
+    # Выбор по весу на каждый запрос из снимка в памяти; кешируется только HTML баннеров
+    return mark_safe(ad_engine.render(place_code))
 
 
 @register.simple_tag
@@ -275,39 +205,16 @@ def process_content_with_ads(content, max_ads=3):
     """
     if not content:
         return content
-    
-    # Получаем активные контекстные объявления
-    context_ads = ContextAd.objects.filter(
-        is_active=True,
-        campaign__is_active=True
-    ).select_related('campaign').order_by('-priority')[:10]
-    
-    if not context_ads:
-        return content
-    
-    # Ищем ключевые фразы в тексте
-    processed_content = content
-    ads_inserted = 0
-    
-    for ad in context_ads:
-        if ads_inserted >= max_ads:
-            break
-        
-        # Проверяем, есть ли ключевая фраза в тексте
-        if ad.keyword_phrase.lower() in processed_content.lower():
-            # Формируем рекламную ссылку
-            click_url = reverse('advertising:context_click', args=[ad.id])
-            ad_link = f'<a href="{click_url}" class="ad-context-link" data-ad-click="{ad.id}" data-ad-type="context" data-ad-context="{ad.id}" target="_blank">{ad.anchor_text}</a>'
-            
-            # Заменяем первое вхождение фразы
-            processed_content = processed_content.replace(
-                ad.keyword_phrase,
-                ad_link,
-                1
-            )
-            ads_inserted += 1
-    
-    return mark_safe(processed_content)
+    return mark_safe(context_ad_engine.insert(content, int(max_ads)))
+
+
+@register.simple_tag
+def post_content_with_ads(post, max_ads=3):
+    """
+    Контент статьи с контекстной рекламой (план вставки кешируется по статье)
+    Использование: {% post_content_with_ads post 2 %}
+    """
+    return mark_safe(context_ad_engine.insert(post.content, int(max_ads), post_id=post.pk))
 
 
 def render_card_content(card_num, banner, card_height):
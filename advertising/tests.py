@@ -5,7 +5,7 @@ from django.test import TestCase
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 from decimal import Decimal
-from datetime import timedelta
+from datetime import time, timedelta
 
 from .models import (
     AdPlace, Advertiser, AdCampaign, AdBanner, AdSchedule,
@@ -196,4 +196,504 @@ class ContextAdModelTest(TestCase):
         self.assertFalse(self.context_ad.is_active_now())
 
 
+
+class AdDecisionEngineTest(TestCase):
+    """Тесты движка выбора баннеров"""
+    
+    def setUp(self):
+        from .ad_engine import invalidate_ad_engine
+        
+        self.place = AdPlace.objects.create(name='Sidebar', code='sidebar_top')
+        advertiser = Advertiser.objects.create(name='Test Company', contact_email='test@example.com')
+        self.campaign = AdCampaign.objects.create(
+            advertiser=advertiser,
+            name='Test Campaign',
+            start_date=timezone.now().date(),
+            end_date=timezone.now().date() + timedelta(days=30)
+        )
+        self.heavy = AdBanner.objects.create(campaign=self.campaign, place=self.place, name='Heavy', weight=300)
+        self.light = AdBanner.objects.create(campaign=self.campaign, place=self.place, name='Light', weight=100)
+        invalidate_ad_engine()
+    
+    def test_alias_table_follows_weights(self):
+        """Тест распределения выбора по весам"""
+        import random
+        from .ad_engine import AliasTable
+        
+        table = AliasTable([1, 3])
+        rng = random.Random(42)
+        picks = [table.sample(rng) for _ in range(20000)]
+        self.assertAlmostEqual(picks.count(1) / len(picks), 0.75, delta=0.02)
+    
+    def test_rotation_without_queries(self):
+        """Тест ротации: после построения снимка выбор не обращается к БД"""
+        from .ad_engine import ad_engine
+        
+        ad_engine.snapshot()
+        with self.assertNumQueries(0):
+            names = {ad_engine.select('sidebar_top')[0].name for _ in range(200)}
+        self.assertEqual(names, {'Heavy', 'Light'})
+        self.assertIsNone(ad_engine.select('missing_place'))
+    
+    def test_schedule_and_daily_limit(self):
+        """Тест окна расписания и исчерпанного дневного лимита"""
+        from .ad_engine import ad_engine
+        
+        now = timezone.now()
+        AdSchedule.objects.create(
+            banner=self.light,
+            start_time=time(0, 0),
+            end_time=time(23, 59, 59, 999999),
+            max_impressions_per_day=10,
+            current_impressions=10,
+            last_reset_date=now.date(),
+        )
+        self.light.unlimited_impressions = False
+        self.light.save()
+        names = {ad_engine.select('sidebar_top', now)[0].name for _ in range(200)}
+        self.assertEqual(names, {'Heavy'})
+
+
+
+class ContextAdEngineTest(TestCase):
+    """Тесты вставки контекстной рекламы"""
+    
+    def setUp(self):
+        from .ad_engine import invalidate_ad_engine
+        
+        advertiser = Advertiser.objects.create(name='Test Company', contact_email='test@example.com')
+        campaign = AdCampaign.objects.create(
+            advertiser=advertiser,
+            name='Test Campaign',
+            start_date=timezone.now().date(),
+            end_date=timezone.now().date() + timedelta(days=30)
+        )
+        self.phone = ContextAd.objects.create(
+            campaign=campaign, keyword_phrase='купить телефон', anchor_text='лучшие телефоны',
+            target_url='https://example.com/phones', priority=8
+        )
+        self.short = ContextAd.objects.create(
+            campaign=campaign, keyword_phrase='телефон', anchor_text='телефоны',
+            target_url='https://example.com/short', priority=3, max_insertions_per_article=2
+        )
+        invalidate_ad_engine()
+    
+    def test_only_text_nodes(self):
+        """Тест: фразы в атрибутах, ссылках и заголовках не заменяются"""
+        from .context_engine import context_ad_engine
+        
+        content = (
+            '<h2>Купить телефон</h2>'
+            '<p title="купить телефон">Где <a href="/x">купить телефон</a>? '
+            'Решили Купить  телефон, потом ещё телефон и телефонный кабель.</p>'
+        )
+        result = context_ad_engine.insert(content, max_ads=5)
+        
+        self.assertIn('<h2>Купить телефон</h2>', result)
+        self.assertIn('title="купить телефон"', result)
+        self.assertIn('<a href="/x">купить телефон</a>', result)
+        self.assertEqual(result.count(f'data-ad-context="{self.phone.id}"'), 1)
+        self.assertEqual(result.count(f'data-ad-context="{self.short.id}"'), 1)
+        self.assertIn('телефонный кабель', result)
+    
+    def test_plan_is_cached(self):
+        """Тест: повторная вставка для той же статьи не сканирует текст"""
+        from unittest import mock
+        from .context_engine import ContextAdSnapshot, context_ad_engine
+        
+        content = '<p>Хочу купить телефон.</p>'
+        first = context_ad_engine.insert(content, max_ads=2, post_id=1)
+        with mock.patch.object(ContextAdSnapshot, 'plan', side_effect=AssertionError):
+            self.assertEqual(context_ad_engine.insert(content, max_ads=2, post_id=1), first)
+        self.assertEqual(context_ad_engine.insert(content, max_ads=0, post_id=1), content)
+
+
+
+class AdEventSpoolTest(TestCase):
+    """Тесты обработки очереди показов и кликов"""
+    
+    def setUp(self):
+        place = AdPlace.objects.create(name='Sidebar', code='sidebar_top')
+        advertiser = Advertiser.objects.create(name='Test Company', contact_email='test@example.com')
+        self.campaign = AdCampaign.objects.create(
+            advertiser=advertiser,
+            name='Test Campaign',
+            cost_per_click=Decimal('5.00'),
+            cost_per_impression=Decimal('100.00'),
+            start_date=timezone.now().date(),
+            end_date=timezone.now().date() + timedelta(days=30)
+        )
+        self.banner = AdBanner.objects.create(campaign=self.campaign, place=place, name='Banner')
+    
+    def test_drain_updates_counters_and_rollups(self):
+        """Тест: сырые записи, счётчики, расход и почасовой агрегат"""
+        from .event_spool import drain_events_list
+        from .models import AdClick, AdImpression, AdPerformanceML
+        
+        now = timezone.now().timestamp()
+        events = [
+            {'k': 'i', 'ts': now, 'b': self.banner.id, 'ip': '127.0.0.1', 'ua': 'iPhone Mobile'}
+            for _ in range(10)
+        ]
+        events.append({'k': 'c', 'ts': now, 'b': self.banner.id, 'ip': '127.0.0.1', 'ua': 'iPhone Mobile',
+                       'to': 'https://example.com'})
+        events.append({'k': 'i', 'ts': now, 'b': 999999, 'ip': '127.0.0.1'})
+        
+        result = drain_events_list(events)
+        
+        self.assertEqual(result, {'impressions': 10, 'clicks': 1})
+        self.assertEqual(AdImpression.objects.count(), 10)
+        self.assertEqual(AdClick.objects.count(), 1)
+        self.banner.refresh_from_db()
+        self.campaign.refresh_from_db()
+        self.assertEqual((self.banner.impressions, self.banner.clicks), (10, 1))
+        self.assertEqual(self.campaign.spent_amount, Decimal('6.00'))
+        
+        rollup = AdPerformanceML.objects.get()
+        self.assertEqual((rollup.impressions, rollup.clicks), (10, 1))
+        self.assertEqual(rollup.device_type, 'mobile')
+        self.assertEqual(rollup.ctr, Decimal('10.00'))
+        self.assertEqual(rollup.revenue, Decimal('6.00'))
+    
+    def test_sub_kopeck_revenue_is_not_lost(self):
+        """Тест: CPM показа дробнее копейки копится в агрегате без округления"""
+        from . import analytics
+        from .event_spool import drain_events_list
+        from .models import AdPerformanceML
+        
+        self.campaign.cost_per_impression = Decimal('1.00')
+        self.campaign.save()
+        now = timezone.now().timestamp()
+        for _ in range(5):
+            drain_events_list([{'k': 'i', 'ts': now, 'b': self.banner.id, 'ip': '127.0.0.1'}])
+        
+        self.assertEqual(AdPerformanceML.objects.get().revenue, Decimal('0.005'))
+        self.assertEqual(analytics.period_totals(timezone.localdate())['revenue'], Decimal('0.01'))
+    
+    def test_failed_file_is_retried(self):
+        """Тест: файл, упавший при обработке, возвращается в очередь"""
+        import os
+        import tempfile
+        from unittest import mock
+        from . import event_spool
+        from .models import AdImpression
+        
+        event = '{"k": "i", "ts": %f, "b": %d, "ip": "127.0.0.1"}\n' % (timezone.now().timestamp(), self.banner.id)
+        with tempfile.TemporaryDirectory() as spool_dir, mock.patch.object(event_spool, 'SPOOL_DIR', spool_dir), \
+                mock.patch.object(event_spool, 'ROTATE_GRACE', 0):
+            with open(event_spool._spool().path, 'w') as spool:
+                spool.write(event)
+            with mock.patch.object(event_spool, 'drain_events_list', side_effect=RuntimeError('db down')):
+                self.assertEqual(event_spool.drain_events()['failed'], 1)
+            
+            # До истечения FAILED_RETRY_SECONDS файл не трогается
+            self.assertEqual(event_spool.drain_events(), {'files': 0, 'impressions': 0, 'clicks': 0, 'failed': 1})
+            
+            result = event_spool.drain_events(retry_failed=True)
+            self.assertEqual((result['files'], result['impressions'], result['failed']), (1, 1, 0))
+            self.assertEqual(os.listdir(spool_dir), [])
+        self.assertEqual(AdImpression.objects.count(), 1)
+    
+    def test_rebuild_waits_for_drain_lock(self):
+        """Тест: пересчёт агрегатов не идёт параллельно с обработкой очереди"""
+        from unittest import mock
+        from django.core.cache import cache
+        from . import event_spool
+        
+        cache.set(event_spool.DRAIN_LOCK_KEY, 1, 60)
+        try:
+            with mock.patch.object(event_spool, 'REBUILD_LOCK_WAIT', 0):
+                with self.assertRaises(RuntimeError):
+                    event_spool.rebuild_rollups(timezone.localdate())
+        finally:
+            cache.delete(event_spool.DRAIN_LOCK_KEY)
+        
+        self.assertEqual(event_spool.rebuild_rollups(timezone.localdate()), 0)
+        self.assertIsNone(cache.get(event_spool.DRAIN_LOCK_KEY))
+
+
 # Добавим тесты для других моделей по мере необходимости
+
+
+class AdAnalyticsTest(TestCase):
+    """Тесты отчётов по почасовым агрегатам и потокового CSV"""
+    
+    def setUp(self):
+        from .models import AdPerformanceML
+        
+        self.today = timezone.now().date()
+        self.yesterday = self.today - timedelta(days=1)
+        self.sidebar = AdPlace.objects.create(name='Sidebar', code='sidebar_top')
+        self.header = AdPlace.objects.create(name='Header', code='header_banner')
+        self.brand = Advertiser.objects.create(name='Brand', contact_email='brand@example.com')
+        self.shop = Advertiser.objects.create(name='Shop', contact_email='shop@example.com')
+        period = dict(start_date=self.today - timedelta(days=60), end_date=self.today + timedelta(days=30))
+        brand_campaign = AdCampaign.objects.create(advertiser=self.brand, name='Brand', **period)
+        shop_campaign = AdCampaign.objects.create(advertiser=self.shop, name='Shop', **period)
+        self.sidebar_banner = AdBanner.objects.create(campaign=brand_campaign, place=self.sidebar, name='Боковой')
+        self.header_banner = AdBanner.objects.create(campaign=brand_campaign, place=self.header, name='Шапка')
+        self.context_ad = ContextAd.objects.create(
+            campaign=shop_campaign, keyword_phrase='крем', anchor_text='крем для лица',
+            target_url='https://example.com', cost_per_click=Decimal('1.00'),
+        )
+        
+        def rollup(date, hour, impressions, clicks, revenue, banner=None, context_ad=None):
+            AdPerformanceML.objects.create(
+                date=date, hour=hour, day_of_week=date.weekday(),
+                ad_place=banner.place if banner else None, banner=banner, context_ad=context_ad,
+                impressions=impressions, clicks=clicks, revenue=Decimal(revenue),
+            )
+        
+        # Доход — двоичные дроби: суммы точны в любой БД, половина копейки округляется вверх
+        rollup(self.today, 10, 100, 5, '0.0625', banner=self.sidebar_banner)
+        rollup(self.today, 11, 100, 5, '0.0625', banner=self.sidebar_banner)
+        rollup(self.yesterday, 9, 50, 12, '12.375', banner=self.header_banner)
+        rollup(self.yesterday, 9, 20, 1, '1', context_ad=self.context_ad)
+        rollup(self.today - timedelta(days=40), 9, 1000, 100, '500', banner=self.sidebar_banner)
+    
+    def test_period_totals(self):
+        from .analytics import period_totals
+        
+        totals = period_totals(self.yesterday)
+        self.assertEqual((totals['impressions'], totals['clicks']), (270, 23))
+        self.assertEqual(totals['revenue'], Decimal('13.50'))
+        self.assertAlmostEqual(totals['ctr'], 23 / 270 * 100)
+        
+        self.assertEqual(period_totals(self.yesterday, self.yesterday)['impressions'], 70)
+        empty = period_totals(self.today + timedelta(days=1))
+        self.assertEqual(empty, {'impressions': 0, 'clicks': 0, 'revenue': Decimal('0.00'), 'ctr': 0})
+    
+    def test_top_places(self):
+        from .analytics import top_places
+        
+        places = top_places(self.yesterday)
+        self.assertEqual([place.code for place in places], ['header_banner', 'sidebar_top'])
+        self.assertEqual((places[0].total_impressions, places[0].total_clicks), (50, 12))
+        self.assertEqual([place.code for place in top_places(self.yesterday, limit=1)], ['header_banner'])
+        self.assertEqual(top_places(self.today + timedelta(days=1)), [])
+    
+    def test_revenue_by_day(self):
+        from .analytics import revenue_by_day
+        
+        self.assertEqual(revenue_by_day(3, today=self.today), [
+            {'date': (self.today - timedelta(days=2)).strftime('%d.%m'), 'revenue': 0.0},
+            {'date': self.yesterday.strftime('%d.%m'), 'revenue': 13.38},
+            {'date': self.today.strftime('%d.%m'), 'revenue': 0.13},
+        ])
+    
+    def test_totals_by_advertiser(self):
+        from .analytics import totals_by_advertiser
+        
+        totals = totals_by_advertiser(self.yesterday)
+        self.assertEqual(set(totals), {self.brand.id, self.shop.id})
+        self.assertEqual(
+            {key: totals[self.brand.id][key] for key in ('impressions', 'clicks', 'revenue')},
+            {'impressions': 250, 'clicks': 22, 'revenue': Decimal('12.50')},
+        )
+        self.assertEqual(totals[self.shop.id]['revenue'], Decimal('1.00'))
+        self.assertAlmostEqual(totals[self.shop.id]['ctr'], 5.0)
+        self.assertEqual(list(totals_by_advertiser(self.yesterday, advertiser_ids=[self.shop.id])), [self.shop.id])
+    
+    def test_export_rows_group_modes(self):
+        from .analytics import export_rows
+        
+        yesterday, today = self.yesterday.isoformat(), self.today.isoformat()
+        self.assertEqual(list(export_rows(self.yesterday)), [
+            [yesterday, 70, 13, '18.57', '13.38'],
+            [today, 200, 10, '5.00', '0.13'],
+        ])
+        self.assertCountEqual(list(export_rows(self.yesterday, self.yesterday, group='place')), [
+            [yesterday, 'Контекстная реклама', 20, 1, '5.00', '1.00'],
+            [yesterday, 'header_banner', 50, 12, '24.00', '12.38'],
+        ])
+        self.assertCountEqual(list(export_rows(self.yesterday, self.yesterday, group='banner')), [
+            [yesterday, 'крем для лица', 20, 1, '5.00', '1.00'],
+            [yesterday, 'Шапка', 50, 12, '24.00', '12.38'],
+        ])
+        self.assertEqual(list(export_rows(self.today + timedelta(days=1))), [])
+    
+    def _export(self, **params):
+        import csv
+        from django.test import RequestFactory
+        from .views import analytics_export
+        
+        request = RequestFactory().get('/advertising/analytics/export/', params)
+        request.user = User.objects.create_user(username=f'staff{User.objects.count()}', is_staff=True)
+        response = analytics_export(request)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        content = b''.join(response.streaming_content).decode('utf-8')
+        self.assertTrue(content.startswith('\ufeff'))
+        return response, list(csv.reader(content[1:].splitlines()))
+    
+    def test_analytics_export_csv(self):
+        response, rows = self._export(days=1, group='place')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="advertising_analytics_place_1d.csv"')
+        self.assertEqual(rows[0], ['Дата', 'Место', 'Показы', 'Клики', 'CTR', 'Доход'])
+        self.assertIn([self.yesterday.isoformat(), 'header_banner', '50', '12', '24.00', '12.38'], rows)
+        self.assertIn([self.today.isoformat(), 'sidebar_top', '200', '10', '5.00', '0.13'], rows)
+        self.assertEqual(len(rows), 4)
+        
+        _, rows = self._export(days=1, group='banner')
+        self.assertEqual(rows[0][1], 'Объявление')
+        
+        # Неизвестная группировка — по дням
+        _, rows = self._export(days=1, group='nope')
+        self.assertEqual(rows, [
+            ['Дата', 'Показы', 'Клики', 'CTR', 'Доход'],
+            [self.yesterday.isoformat(), '70', '13', '18.57', '13.38'],
+            [self.today.isoformat(), '200', '10', '5.00', '0.13'],
+        ])
+    
+    def test_analytics_export_empty_period(self):
+        from .models import AdPerformanceML
+        
+        AdPerformanceML.objects.all().delete()
+        _, rows = self._export()
+        self.assertEqual(rows, [['Дата', 'Показы', 'Клики', 'CTR', 'Доход']])
+
+
+class AdPlacementOptimizerTest(TestCase):
+    """Тесты векторного прогноза по сетке кандидатов и кеша моделей по mtime"""
+    
+    def setUp(self):
+        import shutil
+        import tempfile
+        from unittest import mock
+        from django.test import override_settings
+        from . import ml_optimizer
+        
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+        cache_patcher = mock.patch.dict(ml_optimizer._artifact_cache, clear=True)
+        cache_patcher.start()
+        self.addCleanup(cache_patcher.stop)
+        self.ml = ml_optimizer
+    
+    def fit_models(self):
+        """Линейные модели: CTR = 5 на 'top', 1 на других местах, +2 на mobile; доход = 10 × CTR"""
+        import pandas as pd
+        from sklearn.linear_model import LinearRegression
+        
+        rows = [
+            {
+                'ad_place__code': place, 'hour': hour, 'day_of_week': 2, 'category': '',
+                'device_type': device, 'user_type': 'guest',
+                'ctr': (5 if place == 'top' else 1) + (2 if device == 'mobile' else 0),
+            }
+            for place in ('top', 'side') for hour in (8, 12, 20) for device in ('desktop', 'mobile')
+        ]
+        data = pd.DataFrame(rows)
+        data['revenue'] = data['ctr'] * 10
+        optimizer = self.ml.AdPlacementOptimizer()
+        X, y_ctr, y_revenue = optimizer.prepare_features(data)
+        self.ml.save_artifact(self.ml.CTR_MODEL_FILE, LinearRegression().fit(X, y_ctr))
+        self.ml.save_artifact(self.ml.REVENUE_MODEL_FILE, LinearRegression().fit(X, y_revenue))
+        self.ml.save_artifact(self.ml.FEATURE_COLUMNS_FILE, optimizer.feature_columns)
+        return optimizer.feature_columns
+    
+    def test_candidate_grid_shape(self):
+        frame = self.ml.build_candidate_frame(['a', 'b'], 3, ('desktop', 'mobile', 'tablet'), ('guest', 'author'))
+        self.assertEqual(len(frame), 2 * 24 * 3 * 2)
+        self.assertEqual(
+            list(frame.columns),
+            ['ad_place__code', 'hour', 'day_of_week', 'category', 'device_type', 'user_type'],
+        )
+        self.assertEqual(frame.iloc[0].tolist(), ['a', 0, 3, '', 'desktop', 'guest'])
+        self.assertEqual(frame.iloc[-1].tolist(), ['b', 23, 3, '', 'tablet', 'author'])
+    
+    def test_align_features_column_order(self):
+        columns = ['hour_cos', 'device_type_mobile', 'ad_place__code_top', 'never_seen', 'hour', 'is_weekend']
+        frame = self.ml.build_candidate_frame(['top', 'unknown'], 6, ('mobile', 'smart-tv'), ('guest',), hours=[0, 12])
+        X = self.ml.align_features(frame, columns)
+        
+        self.assertEqual(list(X.columns), columns)
+        self.assertTrue((X.dtypes == 'float64').all())
+        self.assertEqual(X['ad_place__code_top'].tolist(), [1, 1, 1, 1, 0, 0, 0, 0])
+        self.assertEqual(X['device_type_mobile'].tolist(), [1, 0, 1, 0] * 2)
+        self.assertEqual(X['never_seen'].sum(), 0)
+        self.assertEqual(X['is_weekend'].tolist(), [1] * 8)
+        self.assertAlmostEqual(X['hour_cos'].iloc[2], -1.0)
+    
+    def test_score_places_is_vectorized(self):
+        from unittest import mock
+        from sklearn.linear_model import LinearRegression
+        
+        feature_columns = self.fit_models()
+        self.assertEqual(self.ml.feature_levels(feature_columns, 'device_type_', ()), ('desktop', 'mobile'))
+        
+        predict = LinearRegression.predict
+        with mock.patch.object(LinearRegression, 'predict', autospec=True, side_effect=predict) as calls:
+            summary = self.ml.AdPlacementOptimizer().score_places(['side', 'top', 'new'], day_of_week=2)
+        
+        # Одна матрица на все места: 3 места × 24 часа × 2 устройства × 1 тип пользователя
+        self.assertEqual(calls.call_count, 2)
+        self.assertEqual([call.args[1].shape for call in calls.call_args_list], [(144, len(feature_columns))] * 2)
+        
+        self.assertEqual(list(summary.index), ['side', 'top', 'new'])
+        self.assertAlmostEqual(summary.at['top', 'predicted_ctr'], 6.0, places=6)
+        self.assertAlmostEqual(summary.at['side', 'predicted_ctr'], 2.0, places=6)
+        self.assertAlmostEqual(summary.at['top', 'predicted_revenue'], 60.0 * 48, places=3)
+        self.assertEqual(summary.at['top', 'best_device'], 'mobile')
+        self.assertEqual(summary['confidence'].tolist(), [self.ml.DEFAULT_CONFIDENCE] * 3)
+        
+        self.ml.save_artifact(self.ml.MODEL_META_FILE, {
+            'ctr_r2': 0.9, 'revenue_r2': 0.8,
+            'samples_by_place': {'top': self.ml.MIN_SAMPLES_PER_PLACE, 'side': self.ml.MIN_SAMPLES_PER_PLACE // 2},
+        })
+        summary = self.ml.AdPlacementOptimizer().score_places(['side', 'top', 'new'], day_of_week=2)
+        self.assertEqual(summary['confidence'].tolist(), [40, 80, 0])
+    
+    def test_load_artifact_reloads_on_mtime_change(self):
+        import os
+        from unittest import mock
+        import joblib
+        
+        with self.assertRaises(FileNotFoundError):
+            self.ml.load_artifact('missing.pkl')
+        
+        self.ml.save_artifact('columns.pkl', ['a', 'b'])
+        with mock.patch('joblib.load', side_effect=joblib.load) as load:
+            first = self.ml.load_artifact('columns.pkl')
+            self.assertIs(self.ml.load_artifact('columns.pkl'), first)
+            self.assertEqual(load.call_count, 1)
+            
+            path = os.path.join(self.ml.get_models_dir(), 'columns.pkl')
+            self.ml.save_artifact('columns.pkl', ['a', 'b', 'c'])
+            stat = os.stat(path)
+            os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+            self.assertEqual(self.ml.load_artifact('columns.pkl'), ['a', 'b', 'c'])
+            self.assertEqual(load.call_count, 2)
+    
+    def test_generate_recommendations(self):
+        from .models import AdRecommendation
+        
+        self.assertEqual(self.ml.AdPlacementOptimizer().generate_recommendations(), 0)
+        
+        top = AdPlace.objects.create(name='Top', code='top')
+        AdPlace.objects.create(name='Side', code='side')
+        advertiser = Advertiser.objects.create(name='Brand', contact_email='brand@example.com')
+        period = dict(start_date=timezone.now().date(), end_date=timezone.now().date() + timedelta(days=30))
+        rich = AdCampaign.objects.create(advertiser=advertiser, name='Rich', budget=Decimal('9000'), **period)
+        AdCampaign.objects.create(advertiser=advertiser, name='Poor', budget=Decimal('100'), **period)
+        AdBanner.objects.create(campaign=rich, place=top, name='Занято')
+        
+        # Модели не обучены — рекомендаций нет
+        self.assertEqual(self.ml.AdPlacementOptimizer().generate_recommendations(), 0)
+        
+        self.fit_models()
+        self.assertEqual(self.ml.AdPlacementOptimizer().generate_recommendations(top_n=10, day_of_week=2), 3)
+        recommendations = list(AdRecommendation.objects.order_by('id'))
+        self.assertEqual(
+            [(rec.place.code, rec.campaign.name) for rec in recommendations],
+            [('top', 'Poor'), ('side', 'Rich'), ('side', 'Poor')],
+        )
+        self.assertEqual(recommendations[0].predicted_ctr, Decimal('6.00'))
+        self.assertEqual(recommendations[0].predicted_revenue, Decimal('2880.00'))
+        self.assertIn('mobile', recommendations[0].recommendation_reason)
+        
+        AdRecommendation.objects.all().delete()
+        self.assertEqual(self.ml.AdPlacementOptimizer().generate_recommendations(top_n=2, day_of_week=2), 2)
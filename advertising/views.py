@@ -5,19 +5,20 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.http import JsonResponse, HttpResponse
 from django.views.decorators.http import require_POST, require_http_methods
 from django.views.decorators.csrf import csrf_exempt, ensure_csrf_cookie
-from django.db.models import Sum, Count, Q, F, Avg
+from django.db.models import Sum, F, Avg
 from django.utils import timezone
 from django.contrib import messages
 from datetime import timedelta, datetime
 from decimal import Decimal
 from urllib.parse import unquote
-from collections import defaultdict
 import json
 
+from . import analytics
 from .decorators import marketing_required
+from .event_spool import record_click, record_impression
 from .models import (
     AdPlace, Advertiser, AdCampaign, AdBanner, AdSchedule,
-    ContextAd, AdInsertion, AdClick, AdImpression,
+    ContextAd, AdInsertion, AdClick,
     AdPerformanceML, AdRecommendation, ExternalScript, AdsTxtSettings
 )
 from blog.models import Post
@@ -55,16 +56,8 @@ def banner_click_redirect(request, banner_id):
     if not request.session.session_key:
         request.session.create()
     
-    # Сохраняем клик
-    AdClick.objects.create(
-        ad_banner=banner,
-        user=request.user if request.user.is_authenticated else None,
-        session_key=request.session.session_key or '',
-        ip_address=get_client_ip(request),
-        user_agent=request.META.get('HTTP_USER_AGENT', '')[:500],
-        referer=request.META.get('HTTP_REFERER', ''),
-        redirect_url=target_url
-    )
+    # Клик уходит в очередь событий (запись в БД — фоновой задачей)
+    record_click(request, get_client_ip(request), target_url, banner_id=banner.id)
     
     return redirect(target_url)
 
@@ -77,16 +70,8 @@ def context_click_redirect(request, context_ad_id):
     if not request.session.session_key:
         request.session.create()
     
-    # Сохраняем клик
-    AdClick.objects.create(
-        context_ad=context_ad,
-        user=request.user if request.user.is_authenticated else None,
-        session_key=request.session.session_key or '',
-        ip_address=get_client_ip(request),
-        user_agent=request.META.get('HTTP_USER_AGENT', '')[:500],
-        referer=request.META.get('HTTP_REFERER', ''),
-        redirect_url=context_ad.target_url
-    )
+    # Клик уходит в очередь событий (запись в БД — фоновой задачей)
+    record_click(request, get_client_ip(request), context_ad.target_url, context_ad_id=context_ad.id)
     
     return redirect(context_ad.target_url)
 
@@ -99,16 +84,10 @@ def insertion_click_redirect(request, insertion_id):
     if not request.session.session_key:
         request.session.create()
     
-    # Сохраняем клик
-    AdClick.objects.create(
-        context_ad=insertion.context_ad,
-        ad_insertion=insertion,
-        user=request.user if request.user.is_authenticated else None,
-        session_key=request.session.session_key or '',
-        ip_address=get_client_ip(request),
-        user_agent=request.META.get('HTTP_USER_AGENT', '')[:500],
-        referer=request.META.get('HTTP_REFERER', ''),
-        redirect_url=insertion.context_ad.target_url
+    # Клик уходит в очередь событий (запись в БД — фоновой задачей)
+    record_click(
+        request, get_client_ip(request), insertion.context_ad.target_url,
+        context_ad_id=insertion.context_ad_id, insertion_id=insertion.id
     )
     
     return redirect(insertion.context_ad.target_url)
@@ -128,33 +107,20 @@ def track_impression(request):
         viewport_position = data.get('viewport_position', 'middle')
         time_visible = data.get('time_visible', 0)
         
-        impression_data = {
-            'user': request.user if request.user.is_authenticated else None,
-            'session_key': request.session.session_key,
-            'ip_address': get_client_ip(request),
-            'user_agent': request.META.get('HTTP_USER_AGENT', '')[:500],
-            'viewport_position': viewport_position,
-            'time_visible': time_visible,
+        ids = {
+            'banner': 'banner_id',
+            'context': 'context_ad_id',
+            'insertion': 'insertion_id',
         }
-        
-        if ad_type == 'banner':
-            banner = AdBanner.objects.filter(id=ad_id, is_active=True).first()
-            if banner:
-                impression_data['ad_banner'] = banner
-                AdImpression.objects.create(**impression_data)
-        
-        elif ad_type == 'context':
-            context_ad = ContextAd.objects.filter(id=ad_id, is_active=True).first()
-            if context_ad:
-                impression_data['context_ad'] = context_ad
-                AdImpression.objects.create(**impression_data)
-        
-        elif ad_type == 'insertion':
-            insertion = AdInsertion.objects.filter(id=ad_id, is_active=True).first()
-            if insertion:
-                impression_data['context_ad'] = insertion.context_ad
-                impression_data['ad_insertion'] = insertion
-                AdImpression.objects.create(**impression_data)
+        if ad_type in ids and ad_id:
+            # Без запросов к БД: проверка объявления и запись — при обработке очереди
+            record_impression(
+                request,
+                get_client_ip(request),
+                viewport_position=str(viewport_position or ''),
+                time_visible=int(time_visible or 0),
+                **{ids[ad_type]: int(ad_id)},
+            )
         
         return JsonResponse({'status': 'ok'})
     
@@ -172,10 +138,11 @@ def advertising_dashboard(request):
     days = int(request.GET.get('days', 7))
     date_from = timezone.now().date() - timedelta(days=days)
     
-    # Общая статистика
-    total_impressions = AdImpression.objects.filter(shown_at__date__gte=date_from).count()
-    total_clicks = AdClick.objects.filter(clicked_at__date__gte=date_from).count()
-    avg_ctr = (total_clicks / total_impressions * 100) if total_impressions > 0 else 0
+    # Общая статистика — из почасовых агрегатов, без сканирования сырых таблиц
+    totals = analytics.period_totals(date_from)
+    total_impressions = totals['impressions']
+    total_clicks = totals['clicks']
+    avg_ctr = totals['ctr']
     
     # Доход за период
     campaigns = AdCampaign.objects.all()
@@ -184,13 +151,8 @@ def advertising_dashboard(request):
     # Активные кампании
     active_campaigns = campaigns.filter(is_active=True).count()
     
-    # Топ-5 мест по эффективности - ОПТИМИЗИРОВАНО
-    top_places = AdPlace.objects.filter(
-        banners__impression_records__shown_at__date__gte=date_from
-    ).annotate(
-        total_impressions=Count('banners__impression_records', filter=Q(banners__impression_records__shown_at__date__gte=date_from)),
-        total_clicks=Count('banners__click_records', filter=Q(banners__click_records__clicked_at__date__gte=date_from))
-    ).order_by('-total_clicks')[:5]
+    # Топ-5 мест по эффективности
+    top_places = analytics.top_places(date_from, limit=5)
     
     # Топ-5 рекламодателей - ОПТИМИЗИРОВАНО
     top_advertisers = Advertiser.objects.filter(
@@ -207,35 +169,8 @@ def advertising_dashboard(request):
         is_applied=False
     ).order_by('-confidence_score', '-predicted_revenue')[:5]
     
-    # График дохода по дням (последние N дней) - ОПТИМИЗИРОВАНО
-    # Используем агрегацию вместо цикла по каждому клику
-    revenue_by_day = []
-    
-    # Получаем все клики за период одним запросом с select_related
-    clicks = AdClick.objects.filter(
-        clicked_at__date__gte=date_from
-    ).select_related('ad_banner__campaign', 'context_ad').only(
-        'clicked_at', 'ad_banner__campaign__cost_per_click', 'context_ad__cost_per_click'
-    )
-    
-    # Группируем по дням и считаем доход
-    daily_revenue = defaultdict(Decimal)
-    
-    for click in clicks:
-        day = click.clicked_at.date()
-        if click.ad_banner and click.ad_banner.campaign:
-            daily_revenue[day] += click.ad_banner.campaign.cost_per_click
-        elif click.context_ad:
-            daily_revenue[day] += click.context_ad.cost_per_click
-    
-    # Формируем массив для графика
-    for i in range(days):
-        day = timezone.now().date() - timedelta(days=days-i-1)
-        revenue = daily_revenue.get(day, Decimal('0.00'))
-        revenue_by_day.append({
-            'date': day.strftime('%d.%m'),
-            'revenue': float(revenue)
-        })
+    # График дохода по дням (последние N дней)
+    revenue_by_day = analytics.revenue_by_day(days)
     
     # Внешние скрипты - ОПТИМИЗИРОВАНО (кэшируем на 5 минут)
     from django.core.cache import cache as django_cache
@@ -703,29 +638,19 @@ def analytics_dashboard(request):
     days = int(request.GET.get('days', 30))
     date_from = timezone.now().date() - timedelta(days=days)
     
-    # Статистика по рекламодателям
+    # Статистика по рекламодателям — из почасовых агрегатов
+    advertisers = list(Advertiser.objects.filter(is_active=True))
+    totals = analytics.totals_by_advertiser(date_from, [advertiser.id for advertiser in advertisers])
+    empty = {'impressions': 0, 'clicks': 0, 'ctr': 0}
     advertisers_stats = []
-    for advertiser in Advertiser.objects.filter(is_active=True):
-        campaigns = advertiser.campaigns.filter(
-            created_at__date__gte=date_from
-        )
-        
-        total_impressions = AdImpression.objects.filter(
-            ad_banner__campaign__in=campaigns,
-            shown_at__date__gte=date_from
-        ).count()
-        
-        total_clicks = AdClick.objects.filter(
-            ad_banner__campaign__in=campaigns,
-            clicked_at__date__gte=date_from
-        ).count()
-        
+    for advertiser in advertisers:
+        stats = totals.get(advertiser.id, empty)
         advertisers_stats.append({
             'advertiser': advertiser,
             'total_spent': advertiser.total_spent,
-            'impressions': total_impressions,
-            'clicks': total_clicks,
-            'ctr': (total_clicks / total_impressions * 100) if total_impressions > 0 else 0
+            'impressions': stats['impressions'],
+            'clicks': stats['clicks'],
+            'ctr': stats['ctr'],
         })
     
     context = {
@@ -740,19 +665,42 @@ def analytics_dashboard(request):
 
 @marketing_required
 def analytics_export(request):
-    """Экспорт аналитики в CSV"""
+    """
+    Экспорт аналитики в CSV (потоково, из почасовых агрегатов)
+    
+    Параметры: days (по умолчанию 30), group = day | place | banner
+    """
     import csv
     from django.http import StreamingHttpResponse
     
-    # TODO: Реализовать экспорт
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="advertising_analytics.csv"'
+    days = int(request.GET.get('days', 30))
+    group = request.GET.get('group', 'day')
+    if group not in analytics.EXPORT_GROUPS:
+        group = 'day'
+    date_from = timezone.now().date() - timedelta(days=days)
+    
+    class Echo:
+        """Псевдо-файл: csv.writer возвращает строку вместо записи"""
+        def write(self, value):
+            return value
+    
+    header = ['Дата']
+    if group == 'place':
+        header.append('Место')
+    elif group == 'banner':
+        header.append('Объявление')
+    header += ['Показы', 'Клики', 'CTR', 'Доход']
     
-    writer = csv.writer(response)
-    writer.writerow(['Дата', 'Показы', 'Клики', 'CTR', 'Доход'])
+    writer = csv.writer(Echo())
     
-    # TODO: Добавить данные
+    def stream():
+        # BOM — чтобы Excel открыл кириллицу в UTF-8
+        yield '\ufeff' + writer.writerow(header)
+        for row in analytics.export_rows(date_from, group=group):
+            yield writer.writerow(row)
     
+    response = StreamingHttpResponse(stream(), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="advertising_analytics_{group}_{days}d.csv"'
     return response
 
 
@@ -68,6 +68,7 @@ def toggle_like(request, post_id):
                 action = 'added'
         
         # Получаем обновленную статистику
+        post.refresh_from_db(fields=['likes_count'])
         likes_count = post.get_likes_count()
         likes_by_type = list(post.get_likes_by_type())
         
@@ -120,6 +121,7 @@ def rate_post(request, post_id):
                 action = 'added'
         
         # Получаем обновленную статистику
+        post.refresh_from_db(fields=['ratings_count', 'ratings_sum'])
         average_rating = post.get_average_rating()
         ratings_count = post.get_ratings_count()
         user_rating = post.get_user_rating(request.user)
@@ -159,6 +161,7 @@ def toggle_bookmark(request, post_id):
                 action = 'added'
         
         # Получаем обновленную статистику
+        post.refresh_from_db(fields=['bookmarks_count'])
         bookmarks_count = post.get_bookmarks_count()
         is_bookmarked = post.is_bookmarked_by_user(request.user)
         
@@ -265,22 +268,19 @@ def create_comment_reply(request):
 @require_POST
 @csrf_exempt
 def increment_post_views(request, post_id):
-    """Увеличение счётчика просмотров статьи (для AJAX)"""
-    try:
-        from django.db.models import F
-        
-        post = get_object_or_404(Post, id=post_id)
-        
-        # Увеличиваем счетчик просмотров БЕЗ вызова сигналов
-        Post.objects.filter(pk=post.pk).update(views=F('views') + 1)
-        
-        # Получаем обновленное значение
-        post.refresh_from_db()
-        
-        return JsonResponse({
-            'success': True,
-            'views': post.views
-        })
-        
-    except Exception as e:
-        return JsonResponse({'error': str(e)}, status=500)
\ No newline at end of file
+    """
+    Учёт просмотра статьи из ленты «ещё из категории» (для AJAX).
+
+    Просмотр идёт в тот же буфер, что и у ViewCounterMiddleware, и попадает
+    в БД при flush_views; в ответе — записанные просмотры плюс буфер процесса.
+    """
+    from .view_counter import is_bot, pending_views, record_view
+
+    post = get_object_or_404(Post.objects.only('slug', 'views'), id=post_id)
+    if not is_bot(request):
+        record_view(post.slug)
+
+    return JsonResponse({
+        'success': True,
+        'views': post.views + pending_views(post.slug)
+    })
\ No newline at end of file
@@ -0,0 +1,88 @@
+"""
+Денормализованные счётчики вовлечённости статьи
+
+Лайки, оценки, закладки и активные комментарии хранятся в колонках Post
+(likes_count, ratings_count, ratings_sum, bookmarks_count, comments_count),
+чтобы карточки в списках, JSON-LD и API не делали 4–6 агрегирующих
+запросов на каждую статью.
+
+Счётчики пересчитываются одним UPDATE с подзапросами в той же транзакции,
+что и запись Like / PostRating / Bookmark / Comment (сигналы blog.signals),
+поэтому не расходятся при гонках и изменениях (смена оценки, скрытие
+комментария). Изменения в обход сигналов (queryset.update, сырой SQL)
+исправляет команда reconcile_engagement — тем же выражением для всего
+архива пачками.
+"""
+import logging
+from typing import Iterable, Optional
+
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+logger = logging.getLogger(__name__)
+
+RECONCILE_BATCH_SIZE = 5000
+
+# Поле счётчика -> (модель, условие, агрегат)
+COUNTERS = {
+    'likes_count': ('Like', {}, Count),
+    'ratings_count': ('PostRating', {}, Count),
+    'ratings_sum': ('PostRating', {}, Sum),
+    'bookmarks_count': ('Bookmark', {}, Count),
+    'comments_count': ('Comment', {'active': True}, Count),
+}
+ENGAGEMENT_FIELDS = tuple(COUNTERS)
+
+
+def _counter_expression(field: str):
+    """Коррелированный подзапрос значения счётчика для строки Post"""
+    from .models import Comment
+    from .models_likes import Bookmark, Like, PostRating
+
+    name, conditions, aggregate = COUNTERS[field]
+    model = {'Like': Like, 'PostRating': PostRating, 'Bookmark': Bookmark, 'Comment': Comment}[name]
+    source = 'rating' if aggregate is Sum else 'pk'
+    value = (
+        model.objects.filter(post=OuterRef('pk'), **conditions)
+        .order_by()
+        .values('post')
+        .annotate(value=aggregate(source))
+        .values('value')
+    )
+    return Coalesce(Subquery(value, output_field=IntegerField()), Value(0))
+
+
+def refresh_counters(post_id: int, fields: Iterable[str] = ENGAGEMENT_FIELDS) -> None:
+    """Пересчитывает счётчики статьи одним UPDATE (вызывается в транзакции записи)"""
+    from .models import Post
+
+    Post.objects.filter(pk=post_id).update(**{field: _counter_expression(field) for field in fields})
+
+
+def reconcile_counters(fields: Iterable[str] = ENGAGEMENT_FIELDS, batch_size: int = RECONCILE_BATCH_SIZE,
+                       post_ids: Optional[Iterable[int]] = None) -> int:
+    """
+    Пересчитывает счётчики всех статей (или post_ids) пачками по диапазонам id.
+
+    Returns:
+        int: Количество обновлённых статей
+    """
+    from .models import Post
+
+    fields = list(fields)
+    updates = {field: _counter_expression(field) for field in fields}
+    queryset = Post.objects.all()
+    if post_ids is not None:
+        queryset = queryset.filter(pk__in=list(post_ids))
+
+    bounds = queryset.order_by().values_list('pk', flat=True)
+    first = bounds.order_by('pk').first()
+    last = bounds.order_by('-pk').first()
+    if first is None:
+        return 0
+
+    updated = 0
+    for start in range(first, last + 1, batch_size):
+        updated += queryset.filter(pk__gte=start, pk__lt=start + batch_size).update(**updates)
+    logger.info(f"🔄 Счётчики вовлечённости пересчитаны: {updated} статей ({', '.join(fields)})")
+    return updated
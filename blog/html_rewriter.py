@@ -0,0 +1,474 @@
+"""
+Однопроходный потоковый HTML-rewriter для пост-обработки ответов
+
+Заменяет цепочку «regex + str.replace на каждый тег»:
+- работает с bytes, без decode/encode всего ответа;
+- один проход токенизатора, все процессоры разделяют один разбор;
+- поддерживает StreamingHttpResponse (теги на границах чанков буферизуются);
+- результат для одинаковых ответов кэшируется по ETag.
+
+Процессоры подключаются через settings.HTML_POSTPROCESSORS (dotted paths).
+"""
+import hashlib
+import logging
+import re
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_POSTPROCESSORS = [
+    'blog.html_rewriter.LazyImageProcessor',
+    'blog.html_rewriter.CanonicalLinkProcessor',
+    'blog.html_rewriter.AdSlotProcessor',
+]
+
+# Элементы, внутри которых разметка не разбирается
+RAW_TEXT_TAGS = (b'script', b'style', b'textarea')
+_RAW_END_RES = {
+    name: re.compile(rb'</' + name + rb'[\s>]', re.IGNORECASE) for name in RAW_TEXT_TAGS
+}
+RAW_END_KEEP_BYTES = 16
+
+# Сколько байт незакрытого тега держать в буфере между чанками
+MAX_PENDING_TAG_BYTES = 8192
+
+_START_TAG_RE = re.compile(
+    rb'<([a-zA-Z][a-zA-Z0-9:-]*)((?:[^>"\']|"[^"]*"|\'[^\']*\')*)>'
+)
+_END_TAG_RE = re.compile(rb'</([a-zA-Z][a-zA-Z0-9:-]*)\s*>')
+_ATTR_RE = re.compile(
+    rb'([^\s"\'>/=]+)(?:\s*=\s*(?:"([^"]*)"|\'([^\']*)\'|([^\s"\'>]+)))?'
+)
+
+
+def parse_attrs(raw):
+    """Атрибуты тега в dict (имена в нижнем регистре, значения bytes)"""
+    attrs = {}
+    for match in _ATTR_RE.finditer(raw):
+        value = match.group(2)
+        if value is None:
+            value = match.group(3)
+        if value is None:
+            value = match.group(4) or b''
+        attrs.setdefault(match.group(1).lower(), value)
+    return attrs
+
+
+# Незакавыченное значение в конце тега: «/» перед «>» входит в значение (src=a/b/)
+_UNQUOTED_TAIL_RE = re.compile(rb'=\s*[^\s"\'=<>`]+$')
+
+
+def add_attribute(tag, attribute):
+    """Добавляет атрибут в конец открывающего тега (учитывает «/>»)"""
+    body = tag[:-1].rstrip()
+    if body.endswith(b'/') and not _UNQUOTED_TAIL_RE.search(body):
+        return body[:-1].rstrip() + b' ' + attribute + b' />'
+    return body + b' ' + attribute + b'>'
+
+
+# ============================================================================
+# ПРОЦЕССОРЫ
+# ============================================================================
+
+class HtmlPostProcessor:
+    """
+    Базовый процессор. Экземпляр создаётся на каждый ответ.
+
+    start_tags / end_tags — имена тегов (bytes, нижний регистр), на которые
+    процессор подписан; comments=True — получать HTML-комментарии.
+    Методы возвращают замену (bytes) или None, если тег не меняется.
+
+    cacheable=False — вывод процессора зависит не только от исходного HTML
+    (например, ротация рекламы), такой результат нельзя кэшировать по ETag.
+    """
+    start_tags = ()
+    end_tags = ()
+    comments = False
+    cacheable = True
+
+    def __init__(self, request, response):
+        self.request = request
+        self.response = response
+
+    @classmethod
+    def applies(cls, request, response):
+        return True
+
+    def start_tag(self, name, tag, attrs_raw):
+        return None
+
+    def end_tag(self, name, tag):
+        return None
+
+    def comment(self, tag):
+        return None
+
+
+class LazyImageProcessor(HtmlPostProcessor):
+    """
+    Добавляет loading="lazy" ко всем изображениям кроме первого.
+    Первое изображение получает loading="eager" (оптимизация LCP).
+    """
+    start_tags = (b'img',)
+
+    def __init__(self, request, response):
+        super().__init__(request, response)
+        self.count = 0
+
+    def start_tag(self, name, tag, attrs_raw):
+        self.count += 1
+        if b'loading=' in attrs_raw.lower():
+            return None
+        value = b'eager' if self.count == 1 else b'lazy'
+        return add_attribute(tag, b'loading="' + value + b'"')
+
+
+class CanonicalLinkProcessor(HtmlPostProcessor):
+    """
+    Вставляет <link rel="canonical"> перед </head>, если шаблон его не вывел.
+    Только на публичных страницах: админка и панели управления не индексируются.
+    """
+    start_tags = (b'link',)
+    end_tags = (b'head',)
+
+    # Непубличные разделы (settings.CANONICAL_EXCLUDED_PATHS)
+    EXCLUDED_PATHS = (
+        '/admin/',
+        '/ckeditor/',
+        '/api/',
+        '/asistent/',
+        '/schedules/',
+        '/sozseti/',
+        '/advertising/',
+        '/dashboard/',
+        '/donations/admin/',
+        '/visitor/superuser/',
+        '/__reload__/',
+    )
+
+    def __init__(self, request, response):
+        super().__init__(request, response)
+        self.seen = False
+
+    @classmethod
+    def applies(cls, request, response):
+        if request is None or response.status_code != 200 or request.method not in ('GET', 'HEAD'):
+            return False
+        if 'noindex' in response.get('X-Robots-Tag', '').lower():
+            return False
+        excluded = getattr(settings, 'CANONICAL_EXCLUDED_PATHS', cls.EXCLUDED_PATHS)
+        return not request.path.startswith(tuple(excluded))
+
+    def start_tag(self, name, tag, attrs_raw):
+        if not self.seen and b'canonical' in attrs_raw.lower():
+            rel = parse_attrs(attrs_raw).get(b'rel', b'')
+            self.seen = rel.strip().lower() == b'canonical'
+        return None
+
+    def end_tag(self, name, tag):
+        if self.seen:
+            return None
+        self.seen = True
+        from django.utils.html import escape
+        from blog.middleware_canonical import build_canonical_url
+        url = escape(build_canonical_url(self.request))
+        return f'<link rel="canonical" href="{url}">'.encode('utf-8') + tag
+
+
+class AdSlotProcessor(HtmlPostProcessor):
+    """
+    Заменяет плейсхолдеры <!-- ad-slot:CODE --> на баннер рекламного места.
+    Позволяет закэшированным страницам (cache_page) получать актуальную ротацию.
+    """
+    comments = True
+    cacheable = False
+
+    _SLOT_RE = re.compile(rb'<!--\s*ad-slot:([\w-]+)\s*-->')
+
+    def comment(self, tag):
+        match = self._SLOT_RE.fullmatch(tag)
+        if not match:
+            return None
+        try:
+            from advertising.templatetags.ad_tags import show_ad
+            return str(show_ad(match.group(1).decode('ascii'))).encode('utf-8')
+        except Exception as e:
+            logger.error(f"Ошибка рендера рекламного слота {match.group(1)!r}: {e}")
+            return b''
+
+
+# ============================================================================
+# ТОКЕНИЗАТОР
+# ============================================================================
+
+class HtmlRewriter:
+    """
+    Потоковый однопроходный rewriter.
+
+        rewriter = HtmlRewriter(processors)
+        for chunk in chunks:
+            out = rewriter.feed(chunk)
+        out += rewriter.close()
+    """
+
+    def __init__(self, processors):
+        self.processors = processors
+        self.changed = False
+        self.uncacheable_changed = False
+        self._buffer = b''
+        self._raw_end = None  # закрывающий тег raw-элемента, внутри которого мы находимся
+
+        self._start_handlers = {}
+        self._end_handlers = {}
+        self._comment_handlers = []
+        for processor in processors:
+            for name in processor.start_tags:
+                self._start_handlers.setdefault(name, []).append(processor)
+            for name in processor.end_tags:
+                self._end_handlers.setdefault(name, []).append(processor)
+            if processor.comments:
+                self._comment_handlers.append(processor)
+
+    def _apply(self, processor, result, original):
+        if result is None or result == original:
+            return original
+        self.changed = True
+        if not processor.cacheable:
+            self.uncacheable_changed = True
+        return result
+
+    def feed(self, data, final=False):
+        data = self._buffer + data
+        self._buffer = b''
+        out = []
+        pos = 0
+        length = len(data)
+
+        while pos < length:
+            if self._raw_end is not None:
+                match = self._raw_end.search(data, pos)
+                if match is None:
+                    # Держим хвост, в котором может начинаться закрывающий тег
+                    keep = 0 if final else RAW_END_KEEP_BYTES
+                    safe = max(pos, length - keep)
+                    out.append(data[pos:safe])
+                    pos = safe
+                    break
+                out.append(data[pos:match.start()])
+                pos = match.start()
+                self._raw_end = None
+                continue
+
+            lt = data.find(b'<', pos)
+            if lt == -1:
+                out.append(data[pos:])
+                pos = length
+                break
+            if lt > pos:
+                out.append(data[pos:lt])
+            pos = lt
+
+            if data.startswith(b'<!--', pos):
+                end = data.find(b'-->', pos + 4)
+                if end == -1:
+                    break
+                end += 3
+                tag = data[pos:end]
+                for processor in self._comment_handlers:
+                    tag = self._apply(processor, processor.comment(tag), tag)
+                out.append(tag)
+                pos = end
+                continue
+
+            nxt = data[pos + 1:pos + 2]
+            if nxt == b'/':
+                match = _END_TAG_RE.match(data, pos)
+                if match:
+                    tag = match.group(0)
+                    name = match.group(1).lower()
+                    for processor in self._end_handlers.get(name, ()):
+                        tag = self._apply(processor, processor.end_tag(name, tag), tag)
+                    out.append(tag)
+                    pos = match.end()
+                    continue
+            elif nxt.isalpha():
+                match = _START_TAG_RE.match(data, pos)
+                if match:
+                    tag = match.group(0)
+                    name = match.group(1).lower()
+                    for processor in self._start_handlers.get(name, ()):
+                        tag = self._apply(processor, processor.start_tag(name, tag, match.group(2)), tag)
+                    out.append(tag)
+                    pos = match.end()
+                    if name in _RAW_END_RES and not tag.endswith(b'/>'):
+                        self._raw_end = _RAW_END_RES[name]
+                    continue
+
+            if not final and length - pos < MAX_PENDING_TAG_BYTES:
+                if nxt in (b'', b'/', b'!') or nxt.isalpha():
+                    break  # тег разрезан границей чанка — дочитаем следующий
+            out.append(b'<')
+            pos += 1
+
+        if pos < length:
+            if final:
+                out.append(data[pos:])
+            else:
+                self._buffer = data[pos:]
+        return b''.join(out)
+
+    def close(self):
+        return self.feed(b'', final=True)
+
+    def rewrite(self, content):
+        return self.feed(content, final=True)
+
+
+# ============================================================================
+# КЭШ ПО ETAG
+# ============================================================================
+
+class _RewriteCache:
+    """LRU-кэш результатов перезаписи в памяти процесса, ограниченный по байтам"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        if len(value) > self.max_bytes // 4:
+            return
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self.size -= len(old)
+            self._data[key] = value
+            self.size += len(value)
+            while self.size > self.max_bytes and self._data:
+                _, evicted = self._data.popitem(last=False)
+                self.size -= len(evicted)
+
+
+# ============================================================================
+# MIDDLEWARE
+# ============================================================================
+
+class HtmlRewriteMiddleware:
+    """
+    Пост-обработка HTML-ответов набором процессоров за один проход.
+
+    Настройки:
+        HTML_POSTPROCESSORS — список dotted paths процессоров
+        HTML_REWRITE_CACHE_BYTES — размер кэша по ETag (0 — выключен)
+    """
+    processor_paths = None
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        paths = self.processor_paths or getattr(settings, 'HTML_POSTPROCESSORS', DEFAULT_POSTPROCESSORS)
+        self.processor_classes = [import_string(path) for path in paths]
+        self.signature = '|'.join(paths).encode('utf-8')
+        cache_bytes = getattr(settings, 'HTML_REWRITE_CACHE_BYTES', 32 * 1024 * 1024)
+        self.cache = _RewriteCache(cache_bytes) if cache_bytes else None
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        return self.process_response(request, response)
+
+    def _build_rewriter(self, request, response):
+        processors = [
+            cls(request, response)
+            for cls in self.processor_classes
+            if cls.applies(request, response)
+        ]
+        return HtmlRewriter(processors) if processors else None
+
+    def _is_rewritable(self, response):
+        if not response.get('Content-Type', '').startswith('text/html'):
+            return False
+        if response.has_header('Content-Encoding'):
+            return False
+        charset = (getattr(response, 'charset', None) or 'utf-8').lower().replace('_', '-')
+        return charset in ('utf-8', 'utf8', 'ascii', 'us-ascii')
+
+    def _cache_key(self, request, response):
+        """
+        Ключ кэша: ETag ответа (или хэш тела, если ETag не выставлен) + URL + набор процессоров.
+        Хэширование тела на порядок дешевле его перезаписи.
+        """
+        if self.cache is None:
+            return None
+        etag = response.get('ETag')
+        if etag:
+            version = etag.encode('utf-8')
+        else:
+            version = hashlib.blake2b(response.content, digest_size=16).digest()
+        raw = b'\0'.join((version, request.get_full_path().encode('utf-8'), self.signature))
+        return hashlib.blake2b(raw, digest_size=16).digest()
+
+    def process_response(self, request, response):
+        if not self._is_rewritable(response):
+            return response
+
+        if getattr(response, 'streaming', False):
+            rewriter = self._build_rewriter(request, response)
+            if rewriter is not None:
+                response.streaming_content = self._stream(rewriter, response.streaming_content)
+                if response.has_header('Content-Length'):
+                    del response['Content-Length']
+            return response
+
+        cache_key = self._cache_key(request, response)
+        if cache_key is not None:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                self._set_content(response, cached)
+                return response
+
+        rewriter = self._build_rewriter(request, response)
+        if rewriter is None:
+            return response
+
+        try:
+            content = rewriter.rewrite(response.content)
+        except Exception as e:
+            logger.error(f"Ошибка пост-обработки HTML {request.path}: {e}")
+            return response
+
+        if cache_key is not None and not rewriter.uncacheable_changed:
+            self.cache.set(cache_key, content)
+        if rewriter.changed:
+            self._set_content(response, content)
+        return response
+
+    @staticmethod
+    def _set_content(response, content):
+        response.content = content
+        if response.has_header('Content-Length'):
+            response['Content-Length'] = str(len(content))
+
+    @staticmethod
+    def _stream(rewriter, chunks):
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+            out = rewriter.feed(chunk)
+            if out:
+                yield out
+        tail = rewriter.close()
+        if tail:
+            yield tail
@@ -0,0 +1,45 @@
+"""
+Management команда для сборки sitemap в файлы (индекс + шарды)
+"""
+from django.core.management.base import BaseCommand
+
+from blog.sitemap_builder import SITEMAP_DIR, build_sitemaps
+
+BUILD_FUNC = 'blog.tasks.build_sitemaps'
+
+
+class Command(BaseCommand):
+    help = 'Пересобрать изменившиеся шарды sitemap и индекс sitemap.xml'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Пересобрать все шарды статей (changefreq/priority зависят от возраста и просмотров)'
+        )
+        parser.add_argument(
+            '--setup-schedule',
+            action='store_true',
+            help='Создать расписания Django-Q: изменения — каждые 15 минут, полная сборка — раз в сутки'
+        )
+
+    def handle(self, *args, **options):
+        if options['setup_schedule']:
+            from django_q.models import Schedule
+
+            for name, defaults in (
+                ('Sitemap build', {'schedule_type': Schedule.MINUTES, 'minutes': 15, 'kwargs': {}}),
+                ('Sitemap full build', {'schedule_type': Schedule.DAILY, 'kwargs': {'full': True}}),
+            ):
+                schedule, created = Schedule.objects.update_or_create(
+                    name=name,
+                    defaults={'func': BUILD_FUNC, 'repeats': -1, **defaults},
+                )
+                state = 'создано' if created else 'обновлено'
+                self.stdout.write(self.style.SUCCESS(f'[OK] Расписание «{name}» {state}'))
+            return
+
+        result = build_sitemaps(full=options['full'])
+        self.stdout.write(self.style.SUCCESS(
+            f"[OK] Шардов: {result['shards']}, пересобрано: {result['rebuilt']} ({SITEMAP_DIR})"
+        ))
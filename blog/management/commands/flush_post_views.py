@@ -0,0 +1,59 @@
+"""
+Management команда для записи накопленных просмотров статей
+"""
+from django.core.management.base import BaseCommand
+
+from blog.view_counter import flush_views, purge_hourly
+
+FLUSH_FUNC = 'blog.view_counter.flush_views'
+
+
+class Command(BaseCommand):
+    help = 'Записать накопленные просмотры статей в БД и обновить почасовые ряды'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--setup-schedule',
+            action='store_true',
+            help='Создать расписание Django-Q (каждую минуту)'
+        )
+        parser.add_argument(
+            '--purge',
+            type=int,
+            metavar='DAYS',
+            help='Удалить почасовые ряды старше N дней'
+        )
+        parser.add_argument(
+            '--retry-failed',
+            action='store_true',
+            help='Сразу повторить обработку отложенных (.failed) файлов очереди'
+        )
+
+    def handle(self, *args, **options):
+        if options['setup_schedule']:
+            from django_q.models import Schedule
+
+            schedule, created = Schedule.objects.update_or_create(
+                func=FLUSH_FUNC,
+                defaults={
+                    'name': 'Post views flush',
+                    'schedule_type': Schedule.MINUTES,
+                    'minutes': 1,
+                    'repeats': -1,
+                }
+            )
+            state = 'создано' if created else 'обновлено'
+            self.stdout.write(self.style.SUCCESS(f'[OK] Расписание записи просмотров {state}'))
+            return
+
+        if options['purge']:
+            deleted = purge_hourly(options['purge'])
+            self.stdout.write(self.style.SUCCESS(f'[OK] Удалено почасовых строк: {deleted}'))
+            return
+
+        result = flush_views(retry_failed=options['retry_failed'])
+        self.stdout.write(self.style.SUCCESS(
+            f"[OK] Файлов: {result['files']}, статей: {result['posts']}, просмотров: {result['views']}"
+        ))
+        if result['failed']:
+            self.stdout.write(self.style.WARNING(f"[WARN] Отложенных файлов: {result['failed']}"))
@@ -0,0 +1,67 @@
+"""
+Команда для предварительной генерации responsive-вариантов (srcset) превью постов
+Варианты записываются в media/responsive/ и манифест, шаблоны только читают манифест
+"""
+import logging
+from django.core.management.base import BaseCommand
+from blog.models import Post
+from blog.signals import VIDEO_EXTENSIONS
+from utilits.responsive_variants import get_variant_store
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Генерирует responsive-варианты (320/640/1024/1920 WebP) для превью всех постов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=None,
+            help='Ограничить количество обрабатываемых постов',
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Пересоздать варианты даже если они актуальны',
+        )
+
+    def handle(self, *args, **options):
+        limit = options['limit']
+        force = options['force']
+        store = get_variant_store()
+
+        names = (
+            Post.objects.exclude(kartinka='')
+            .exclude(kartinka__isnull=True)
+            .order_by('-id')
+            .values_list('kartinka', flat=True)
+        )
+        if limit:
+            names = names[:limit]
+
+        stats = {'ready': 0, 'skipped': 0, 'errors': 0}
+        self.stdout.write(self.style.SUCCESS('🖼️ Генерация responsive-вариантов...'))
+
+        # Манифест записывается один раз в конце прогона
+        with store.batch():
+            for name in names.iterator():
+                if name.lower().endswith(VIDEO_EXTENSIONS):
+                    stats['skipped'] += 1
+                    continue
+                try:
+                    if store.ensure(name, force=force):
+                        stats['ready'] += 1
+                    else:
+                        stats['errors'] += 1
+                except Exception as e:
+                    logger.error(f'Ошибка генерации вариантов для {name}: {e}', exc_info=True)
+                    stats['errors'] += 1
+
+        self.stdout.write('=' * 60)
+        self.stdout.write(self.style.SUCCESS(f'✅ Готово: {stats["ready"]}'))
+        self.stdout.write(f'⏭️ Пропущено (видео): {stats["skipped"]}')
+        if stats['errors']:
+            self.stdout.write(self.style.ERROR(f'❌ Ошибок / нет файла: {stats["errors"]}'))
+        self.stdout.write('=' * 60)
@@ -285,27 +285,29 @@ class Command(BaseCommand):
             
             try:
                 seo_optimizer = AdvancedSEOOptimizer()
-                # Отправляем батчами по 100 URL (лимит IndexNow)
-                batch_size = 100
-                for i in range(0, len(indexnow_urls), batch_size):
-                    batch = indexnow_urls[i:i + batch_size]
-                    result = seo_optimizer.submit_images_to_search_engines(batch)
-                    
-                    if result.get('indexnow', {}).get('success'):
-                        self.stdout.write(
-                            self.style.SUCCESS(
-                                f'  ✅ IndexNow: отправлено {len(batch)} URL '
-                                f'({i+1}-{min(i+batch_size, len(indexnow_urls))} из {len(indexnow_urls)})'
-                            )
+                # Один вызов: очередь индексации сама делит на пачки до 10 000 URL
+                result = seo_optimizer.submit_images_to_search_engines(indexnow_urls)
+                indexnow = result.get('indexnow', {})
+                
+                if indexnow.get('flush_skipped'):
+                    self.stdout.write(
+                        self.style.WARNING(
+                            f'  ⏳ IndexNow: в очереди {result.get("queued", 0)} URL, отправка пропущена '
+                            f'(очередь уже отправляется) — уйдут с плановой отправкой'
                         )
-                    else:
-                        error = result.get('indexnow', {}).get('error', 'unknown')
-                        self.stdout.write(
-                            self.style.WARNING(
-                                f'  ⚠️ IndexNow: не удалось отправить батч '
-                                f'({i+1}-{min(i+batch_size, len(indexnow_urls))}): {error}'
-                            )
+                    )
+                elif indexnow.get('success'):
+                    self.stdout.write(
+                        self.style.SUCCESS(
+                            f'  ✅ IndexNow: отправлено {indexnow.get("submitted", 0)} URL '
+                            f'(запросов: {indexnow.get("requests", 0)}, всего URL: {len(indexnow_urls)})'
                         )
+                    )
+                else:
+                    error = indexnow.get('error') or (
+                        f'отложено {indexnow.get("deferred", 0)}, ошибок {indexnow.get("failed", 0)}'
+                    )
+                    self.stdout.write(self.style.WARNING(f'  ⚠️ IndexNow: не удалось отправить: {error}'))
             except Exception as e:
                 self.stdout.write(
                     self.style.ERROR(f'  ❌ Ошибка отправки в IndexNow: {e}')
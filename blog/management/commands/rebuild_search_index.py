@@ -0,0 +1,79 @@
+"""
+Команда для полной перестройки полнотекстового индекса статей
+Обычно индекс обновляется сигналами при сохранении статьи; команда нужна
+для первичного построения и после массовых изменений через queryset.update()
+"""
+import logging
+import time
+from django.core.management.base import BaseCommand
+from blog.models import Post, PostSearchDocument
+from blog.search_index import index_post, invalidate_stats, search_post_ids
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает полнотекстовый индекс поиска по опубликованным статьям'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--clear',
+            action='store_true',
+            help='Очистить индекс перед построением',
+        )
+        parser.add_argument(
+            '--query',
+            type=str,
+            default=None,
+            help='После построения выполнить тестовый запрос и показать топ-5',
+        )
+
+    def handle(self, *args, **options):
+        if options['clear']:
+            deleted, _ = PostSearchDocument.objects.all().delete()
+            self.stdout.write(f'🗑️ Индекс очищен ({deleted} строк)')
+
+        # Статьи, снятые с публикации в обход сигналов
+        stale = PostSearchDocument.objects.exclude(post__status='published')
+        stale_count, _ = stale.delete()
+
+        posts = (
+            Post.objects.filter(status='published')
+            .select_related('category')
+            .prefetch_related('tags')
+            .order_by('id')
+        )
+
+        self.stdout.write(self.style.SUCCESS('🔎 Построение поискового индекса...'))
+        started = time.monotonic()
+        indexed = errors = 0
+
+        for post in posts.iterator(chunk_size=200):
+            try:
+                index_post(post)
+                indexed += 1
+            except Exception as e:
+                logger.error(f'Ошибка индексации статьи {post.pk}: {e}', exc_info=True)
+                errors += 1
+            if indexed and indexed % 500 == 0:
+                self.stdout.write(f'   ... {indexed} статей')
+
+        invalidate_stats()
+
+        self.stdout.write('=' * 60)
+        self.stdout.write(self.style.SUCCESS(f'✅ Проиндексировано: {indexed} за {time.monotonic() - started:.1f} с'))
+        if stale_count:
+            self.stdout.write(f'🧹 Удалено устаревших строк: {stale_count}')
+        if errors:
+            self.stdout.write(self.style.ERROR(f'❌ Ошибок: {errors}'))
+        self.stdout.write('=' * 60)
+
+        if options['query']:
+            started = time.perf_counter()
+            results = search_post_ids(options['query'], limit=5)
+            elapsed = (time.perf_counter() - started) * 1000
+            titles = Post.objects.in_bulk([post_id for post_id, _ in results])
+            self.stdout.write(f'🔍 "{options["query"]}" ({elapsed:.1f} мс):')
+            for post_id, score in results:
+                post = titles.get(post_id)
+                self.stdout.write(f'   {score:6.2f}  {post.title if post else post_id}')
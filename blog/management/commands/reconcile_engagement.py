@@ -0,0 +1,39 @@
+"""
+Management команда для сверки счётчиков вовлечённости статей
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from blog.engagement import ENGAGEMENT_FIELDS, RECONCILE_BATCH_SIZE, reconcile_counters
+
+
+class Command(BaseCommand):
+    help = 'Пересчитать лайки, оценки, закладки и комментарии статей (set-wise, пачками)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fields',
+            nargs='+',
+            choices=ENGAGEMENT_FIELDS,
+            default=list(ENGAGEMENT_FIELDS),
+            help='Какие счётчики пересчитать (по умолчанию — все)'
+        )
+        parser.add_argument(
+            '--post',
+            type=int,
+            nargs='+',
+            dest='post_ids',
+            help='Только эти статьи'
+        )
+        parser.add_argument(
+            '--batch',
+            type=int,
+            default=RECONCILE_BATCH_SIZE,
+            help=f'Размер диапазона id на один UPDATE (по умолчанию {RECONCILE_BATCH_SIZE})'
+        )
+
+    def handle(self, *args, **options):
+        if options['batch'] < 1:
+            raise CommandError('--batch должен быть положительным')
+
+        updated = reconcile_counters(options['fields'], options['batch'], options['post_ids'])
+        self.stdout.write(self.style.SUCCESS(f'[OK] Счётчики пересчитаны: {updated} статей'))
@@ -7,15 +7,14 @@ import re
 from typing import Any, Dict, List, Optional
 
 from django.core.cache import cache
-from django.http import HttpResponsePermanentRedirect, HttpResponseRedirect
-from django.urls import reverse
+from django.http import HttpResponseGone, HttpResponsePermanentRedirect, HttpResponseRedirect
 from django.utils import timezone
 
 from Asistent.services.yandex_webmaster import (
     get_yandex_webmaster_client,
     YandexWebmasterClient,
 )
-from blog.models import Post
+from blog.redirect_table import GONE, redirect_table
 
 logger = logging.getLogger(__name__)
 
@@ -72,19 +71,26 @@ class Smart404Middleware:
         # Логируем 404
         logger.warning(f"404 Error: {path} | Referrer: {request.META.get('HTTP_REFERER', 'N/A')}")
         
-        # Сохраняем в кэш для статистики
+        # Счётчик 404 пути в общем кэше (одна атомарная операция)
         cache_key = f"404_log_{path}"
-        count = cache.get(cache_key, 0) + 1
-        cache.set(cache_key, count, 3600 * 24)  # 24 часа
+        try:
+            count = cache.incr(cache_key)
+        except ValueError:
+            count = 1 if cache.add(cache_key, 1, 3600 * 24) else cache.incr(cache_key)  # 24 часа
         
         # Если много запросов к одной странице - отправляем alert
         if count == 5:
             self.send_404_alert(path, count)
         
-        # Пытаемся найти похожую страницу и сделать редирект
-        redirect_url = self.find_similar_page(path)
-        if redirect_url:
-            logger.info(f"Auto-redirect 404: {path} -> {redirect_url}")
+        # Редирект из таблицы URLRedirect или на похожую страницу (снимок в памяти, без запросов)
+        target = self.find_similar_page(path)
+        if target:
+            redirect_url, status, _ = target
+            if status == GONE:
+                return HttpResponseGone()
+            logger.info(f"Auto-redirect 404: {path} -> {redirect_url} ({status})")
+            if status == 302:
+                return HttpResponseRedirect(redirect_url)
             return HttpResponsePermanentRedirect(redirect_url)
         
         # Возвращаем оригинальный 404
@@ -99,58 +105,16 @@ class Smart404Middleware:
     
     def find_similar_page(self, path):
         """
-        Пытается найти похожую страницу для редиректа
+        Редирект для пути: URLRedirect или похожая страница (см. blog.redirect_table)
         
-        Examples:
-            /post/my-slug/ -> /blog/post/my-slug/
-            /post/tags/test/ -> /blog/post/tags/test/
+        Returns:
+            tuple: (URL, HTTP-код, id URLRedirect) или None
         """
-        # Старые URL постов -> новые URL блога
-        if path.startswith('/post/'):
-            new_path = path.replace('/post/', '/blog/post/', 1)
-            
-            # Проверяем существует ли страница
-            if self.url_exists(new_path):
-                return new_path
-        
-        # Пытаемся найти пост по slug
-        if '/post/' in path:
-            slug = path.rstrip('/').split('/')[-1]
-            # ИСПРАВЛЕНО: Убираем дефисы в начале и конце slug
-            original_slug = slug
-            slug = slug.strip('-').strip('$')
-            
-            # Если slug начинался с дефиса - делаем редирект 301 на исправленный URL
-            if original_slug.startswith('-') and slug != original_slug:
-                try:
-                    post = Post.objects.filter(slug=slug, status='published').first()
-                    if post:
-                        # Редирект 301 на правильный URL
-                        from django.http import HttpResponsePermanentRedirect
-                        return HttpResponsePermanentRedirect(post.get_absolute_url())
-                except:
-                    pass
-            
-            # Обычный поиск по исправленному slug
-            try:
-                post = Post.objects.filter(slug=slug, status='published').first()
-                if post:
-                    return post.get_absolute_url()
-            except:
-                pass
-        
-        return None
-    
-    def url_exists(self, path):
-        """Проверка существования URL"""
-        from django.urls import resolve
-        from django.urls.exceptions import Resolver404
-        
         try:
-            resolve(path)
-            return True
-        except Resolver404:
-            return False
+            return redirect_table.lookup(path)
+        except Exception as e:
+            logger.error(f"Ошибка таблицы редиректов для {path}: {e}")
+            return None
     
     def send_404_alert(self, path, count):
         """Отправка алерта о частых 404 ошибках"""
@@ -9,6 +9,24 @@ from django.http import HttpResponsePermanentRedirect
 logger = logging.getLogger(__name__)
 
 
+def build_canonical_url(request):
+    """
+    Полный canonical URL запроса без незначащих GET-параметров
+    """
+    from django.conf import settings
+
+    canonical_path = request.path
+    query_params = request.GET.copy()
+    for param in CanonicalURLMiddleware.INSIGNIFICANT_PARAMS:
+        query_params.pop(param, None)
+
+    if query_params:
+        canonical_path += '?' + query_params.urlencode()
+
+    site_url = getattr(settings, 'SITE_URL', 'https://idealimage.ru')
+    return site_url + canonical_path
+
+
 class CanonicalURLMiddleware(MiddlewareMixin):
     """
     Middleware для обработки canonical URLs и незначащих GET-параметров
@@ -85,21 +103,8 @@ class CanonicalURLMiddleware(MiddlewareMixin):
         Добавляем canonical URL в контекст для шаблонов
         """
         if hasattr(response, 'context_data'):
-            # Формируем полный canonical URL
-            canonical_path = request.path
-            
-            # Удаляем незначащие параметры из query string
-            query_params = request.GET.copy()
-            for param in self.INSIGNIFICANT_PARAMS:
-                query_params.pop(param, None)
-            
-            if query_params:
-                canonical_path += '?' + query_params.urlencode()
-            
-            # Полный URL с доменом
-            from django.conf import settings
-            site_url = getattr(settings, 'SITE_URL', 'https://idealimage.ru')
-            canonical_url = site_url + canonical_path
+            # Полный canonical URL с доменом
+            canonical_url = build_canonical_url(request)
             
             # Добавляем в контекст
             if response.context_data is None:
@@ -0,0 +1,48 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0031_add_thumbnail_field'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostSearchDocument',
+            fields=[
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='blog.post', verbose_name='Статья')),
+                ('title_length', models.PositiveIntegerField(default=0)),
+                ('description_length', models.PositiveIntegerField(default=0)),
+                ('tags_length', models.PositiveIntegerField(default=0)),
+                ('category_length', models.PositiveIntegerField(default=0)),
+                ('content_length', models.PositiveIntegerField(default=0)),
+                ('indexed_at', models.DateTimeField(auto_now=True, verbose_name='Проиндексировано')),
+            ],
+            options={
+                'verbose_name': 'Поисковый документ',
+                'verbose_name_plural': 'Поисковые документы',
+                'db_table': 'app_search_documents',
+            },
+        ),
+        migrations.CreateModel(
+            name='PostSearchPosting',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64, verbose_name='Основа слова')),
+                ('title_tf', models.PositiveSmallIntegerField(default=0)),
+                ('description_tf', models.PositiveSmallIntegerField(default=0)),
+                ('tags_tf', models.PositiveSmallIntegerField(default=0)),
+                ('category_tf', models.PositiveSmallIntegerField(default=0)),
+                ('content_tf', models.PositiveSmallIntegerField(default=0)),
+                ('document', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='postings', to='blog.postsearchdocument', verbose_name='Документ')),
+            ],
+            options={
+                'verbose_name': 'Вхождение термина',
+                'verbose_name_plural': 'Вхождения терминов',
+                'db_table': 'app_search_postings',
+                'unique_together': {('term', 'document')},
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0032_post_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostViewHourly',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField(verbose_name='Час (UTC)')),
+                ('views', models.PositiveIntegerField(default=0, verbose_name='Просмотров')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='hourly_views', to='blog.post', verbose_name='Статья')),
+            ],
+            options={
+                'verbose_name': 'Просмотры за час',
+                'verbose_name_plural': 'Просмотры по часам',
+                'db_table': 'app_post_views_hourly',
+                'indexes': [models.Index(fields=['hour'], name='app_post_vi_hour_5d3e1c_idx')],
+                'unique_together': {('post', 'hour')},
+            },
+        ),
+    ]
@@ -0,0 +1,59 @@
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def fill_engagement_counters(apps, schema_editor):
+    """Начальные значения счётчиков одним UPDATE с подзапросами"""
+    Post = apps.get_model('blog', 'Post')
+    sources = {
+        'likes_count': (apps.get_model('blog', 'Like'), {}, Count, 'pk'),
+        'ratings_count': (apps.get_model('blog', 'PostRating'), {}, Count, 'pk'),
+        'ratings_sum': (apps.get_model('blog', 'PostRating'), {}, Sum, 'rating'),
+        'bookmarks_count': (apps.get_model('blog', 'Bookmark'), {}, Count, 'pk'),
+        'comments_count': (apps.get_model('blog', 'Comment'), {'active': True}, Count, 'pk'),
+    }
+    updates = {}
+    for field, (model, conditions, aggregate, source) in sources.items():
+        value = (
+            model.objects.filter(post=OuterRef('pk'), **conditions)
+            .order_by().values('post').annotate(value=aggregate(source)).values('value')
+        )
+        updates[field] = Coalesce(Subquery(value, output_field=IntegerField()), Value(0))
+    Post.objects.update(**updates)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0033_postviewhourly'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='likes_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='лайков'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='ratings_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='оценок'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='ratings_sum',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='сумма оценок'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='bookmarks_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='закладок'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='активных комментариев'),
+        ),
+        migrations.RunPython(fill_engagement_counters, migrations.RunPython.noop),
+    ]
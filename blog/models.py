@@ -66,6 +66,12 @@ class Post(models.Model):
     telegram_posted_at = models.DateTimeField(verbose_name='Опубликованно в Телеграмме', blank=True, null=True)
     fixed = models.BooleanField(verbose_name='ФИКСА', default=False)
     views = models.IntegerField(verbose_name='просмотров', default=0)
+    # Счётчики вовлечённости (ведёт blog.engagement, сверка — команда reconcile_engagement)
+    likes_count = models.PositiveIntegerField(verbose_name='лайков', default=0, editable=False)
+    ratings_count = models.PositiveIntegerField(verbose_name='оценок', default=0, editable=False)
+    ratings_sum = models.PositiveIntegerField(verbose_name='сумма оценок', default=0, editable=False)
+    bookmarks_count = models.PositiveIntegerField(verbose_name='закладок', default=0, editable=False)
+    comments_count = models.PositiveIntegerField(verbose_name='активных комментариев', default=0, editable=False)
     tags = TaggableManager(blank=True)
     
     # AI Moderation fields
@@ -304,7 +310,7 @@ class Post(models.Model):
     
     def get_likes_count(self):
         """Получить количество лайков"""
-        return self.likes.count()
+        return self.likes_count
     
     def get_likes_by_type(self):
         """Получить лайки по типам"""
@@ -313,17 +319,15 @@ class Post(models.Model):
     
     def get_average_rating(self):
         """Получить средний рейтинг статьи"""
-        from django.db.models import Avg
-        avg_rating = self.ratings.aggregate(avg=Avg('rating'))['avg']
-        return round(avg_rating, 1) if avg_rating else 0
+        return round(self.ratings_sum / self.ratings_count, 1) if self.ratings_count else 0
     
     def get_ratings_count(self):
         """Получить количество оценок"""
-        return self.ratings.count()
+        return self.ratings_count
     
     def get_bookmarks_count(self):
         """Получить количество закладок"""
-        return self.bookmarks.count()
+        return self.bookmarks_count
     
     def is_liked_by_user(self, user):
         """Проверить, лайкнул ли пользователь статью"""
@@ -367,6 +371,9 @@ class Post(models.Model):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.__kartinka = self.kartinka if self.pk else None
+        # slug и статус на момент загрузки (без подгрузки отложенных полей):
+        # таблица редиректов перестраивается только при их смене
+        self._redirect_state = (self.__dict__.get('slug'), self.__dict__.get('status')) if self.pk else None
     
     
     def save(self, *args, **kwargs):
@@ -385,7 +392,30 @@ class Post(models.Model):
             words = clean_text.split()[:120]
             self.description = ' '.join(words)
         
+        # Отложенные поля (only/defer) не пишутся и не подгружаются, как и в
+        # обычном Model.save; счётчики вовлечённости не пишутся (см. _do_update)
+        deferred = self.get_deferred_fields()
+        if deferred and not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            from blog.engagement import ENGAGEMENT_FIELDS
+            skipped = {*ENGAGEMENT_FIELDS, *deferred}
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.attname not in skipped
+            ]
+        
         super().save(*args, **kwargs)
+    
+    def _do_update(self, base_qs, using, pk_val, values, update_fields, forced_update):
+        """
+        Полное сохранение не затирает счётчики вовлечённости устаревшими значениями
+        из памяти — их пишет только blog.engagement. views пишется как обычное поле
+        (blog.view_counter прибавляет через F()). Если строку успели удалить,
+        UPDATE не затронет строк и Model.save вставит её целиком, как обычно.
+        """
+        if update_fields is None:
+            from blog.engagement import ENGAGEMENT_FIELDS
+            values = [value for value in values if value[0].attname not in ENGAGEMENT_FIELDS]
+        return super()._do_update(base_qs, using, pk_val, values, update_fields, forced_update)
         
         
 
@@ -518,3 +548,85 @@ class URLRedirect(models.Model):
     
     def __str__(self):
         return f"{self.old_url} -> {self.new_url or '410 Gone'}"
+
+
+class PostSearchDocument(models.Model):
+    """
+    Документ полнотекстового индекса: длины полей опубликованной статьи (в токенах)
+    Нужны для нормализации BM25 по длине поля
+    """
+    post = models.OneToOneField(
+        Post,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='search_document',
+        verbose_name='Статья'
+    )
+    title_length = models.PositiveIntegerField(default=0)
+    description_length = models.PositiveIntegerField(default=0)
+    tags_length = models.PositiveIntegerField(default=0)
+    category_length = models.PositiveIntegerField(default=0)
+    content_length = models.PositiveIntegerField(default=0)
+    indexed_at = models.DateTimeField(auto_now=True, verbose_name='Проиндексировано')
+
+    class Meta:
+        db_table = 'app_search_documents'
+        verbose_name = 'Поисковый документ'
+        verbose_name_plural = 'Поисковые документы'
+
+    def __str__(self):
+        return f"Индекс статьи #{self.post_id}"
+
+
+class PostSearchPosting(models.Model):
+    """
+    Строка инвертированного индекса: основа слова -> статья с частотами по полям
+    """
+    term = models.CharField(max_length=64, verbose_name='Основа слова')
+    document = models.ForeignKey(
+        PostSearchDocument,
+        on_delete=models.CASCADE,
+        related_name='postings',
+        verbose_name='Документ'
+    )
+    title_tf = models.PositiveSmallIntegerField(default=0)
+    description_tf = models.PositiveSmallIntegerField(default=0)
+    tags_tf = models.PositiveSmallIntegerField(default=0)
+    category_tf = models.PositiveSmallIntegerField(default=0)
+    content_tf = models.PositiveSmallIntegerField(default=0)
+
+    class Meta:
+        db_table = 'app_search_postings'
+        unique_together = ('term', 'document')
+        verbose_name = 'Вхождение термина'
+        verbose_name_plural = 'Вхождения терминов'
+
+    def __str__(self):
+        return f"{self.term} -> #{self.document_id}"
+
+
+class PostViewHourly(models.Model):
+    """
+    Просмотры статьи за час (пишет blog.view_counter при сбросе очереди)
+    Ряды используются для ранжирования популярного за последние часы/сутки
+    """
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='hourly_views',
+        verbose_name='Статья'
+    )
+    hour = models.DateTimeField(verbose_name='Час (UTC)')
+    views = models.PositiveIntegerField(default=0, verbose_name='Просмотров')
+
+    class Meta:
+        db_table = 'app_post_views_hourly'
+        unique_together = ('post', 'hour')
+        indexes = [
+            models.Index(fields=['hour']),
+        ]
+        verbose_name = 'Просмотры за час'
+        verbose_name_plural = 'Просмотры по часам'
+
+    def __str__(self):
+        return f"#{self.post_id} {self.hour:%Y-%m-%d %H}:00 — {self.views}"
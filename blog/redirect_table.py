@@ -0,0 +1,181 @@
+"""
+Таблица редиректов для Smart404Middleware
+
+Раньше middleware не читал URLRedirect вовсе, на каждый 404 делал resolve()
+и до двух запросов Post по slug, а счётчик 404 вёл парой cache.get + set —
+сканирование сайта ботами давало запросы к БД на каждую пробу.
+
+Здесь:
+- в памяти процесса строится снимок: активные URLRedirect (old_url ->
+  new_url, тип) и множество slug опубликованных статей (2 запроса);
+- снимок перестраивается по общей версии в Django cache (сигналы
+  URLRedirect и Post) или раз в SNAPSHOT_MAX_AGE секунд;
+- пути, для которых ничего не нашлось, запоминаются в ограниченном
+  негативном кэше снимка — повторный промах стоит один поиск в словаре;
+- срабатывания редиректов копятся в процессе и раз в HITS_FLUSH_INTERVAL
+  секунд пишутся одним UPDATE (hits_count, last_seen).
+
+Несовпавший 404 не делает ни одного запроса к БД.
+"""
+import atexit
+import logging
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from typing import Dict, FrozenSet, Optional, Tuple
+
+from django.conf import settings
+from django.db.models import Case, F, IntegerField, Value, When
+from django.urls import Resolver404, resolve, reverse
+from django.utils import timezone
+
+from utilits.versioned_snapshot import VersionedSnapshot, bump_version
+
+logger = logging.getLogger(__name__)
+
+REDIRECT_TABLE_VERSION_KEY = 'redirect_table_version'
+SNAPSHOT_MAX_AGE = getattr(settings, 'REDIRECT_TABLE_MAX_AGE', 600)
+NEGATIVE_CACHE_SIZE = getattr(settings, 'REDIRECT_TABLE_NEGATIVE_CACHE_SIZE', 10000)
+HITS_FLUSH_INTERVAL = getattr(settings, 'REDIRECT_TABLE_HITS_FLUSH_SECONDS', 30)
+
+GONE = 410
+
+# (URL назначения, HTTP-код, id URLRedirect или None)
+Target = Tuple[str, int, Optional[int]]
+
+
+def _normalize(path: str) -> str:
+    return path if path.endswith('/') else path + '/'
+
+
+class RedirectSnapshot:
+    """Редиректы и slug опубликованных статей на момент построения"""
+
+    def __init__(self, redirects: Dict[str, Target], slugs: FrozenSet[str]):
+        self.redirects = redirects
+        self.slugs = slugs
+        self.missing: OrderedDict = OrderedDict()
+        self._missing_lock = threading.Lock()
+
+    def lookup(self, path: str) -> Optional[Target]:
+        key = _normalize(path)
+        target = self.redirects.get(key)
+        if target is not None:
+            return target
+        with self._missing_lock:
+            if key in self.missing:
+                return None
+
+        target = self._guess(path)
+        if target is None:
+            # Снимок общий для потоков процесса — вставка и вытеснение под блокировкой
+            with self._missing_lock:
+                self.missing[key] = None
+                while len(self.missing) > NEGATIVE_CACHE_SIZE:
+                    self.missing.popitem(last=False)
+        return target
+
+    def _guess(self, path: str) -> Optional[Target]:
+        """
+        Похожая страница для неизвестного пути
+
+        Examples:
+            /post/my-slug/ -> /blog/post/my-slug/
+            /anything/post/-my-slug/ -> /blog/post/my-slug/
+        """
+        # Старые URL постов -> новые URL блога
+        if path.startswith('/post/'):
+            new_path = path.replace('/post/', '/blog/post/', 1)
+            try:
+                resolve(new_path)
+                return new_path, 301, None
+            except Resolver404:
+                pass
+
+        if '/post/' in path:
+            # Дефисы и $ по краям slug — частые опечатки в ссылках
+            slug = path.rstrip('/').split('/')[-1].strip('-').strip('$')
+            if slug in self.slugs:
+                return reverse('blog:post_detail', kwargs={'slug': slug}), 301, None
+        return None
+
+
+def build_snapshot() -> RedirectSnapshot:
+    from .models import Post, URLRedirect
+
+    redirects = {}
+    rows = URLRedirect.objects.filter(is_active=True).values_list('pk', 'old_url', 'new_url', 'redirect_type')
+    for pk, old_url, new_url, redirect_type in rows:
+        code = GONE if not new_url or redirect_type == GONE else redirect_type
+        redirects[_normalize(old_url)] = (new_url, code, pk)
+    slugs = frozenset(Post.objects.filter(status='published').values_list('slug', flat=True))
+    return RedirectSnapshot(redirects, slugs)
+
+
+class RedirectTable(VersionedSnapshot):
+    """Снимок в памяти процесса, привязанный к общей версии и с отложенной записью срабатываний"""
+
+    version_key = REDIRECT_TABLE_VERSION_KEY
+
+    def __init__(self, max_age: float = SNAPSHOT_MAX_AGE):
+        super().__init__(max_age=max_age)
+        self._hits: Dict[int, int] = defaultdict(int)
+        self._flushed_at = time.monotonic()
+
+    def build(self) -> RedirectSnapshot:
+        return build_snapshot()
+
+    def lookup(self, path: str) -> Optional[Target]:
+        """Редирект для пути или None; срабатывание URLRedirect учитывается"""
+        target = self.snapshot().lookup(path)
+        if target is not None and target[2] is not None:
+            self.record_hit(target[2])
+        return target
+
+    def record_hit(self, redirect_id: int) -> None:
+        with self._lock:
+            self._hits[redirect_id] += 1
+            due = time.monotonic() - self._flushed_at >= HITS_FLUSH_INTERVAL
+        if due:
+            self.flush_hits()
+
+    def flush_hits(self) -> int:
+        """
+        Пишет накопленные срабатывания одним UPDATE.
+
+        Returns:
+            int: Количество срабатываний
+        """
+        from .models import URLRedirect
+
+        with self._lock:
+            hits = dict(self._hits)
+            self._hits.clear()
+            self._flushed_at = time.monotonic()
+        if not hits:
+            return 0
+
+        increment = Case(
+            *[When(pk=pk, then=Value(count)) for pk, count in hits.items()],
+            default=Value(0),
+            output_field=IntegerField(),
+        )
+        try:
+            URLRedirect.objects.filter(pk__in=list(hits)).update(
+                hits_count=F('hits_count') + increment,
+                last_seen=timezone.now(),
+            )
+        except Exception as e:
+            logger.warning(f"Не удалось записать срабатывания редиректов: {e}")
+            return 0
+        return sum(hits.values())
+
+
+redirect_table = RedirectTable()
+atexit.register(redirect_table.flush_hits)
+
+
+def invalidate_redirect_table():
+    """Перестроить таблицу редиректов во всех процессах (через общую версию)"""
+    bump_version(REDIRECT_TABLE_VERSION_KEY)
+    redirect_table.reset()
@@ -0,0 +1,361 @@
+"""
+Полнотекстовый поиск по статьям блога
+
+Инвертированный индекс в БД (PostSearchDocument / PostSearchPosting) вместо
+OR-цепочек icontains по TEXT-полям. Слова приводятся к основе стеммером
+Snowball для русского языка, ранжирование — BM25F с весами полей.
+
+Запрос читает только строки индекса по терминам запроса (индекс по term),
+поэтому время поиска зависит от частоты слов, а не от размера архива.
+"""
+import html
+import logging
+import math
+import re
+from collections import Counter
+from collections.abc import Sequence
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from django.core.cache import cache
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+# Веса полей (соотношение прежних баллов релевантности 50/30/20/10/1)
+FIELD_WEIGHTS = {
+    'category': 5.0,
+    'tags': 3.0,
+    'title': 2.0,
+    'description': 1.0,
+    'content': 0.1,
+}
+FIELDS = tuple(FIELD_WEIGHTS)
+
+BM25_K1 = 1.2
+BM25_B = {
+    'category': 0.3,
+    'tags': 0.5,
+    'title': 0.75,
+    'description': 0.75,
+    'content': 0.75,
+}
+
+MAX_TERM_LENGTH = 64
+MAX_TF = 32767  # PositiveSmallIntegerField
+STATS_CACHE_KEY = 'blog_search_stats'
+STATS_CACHE_TIMEOUT = 60 * 5
+# Доля опубликованных статей в индексе, с которой поиск переключается на него
+READY_COVERAGE = 0.95
+
+STOP_WORDS = frozenset("""
+а без более бы был была были было быть в вам вас весь во вот все всего всех вы где да даже для до
+его ее если есть еще же за здесь и из или им их к как ко когда кто ли либо мне может мы на над надо
+наш не него нее нет ни них но ну о об однако он она они оно от очень по под при с со так также такой
+там те тем то того тоже той только том ты у уже хотя чего чей чем что чтобы чье чья эта эти это я
+the and for with from that this are was you
+""".split())
+
+_TOKEN_RE = re.compile(r'[0-9a-zа-я]+')
+_TAG_RE = re.compile(r'<[^>]+>')
+
+
+# ============================================================================
+# СТЕММЕР (Snowball, русский)
+# ============================================================================
+
+_RV_RE = re.compile(r'^(.*?[аеиоуыэюя])(.*)$')
+_PERFECTIVE_GERUND = re.compile(r'((ив|ивши|ившись|ыв|ывши|ывшись)|((?<=[ая])(в|вши|вшись)))$')
+_REFLEXIVE = re.compile(r'(с[яь])$')
+_ADJECTIVE = re.compile(r'(ее|ие|ые|ое|ими|ыми|ей|ий|ый|ой|ем|им|ым|ом|его|ого|ему|ому|их|ых|ую|юю|ая|яя|ою|ею)$')
+_PARTICIPLE = re.compile(r'((ивш|ывш|ующ)|((?<=[ая])(ем|нн|вш|ющ|щ)))$')
+_VERB = re.compile(
+    r'((ила|ыла|ена|ейте|уйте|ите|или|ыли|ей|уй|ил|ыл|им|ым|ен|ило|ыло|ено|ят|ует|уют|ит|ыт|ены|ить|ыть|ишь|ую|ю)'
+    r'|((?<=[ая])(ла|на|ете|йте|ли|й|л|ем|н|ло|но|ет|ют|ны|ть|ешь|нно)))$'
+)
+_NOUN = re.compile(
+    r'(а|ев|ов|ие|ье|е|иями|ями|ами|еи|ии|и|ией|ей|ой|ий|й|иям|ям|ием|ем|ам|ом|о|у|ах|иях|ях|ы|ь|ию|ью|ю|ия|ья|я)$'
+)
+_DERIVATIONAL = re.compile(r'.*[^аеиоуыэюя]+[аеиоуыэюя].*ость?$')
+_DER = re.compile(r'ость?$')
+_SUPERLATIVE = re.compile(r'(ейше|ейш)$')
+
+
+@lru_cache(maxsize=100000)
+def stem(word: str) -> str:
+    """Основа русского слова (алгоритм Snowball); латиница и числа не меняются"""
+    match = _RV_RE.match(word)
+    if not match:
+        return word
+
+    prefix, rv = match.groups()
+    temp = _PERFECTIVE_GERUND.sub('', rv, 1)
+    if temp == rv:
+        rv = _REFLEXIVE.sub('', rv, 1)
+        temp = _ADJECTIVE.sub('', rv, 1)
+        if temp != rv:
+            rv = _PARTICIPLE.sub('', temp, 1)
+        else:
+            temp = _VERB.sub('', rv, 1)
+            rv = _NOUN.sub('', rv, 1) if temp == rv else temp
+    else:
+        rv = temp
+
+    if rv.endswith('и'):
+        rv = rv[:-1]
+    if _DERIVATIONAL.match(rv):
+        rv = _DER.sub('', rv, 1)
+    if rv.endswith('ь'):
+        rv = rv[:-1]
+    else:
+        rv = _SUPERLATIVE.sub('', rv, 1)
+        if rv.endswith('нн'):
+            rv = rv[:-1]
+    return prefix + rv
+
+
+def tokenize(text: str, is_html: bool = False) -> List[str]:
+    """
+    Разбивает текст на основы слов (без стоп-слов и однобуквенных токенов)
+
+    Args:
+        text: Исходный текст
+        is_html: Удалить HTML-теги и сущности перед разбором
+    """
+    if not text:
+        return []
+    if is_html:
+        text = html.unescape(_TAG_RE.sub(' ', text))
+    text = text.lower().replace('ё', 'е')
+    return [
+        stem(token)[:MAX_TERM_LENGTH]
+        for token in _TOKEN_RE.findall(text)
+        if len(token) > 1 and token not in STOP_WORDS
+    ]
+
+
+# ============================================================================
+# ИНДЕКСАЦИЯ
+# ============================================================================
+
+def _post_fields(post) -> Dict[str, List[str]]:
+    """Токены по полям статьи"""
+    tags = ' '.join(f"{tag.name} {tag.slug}" for tag in post.tags.all())
+    category = f"{post.category.title} {post.category.slug}" if post.category_id else ''
+    return {
+        'category': tokenize(category),
+        'tags': tokenize(tags),
+        'title': tokenize(post.title),
+        'description': tokenize(post.description, is_html=True),
+        'content': tokenize(post.content, is_html=True),
+    }
+
+
+def index_post(post) -> bool:
+    """
+    Переиндексирует одну статью. Неопубликованные статьи удаляются из индекса.
+
+    Returns:
+        bool: True если статья есть в индексе после вызова
+    """
+    from .models import PostSearchDocument, PostSearchPosting
+
+    if post.status != 'published':
+        remove_post(post.pk)
+        return False
+
+    fields = _post_fields(post)
+    counters = {field: Counter(tokens) for field, tokens in fields.items()}
+    terms = set().union(*counters.values())
+
+    with transaction.atomic():
+        document, _ = PostSearchDocument.objects.update_or_create(
+            post_id=post.pk,
+            defaults={f'{field}_length': len(tokens) for field, tokens in fields.items()},
+        )
+        PostSearchPosting.objects.filter(document=document).delete()
+        PostSearchPosting.objects.bulk_create(
+            [
+                PostSearchPosting(
+                    term=term,
+                    document=document,
+                    **{f'{field}_tf': min(counters[field][term], MAX_TF) for field in FIELDS},
+                )
+                for term in terms
+            ],
+            batch_size=1000,
+        )
+    return True
+
+
+def remove_post(post_id) -> None:
+    """Удаляет статью из индекса (строки вхождений удаляются каскадом)"""
+    from .models import PostSearchDocument
+    PostSearchDocument.objects.filter(post_id=post_id).delete()
+
+
+def reindex_post_by_id(post_id) -> bool:
+    """Загружает статью и переиндексирует её (для фоновой задачи)"""
+    from .models import Post
+
+    post = (
+        Post.objects.filter(pk=post_id)
+        .select_related('category')
+        .prefetch_related('tags')
+        .first()
+    )
+    if post is None:
+        remove_post(post_id)
+        return False
+    return index_post(post)
+
+
+def schedule_post_reindex(post_id) -> None:
+    """
+    Ставит переиндексацию статьи в очередь Django-Q.
+    Если очередь недоступна — индексирует сразу.
+    """
+    try:
+        from django_q.tasks import async_task
+        async_task(
+            'blog.tasks.reindex_post_search',
+            post_id,
+            task_name=f"search_reindex_{post_id}",
+            group='search_index',
+        )
+    except Exception as e:
+        logger.warning(f"Очередь недоступна, индексируем статью {post_id} сразу: {e}")
+        try:
+            reindex_post_by_id(post_id)
+        except Exception as exc:
+            logger.error(f"Ошибка индексации статьи {post_id}: {exc}", exc_info=True)
+
+
+# ============================================================================
+# ПОИСК
+# ============================================================================
+
+def _collection_stats() -> Optional[dict]:
+    """Число документов, опубликованных статей и средние длины полей (кешируются на 5 минут)"""
+    stats = cache.get(STATS_CACHE_KEY)
+    if stats is not None and 'published' in stats:
+        return stats
+
+    from django.db.models import Avg, Count
+    from .models import Post, PostSearchDocument
+
+    aggregates = PostSearchDocument.objects.aggregate(
+        total=Count('pk'),
+        **{f'{field}_avg': Avg(f'{field}_length') for field in FIELDS},
+    )
+    stats = {
+        'total': aggregates['total'] or 0,
+        'published': Post.objects.filter(status='published').count(),
+        'avg': {field: float(aggregates[f'{field}_avg'] or 0) or 1.0 for field in FIELDS},
+    }
+    cache.set(STATS_CACHE_KEY, stats, STATS_CACHE_TIMEOUT)
+    return stats
+
+
+def is_index_ready() -> bool:
+    """
+    Индекс построен: в нём не меньше READY_COVERAGE опубликованных статей.
+
+    Сигналы индексируют только сохраняемые статьи, поэтому до первого
+    rebuild_search_index индекс почти пуст и поиск остаётся на старом пути.
+    """
+    stats = _collection_stats()
+    return stats['total'] > 0 and stats['total'] >= stats['published'] * READY_COVERAGE
+
+
+def search_post_ids(query: str, limit: Optional[int] = None) -> List[Tuple[int, float]]:
+    """
+    BM25F-поиск по индексу.
+
+    Returns:
+        List[Tuple[int, float]]: (id статьи, оценка) по убыванию релевантности
+    """
+    from .models import PostSearchPosting
+
+    terms = list(dict.fromkeys(tokenize(query)))
+    if not terms:
+        return []
+
+    stats = _collection_stats()
+    total = stats['total']
+    if not total:
+        return []
+    avg = stats['avg']
+
+    rows = PostSearchPosting.objects.filter(term__in=terms).values_list(
+        'term', 'document_id',
+        *[f'{field}_tf' for field in FIELDS],
+        *[f'document__{field}_length' for field in FIELDS],
+    )
+
+    postings: Dict[str, list] = {term: [] for term in terms}
+    for row in rows:
+        postings[row[0]].append(row[1:])
+
+    field_count = len(FIELDS)
+    scores: Dict[int, float] = {}
+    for term, entries in postings.items():
+        df = len(entries)
+        if not df:
+            continue
+        idf = math.log(1 + (total - df + 0.5) / (df + 0.5))
+        for entry in entries:
+            post_id = entry[0]
+            tfs = entry[1:1 + field_count]
+            lengths = entry[1 + field_count:]
+            weighted_tf = 0.0
+            for field, tf, length in zip(FIELDS, tfs, lengths):
+                if tf:
+                    b = BM25_B[field]
+                    weighted_tf += FIELD_WEIGHTS[field] * tf / (1 - b + b * length / avg[field])
+            scores[post_id] = scores.get(post_id, 0.0) + idf * weighted_tf * (BM25_K1 + 1) / (BM25_K1 + weighted_tf)
+
+    # При равной оценке — более новые статьи (больший id) выше
+    ranked = sorted(scores.items(), key=lambda item: (-item[1], -item[0]))
+    return ranked[:limit] if limit else ranked
+
+
+class SearchResults(Sequence):
+    """
+    Ранжированный список статей для Paginator.
+    Объекты Post загружаются только для запрошенного среза, порядок сохраняется.
+    """
+
+    model = None
+
+    def __init__(self, ranked_ids: List[int], queryset=None):
+        from .models import Post
+
+        self.model = Post
+        self.ranked_ids = ranked_ids
+        self.queryset = queryset if queryset is not None else (
+            Post.objects.filter(status='published').select_related('author', 'category')
+        )
+
+    def __len__(self):
+        return len(self.ranked_ids)
+
+    def count(self):
+        return len(self.ranked_ids)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            ids = self.ranked_ids[index]
+            posts = self.queryset.in_bulk(ids)
+            return [posts[post_id] for post_id in ids if post_id in posts]
+        return self.queryset.get(pk=self.ranked_ids[index])
+
+
+def search_posts(query: str) -> SearchResults:
+    """Ранжированные опубликованные статьи по запросу"""
+    return SearchResults([post_id for post_id, _ in search_post_ids(query)])
+
+
+def invalidate_stats() -> None:
+    """Сбрасывает кеш статистики индекса (после полной перестройки)"""
+    cache.delete(STATS_CACHE_KEY)
@@ -2,6 +2,151 @@
 Signals для модели Post
 Минимальная версия - основные сигналы перенесены в другие модули
 """
-# Файл оставлен для совместимости с blog/apps.py
-# Основные сигналы могут быть в других модулях
+import logging
+import os
 
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from blog.models import Category, Comment, Post, URLRedirect
+from blog.models_likes import Bookmark, Like, PostRating
+
+logger = logging.getLogger(__name__)
+
+VIDEO_EXTENSIONS = ('.mp4', '.webm', '.mov', '.avi')
+
+# Поля статьи, влияющие на полнотекстовый индекс
+SEARCH_INDEX_FIELDS = frozenset({'title', 'description', 'content', 'category', 'category_id', 'status'})
+# Поля статьи, влияющие на таблицу редиректов (slug опубликованных статей)
+REDIRECT_TABLE_FIELDS = frozenset({'slug', 'status'})
+
+
+@receiver(post_save, sender=Post)
+def schedule_post_image_variants(sender, instance, created, **kwargs):
+    """
+    Ставит генерацию responsive-вариантов превью в очередь при загрузке/замене изображения.
+    """
+    name = instance.kartinka.name if instance.kartinka else ''
+    if not name or name.lower().endswith(VIDEO_EXTENSIONS):
+        return
+
+    previous = getattr(instance, '_Post__kartinka', None)
+    if not created and previous is not None and previous.name == name:
+        return
+
+    try:
+        from utilits.responsive_variants import schedule_variants
+        schedule_variants(name)
+    except Exception as exc:
+        logger.warning("Не удалось запланировать responsive-варианты для '%s': %s", name, exc)
+
+
+@receiver(post_save, sender=Post)
+def reindex_post_search(sender, instance, update_fields=None, **kwargs):
+    """
+    Обновляет полнотекстовый индекс статьи после коммита транзакции.
+    Сохранения без индексируемых полей (просмотры, Telegram и т.п.) пропускаются.
+    """
+    if update_fields and not SEARCH_INDEX_FIELDS.intersection(update_fields):
+        return
+
+    from blog.search_index import schedule_post_reindex
+    post_id = instance.pk
+    transaction.on_commit(lambda: schedule_post_reindex(post_id))
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def reindex_post_search_on_tags(sender, instance, action, **kwargs):
+    """Теги индексируются отдельным полем — переиндексируем при их изменении"""
+    if action not in ('post_add', 'post_remove', 'post_clear') or not isinstance(instance, Post):
+        return
+
+    from blog.search_index import schedule_post_reindex
+    post_id = instance.pk
+    transaction.on_commit(lambda: schedule_post_reindex(post_id))
+
+
+@receiver(pre_save, sender=Category)
+def track_category_search_terms(sender, instance, **kwargs):
+    """Запоминаем прежние название и slug категории"""
+    if not instance.pk:
+        return
+    instance._search_previous_terms = (
+        Category.objects.filter(pk=instance.pk).values_list('title', 'slug').first()
+    )
+
+
+@receiver(post_save, sender=Category)
+def reindex_category_posts_search(sender, instance, created, **kwargs):
+    """Название и slug категории входят в индекс статей — переиндексируем её статьи"""
+    previous = getattr(instance, '_search_previous_terms', None)
+    if created or previous is None or previous == (instance.title, instance.slug):
+        return
+
+    try:
+        from django_q.tasks import async_task
+        async_task(
+            'blog.tasks.reindex_category_search',
+            instance.pk,
+            task_name=f"search_reindex_category_{instance.pk}",
+            group='search_index',
+        )
+    except Exception as exc:
+        logger.warning("Не удалось запланировать переиндексацию категории %s: %s", instance.pk, exc)
+
+
+# Счётчики вовлечённости статьи, которые пересчитывает запись каждой модели
+ENGAGEMENT_SENDERS = {
+    Like: ('likes_count',),
+    PostRating: ('ratings_count', 'ratings_sum'),
+    Bookmark: ('bookmarks_count',),
+    Comment: ('comments_count',),
+}
+
+
+def refresh_post_engagement(sender, instance, raw=False, **kwargs):
+    """Пересчитывает счётчики статьи в той же транзакции, что и запись лайка/оценки/закладки/комментария"""
+    if raw or not instance.post_id:
+        return
+    from blog.engagement import refresh_counters
+    refresh_counters(instance.post_id, ENGAGEMENT_SENDERS[sender])
+
+
+for _sender in ENGAGEMENT_SENDERS:
+    post_save.connect(refresh_post_engagement, sender=_sender, dispatch_uid=f'engagement_save_{_sender.__name__}')
+    post_delete.connect(refresh_post_engagement, sender=_sender, dispatch_uid=f'engagement_delete_{_sender.__name__}')
+
+
+@receiver(post_save, sender=URLRedirect)
+@receiver(post_delete, sender=URLRedirect)
+def invalidate_redirect_table_on_redirect_change(sender, instance, **kwargs):
+    """Редирект добавлен/изменён в админке — таблица Smart404Middleware перестраивается"""
+    from blog.redirect_table import invalidate_redirect_table
+    transaction.on_commit(invalidate_redirect_table)
+
+
+@receiver(post_save, sender=Post)
+def invalidate_redirect_table_on_post_save(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Опубликованные slug входят в таблицу редиректов.
+    Полное сохранение Post всегда включает slug и status в update_fields,
+    поэтому сравниваем с состоянием на момент загрузки (Post._redirect_state).
+    """
+    if update_fields and not REDIRECT_TABLE_FIELDS.intersection(update_fields):
+        return
+    previous = None if created else instance._redirect_state
+    current = instance._redirect_state = (instance.__dict__.get('slug'), instance.__dict__.get('status'))
+    if previous == current:
+        return
+    if 'published' not in (current[1], previous[1] if previous else None):
+        return
+    from blog.redirect_table import invalidate_redirect_table
+    transaction.on_commit(invalidate_redirect_table)
+
+
+@receiver(post_delete, sender=Post)
+def invalidate_redirect_table_on_post_delete(sender, instance, **kwargs):
+    """Slug удалённой статьи выходит из таблицы редиректов"""
+    from blog.redirect_table import invalidate_redirect_table
+    transaction.on_commit(invalidate_redirect_table)
@@ -0,0 +1,301 @@
+"""
+Сборка sitemap в файлы: индекс + шарды до 50 000 URL
+
+Раньше /sitemap.xml собирался в процессе по всем опубликованным статьям
+(PostSitemap + ImageSitemap, шаблон на весь архив в памяти) и кешировался
+целиком на час в LocMem каждого воркера.
+
+Здесь:
+- статьи раскладываются по шардам по диапазонам id (SHARD_SIZE id на шард),
+  поэтому изменённая статья затрагивает только свой шард;
+- для каждого шарда одним сгруппированным запросом считается отпечаток
+  (число статей, max(updated), сумма id) — пересобираются только шарды, у
+  которых он изменился (правка, публикация, снятие, удаление);
+- шард пишется потоково (iterator + запись в файл), память не растёт с
+  размером архива; файл заменяется атомарно и только если изменилось
+  содержимое — ETag у неизменных шардов стабилен;
+- категории, теги и авторы — отдельные небольшие шарды;
+- sitemap.xml (индекс) и шарды отдаёт views_sitemap.sitemap_file как
+  статические файлы с ETag / Last-Modified.
+"""
+import gzip
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+from datetime import datetime
+from datetime import timezone as dt_timezone
+from typing import Dict, Iterable, Iterator, List, Optional
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.db.models import Count, F, IntegerField, Max, Sum, Value
+from django.db.models.functions import Floor
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+SITEMAP_DIR = getattr(settings, 'SITEMAP_DIR', None) or os.path.join(settings.BASE_DIR, 'cache', 'sitemaps')
+SITEMAP_GZIP = getattr(settings, 'SITEMAP_GZIP', False)
+SHARD_SIZE = 50000  # лимит протокола sitemaps.org на файл
+INDEX_NAME = 'sitemap.xml'
+MANIFEST_NAME = 'manifest.json'
+SHARD_NAME_RE = re.compile(r'^sitemap-[a-z]+-\d{4}\.xml(\.gz)?$')
+ITERATOR_CHUNK = 2000
+
+URLSET_OPEN = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9" '
+    'xmlns:image="http://www.google.com/schemas/sitemap-image/1.1">\n'
+)
+URLSET_CLOSE = '</urlset>\n'
+
+
+def _site_url() -> str:
+    return getattr(settings, 'SITE_URL', 'https://idealimage.ru').rstrip('/')
+
+
+def shard_name(section: str, number: int) -> str:
+    return f'sitemap-{section}-{number:04d}.xml' + ('.gz' if SITEMAP_GZIP else '')
+
+
+def _url_entry(loc: str, lastmod=None, changefreq=None, priority=None, images: Iterable[dict] = ()) -> str:
+    parts = [f'<url><loc>{escape(loc)}</loc>']
+    if lastmod:
+        parts.append(f'<lastmod>{lastmod:%Y-%m-%d}</lastmod>')
+    if changefreq:
+        parts.append(f'<changefreq>{changefreq}</changefreq>')
+    if priority is not None:
+        parts.append(f'<priority>{float(priority):.1f}</priority>')
+    for image in images:
+        parts.append(f'<image:image><image:loc>{escape(image["loc"])}</image:loc>')
+        if image.get('caption'):
+            parts.append(f'<image:caption>{escape(image["caption"])}</image:caption>')
+        if image.get('title'):
+            parts.append(f'<image:title>{escape(image["title"])}</image:title>')
+        parts.append('</image:image>')
+    parts.append('</url>\n')
+    return ''.join(parts)
+
+
+def _write_file(name: str, chunks: Iterator[str]) -> Optional[str]:
+    """
+    Потоково пишет файл во временный и атомарно заменяет, если содержимое изменилось.
+
+    Returns:
+        str: sha1 содержимого (несжатого)
+    """
+    os.makedirs(SITEMAP_DIR, exist_ok=True)
+    path = os.path.join(SITEMAP_DIR, name)
+    digest = hashlib.sha1()
+    fd, tmp_path = tempfile.mkstemp(dir=SITEMAP_DIR, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as raw:
+            # mtime=0: одинаковое содержимое даёт одинаковые байты архива
+            stream = gzip.GzipFile(fileobj=raw, mode='wb', mtime=0) if name.endswith('.gz') else raw
+            for chunk in chunks:
+                data = chunk.encode('utf-8')
+                digest.update(data)
+                stream.write(data)
+            if stream is not raw:
+                stream.close()
+        sha = digest.hexdigest()
+        if os.path.exists(path) and _file_sha(path) == sha:
+            os.remove(tmp_path)
+        else:
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, path)
+        return sha
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _file_sha(path: str) -> str:
+    opener = gzip.open if path.endswith('.gz') else open
+    digest = hashlib.sha1()
+    with opener(path, 'rb') as existing:
+        for block in iter(lambda: existing.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _load_manifest() -> dict:
+    try:
+        with open(os.path.join(SITEMAP_DIR, MANIFEST_NAME), encoding='utf-8') as manifest:
+            return json.load(manifest)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_manifest(manifest: dict) -> None:
+    _write_file(MANIFEST_NAME, iter([json.dumps(manifest, ensure_ascii=False, indent=1, sort_keys=True)]))
+
+
+# ============================================================================
+# СЕКЦИИ
+# ============================================================================
+
+def _published_posts():
+    from .models import Post
+    return Post.objects.filter(status='published')
+
+
+def post_shard_fingerprints() -> Dict[int, list]:
+    """{номер шарда: [статей, max(updated) ISO, сумма id]} одним сгруппированным запросом"""
+    rows = (
+        _published_posts()
+        .annotate(shard=Floor(F('pk') / Value(SHARD_SIZE), output_field=IntegerField()))
+        .order_by()
+        .values('shard')
+        .annotate(total=Count('pk'), last=Max('updated'), ids=Sum('pk'))
+    )
+    return {
+        int(row['shard']): [row['total'], row['last'].isoformat() if row['last'] else None, int(row['ids'])]
+        for row in rows
+    }
+
+
+def _post_entries(number: int) -> Iterator[str]:
+    from .sitemaps import PostSitemap
+
+    site = PostSitemap()
+    site_url = _site_url()
+    posts = (
+        _published_posts()
+        .filter(pk__gte=number * SHARD_SIZE, pk__lt=(number + 1) * SHARD_SIZE)
+        .only('pk', 'slug', 'title', 'description', 'kartinka', 'created', 'updated', 'views')
+        .order_by('pk')
+    )
+    yield URLSET_OPEN
+    for post in posts.iterator(chunk_size=ITERATOR_CHUNK):
+        yield _url_entry(
+            f'{site_url}{post.get_absolute_url()}',
+            lastmod=post.updated,
+            changefreq=site.changefreq(post),
+            priority=site.priority(post),
+            images=site.images(post),
+        )
+    yield URLSET_CLOSE
+
+
+def _static_entries(site, items: Iterable) -> Iterator[str]:
+    site_url = _site_url()
+    yield URLSET_OPEN
+    for item in items:
+        location = site.location(item) if hasattr(site, 'location') else item.get_absolute_url()
+        lastmod = site.lastmod(item) if callable(getattr(site, 'lastmod', None)) else None
+        yield _url_entry(f'{site_url}{location}', lastmod=lastmod, changefreq=site.changefreq, priority=site.priority)
+    yield URLSET_CLOSE
+
+
+def _small_sections() -> Dict[str, Iterator[str]]:
+    """Небольшие секции (один шард каждая, пересобираются при каждом запуске)"""
+    from .sitemaps import AuthorSitemap, CategorySitemap, TagSitemap
+
+    categories = CategorySitemap()
+    tags = TagSitemap()
+    authors = AuthorSitemap()
+    # Дата последней статьи автора одним запросом вместо двух на каждого
+    author_items = authors.items().annotate(last_post=Max('vizitor__author_posts__updated'))
+
+    class _Authors:
+        changefreq = authors.changefreq
+        priority = authors.priority
+        location = staticmethod(authors.location)
+
+        @staticmethod
+        def lastmod(profile):
+            return profile.last_post
+
+    return {
+        'categories': _static_entries(categories, categories.items().iterator(chunk_size=ITERATOR_CHUNK)),
+        'tags': _static_entries(tags, tags.items().iterator(chunk_size=ITERATOR_CHUNK)),
+        'authors': _static_entries(_Authors, author_items.iterator(chunk_size=ITERATOR_CHUNK)),
+    }
+
+
+# ============================================================================
+# СБОРКА
+# ============================================================================
+
+def build_sitemaps(full: bool = False) -> dict:
+    """
+    Пересобирает изменившиеся шарды и индекс (задача Django-Q).
+
+    Args:
+        full: пересобрать все шарды статей (changefreq/priority зависят от
+            возраста и просмотров статьи — раз в сутки)
+
+    Returns:
+        dict: Количество шардов всего и пересобранных
+    """
+    manifest = _load_manifest()
+    previous = manifest.get('shards', {})
+    shards: Dict[str, dict] = {}
+    rebuilt: List[str] = []
+
+    for number, fingerprint in sorted(post_shard_fingerprints().items()):
+        name = shard_name('posts', number)
+        entry = previous.get(name)
+        if full or entry is None or entry.get('fingerprint') != fingerprint \
+                or not os.path.exists(os.path.join(SITEMAP_DIR, name)):
+            sha = _write_file(name, _post_entries(number))
+            entry = {'fingerprint': fingerprint, 'sha': sha}
+            rebuilt.append(name)
+        shards[name] = {**entry, 'lastmod': fingerprint[1]}
+
+    now = timezone.now().isoformat()
+    for section, chunks in _small_sections().items():
+        name = shard_name(section, 0)
+        sha = _write_file(name, chunks)
+        entry = previous.get(name, {})
+        if entry.get('sha') != sha:
+            rebuilt.append(name)
+            entry = {'sha': sha, 'lastmod': now}
+        shards[name] = entry
+
+    site_url = _site_url()
+
+    def index_chunks():
+        yield '<?xml version="1.0" encoding="UTF-8"?>\n'
+        yield '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+        for name, entry in shards.items():
+            lastmod = entry.get('lastmod')
+            lastmod_tag = f'<lastmod>{lastmod[:10]}</lastmod>' if lastmod else ''
+            yield f'<sitemap><loc>{escape(site_url)}/sitemaps/{name}</loc>{lastmod_tag}</sitemap>\n'
+        yield '</sitemapindex>\n'
+
+    _write_file(INDEX_NAME, index_chunks())
+
+    # Шарды, которых больше нет (например, после смены SITEMAP_GZIP)
+    for name in set(previous) - set(shards):
+        try:
+            os.remove(os.path.join(SITEMAP_DIR, name))
+        except OSError:
+            pass
+
+    _save_manifest({'built_at': now, 'shards': shards})
+    if rebuilt:
+        logger.info(f"🗺️ Sitemap: пересобрано {len(rebuilt)} из {len(shards)} шардов")
+    return {'shards': len(shards), 'rebuilt': len(rebuilt), 'names': rebuilt}
+
+
+def sitemap_path(name: str) -> Optional[str]:
+    """Путь к собранному файлу sitemap (индекс или шард) или None"""
+    if name != INDEX_NAME and not SHARD_NAME_RE.match(name):
+        return None
+    path = os.path.join(SITEMAP_DIR, name)
+    return path if os.path.isfile(path) else None
+
+
+def file_etag(path: str) -> str:
+    stat = os.stat(path)
+    return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+
+def file_last_modified(path: str) -> datetime:
+    return datetime.fromtimestamp(os.stat(path).st_mtime, tz=dt_timezone.utc)
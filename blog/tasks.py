@@ -0,0 +1,70 @@
+"""
+Фоновые задачи Django-Q для блога
+"""
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def generate_responsive_variants(name, force=False):
+    """
+    Генерирует responsive-варианты (srcset) для изображения из media/.
+
+    Args:
+        name: Путь изображения относительно MEDIA_ROOT (FieldFile.name)
+        force: Перегенерировать существующие варианты
+    """
+    from utilits.responsive_variants import get_variant_store
+
+    entry = get_variant_store().ensure(name, force=force)
+    if not entry:
+        return {'success': False, 'name': name}
+    return {'success': True, 'name': name, 'widths': entry['widths']}
+
+
+def reindex_post_search(post_id):
+    """
+    Переиндексирует статью в полнотекстовом индексе поиска.
+
+    Args:
+        post_id: ID статьи
+    """
+    from blog.search_index import reindex_post_by_id
+
+    indexed = reindex_post_by_id(post_id)
+    return {'success': True, 'post_id': post_id, 'indexed': indexed}
+
+
+def reindex_category_search(category_id):
+    """
+    Переиндексирует опубликованные статьи категории (после переименования категории).
+
+    Args:
+        category_id: ID категории
+    """
+    from blog.models import Post
+    from blog.search_index import index_post
+
+    posts = (
+        Post.objects.filter(category_id=category_id, status='published')
+        .select_related('category')
+        .prefetch_related('tags')
+    )
+    count = 0
+    for post in posts:
+        index_post(post)
+        count += 1
+    return {'success': True, 'category_id': category_id, 'indexed': count}
+
+
+def build_sitemaps(full=False):
+    """
+    Пересобирает изменившиеся шарды sitemap и индекс.
+
+    Args:
+        full: Пересобрать все шарды статей
+    """
+    from blog.sitemap_builder import build_sitemaps as build
+
+    result = build(full=full)
+    return {'success': True, 'shards': result['shards'], 'rebuilt': result['rebuilt']}
@@ -3,7 +3,6 @@ Template tags для responsive images (srcset)
 """
 from django import template
 from django.conf import settings
-import os
 
 register = template.Library()
 
@@ -13,6 +12,10 @@ def responsive_image_srcset(image_field, sizes=None):
     """
     Генерирует srcset для responsive images
     
+    Только читает манифест готовых вариантов (O(1), без Pillow).
+    Если варианты ещё не созданы — ставит генерацию в очередь Django-Q
+    и возвращает srcset из оригинала.
+    
     Args:
         image_field: FileField изображения
         sizes: Атрибут sizes (опционально)
@@ -24,24 +27,16 @@ def responsive_image_srcset(image_field, sizes=None):
         return ''
     
     try:
-        from utilits.image_optimizer import ImageOptimizer
-        
-        # Получаем путь к изображению
-        image_path = image_field.path if hasattr(image_field, 'path') else None
-        if not image_path or not os.path.exists(image_path):
-            # Fallback: используем URL
-            image_url = image_field.url if hasattr(image_field, 'url') else ''
-            if image_url:
-                return f'{settings.SITE_URL}{image_url} 1920w'
-            return ''
-        
-        # Генерируем responsive images
-        responsive = ImageOptimizer.generate_responsive_images(image_path)
+        from utilits.responsive_variants import get_variant_store, schedule_variants
         
-        if responsive and responsive.get('srcset'):
-            return responsive['srcset']
+        name = getattr(image_field, 'name', '')
+        if name:
+            srcset = get_variant_store().get_srcset(name, base_url=settings.SITE_URL)
+            if srcset:
+                return srcset
+            schedule_variants(name)
         
-        # Fallback
+        # Fallback: оригинал
         image_url = image_field.url if hasattr(image_field, 'url') else ''
         if image_url:
             return f'{settings.SITE_URL}{image_url} 1920w'
@@ -0,0 +1,613 @@
+"""
+Тесты для приложения blog
+"""
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from .models import Category, Post
+
+User = get_user_model()
+
+
+class BlogTestMixin:
+    """Автор, категория и фабрика статей"""
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author', password='x')
+        self.category = Category.objects.create(title='Красота', slug='beauty')
+
+    def make_post(self, slug, title='Статья', content='Текст статьи', status='published', **extra):
+        return Post.objects.create(
+            title=title, slug=slug, content=content, author=self.author,
+            category=self.category, status=status, **extra,
+        )
+
+
+class SearchIndexTests(BlogTestMixin, TestCase):
+    """Полнотекстовый индекс: BM25F-ранжирование и переключение на индекс после построения"""
+
+    def setUp(self):
+        super().setUp()
+        # Индексируем явно, а не через очередь Django-Q из сигналов
+        patcher = mock.patch('blog.search_index.schedule_post_reindex')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_stemmed_terms_are_ranked_by_field_weight(self):
+        from blog.search_index import index_post, search_post_ids, search_posts, tokenize
+
+        self.assertEqual(tokenize('Уход за волосами'), tokenize('уход волосы'))
+
+        in_title = self.make_post('hair-title', title='Уход за волосами зимой', content='Советы')
+        in_content = self.make_post('hair-content', title='Советы', content='Немного про волосы и уход')
+        other = self.make_post('nails', title='Маникюр', content='Лак для ногтей')
+        for post in (in_title, in_content, other):
+            index_post(post)
+
+        ranked = [post_id for post_id, _ in search_post_ids('волосы')]
+        self.assertEqual(ranked, [in_title.pk, in_content.pk])
+        self.assertEqual([post.pk for post in search_posts('волосы')[0:1]], [in_title.pk])
+        self.assertEqual(search_post_ids('и для'), [])
+
+    def test_unpublished_post_is_removed_from_index(self):
+        from blog.search_index import index_post, search_post_ids
+
+        post = self.make_post('draft-later', title='Пилинг лица')
+        index_post(post)
+        self.assertEqual(len(search_post_ids('пилинг')), 1)
+
+        post.status = 'draft'
+        self.assertFalse(index_post(post))
+        self.assertEqual(search_post_ids('пилинг'), [])
+
+    def test_index_is_ready_only_after_full_build(self):
+        from django.core.management import call_command
+
+        from blog.search_index import index_post, invalidate_stats, is_index_ready
+
+        posts = [self.make_post(f'post-{i}', title=f'Статья номер {i}') for i in range(5)]
+        self.assertFalse(is_index_ready())
+
+        # Одна сохранённая статья после деплоя не переключает поиск на почти пустой индекс
+        index_post(posts[0])
+        invalidate_stats()
+        self.assertFalse(is_index_ready())
+
+        call_command('rebuild_search_index', stdout=mock.Mock())
+        self.assertTrue(is_index_ready())
+
+
+class ViewCounterTests(BlogTestMixin, TestCase):
+    """Просмотры с отложенной записью: буфер процесса → файл-очередь → flush_views"""
+
+    def setUp(self):
+        import tempfile
+
+        from blog import view_counter
+
+        super().setUp()
+        spool_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(spool_dir.cleanup)
+        for name, value in (('SPOOL_DIR', spool_dir.name), ('ROTATE_GRACE', 0), ('SPILL_INTERVAL', 3600)):
+            patcher = mock.patch.object(view_counter, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        view_counter._buffer.clear()
+        self.addCleanup(view_counter._buffer.clear)
+        self.post = self.make_post('popular', views=10)
+
+    def test_page_cache_hits_are_counted(self):
+        from django.http import HttpResponse
+        from django.test import RequestFactory
+        from django.views.decorators.cache import cache_page
+
+        from blog.models import PostViewHourly
+        from blog.view_counter import ViewCounterMiddleware, flush_views
+
+        rendered = []
+
+        @cache_page(60)
+        def post_detail(request, slug):
+            rendered.append(slug)
+            return HttpResponse('ok')
+
+        def get_response(request):
+            request.resolver_match = mock.Mock(url_name='post_detail', kwargs={'slug': 'popular'})
+            return post_detail(request, slug='popular')
+
+        middleware = ViewCounterMiddleware(get_response)
+        factory = RequestFactory()
+        with self.assertNumQueries(0):
+            for user_agent in ('Mozilla/5.0', 'Mozilla/5.0', 'Mozilla/5.0', 'Googlebot/2.1'):
+                middleware(factory.get('/post/popular/', HTTP_USER_AGENT=user_agent))
+        self.assertEqual(rendered, ['popular'])
+
+        self.assertEqual(flush_views(), {'files': 1, 'posts': 1, 'views': 3, 'failed': 0})
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.views, 13)
+        self.assertEqual(PostViewHourly.objects.get(post=self.post).views, 3)
+        self.assertEqual(flush_views()['files'], 0)
+
+    def test_ajax_endpoint_buffers_view(self):
+        from django.urls import reverse
+
+        from blog.view_counter import flush_views
+
+        url = reverse('blog:increment_post_views', args=[self.post.pk])
+        self.assertEqual(self.client.post(url).json(), {'success': True, 'views': 11})
+        self.assertEqual(self.client.post(url).json()['views'], 12)
+        self.assertEqual(Post.objects.get(pk=self.post.pk).views, 10)
+
+        flush_views()
+        self.assertEqual(Post.objects.get(pk=self.post.pk).views, 12)
+        self.assertEqual(self.client.post(reverse('blog:increment_post_views', args=[0])).status_code, 404)
+
+    def test_failed_file_is_retried(self):
+        import os
+
+        from blog import view_counter
+
+        view_counter.record_view('popular')
+        view_counter.record_view('popular')
+        with mock.patch.object(view_counter, 'apply_views', side_effect=RuntimeError('db down')):
+            self.assertEqual(view_counter.flush_views()['failed'], 1)
+        self.assertEqual(Post.objects.get(pk=self.post.pk).views, 10)
+
+        # До истечения FAILED_RETRY_SECONDS файл не трогается
+        self.assertEqual(view_counter.flush_views(), {'files': 0, 'posts': 0, 'views': 0, 'failed': 1})
+
+        with mock.patch.object(view_counter, 'FAILED_RETRY_SECONDS', 0):
+            self.assertEqual(view_counter.flush_views(), {'files': 1, 'posts': 1, 'views': 2, 'failed': 0})
+        self.assertEqual(Post.objects.get(pk=self.post.pk).views, 12)
+        self.assertEqual(os.listdir(view_counter.SPOOL_DIR), [])
+
+
+class EngagementCounterTests(BlogTestMixin, TestCase):
+    """Денормализованные счётчики статьи: сигналы, полное сохранение и сверка"""
+
+    def setUp(self):
+        super().setUp()
+        self.post = self.make_post('counted', views=5)
+        self.reader = User.objects.create_user(username='reader', password='x')
+
+    def counters(self):
+        return Post.objects.values(
+            'likes_count', 'ratings_count', 'ratings_sum', 'bookmarks_count', 'comments_count', 'views'
+        ).get(pk=self.post.pk)
+
+    def test_signals_keep_counters_in_sync(self):
+        from blog.models import Comment
+        from blog.models_likes import Bookmark, Like, PostRating
+
+        Like.objects.create(post=self.post, session_key='s1')
+        Like.objects.create(post=self.post, session_key='s2')
+        rating = PostRating.objects.create(post=self.post, user=self.reader, rating=4)
+        Bookmark.objects.create(post=self.post, user=self.reader)
+        Comment.objects.create(post=self.post, author_comment='Читатель', content='Спасибо', email='r@example.com')
+        active_comments = Comment.objects.filter(post=self.post, active=True).count()
+        self.assertEqual(self.counters(), {
+            'likes_count': 2, 'ratings_count': 1, 'ratings_sum': 4, 'bookmarks_count': 1,
+            'comments_count': active_comments, 'views': 5,
+        })
+
+        rating.rating = 2
+        rating.save()
+        Like.objects.filter(session_key='s1').get().delete()
+        self.assertEqual((self.counters()['ratings_sum'], self.counters()['likes_count']), (2, 1))
+
+    def test_full_save_does_not_overwrite_counters(self):
+        from blog.models_likes import Like
+
+        stale = Post.objects.get(pk=self.post.pk)
+        Like.objects.create(post=self.post, session_key='s1')
+
+        stale.title = 'Новый заголовок'
+        stale.save()
+        self.assertEqual(self.counters()['likes_count'], 1)
+        self.assertEqual(Post.objects.get(pk=self.post.pk).title, 'Новый заголовок')
+
+    def test_full_save_writes_views(self):
+        post = Post.objects.get(pk=self.post.pk)
+        post.views = 42
+        post.save()
+        self.assertEqual(self.counters()['views'], 42)
+
+    def test_full_save_of_deleted_row_inserts_it(self):
+        stale = Post.objects.get(pk=self.post.pk)
+        Post.objects.filter(pk=self.post.pk).delete()
+
+        stale.title = 'Восстановлена'
+        stale.save()
+        restored = Post.objects.get(pk=self.post.pk)
+        self.assertEqual((restored.title, restored.views), ('Восстановлена', 5))
+
+    def test_save_with_deferred_fields_does_not_load_them(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        post = Post.objects.only('id', 'title', 'slug', 'description', 'content', 'status').get(pk=self.post.pk)
+        self.assertIn('category_id', post.get_deferred_fields())
+
+        post.title = 'Только заголовок'
+        with CaptureQueriesContext(connection) as queries:
+            post.save()
+        # Первый запрос — сам UPDATE: отложенные поля не подгружались по одному
+        update = queries.captured_queries[0]['sql']
+        self.assertTrue(update.startswith(f'UPDATE "{Post._meta.db_table}"'), update)
+        for column in ('"views"', '"category_id"', '"likes_count"'):
+            self.assertNotIn(column, update)
+        self.assertEqual(Post.objects.get(pk=self.post.pk).title, 'Только заголовок')
+
+    def test_reconcile_engagement_fixes_drift(self):
+        from django.core.management import call_command
+
+        from blog.models_likes import Like
+
+        other = self.make_post('other')
+        Like.objects.create(post=self.post, session_key='s1')
+        Post.objects.update(likes_count=7, comments_count=3)
+
+        call_command('reconcile_engagement', '--fields', 'likes_count', '--post', str(self.post.pk),
+                     stdout=mock.Mock())
+        self.assertEqual(self.counters()['likes_count'], 1)
+        self.assertEqual(self.counters()['comments_count'], 3)
+        self.assertEqual(Post.objects.get(pk=other.pk).likes_count, 7)
+
+        call_command('reconcile_engagement', '--batch', '1', stdout=mock.Mock())
+        self.assertEqual(Post.objects.get(pk=other.pk).likes_count, 0)
+        self.assertEqual(self.counters()['comments_count'], 0)
+
+
+class RedirectTableTests(BlogTestMixin, TestCase):
+    """Таблица редиректов Smart404Middleware: снимок в памяти, негативный кэш и отложенные hits_count"""
+
+    def setUp(self):
+        from django.http import HttpResponseNotFound
+        from django.test import RequestFactory
+
+        from blog.middleware_404 import Smart404Middleware
+        from blog.models import URLRedirect
+        from blog.redirect_table import redirect_table
+
+        super().setUp()
+        self.moved = URLRedirect.objects.create(old_url='/old-page/', new_url='/new-page/', redirect_type=301)
+        URLRedirect.objects.create(old_url='/sale/', new_url='/promo/', redirect_type=302)
+        URLRedirect.objects.create(old_url='/removed/', new_url='', redirect_type=301)
+        redirect_table.reset()
+        redirect_table.flush_hits()
+        self.addCleanup(redirect_table.reset)
+        self.table = redirect_table
+        self.middleware = Smart404Middleware(lambda request: HttpResponseNotFound())
+        self.factory = RequestFactory()
+
+    def get(self, path):
+        return self.middleware(self.factory.get(path))
+
+    def test_redirects_and_gone(self):
+        response = self.get('/old-page')
+        self.assertEqual((response.status_code, response['Location']), (301, '/new-page/'))
+        response = self.get('/sale/')
+        self.assertEqual((response.status_code, response['Location']), (302, '/promo/'))
+        self.assertEqual(self.get('/removed/').status_code, 410)
+
+    def test_repeated_unmatched_404_makes_no_queries(self):
+        self.assertEqual(self.get('/no-such-page/').status_code, 404)
+        self.assertIn('/no-such-page/', self.table.snapshot().missing)
+        with self.assertNumQueries(0):
+            for _ in range(3):
+                self.assertEqual(self.get('/no-such-page/').status_code, 404)
+
+    def test_negative_cache_is_bounded_under_threads(self):
+        import threading
+
+        with mock.patch('blog.redirect_table.NEGATIVE_CACHE_SIZE', 50):
+            snapshot = self.table.snapshot()
+            threads = [
+                threading.Thread(target=lambda n=n: [snapshot.lookup(f'/miss-{n}-{i}/') for i in range(200)])
+                for n in range(4)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(len(snapshot.missing), 50)
+
+    def test_hits_are_flushed_in_one_update(self):
+        from blog.models import URLRedirect
+
+        with mock.patch('blog.redirect_table.HITS_FLUSH_INTERVAL', 3600):
+            for _ in range(3):
+                self.get('/old-page/')
+        self.assertEqual(URLRedirect.objects.get(pk=self.moved.pk).hits_count, 0)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(self.table.flush_hits(), 3)
+        self.assertEqual(URLRedirect.objects.get(pk=self.moved.pk).hits_count, 3)
+        self.assertEqual(self.table.flush_hits(), 0)
+
+    def test_signals_rebuild_snapshot(self):
+        from blog.models import URLRedirect
+
+        self.assertEqual(self.get('/fresh/').status_code, 404)
+        self.assertEqual(self.get('/blog/post/-new-article-/').status_code, 404)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            URLRedirect.objects.create(old_url='/fresh/', new_url='/fresher/', redirect_type=301)
+        self.assertEqual(self.get('/fresh/')['Location'], '/fresher/')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.make_post('new-article')
+        response = self.get('/blog/post/-new-article-/')
+        self.assertEqual(response.status_code, 301)
+        self.assertTrue(response['Location'].endswith('/post/new-article/'))
+
+    def test_post_save_invalidates_only_on_slug_or_status_change(self):
+        post = self.make_post('stable-slug')
+        draft = self.make_post('draft-slug', status='draft')
+
+        with mock.patch('blog.redirect_table.invalidate_redirect_table') as invalidate:
+            with self.captureOnCommitCallbacks(execute=True):
+                post.title = 'Новый заголовок'
+                post.save()
+                draft.slug = 'draft-renamed'
+                draft.save()
+            invalidate.assert_not_called()
+
+            with self.captureOnCommitCallbacks(execute=True):
+                post.slug = 'renamed-slug'
+                post.save()
+            self.assertEqual(invalidate.call_count, 1)
+
+            with self.captureOnCommitCallbacks(execute=True):
+                draft.status = 'published'
+                draft.save()
+            self.assertEqual(invalidate.call_count, 2)
+
+            with self.captureOnCommitCallbacks(execute=True):
+                self.make_post('another-draft', status='draft')
+            self.assertEqual(invalidate.call_count, 2)
+
+
+class SitemapBuilderTests(BlogTestMixin, TestCase):
+    """Файловый sitemap: пересборка по отпечаткам шардов и отдача с ETag"""
+
+    def setUp(self):
+        import tempfile
+
+        from blog import sitemap_builder
+
+        super().setUp()
+        sitemap_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(sitemap_dir.cleanup)
+        for name, value in (('SITEMAP_DIR', sitemap_dir.name), ('SHARD_SIZE', 2), ('SITEMAP_GZIP', False)):
+            patcher = mock.patch.object(sitemap_builder, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.dir = sitemap_dir.name
+        self.posts = [self.make_post(f'sitemap-{i}', title=f'Статья {i}') for i in range(5)]
+
+    def shard_of(self, post):
+        from blog.sitemap_builder import shard_name
+        return shard_name('posts', post.pk // 2)
+
+    def read(self, name):
+        import os
+        with open(os.path.join(self.dir, name), encoding='utf-8') as sitemap:
+            return sitemap.read()
+
+    def test_only_changed_shard_is_rebuilt(self):
+        from blog.sitemap_builder import build_sitemaps
+
+        first = build_sitemaps()
+        post_shards = {self.shard_of(post) for post in self.posts}
+        self.assertTrue(post_shards <= set(first['names']))
+        self.assertEqual(build_sitemaps()['names'], [])
+
+        changed = self.posts[0]
+        changed.title = 'Новый заголовок'
+        changed.save()
+        self.assertEqual(build_sitemaps()['names'], [self.shard_of(changed)])
+
+        # posts[1] делит шард с соседней статьёй при любой чётности первого id
+        unpublished = self.posts[1]
+        unpublished.status = 'draft'
+        unpublished.save()
+        result = build_sitemaps()
+        self.assertEqual(result['names'], [self.shard_of(unpublished)])
+        self.assertNotIn('/post/sitemap-1/', self.read(self.shard_of(unpublished)))
+
+        self.assertEqual(build_sitemaps(full=True)['shards'], result['shards'])
+
+    def test_emptied_shard_is_removed(self):
+        import os
+
+        from blog.sitemap_builder import INDEX_NAME, build_sitemaps
+
+        name = self.shard_of(self.posts[-1])
+        build_sitemaps()
+        self.assertIn(name, self.read(INDEX_NAME))
+
+        Post.objects.filter(pk__in=[post.pk for post in self.posts if self.shard_of(post) == name]).delete()
+        build_sitemaps()
+        self.assertFalse(os.path.exists(os.path.join(self.dir, name)))
+        self.assertNotIn(name, self.read(INDEX_NAME))
+        self.assertIn(self.shard_of(self.posts[0]), self.read(INDEX_NAME))
+
+    def test_sitemap_file_etag_and_404(self):
+        from django.http import Http404
+        from django.test import RequestFactory
+
+        from blog.sitemap_builder import INDEX_NAME, build_sitemaps
+        from blog.views_sitemap import sitemap_file
+
+        factory = RequestFactory()
+        with self.assertRaises(Http404):
+            sitemap_file(factory.get('/sitemap.xml'), name=INDEX_NAME)
+
+        build_sitemaps()
+        name = self.shard_of(self.posts[0])
+        with self.assertNumQueries(0):
+            response = sitemap_file(factory.get(f'/sitemaps/{name}'), name=name)
+            self.assertEqual(response.status_code, 200)
+            self.assertIn('/post/sitemap-0/', b''.join(response.streaming_content).decode())
+            etag = response['ETag']
+
+            cached = sitemap_file(factory.get(f'/sitemaps/{name}', HTTP_IF_NONE_MATCH=etag), name=name)
+            self.assertEqual(cached.status_code, 304)
+
+        # Пересборка без изменений не меняет файл — ETag стабилен
+        build_sitemaps()
+        self.assertEqual(sitemap_file(factory.get(f'/sitemaps/{name}'), name=name)['ETag'], etag)
+
+        for missing in ('sitemap-posts-9999.xml', '../manifest.json', 'manifest.json'):
+            with self.assertRaises(Http404):
+                sitemap_file(factory.get(f'/sitemaps/{missing}'), name=missing)
+
+
+class HtmlRewriterTests(SimpleTestCase):
+    """Однопроходный rewriter: чанки, raw-text элементы, процессоры и кэш по ETag"""
+
+    PAGE = (
+        b'<html><head><title>T</title></head><body>'
+        b'<img src="first.jpg"><p>text</p>'
+        b'<script>var html = "<img src=x.jpg>";</script>'
+        b'<style>/* <img src=y.jpg> */</style>'
+        b'<!-- note --><!-- ad-slot:header -->'
+        b'<img src=second.jpg alt=\'a > b\'></body></html>'
+    )
+
+    def setUp(self):
+        from django.test import RequestFactory
+        self.factory = RequestFactory()
+        patcher = mock.patch('advertising.templatetags.ad_tags.show_ad', return_value='<div class="ad">AD</div>')
+        self.show_ad = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _rewriter(self, path='/blog/post/x/', processors=None):
+        from django.http import HttpResponse
+        from blog import html_rewriter
+
+        request = self.factory.get(path)
+        response = HttpResponse(b'', content_type='text/html; charset=utf-8')
+        classes = processors or [
+            html_rewriter.LazyImageProcessor,
+            html_rewriter.CanonicalLinkProcessor,
+            html_rewriter.AdSlotProcessor,
+        ]
+        return html_rewriter.HtmlRewriter([
+            cls(request, response) for cls in classes if cls.applies(request, response)
+        ])
+
+    def _middleware(self, body, path='/blog/post/x/', etag=None, status=200):
+        from django.http import HttpResponse
+        from blog.html_rewriter import HtmlRewriteMiddleware
+
+        def get_response(request):
+            response = HttpResponse(body, content_type='text/html; charset=utf-8', status=status)
+            if etag:
+                response['ETag'] = etag
+            return response
+
+        middleware = HtmlRewriteMiddleware(get_response)
+        return middleware, lambda: middleware(self.factory.get(path))
+
+    def test_tags_split_across_chunks(self):
+        expected = self._rewriter().rewrite(self.PAGE)
+        self.assertIn(b'<img src="first.jpg" loading="eager">', expected)
+        self.assertIn(b'loading="lazy"', expected)
+
+        for size in (1, 2, 3, 7, 16, 64):
+            rewriter = self._rewriter()
+            out = b''.join(
+                rewriter.feed(self.PAGE[start:start + size])
+                for start in range(0, len(self.PAGE), size)
+            ) + rewriter.close()
+            self.assertEqual(out, expected, f'chunk size {size}')
+
+    def test_script_and_style_are_not_rewritten(self):
+        out = self._rewriter().rewrite(self.PAGE)
+        self.assertIn(b'<script>var html = "<img src=x.jpg>";</script>', out)
+        self.assertIn(b'<style>/* <img src=y.jpg> */</style>', out)
+        self.assertEqual(out.count(b'loading='), 2)
+        self.assertIn(b'<img src=second.jpg alt=\'a > b\' loading="lazy">', out)
+
+    def test_unquoted_value_before_slash_is_kept(self):
+        from blog.html_rewriter import LazyImageProcessor, parse_attrs
+
+        out = self._rewriter(processors=[LazyImageProcessor]).rewrite(
+            b'<img src=a.jpg/><img src="b.jpg"/><img src=c.jpg />'
+        )
+        self.assertEqual(
+            out,
+            b'<img src=a.jpg/ loading="eager"><img src="b.jpg" loading="lazy" />'
+            b'<img src=c.jpg loading="lazy" />',
+        )
+        self.assertEqual(parse_attrs(b' src=a.jpg/ loading="eager"')[b'src'], b'a.jpg/')
+
+    @override_settings(SITE_URL='https://example.test')
+    def test_canonical_is_injected_on_public_pages_only(self):
+        out = self._rewriter(path='/blog/post/x/?utm_source=tg').rewrite(self.PAGE)
+        self.assertIn(b'<link rel="canonical" href="https://example.test/blog/post/x/"></head>', out)
+
+        with_link = self.PAGE.replace(b'</head>', b'<link rel="canonical" href="/own/"></head>')
+        self.assertEqual(self._rewriter().rewrite(with_link).count(b'canonical'), 1)
+
+        for path in ('/admin/blog/post/', '/advertising/analytics/', '/asistent/admin-panel/', '/dashboard/'):
+            self.assertNotIn(b'canonical', self._rewriter(path=path).rewrite(self.PAGE), path)
+
+        _, call = self._middleware(self.PAGE, status=404)
+        self.assertNotIn(b'canonical', call().content)
+
+    def test_ad_slot_is_replaced(self):
+        out = self._rewriter(path='/admin/').rewrite(self.PAGE)
+        self.assertIn(b'<!-- note --><div class="ad">AD</div>', out)
+        self.assertNotIn(b'ad-slot', out)
+        self.show_ad.assert_called_once_with('header')
+
+    def test_rewrite_cache_hits_by_etag_and_body_hash(self):
+        from blog.html_rewriter import HtmlRewriteMiddleware
+
+        page = self.PAGE.replace(b'<!-- ad-slot:header -->', b'')
+        middleware, call = self._middleware(page, etag='"v1"')
+        with mock.patch.object(
+            HtmlRewriteMiddleware, '_build_rewriter', autospec=True,
+            side_effect=HtmlRewriteMiddleware._build_rewriter,
+        ) as build:
+            first = call().content
+            second = call().content
+            self.assertEqual(build.call_count, 1)
+            self.assertEqual(first, second)
+            self.assertIn(b'loading="lazy"', second)
+
+            # Тот же ответ без ETag кэшируется по хэшу тела
+            middleware, call = self._middleware(page)
+            call()
+            call()
+            self.assertEqual(build.call_count, 2)
+
+            # Ротация рекламы не кэшируется
+            middleware, call = self._middleware(self.PAGE, etag='"v1"')
+            call()
+            call()
+            self.assertEqual(build.call_count, 4)
+            self.assertEqual(self.show_ad.call_count, 2)
+
+    def test_rewrite_cache_is_bounded(self):
+        from blog.html_rewriter import _RewriteCache
+
+        lru = _RewriteCache(max_bytes=40)
+        lru.set(b'a', b'x' * 10)
+        lru.set(b'b', b'x' * 10)
+        lru.set(b'c', b'x' * 10)
+        self.assertIsNotNone(lru.get(b'a'))  # a — самый свежий
+        lru.set(b'd', b'x' * 10)
+        lru.set(b'e', b'x' * 10)
+        self.assertIsNone(lru.get(b'b'))
+        self.assertIsNotNone(lru.get(b'a'))
+        self.assertLessEqual(lru.size, 40)
+        lru.set(b'big', b'x' * 11)  # больше четверти кэша — не сохраняется
+        self.assertIsNone(lru.get(b'big'))
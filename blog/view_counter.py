@@ -0,0 +1,300 @@
+"""
+Счётчик просмотров статей с отложенной записью
+
+Раньше post_detail (под @cache_page) делал UPDATE blog_post SET views=views+1
+прямо в view: просмотры из кэша страниц не считались вовсе, а каждый промах
+кэша — синхронный UPDATE с блокировкой строки популярной статьи.
+
+Теперь:
+- ViewCounterMiddleware отмечает каждый успешный GET статьи (из кэша или
+  нет) в словаре процесса — без обращений к БД;
+- раз в SPILL_INTERVAL секунд процесс дописывает накопленное одной строкой
+  JSON в файл-очередь (utilits.spool.FileSpool, как очередь событий рекламы);
+- задача Django-Q flush_views раз в минуту забирает очередь, прибавляет
+  просмотры к Post.views одним UPDATE ... CASE на пачку статей и ведёт
+  почасовые ряды PostViewHourly для ранжирования популярного; файл, который
+  не удалось записать, повторяется через FAILED_RETRY_SECONDS.
+"""
+import atexit
+import logging
+import os
+import re
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Sum, Value, When
+from django.utils import timezone
+
+from utilits.spool import FileSpool
+
+logger = logging.getLogger(__name__)
+
+SPOOL_DIR = getattr(settings, 'POST_VIEWS_SPOOL_DIR', None) or os.path.join(settings.BASE_DIR, 'cache', 'post_views')
+SPOOL_NAME = 'views'
+ROTATE_GRACE = 1.0
+FAILED_RETRY_SECONDS = getattr(settings, 'POST_VIEWS_FAILED_RETRY_SECONDS', 60 * 60)
+SPILL_INTERVAL = getattr(settings, 'POST_VIEWS_SPILL_SECONDS', 5)
+SPILL_MAX_KEYS = 1000
+FLUSH_LOCK_KEY = 'post_views_flush_lock'
+FLUSH_LOCK_TIMEOUT = 60 * 10
+UPDATE_BATCH_SIZE = 500
+
+_BOT_RE = re.compile(r'bot|crawl|spider|slurp|preview|monitor|curl|wget|python-requests', re.IGNORECASE)
+
+# Буфер процесса: (slug, час в секундах epoch) -> просмотры
+_buffer: Dict[tuple, int] = defaultdict(int)
+_buffer_lock = threading.Lock()
+_last_spill = time.monotonic()
+
+
+def _spool() -> FileSpool:
+    return FileSpool(
+        SPOOL_DIR, SPOOL_NAME, 'просмотров', FLUSH_LOCK_KEY, lock_timeout=FLUSH_LOCK_TIMEOUT,
+        rotate_grace=ROTATE_GRACE, failed_retry_seconds=FAILED_RETRY_SECONDS,
+    )
+
+
+def _hour_start(timestamp: float) -> int:
+    return int(timestamp) // 3600 * 3600
+
+
+# ============================================================================
+# ЗАПИСЬ (на пути запроса)
+# ============================================================================
+
+def record_view(slug: str, timestamp: Optional[float] = None) -> None:
+    """Учитывает просмотр статьи в буфере процесса"""
+    key = (slug, _hour_start(timestamp or time.time()))
+    with _buffer_lock:
+        _buffer[key] += 1
+        due = time.monotonic() - _last_spill >= SPILL_INTERVAL or len(_buffer) >= SPILL_MAX_KEYS
+    if due:
+        spill()
+
+
+def pending_views(slug: str) -> int:
+    """Просмотры статьи в буфере процесса, ещё не переданные в очередь"""
+    with _buffer_lock:
+        return sum(count for (key, _), count in _buffer.items() if key == slug)
+
+
+def is_bot(request) -> bool:
+    return bool(_BOT_RE.search(request.META.get('HTTP_USER_AGENT', '')))
+
+
+def spill() -> int:
+    """
+    Дописывает буфер процесса в файл-очередь одной строкой.
+
+    Returns:
+        int: Количество просмотров, переданных в очередь
+    """
+    global _last_spill
+
+    with _buffer_lock:
+        if not _buffer:
+            _last_spill = time.monotonic()
+            return 0
+        items = list(_buffer.items())
+        _buffer.clear()
+        _last_spill = time.monotonic()
+
+    if not _spool().append([[slug, hour, count] for (slug, hour), count in items]):
+        # Очередь недоступна — просмотры сразу в БД, чтобы не потерять их
+        apply_views(items)
+    return sum(count for _, count in items)
+
+
+atexit.register(spill)
+
+
+class ViewCounterMiddleware:
+    """
+    Считает просмотры статей, включая ответы из кэша страниц.
+
+    Должен стоять в MIDDLEWARE снаружи @cache_page (любое место списка):
+    кэшированный ответ всё равно проходит через process_response.
+    """
+
+    URL_NAME = 'post_detail'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        match = getattr(request, 'resolver_match', None)
+        if (
+            match is not None
+            and match.url_name == self.URL_NAME
+            and request.method == 'GET'
+            and response.status_code == 200
+            and not is_bot(request)
+        ):
+            record_view(match.kwargs.get('slug', ''))
+        return response
+
+
+# ============================================================================
+# ОБРАБОТКА (Django-Q)
+# ============================================================================
+
+def _spool_items(lines: List[list]) -> List[tuple]:
+    """Строки очереди [[slug, час, просмотры], ...] -> [((slug, час), просмотры), ...]"""
+    items = []
+    broken = 0
+    for line in lines:
+        try:
+            items.extend(((slug, hour), count) for slug, hour, count in line)
+        except (ValueError, TypeError):
+            broken += 1
+    if broken:
+        logger.warning(f"Очередь просмотров: пропущено {broken} повреждённых строк")
+    return items
+
+
+def flush_views(retry_failed: bool = False) -> dict:
+    """
+    Записывает накопленные просмотры в БД (задача Django-Q, раз в минуту).
+
+    Args:
+        retry_failed: Вернуть в обработку все отложенные файлы, не дожидаясь FAILED_RETRY_SECONDS
+
+    Returns:
+        dict: Количество файлов, статей, просмотров и отложенных (.failed) файлов
+    """
+    spill()
+    totals = {'files': 0, 'posts': 0, 'views': 0, 'failed': 0}
+    drained = _spool().drain(lambda lines: apply_views(_spool_items(lines)), retry_failed=retry_failed)
+    if drained is None:
+        return totals
+
+    for result in drained['results']:
+        totals['files'] += 1
+        totals['posts'] += result['posts']
+        totals['views'] += result['views']
+    totals['failed'] = drained['failed']
+    if totals['files']:
+        logger.info(f"👁️ Просмотры: +{totals['views']} для {totals['posts']} статей ({totals['files']} файл.)")
+    return totals
+
+
+def apply_views(items: List[tuple]) -> dict:
+    """
+    Прибавляет [((slug, час), просмотры), ...] к Post.views и PostViewHourly (одна транзакция).
+
+    Returns:
+        dict: Количество статей и просмотров
+    """
+    from .models import Post
+
+    by_hour = defaultdict(int)
+    for (slug, hour), count in items:
+        by_hour[(slug, hour)] += count
+    if not by_hour:
+        return {'posts': 0, 'views': 0}
+
+    post_ids = dict(
+        Post.objects.filter(slug__in={slug for slug, _ in by_hour}).order_by().values_list('slug', 'pk')
+    )
+    per_post = defaultdict(int)
+    hourly = defaultdict(int)
+    for (slug, hour), count in by_hour.items():
+        pk = post_ids.get(slug)
+        if pk is None:
+            continue
+        per_post[pk] += count
+        hourly[(pk, datetime.fromtimestamp(hour, tz=dt_timezone.utc))] += count
+
+    with transaction.atomic():
+        pks = sorted(per_post)
+        for start in range(0, len(pks), UPDATE_BATCH_SIZE):
+            batch = pks[start:start + UPDATE_BATCH_SIZE]
+            increment = Case(
+                *[When(pk=pk, then=Value(per_post[pk])) for pk in batch],
+                default=Value(0),
+                output_field=IntegerField(),
+            )
+            Post.objects.filter(pk__in=batch).update(views=F('views') + increment)
+        _merge_hourly(hourly)
+
+    return {'posts': len(per_post), 'views': sum(per_post.values())}
+
+
+def _merge_hourly(hourly: Dict[tuple, int]) -> None:
+    """Прибавляет {(post_id, час): просмотры} к строкам PostViewHourly"""
+    from .models import PostViewHourly
+
+    if not hourly:
+        return
+    existing = PostViewHourly.objects.filter(
+        post_id__in={pk for pk, _ in hourly},
+        hour__in={hour for _, hour in hourly},
+    )
+    rows = {(row.post_id, row.hour): row for row in existing}
+
+    to_create, to_update = [], []
+    for key, count in hourly.items():
+        row = rows.get(key)
+        if row is None:
+            to_create.append(PostViewHourly(post_id=key[0], hour=key[1], views=count))
+        else:
+            row.views += count
+            to_update.append(row)
+    PostViewHourly.objects.bulk_create(to_create, batch_size=1000)
+    if to_update:
+        PostViewHourly.objects.bulk_update(to_update, ['views'], batch_size=1000)
+
+
+# ============================================================================
+# ЧТЕНИЕ
+# ============================================================================
+
+def _since(hours: int) -> datetime:
+    return datetime.fromtimestamp(_hour_start(time.time()), tz=dt_timezone.utc) - timedelta(hours=hours - 1)
+
+
+def hourly_series(post_ids: List[int], hours: int = 24) -> Dict[int, List[int]]:
+    """
+    Почасовые просмотры статей за последние hours часов (от старых к новым).
+
+    Returns:
+        dict: {post_id: [просмотры за каждый час]}
+    """
+    from .models import PostViewHourly
+
+    since = _since(hours)
+    series = {pk: [0] * hours for pk in post_ids}
+    rows = PostViewHourly.objects.filter(post_id__in=post_ids, hour__gte=since).values_list('post_id', 'hour', 'views')
+    for pk, hour, views in rows:
+        index = int((hour - since).total_seconds() // 3600)
+        if 0 <= index < hours:
+            series[pk][index] += views
+    return series
+
+
+def trending_post_ids(hours: int = 24, limit: int = 10) -> List[int]:
+    """Опубликованные статьи с наибольшим числом просмотров за последние hours часов"""
+    from .models import PostViewHourly
+
+    rows = (
+        PostViewHourly.objects.filter(hour__gte=_since(hours), post__status='published')
+        .values('post_id')
+        .annotate(total=Sum('views'))
+        .order_by('-total', '-post_id')[:limit]
+    )
+    return [row['post_id'] for row in rows]
+
+
+def purge_hourly(days: int = 90) -> int:
+    """Удаляет почасовые ряды старше days дней"""
+    from .models import PostViewHourly
+
+    deleted, _ = PostViewHourly.objects.filter(hour__lt=timezone.now() - timedelta(days=days)).delete()
+    return deleted
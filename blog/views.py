@@ -18,7 +18,7 @@ from django.urls import reverse_lazy, reverse
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.contrib.messages.views import SuccessMessageMixin
 from .mixins import AuthorRequiredMixin
-from django.db.models import Q, F
+from django.db.models import Q
 from django.core.cache import cache
 from django.views.decorators.cache import cache_page
 from django.utils import timezone
@@ -135,8 +135,7 @@ def post_detail(request, slug):
         raise Http404("Статья не найдена")
     comments = post.comments.filter(active=True).select_related('post')
     
-    # Увеличиваем счетчик просмотров БЕЗ вызова сигналов
-    Post.objects.filter(pk=post.pk).update(views=F('views') + 1)
+    # Просмотры (в том числе из кэша страниц) считает blog.view_counter.ViewCounterMiddleware
     
     # SEO данные (используем AI-сгенерированные если доступны)
     page_title = post.meta_title if hasattr(post, 'meta_title') and post.meta_title else post.title
@@ -1128,7 +1127,11 @@ class SearchPageView(ListView):
     def get_queryset(self):
         query = self.request.GET.get('query')
         if query:
-            # Искать только среди опубликованных статей
+            from .search_index import is_index_ready, search_posts
+
+            # Полнотекстовый индекс (BM25); пока индекс не построен — прежний поиск
+            if is_index_ready():
+                return search_posts(query)
             return Post.objects.filter(
                 Q(title__icontains=query) | Q(description__icontains=query),
                 status='published'
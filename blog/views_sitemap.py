@@ -1,8 +1,13 @@
 """
 Кастомный sitemap view с поддержкой Google Image Sitemap
 Включает кэширование для оптимальной производительности
+
+Основной путь — файлы, собранные blog.sitemap_builder (индекс + шарды):
+sitemap_file отдаёт их с ETag / Last-Modified без запросов к БД.
+image_sitemap собирает карту в процессе и используется, пока файлы не собраны.
 """
-from django.http import HttpResponse, Http404
+from django.http import FileResponse, HttpResponse, Http404
+from django.views.decorators.http import condition
 from django.template import loader
 from django.contrib.sites.shortcuts import get_current_site
 from django.core.cache import cache
@@ -134,3 +139,35 @@ def image_sitemap(request, sitemaps, section=None):
     
     return response
 
+
+
+def _built_file_etag(request, name, **kwargs):
+    from blog.sitemap_builder import file_etag, sitemap_path
+    path = sitemap_path(name)
+    return file_etag(path) if path else None
+
+
+def _built_file_last_modified(request, name, **kwargs):
+    from blog.sitemap_builder import file_last_modified, sitemap_path
+    path = sitemap_path(name)
+    return file_last_modified(path) if path else None
+
+
+@condition(etag_func=_built_file_etag, last_modified_func=_built_file_last_modified)
+def sitemap_file(request, name, sitemaps=None):
+    """
+    Собранный файл sitemap (индекс или шард) с ETag / Last-Modified
+    Если индекс ещё не собран — карта строится в процессе (image_sitemap)
+    """
+    from blog.sitemap_builder import sitemap_path
+
+    path = sitemap_path(name)
+    if path is None:
+        if sitemaps is not None:
+            return image_sitemap(request, sitemaps)
+        raise Http404("Sitemap не найден")
+
+    content_type = 'application/gzip' if name.endswith('.gz') else 'application/xml; charset=utf-8'
+    response = FileResponse(open(path, 'rb'), content_type=content_type)
+    response['Cache-Control'] = 'public, max-age=3600'
+    return response
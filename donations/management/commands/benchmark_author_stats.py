@@ -0,0 +1,160 @@
+"""
+Management команда для замера пересчёта статистики и бонусов авторов
+
+Создаёт синтетический набор (авторы, статьи, лайки, комментарии, задания)
+внутри транзакции, замеряет пакетный пересчёт и прежний расчёт по одному
+автору (на выборке), после чего откатывает транзакцию — данные в БД не остаются.
+"""
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from donations.stats_engine import upsert_author_bonuses, upsert_author_stats
+
+
+def _legacy_author_stats(author, period_start, period_end):
+    """Прежняя схема: запросы лайков и комментариев на каждую статью (только чтение)"""
+    from blog.models import Post
+    from Asistent.models import TaskAssignment
+
+    articles = Post.objects.filter(
+        author=author, status='published', created__gte=period_start, created__lte=period_end
+    )
+    totals = [articles.count(), 0, 0, 0]
+    for article in articles:
+        totals[1] += article.likes.count()
+        totals[2] += article.comments.filter(active=True).count()
+        totals[3] += article.views
+    tasks = TaskAssignment.objects.filter(
+        author=author, status='approved', completed_at__gte=period_start, completed_at__lte=period_end
+    ).select_related('task')
+    len(tasks)
+    return totals
+
+
+class QueryCounter:
+    """Счётчик SQL-запросов (execute_wrapper, не зависит от DEBUG и лимита connection.queries)"""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class Command(BaseCommand):
+    help = 'Замерить пакетный пересчёт статистики и бонусов авторов на синтетических данных'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--authors', type=int, default=2000, help='Авторов (по умолчанию: 2000)')
+        parser.add_argument('--posts', type=int, default=5, help='Статей на автора (по умолчанию: 5)')
+        parser.add_argument('--likes', type=int, default=4, help='Лайков на статью (по умолчанию: 4)')
+        parser.add_argument('--comments', type=int, default=3, help='Комментариев на статью (по умолчанию: 3)')
+        parser.add_argument(
+            '--sample',
+            type=int,
+            default=50,
+            help='Авторов для замера расчёта по одному (по умолчанию: 50)'
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            period_start, period_end, authors = self._populate(options)
+            self._measure(period_start, period_end, authors, options['sample'])
+            transaction.set_rollback(True)
+        self.stdout.write('Синтетические данные удалены (откат транзакции)')
+
+    def _populate(self, options):
+        from blog.models import Category, Comment, Post
+        from blog.models_likes import Like
+        from Asistent.models import ContentTask, TaskAssignment
+
+        rng = random.Random(42)
+        started = time.perf_counter()
+        now = timezone.now()
+        prefix = f'bench{int(now.timestamp())}'
+
+        User.objects.bulk_create(
+            [User(username=f'{prefix}_{index}') for index in range(options['authors'])], batch_size=1000
+        )
+        authors = list(User.objects.filter(username__startswith=f'{prefix}_'))
+        category = Category.objects.create(title=prefix, slug=prefix)
+
+        Post.objects.bulk_create([
+            Post(
+                title=f'Статья {author.id}-{number}',
+                slug=f'{prefix}-{author.id}-{number}',
+                category=category,
+                author=author,
+                status='published',
+                views=rng.randint(0, 5000),
+            )
+            for author in authors for number in range(options['posts'])
+        ], batch_size=1000)
+        posts = list(Post.objects.filter(category=category).only('id'))
+
+        Like.objects.bulk_create([
+            Like(post=post, session_key=f'{prefix}{number}')
+            for post in posts for number in range(options['likes'])
+        ], batch_size=2000)
+        Comment.objects.bulk_create([
+            Comment(
+                post=post, author_comment='Читатель', content='Комментарий',
+                email='reader@example.com', active=number % 4 != 0,
+            )
+            for post in posts for number in range(options['comments'])
+        ], batch_size=2000)
+
+        task = ContentTask.objects.create(
+            title=prefix, description=prefix, deadline=now + timedelta(days=7),
+            required_word_count=300, reward=Decimal('150.00'), created_by=authors[0],
+        )
+        TaskAssignment.objects.bulk_create([
+            TaskAssignment(task=task, author=author, status='approved', completed_at=now)
+            for author in authors[::3]
+        ], batch_size=1000)
+
+        self.stdout.write(
+            f'Данные: авторов {len(authors)}, статей {len(posts)}, '
+            f'подготовка {time.perf_counter() - started:.1f} с'
+        )
+        return now - timedelta(hours=1), now + timedelta(hours=1), authors
+
+    def _measure(self, period_start, period_end, authors, sample_size):
+        stats_queries, bonus_queries = QueryCounter(), QueryCounter()
+        with connection.execute_wrapper(stats_queries):
+            started = time.perf_counter()
+            stats_list = upsert_author_stats(period_start, period_end, 'week')
+            stats_time = time.perf_counter() - started
+        with connection.execute_wrapper(bonus_queries):
+            started = time.perf_counter()
+            bonuses = upsert_author_bonuses(stats_list, period_start, period_end)
+            bonus_time = time.perf_counter() - started
+
+        self.stdout.write(self.style.SUCCESS(
+            f'[OK] Статистика {len(stats_list)} авторов: {stats_time * 1000:.0f} мс, запросов {stats_queries.count}'
+        ))
+        self.stdout.write(self.style.SUCCESS(
+            f'[OK] Бонусы {len(bonuses)} авторов: {bonus_time * 1000:.0f} мс, запросов {bonus_queries.count}'
+        ))
+
+        sample = authors[:max(1, min(sample_size, len(authors)))]
+        legacy_queries = QueryCounter()
+        with connection.execute_wrapper(legacy_queries):
+            started = time.perf_counter()
+            for author in sample:
+                _legacy_author_stats(author, period_start, period_end)
+            legacy_time = time.perf_counter() - started
+        scale = len(authors) / len(sample)
+        self.stdout.write(
+            f'По одному автору (без записи, выборка {len(sample)}): '
+            f'оценка на всех {legacy_time * scale:.1f} с, '
+            f'запросов ~{int(legacy_queries.count * scale)}'
+        )
@@ -0,0 +1,308 @@
+"""
+Пакетный расчёт статистики и бонусов авторов
+
+Раньше статистика считалась по одному автору: на каждую статью — запрос
+лайков и комментариев, на каждого автора — запрос формул, два сохранения
+AuthorStats и отдельные запросы донатов и штрафов. Ежедневный пересчёт
+стоил O(авторов × статей) запросов.
+
+Здесь все показатели периода собираются несколькими сгруппированными
+запросами на всех авторов сразу (статьи со счётчиками лайков и
+комментариев, задания, донаты, штрафы/премии), роли определяются по формулам, загруженным один раз,
+а AuthorStats / AuthorBonus записываются пачками (bulk_create + bulk_update).
+Число запросов не зависит от числа авторов и статей.
+"""
+import logging
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Q, Sum
+from django.utils import timezone
+
+from .models import (
+    AuthorBonus, AuthorPenaltyReward, AuthorRole, AuthorStats, BonusFormula, Donation,
+)
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+ZERO = Decimal('0.00')
+
+STATS_FIELDS = [
+    'period_end', 'articles_count', 'total_likes', 'total_comments', 'total_views',
+    'completed_tasks_count', 'tasks_reward_total', 'articles_detail', 'tasks_detail',
+    'current_role', 'calculated_points', 'calculated_at',
+]
+BONUS_FIELDS = [
+    'role_at_calculation', 'donations_amount', 'bonus_percentage', 'calculated_bonus',
+    'tasks_reward', 'points_earned', 'point_value', 'bonus_from_points', 'total_bonus',
+]
+
+
+def _empty_activity() -> dict:
+    return {
+        'articles_count': 0,
+        'total_likes': 0,
+        'total_comments': 0,
+        'total_views': 0,
+        'articles_detail': [],
+        'completed_tasks_count': 0,
+        'tasks_reward_total': ZERO,
+        'tasks_detail': [],
+    }
+
+
+def collect_author_activity(period_start, period_end, author_ids: Optional[Iterable[int]] = None) -> Dict[int, dict]:
+    """
+    Статьи, лайки, комментарии, просмотры и задания авторов за период (2 запроса).
+
+    Args:
+        period_start: datetime начала периода
+        period_end: datetime конца периода
+        author_ids: только эти авторы (по умолчанию — все, у кого есть активность)
+
+    Returns:
+        Dict[int, dict]: {author_id: показатели в полях AuthorStats}
+    """
+    from blog.models import Post
+    from Asistent.models import TaskAssignment
+
+    posts = Post.objects.filter(status='published', created__gte=period_start, created__lte=period_end)
+    assignments = TaskAssignment.objects.filter(
+        status='approved', completed_at__gte=period_start, completed_at__lte=period_end
+    )
+    if author_ids is not None:
+        author_ids = list(author_ids)
+        posts = posts.filter(author_id__in=author_ids)
+        assignments = assignments.filter(author_id__in=author_ids)
+
+    activity: Dict[int, dict] = {}
+    fields = ('id', 'author_id', 'title', 'slug', 'created', 'views', 'likes_count', 'comments_count')
+    for post in posts.values(*fields):
+        stats = activity.setdefault(post['author_id'], _empty_activity())
+        post_likes = post['likes_count']
+        post_comments = post['comments_count']
+        stats['articles_count'] += 1
+        stats['total_likes'] += post_likes
+        stats['total_comments'] += post_comments
+        stats['total_views'] += post['views']
+        stats['articles_detail'].append({
+            'id': post['id'],
+            'title': post['title'],
+            'slug': post['slug'],
+            'created': post['created'].isoformat(),
+            'likes': post_likes,
+            'comments': post_comments,
+            'views': post['views'],
+        })
+
+    for assignment in assignments.values('author_id', 'task_id', 'task__title', 'task__reward', 'completed_at'):
+        stats = activity.setdefault(assignment['author_id'], _empty_activity())
+        reward = assignment['task__reward']
+        stats['completed_tasks_count'] += 1
+        stats['tasks_reward_total'] += reward
+        stats['tasks_detail'].append({
+            'task_id': assignment['task_id'],
+            'task_title': assignment['task__title'],
+            'completed_at': assignment['completed_at'].isoformat() if assignment['completed_at'] else None,
+            'reward': float(reward),
+        })
+
+    for author_id in author_ids or ():
+        activity.setdefault(author_id, _empty_activity())
+    return activity
+
+
+class RoleResolver:
+    """Формулы бонусов и роли, загруженные один раз на весь пересчёт"""
+
+    def __init__(self):
+        self.formulas = list(
+            BonusFormula.objects.filter(is_active=True).select_related('role').order_by('-role__level')
+        )
+        if self.formulas:
+            self.fallback_role = AuthorRole.objects.select_related('formula').order_by('level').first()
+        else:
+            logger.warning('Нет активных формул для расчета роли. Создайте формулы через админ-панель.')
+            # Роль стажера по умолчанию
+            self.fallback_role = AuthorRole.objects.filter(level=1).first()
+
+    def resolve(self, stats):
+        """
+        Роль и баллы автора по его статистике
+
+        Returns:
+            tuple: (AuthorRole, calculated_points)
+        """
+        if not self.formulas:
+            return self.fallback_role, 0
+
+        metrics = {
+            'articles': stats.articles_count,
+            'likes': stats.total_likes,
+            'comments': stats.total_comments,
+            'views': stats.total_views,
+            'tasks': stats.completed_tasks_count,
+        }
+        # Формулы отсортированы от высшей роли к низшей — первая подходящая и есть лучшая
+        for formula in self.formulas:
+            points = formula.calculate_points(**metrics)
+            if points >= float(formula.min_points_required) and stats.articles_count >= formula.min_articles_required:
+                return formula.role, points
+
+        # Не нашли подходящую роль — самая низкая (Стажёр) с баллами по её формуле
+        role = self.fallback_role
+        if role and hasattr(role, 'formula'):
+            return role, role.formula.calculate_points(**metrics)
+        return role, 0
+
+
+def upsert_author_stats(period_start, period_end, period_type='week',
+                        author_ids: Optional[Iterable[int]] = None) -> List[AuthorStats]:
+    """
+    Пересчитать и записать AuthorStats авторов за период
+
+    Args:
+        period_start: datetime начала периода
+        period_end: datetime конца периода
+        period_type: тип периода ('week', 'month', 'all_time')
+        author_ids: только эти авторы (по умолчанию — все с активностью за период)
+
+    Returns:
+        list: AuthorStats (с заполненным author)
+    """
+    activity = collect_author_activity(period_start, period_end, author_ids)
+    if not activity:
+        return []
+
+    resolver = RoleResolver()
+    authors = User.objects.in_bulk(list(activity))
+    existing = {
+        stats.author_id: stats
+        for stats in AuthorStats.objects.filter(period_type=period_type, period_start=period_start)
+    }
+    now = timezone.now()
+    to_create, to_update = [], []
+    for author_id, values in activity.items():
+        author = authors.get(author_id)
+        if author is None:
+            continue
+        stats = existing.get(author_id)
+        if stats is None:
+            stats = AuthorStats(author=author, period_type=period_type, period_start=period_start)
+            to_create.append(stats)
+        else:
+            stats.author = author
+            to_update.append(stats)
+        stats.period_end = period_end
+        for field, value in values.items():
+            setattr(stats, field, value)
+        role, points = resolver.resolve(stats)
+        stats.current_role = role
+        stats.calculated_points = Decimal(str(points))
+        stats.calculated_at = now
+
+    with transaction.atomic():
+        AuthorStats.objects.bulk_create(to_create, batch_size=BATCH_SIZE)
+        AuthorStats.objects.bulk_update(to_update, STATS_FIELDS, batch_size=BATCH_SIZE)
+
+    logger.info(f'📊 Статистика авторов за {period_start} - {period_end}: '
+                f'создано {len(to_create)}, обновлено {len(to_update)}')
+    return to_create + to_update
+
+
+def _penalties_by_author(period_start, period_end) -> Dict[int, list]:
+    """Действующие в периоде штрафы и премии, сгруппированные по авторам"""
+    queryset = AuthorPenaltyReward.objects.filter(
+        is_active=True,
+        applied_from__lte=period_end,
+    ).filter(
+        Q(applied_until__isnull=True) | Q(applied_until__gte=period_start)
+    )
+    grouped: Dict[int, list] = {}
+    for item in queryset:
+        grouped.setdefault(item.author_id, []).append(item)
+    return grouped
+
+
+def upsert_author_bonuses(stats_list: List[AuthorStats], period_start, period_end) -> List[AuthorBonus]:
+    """
+    Рассчитать и записать AuthorBonus по готовой статистике (3 запроса чтения)
+
+    Args:
+        stats_list: AuthorStats за период (из upsert_author_stats)
+        period_start: datetime начала периода
+        period_end: datetime конца периода
+
+    Returns:
+        list: AuthorBonus
+    """
+    from .bonus_calculator import apply_penalties_rewards
+
+    if not stats_list:
+        return []
+
+    # Донаты и штрафы читаются за период целиком (без длинных IN-списков авторов)
+    donations = dict(
+        Donation.objects.filter(
+            article_author__isnull=False,
+            status='succeeded',
+            completed_at__gte=period_start,
+            completed_at__lte=period_end,
+        ).values('article_author').annotate(total=Sum('amount')).values_list('article_author', 'total')
+    )
+    penalties = _penalties_by_author(period_start, period_end)
+    existing = {
+        bonus.author_id: bonus
+        for bonus in AuthorBonus.objects.filter(period_start=period_start, period_end=period_end)
+    }
+
+    to_create, to_update = [], []
+    for stats in stats_list:
+        role = stats.current_role
+        bonus = existing.get(stats.author_id)
+        if bonus is None:
+            bonus = AuthorBonus(author=stats.author, period_start=period_start, period_end=period_end)
+            to_create.append(bonus)
+        else:
+            bonus.author = stats.author
+            to_update.append(bonus)
+        bonus.role_at_calculation = role
+
+        # 1. Бонус от донатов
+        bonus.donations_amount = donations.get(stats.author_id) or ZERO
+        if role:
+            bonus.bonus_percentage = role.bonus_percentage
+            bonus.calculated_bonus = bonus.donations_amount * (role.bonus_percentage / 100)
+        else:
+            bonus.bonus_percentage = ZERO
+            bonus.calculated_bonus = ZERO
+
+        # 2. Вознаграждение за задания
+        bonus.tasks_reward = stats.tasks_reward_total
+
+        # 3. Бонус от баллов
+        bonus.points_earned = stats.calculated_points
+        if role:
+            bonus.point_value = role.point_value
+            bonus.bonus_from_points = stats.calculated_points * role.point_value
+        else:
+            bonus.point_value = Decimal('1.00')
+            bonus.bonus_from_points = stats.calculated_points
+
+        # 4-5. Итог с учётом штрафов и премий
+        total_before_adjustments = bonus.calculated_bonus + bonus.tasks_reward + bonus.bonus_from_points
+        bonus.total_bonus = apply_penalties_rewards(
+            stats.author, total_before_adjustments, period_start, period_end,
+            penalties_rewards=penalties.get(stats.author_id, []),
+        )
+
+    with transaction.atomic():
+        AuthorBonus.objects.bulk_create(to_create, batch_size=BATCH_SIZE)
+        AuthorBonus.objects.bulk_update(to_update, BONUS_FIELDS, batch_size=BATCH_SIZE)
+
+    logger.info(f'💰 Бонусы авторов за {period_start} - {period_end}: '
+                f'создано {len(to_create)}, обновлено {len(to_update)}')
+    return to_create + to_update
@@ -5,6 +5,8 @@
 """
 from django.test import TestCase, Client
 from django.contrib.auth.models import User
+from django.utils import timezone
+from datetime import timedelta
 from decimal import Decimal
 
 from .models import Donation, DonationSettings
@@ -140,4 +142,105 @@ class DonationFormsTest(TestCase):
         self.assertFalse(form.is_valid())
 
 
-# Добавьте свои тесты здесь
\ No newline at end of file
+# Добавьте свои тесты здесь
+
+class AuthorStatsEngineTest(TestCase):
+    """Тесты пакетного расчёта статистики и бонусов авторов"""
+    
+    def setUp(self):
+        from blog.engagement import reconcile_counters
+        from blog.models import Category, Comment, Post
+        from blog.models_likes import Like
+        from .models import AuthorRole, BonusFormula
+        
+        trainee = AuthorRole.objects.create(name='Стажёр', level=1, point_value=Decimal('1.00'))
+        author_role = AuthorRole.objects.create(
+            name='Автор', level=2, bonus_percentage=Decimal('10.00'), point_value=Decimal('2.00')
+        )
+        for role, min_articles in ((trainee, 0), (author_role, 2)):
+            BonusFormula.objects.create(
+                role=role, articles_weight=1, likes_weight=1, comments_weight=1,
+                views_weight=0, tasks_weight=0, min_articles_required=min_articles,
+            )
+        
+        category = Category.objects.create(title='Тест', slug='test')
+        self.writer = User.objects.create_user(username='writer')
+        self.novice = User.objects.create_user(username='novice')
+        for number, (author, likes, comments) in enumerate(
+            ((self.writer, 2, 1), (self.writer, 0, 2), (self.novice, 1, 0))
+        ):
+            post = Post.objects.create(
+                title=f'Статья {number}', slug=f'post-{number}', category=category,
+                author=author, status='published', views=10,
+            )
+            for like in range(likes):
+                Like.objects.create(post=post, session_key=f'session-{number}-{like}')
+            for comment in range(comments):
+                Comment.objects.create(post=post, author_comment='Читатель', content='Текст', email='r@example.com')
+            Comment.objects.create(post=post, author_comment='Спам', content='Спам', email='s@example.com')
+        # Модерация при сохранении может активировать комментарий — снимаем флаг напрямую
+        # (update идёт в обход сигналов, поэтому счётчики статей сверяются явно)
+        Comment.objects.filter(author_comment='Спам').update(active=False)
+        reconcile_counters(['comments_count'])
+        
+        Donation.objects.create(
+            user_email='d@example.com', amount=Decimal('500.00'), payment_method='yandex',
+            status='succeeded', article_author=self.writer, completed_at=timezone.now(),
+        )
+        self.period = (timezone.now() - timedelta(days=1), timezone.now() + timedelta(days=1))
+    
+    def test_stats_and_roles(self):
+        """Тест: показатели и роли всех авторов за один пересчёт, повторный пересчёт обновляет записи"""
+        from .bonus_calculator import recalculate_all_authors_stats
+        from .models import AuthorStats
+        
+        recalculate_all_authors_stats(*self.period)
+        stats_list = recalculate_all_authors_stats(*self.period)
+        
+        self.assertEqual(AuthorStats.objects.count(), 2)
+        stats = {item.author_id: item for item in stats_list}
+        writer = stats[self.writer.id]
+        self.assertEqual(
+            (writer.articles_count, writer.total_likes, writer.total_comments, writer.total_views),
+            (2, 2, 3, 20)
+        )
+        self.assertEqual(writer.current_role.level, 2)
+        self.assertEqual(writer.calculated_points, Decimal('7'))
+        self.assertEqual(len(writer.articles_detail), 2)
+        self.assertEqual(stats[self.novice.id].current_role.level, 1)
+    
+    def test_bonuses(self):
+        """Тест: бонусы от донатов и баллов с учётом штрафа"""
+        from .bonus_calculator import recalculate_all_authors_bonuses
+        from .models import AuthorPenaltyReward
+        
+        AuthorPenaltyReward.objects.create(
+            author=self.writer, type='penalty', amount=Decimal('4.00'), amount_type='fixed',
+            reason='Тест', applied_to='weekly', applied_from=self.period[0],
+        )
+        bonuses = {bonus.author_id: bonus for bonus in recalculate_all_authors_bonuses(*self.period)}
+        
+        # 500 × 10% + 7 баллов × 2₽ − 4₽ штрафа
+        self.assertEqual(bonuses[self.writer.id].total_bonus, Decimal('60.00'))
+        self.assertEqual(bonuses[self.novice.id].donations_amount, Decimal('0.00'))
+    
+    def test_failing_author_does_not_block_others(self):
+        """Тест: ошибка расчёта одного автора не оставляет без статистики и бонусов остальных"""
+        from unittest import mock
+        from .bonus_calculator import recalculate_all_authors_bonuses
+        from .models import AuthorBonus, AuthorStats
+        from .stats_engine import RoleResolver
+        
+        resolve = RoleResolver.resolve
+        
+        def broken_for_novice(resolver, stats):
+            if stats.author_id == self.novice.id:
+                raise ValueError('broken formula')
+            return resolve(resolver, stats)
+        
+        with mock.patch.object(RoleResolver, 'resolve', broken_for_novice):
+            bonuses = recalculate_all_authors_bonuses(*self.period)
+        
+        self.assertEqual([bonus.author_id for bonus in bonuses], [self.writer.id])
+        self.assertEqual(list(AuthorStats.objects.values_list('author_id', flat=True)), [self.writer.id])
+        self.assertEqual(AuthorBonus.objects.get().author_id, self.writer.id)
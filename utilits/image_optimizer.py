@@ -263,51 +263,41 @@ class ImageOptimizer:
         """
         Генерирует responsive images (несколько размеров) для srcset
         
+        Варианты хранятся в utilits.responsive_variants под детерминированными
+        именами (путь + mtime + ширина), поэтому повторный вызов не пересжимает
+        изображение и не создаёт новые файлы.
+        
         Args:
             image_path: Путь к оригинальному изображению
-            context_name: Название для SEO-имени (опционально)
+            context_name: Не используется (оставлен для обратной совместимости)
         
         Returns:
             Dict с путями к разным размерам и srcset строкой
         """
+        from utilits.responsive_variants import get_variant_store, variant_relpath
+        
         try:
             if not os.path.exists(image_path):
                 return None
             
-            img = Image.open(image_path)
-            original_width = img.width
+            store = get_variant_store()
+            entry = store.ensure(image_path)
+            if not entry:
+                return None
             
+            size_names = {width: name for name, width in cls.RESPONSIVE_SIZES.items()}
             responsive_images = {}
-            srcset_parts = []
-            
-            # Генерируем разные размеры
-            for size_name, target_width in cls.RESPONSIVE_SIZES.items():
-                if target_width > original_width:
-                    continue  # Пропускаем размеры больше оригинала
-                
-                # Изменяем размер
-                ratio = target_width / original_width
-                new_height = int(img.height * ratio)
-                resized_img = img.resize((target_width, new_height), Image.Resampling.LANCZOS)
-                
-                # Сохраняем
-                base_name = cls._generate_seo_filename(context_name or 'image', 'webp')
-                filename = f"{base_name}-{target_width}w.webp"
-                output_path = os.path.join(os.path.dirname(image_path), filename)
-                
-                resized_img.save(output_path, 'WEBP', quality=cls.QUALITY['webp'], method=6)
-                
-                responsive_images[size_name] = {
-                    'path': output_path,
-                    'width': target_width,
-                    'url': f"/media/{os.path.relpath(output_path, settings.MEDIA_ROOT)}"
+            for width in entry['widths']:
+                relpath = variant_relpath(entry['key'], width)
+                responsive_images[size_names.get(width, f"{width}w")] = {
+                    'path': os.path.join(settings.MEDIA_ROOT, relpath),
+                    'width': width,
+                    'url': f"{settings.MEDIA_URL}{relpath}",
                 }
-                
-                srcset_parts.append(f"{responsive_images[size_name]['url']} {target_width}w")
             
             return {
                 'images': responsive_images,
-                'srcset': ', '.join(srcset_parts),
+                'srcset': store.get_srcset(image_path),
                 'sizes': '(max-width: 320px) 320px, (max-width: 640px) 640px, (max-width: 1024px) 1024px, 1920px'
             }
             
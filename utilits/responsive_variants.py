@@ -0,0 +1,354 @@
+"""
+Хранилище responsive-вариантов изображений (srcset)
+
+Варианты генерируются ОДИН раз (при загрузке изображения или фоновой задачей
+Django-Q) и записываются в манифест. Шаблонный тег только читает манифест
+из памяти процесса — никакого Pillow при рендеринге страницы.
+
+Имя варианта детерминировано: sha1(путь исходника + mtime)[:16] + ширина,
+поэтому повторная генерация не плодит новые файлы в media/.
+
+Массовая генерация (management-команда) оборачивается в store.batch():
+манифест перечитывается и переписывается один раз за прогон, а не на каждое
+изображение.
+
+Структура на диске:
+    media/responsive/manifest.json
+    media/responsive/ab/ab12cd34ef567890-640w.webp
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+
+VARIANTS_DIR = 'responsive'
+MANIFEST_NAME = 'manifest.json'
+
+# Как часто (сек) процесс проверяет, не обновился ли манифест на диске
+MANIFEST_RELOAD_INTERVAL = 30
+
+# Сколько ждать lock-файл манифеста и когда считать его «протухшим»
+LOCK_TIMEOUT = 10
+LOCK_STALE_SECONDS = 60
+
+
+def _variants_root():
+    return os.path.join(settings.MEDIA_ROOT, VARIANTS_DIR)
+
+
+def _manifest_path():
+    return os.path.join(_variants_root(), MANIFEST_NAME)
+
+
+def _normalize_name(name):
+    """Путь исходника относительно MEDIA_ROOT с прямыми слэшами"""
+    if os.path.isabs(name):
+        name = os.path.relpath(name, settings.MEDIA_ROOT)
+    return name.replace('\\', '/').lstrip('/')
+
+
+def variant_key(name, mtime):
+    """Content-addressed ключ исходника: путь + mtime"""
+    raw = f"{_normalize_name(name)}:{int(mtime)}".encode('utf-8')
+    return hashlib.sha1(raw).hexdigest()[:16]
+
+
+def variant_relpath(key, width):
+    """Относительный (от MEDIA_ROOT) путь к варианту заданной ширины"""
+    return f"{VARIANTS_DIR}/{key[:2]}/{key}-{width}w.webp"
+
+
+class _ManifestLock:
+    """
+    Межпроцессная блокировка манифеста через lock-файл (O_EXCL).
+    Работает одинаково на Linux-сервере и локальной Windows-машине.
+    """
+
+    def __init__(self, path):
+        self.path = path + '.lock'
+        self.fd = None
+
+    def __enter__(self):
+        deadline = time.monotonic() + LOCK_TIMEOUT
+        while True:
+            try:
+                self.fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                return self
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(self.path) > LOCK_STALE_SECONDS:
+                        os.remove(self.path)
+                        continue
+                except OSError:
+                    continue
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"Не удалось захватить {self.path}")
+                time.sleep(0.05)
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+        return False
+
+
+class ResponsiveVariantStore:
+    """
+    Манифест responsive-вариантов, общий для всех процессов через файл.
+
+    Запись манифеста:
+        {"images/foo.jpg": {"key": "...", "mtime": 1700000000, "widths": [320, 640]}}
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._manifest_mtime = None
+        self._checked_at = 0.0
+        # Отложенные записи манифеста внутри batch() (своя у каждого потока)
+        self._local = threading.local()
+
+    # ------------------------------------------------------------------
+    # Чтение (горячий путь шаблонов)
+    # ------------------------------------------------------------------
+    def _read_manifest(self):
+        try:
+            with open(_manifest_path(), 'r', encoding='utf-8') as fh:
+                return json.load(fh)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"Манифест responsive-вариантов повреждён: {e}")
+            return {}
+
+    def _maybe_reload(self, force=False):
+        now = time.monotonic()
+        if not force and now - self._checked_at < MANIFEST_RELOAD_INTERVAL:
+            return
+        with self._lock:
+            self._checked_at = now
+            try:
+                mtime = os.path.getmtime(_manifest_path())
+            except OSError:
+                mtime = None
+            if force or mtime != self._manifest_mtime:
+                self._entries = self._read_manifest()
+                self._manifest_mtime = mtime
+
+    def get(self, name):
+        """Запись манифеста для исходника или None (O(1), без обращения к диску)"""
+        if not name:
+            return None
+        self._maybe_reload()
+        return self._entries.get(_normalize_name(name))
+
+    def get_srcset(self, name, base_url=''):
+        """Готовая строка srcset или '' если варианты ещё не сгенерированы"""
+        entry = self.get(name)
+        if not entry or not entry.get('widths'):
+            return ''
+        media_url = settings.MEDIA_URL.rstrip('/')
+        return ', '.join(
+            f"{base_url}{media_url}/{variant_relpath(entry['key'], width)} {width}w"
+            for width in entry['widths']
+        )
+
+    # ------------------------------------------------------------------
+    # Генерация (фоновые задачи, загрузка, management-команды)
+    # ------------------------------------------------------------------
+    def ensure(self, name, widths=None, force=False):
+        """
+        Генерирует недостающие варианты для исходника и обновляет манифест.
+
+        Args:
+            name: Путь относительно MEDIA_ROOT (FieldFile.name) или абсолютный путь
+            widths: Список ширин (по умолчанию ImageOptimizer.RESPONSIVE_SIZES)
+            force: Перегенерировать даже если запись актуальна
+
+        Returns:
+            Запись манифеста или None
+        """
+        from utilits.image_optimizer import ImageOptimizer
+
+        name = _normalize_name(name)
+        source_path = os.path.join(settings.MEDIA_ROOT, name)
+        try:
+            mtime = os.path.getmtime(source_path)
+        except OSError:
+            logger.warning(f"Исходник для responsive-вариантов не найден: {name}")
+            return None
+
+        key = variant_key(name, mtime)
+        current = self._current_entry(name)
+        # Пустой widths — запись из старых версий: перегенерируем
+        if current and current.get('key') == key and current.get('widths') and not force:
+            return current
+
+        widths = sorted(widths or ImageOptimizer.RESPONSIVE_SIZES.values())
+        generated = []
+        try:
+            with Image.open(source_path) as src:
+                img = ImageOps.exif_transpose(src)
+                img = ImageOptimizer._convert_to_rgb(img)
+                # Не апскейлим; исходник уже наименьшей ширины — один вариант в его ширину,
+                # иначе пустая запись выглядела бы как промах и генерация ставилась бы заново
+                fitting = [width for width in widths if width <= img.width] or [img.width]
+                for width in fitting:
+                    out_rel = variant_relpath(key, width)
+                    out_path = os.path.join(settings.MEDIA_ROOT, out_rel)
+                    if force or not os.path.exists(out_path):
+                        os.makedirs(os.path.dirname(out_path), exist_ok=True)
+                        height = max(1, int(img.height * width / img.width))
+                        resized = img.resize((width, height), Image.Resampling.LANCZOS)
+                        tmp_path = f"{out_path}.{os.getpid()}.tmp"
+                        resized.save(tmp_path, 'WEBP', quality=ImageOptimizer.QUALITY['webp'], method=6)
+                        os.replace(tmp_path, out_path)
+                    generated.append(width)
+        except Exception as e:
+            logger.error(f"❌ Ошибка генерации responsive-вариантов {name}: {e}")
+            return None
+
+        entry = {'key': key, 'mtime': int(mtime), 'widths': generated}
+        self._write_entry(name, entry, stale_key=current.get('key') if current else None)
+        logger.info(f"✅ Responsive-варианты готовы: {name} → {generated}")
+        return entry
+
+    def discard(self, name):
+        """Удаляет варианты и запись манифеста (исходник удалён/заменён)"""
+        name = _normalize_name(name)
+        current = self._current_entry(name)
+        if not current:
+            return
+        self._write_entry(name, None, stale_key=current.get('key'))
+
+    @contextmanager
+    def batch(self):
+        """
+        Откладывает запись манифеста до конца блока (массовая генерация).
+
+        Манифест читается один раз в начале, изменения копятся в памяти и
+        записываются одним проходом под блокировкой при выходе из блока, в том
+        числе при исключении. Вложенный batch() пишет вместе с внешним.
+        """
+        if getattr(self._local, 'pending', None) is not None:
+            yield self
+            return
+
+        self._maybe_reload(force=True)
+        self._local.pending = {}
+        self._local.stale_keys = []
+        try:
+            yield self
+        finally:
+            pending, stale_keys = self._local.pending, self._local.stale_keys
+            self._local.pending = self._local.stale_keys = None
+            if pending:
+                self._flush(pending, stale_keys)
+
+    def _current_entry(self, name):
+        """Актуальная запись: вне batch() — перечитанная с диска, внутри — с учётом отложенных"""
+        pending = getattr(self._local, 'pending', None)
+        if pending is None:
+            self._maybe_reload(force=True)
+        elif name in pending:
+            return pending[name]
+        return self._entries.get(name)
+
+    def _write_entry(self, name, entry, stale_key=None):
+        pending = getattr(self._local, 'pending', None)
+        if pending is not None:
+            pending[name] = entry
+            if stale_key:
+                self._local.stale_keys.append(stale_key)
+            return
+        self._flush({name: entry}, [stale_key] if stale_key else [])
+
+    def _flush(self, changes, stale_keys):
+        """Применяет изменения {name: entry или None} к манифесту одной записью"""
+        path = _manifest_path()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with _ManifestLock(path):
+            # Перечитываем под блокировкой: манифест мог обновить другой процесс
+            data = self._read_manifest()
+            for name, entry in changes.items():
+                if entry is None:
+                    data.pop(name, None)
+                else:
+                    data[name] = entry
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as fh:
+                json.dump(data, fh, ensure_ascii=False, separators=(',', ':'))
+            os.replace(tmp_path, path)
+
+        with self._lock:
+            self._entries = data
+            self._manifest_mtime = os.path.getmtime(path)
+            self._checked_at = time.monotonic()
+
+        live_keys = {entry['key'] for entry in changes.values() if entry}
+        for stale_key in set(stale_keys) - live_keys:
+            self._remove_variant_files(stale_key)
+
+    @staticmethod
+    def _remove_variant_files(key):
+        folder = os.path.join(_variants_root(), key[:2])
+        try:
+            for filename in os.listdir(folder):
+                if filename.startswith(f"{key}-"):
+                    os.remove(os.path.join(folder, filename))
+        except OSError:
+            pass
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_variant_store():
+    """Синглтон хранилища на процесс"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = ResponsiveVariantStore()
+    return _store
+
+
+def schedule_variants(name):
+    """
+    Ставит генерацию вариантов в очередь Django-Q (не чаще раза в 10 минут на файл).
+    Безопасно вызывать из шаблонов: сама генерация в запросе не выполняется.
+    """
+    if not name:
+        return
+    name = _normalize_name(name)
+    try:
+        from django.core.cache import cache
+        if not cache.add(f"responsive_variants:pending:{name}", 1, 600):
+            return
+    except Exception:
+        pass
+
+    try:
+        from django_q.tasks import async_task
+        async_task(
+            'blog.tasks.generate_responsive_variants',
+            name,
+            task_name=f"responsive_variants_{variant_key(name, 0)}",
+            group='responsive_variants',
+        )
+    except Exception as e:
+        logger.warning(f"Не удалось поставить генерацию responsive-вариантов {name}: {e}")
@@ -194,10 +194,9 @@ def get_article_structured_data(post):
         }
     
     # Добавляем комментарии (если есть)
-    if hasattr(post, 'comments'):
-        comments_count = post.comments.filter(active=True).count() if hasattr(post.comments, 'filter') else 0
-        if comments_count > 0:
-            structured_data["commentCount"] = comments_count
+    comments_count = getattr(post, 'comments_count', 0)
+    if comments_count > 0:
+        structured_data["commentCount"] = comments_count
     
     # Добавляем категорию если есть
     if hasattr(post, 'category') and post.category:
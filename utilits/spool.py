@@ -0,0 +1,154 @@
+"""
+Файл-очередь JSON-строк для отложенной записи в БД
+
+Общая механика очередей показов/кликов рекламы (advertising.event_spool)
+и просмотров статей (blog.view_counter):
+- append() дописывает запись одной строкой JSON одним write() в файл,
+  открытый с O_APPEND — строки от разных воркеров не перемешиваются;
+- drain() под блокировкой cache.add забирает файл переименованием в
+  <name>-<ns>.ready и отдаёт записи обработчику; после успеха файл
+  удаляется, при ошибке переименовывается в .failed;
+- .failed возвращаются в обработку через failed_retry_seconds (обработчик
+  пишет файл в одной транзакции, поэтому повтор не удваивает данные),
+  а пока такие файлы есть, каждый drain() пишет ошибку в лог.
+"""
+import glob
+import json
+import logging
+import os
+import time
+from typing import Any, Callable, List, Optional
+
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+
+class FileSpool:
+    """Очередь <directory>/<name>.log с готовыми к обработке <name>-*.ready и отложенными <name>-*.failed"""
+
+    def __init__(self, directory: str, name: str, label: str, lock_key: str, lock_timeout: int = 60 * 10,
+                 rotate_grace: float = 1.0, failed_retry_seconds: float = 60 * 60):
+        self.directory = directory
+        self.name = name
+        self.label = label
+        self.lock_key = lock_key
+        self.lock_timeout = lock_timeout
+        self.rotate_grace = rotate_grace  # секунды: дать дописать строкам, открытым до переименования
+        self.failed_retry_seconds = failed_retry_seconds
+
+    @property
+    def path(self) -> str:
+        return os.path.join(self.directory, f'{self.name}.log')
+
+    def _files(self, suffix: str) -> List[str]:
+        return sorted(glob.glob(os.path.join(self.directory, f'{self.name}-*{suffix}')))
+
+    # ------------------------------------------------------------------
+    # Запись (на пути запроса)
+    # ------------------------------------------------------------------
+
+    def append(self, record: Any) -> bool:
+        """Дописывает запись в очередь одним write(); False если запись не удалась"""
+        line = (json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n').encode('utf-8')
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, line)
+            finally:
+                os.close(fd)
+            return True
+        except OSError as e:
+            logger.warning(f"Очередь {self.label} недоступна: {e}")
+            return False
+
+    # ------------------------------------------------------------------
+    # Обработка (Django-Q)
+    # ------------------------------------------------------------------
+
+    def rotate(self) -> List[str]:
+        """Переименовывает текущий файл очереди и возвращает все готовые к обработке"""
+        if os.path.exists(self.path):
+            ready = os.path.join(self.directory, f'{self.name}-{time.time_ns()}.ready')
+            try:
+                os.rename(self.path, ready)
+                time.sleep(self.rotate_grace)
+            except OSError as e:
+                logger.warning(f"Не удалось забрать очередь {self.label}: {e}")
+        return self._files('.ready')
+
+    def read(self, path: str) -> List[Any]:
+        """Записи файла; повреждённые строки пропускаются"""
+        records = []
+        broken = 0
+        with open(path, 'rb') as spool:
+            for line in spool:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    broken += 1
+        if broken:
+            logger.warning(f"Очередь {os.path.basename(path)}: пропущено {broken} повреждённых строк")
+        return records
+
+    def requeue_failed(self, min_age: Optional[float] = None) -> int:
+        """Возвращает в обработку отложенные (.failed) файлы старше min_age секунд"""
+        min_age = self.failed_retry_seconds if min_age is None else min_age
+        requeued = 0
+        for path in self._files('.failed'):
+            try:
+                if time.time() - os.path.getmtime(path) < min_age:
+                    continue
+                os.rename(path, path[:-len('.failed')] + '.ready')
+            except OSError:
+                continue
+            requeued += 1
+        if requeued:
+            logger.info(f"🔁 Повторная обработка отложенных файлов очереди {self.label}: {requeued}")
+        return requeued
+
+    def failed_count(self) -> int:
+        return len(self._files('.failed'))
+
+    def drain(self, handler: Callable[[List[Any]], dict], retry_failed: bool = False) -> Optional[dict]:
+        """
+        Отдаёт обработчику записи каждого готового файла.
+
+        Args:
+            handler: Пишет записи одного файла в БД (в одной транзакции)
+            retry_failed: Вернуть в обработку все отложенные файлы, не дожидаясь failed_retry_seconds
+
+        Returns:
+            dict: {'results': [результаты handler], 'failed': отложенных файлов}
+                или None, если очередь уже обрабатывается
+        """
+        if not cache.add(self.lock_key, os.getpid(), self.lock_timeout):
+            logger.info(f"⏭️ Очередь {self.label} уже обрабатывается")
+            return None
+
+        results = []
+        try:
+            self.requeue_failed(0 if retry_failed else None)
+            for path in self.rotate():
+                try:
+                    result = handler(self.read(path))
+                except Exception as e:
+                    # Файл откладывается, чтобы не блокировать следующие
+                    logger.error(f"Ошибка обработки очереди {os.path.basename(path)}: {e}", exc_info=True)
+                    failed = path[:-len('.ready')] + '.failed'
+                    os.rename(path, failed)
+                    os.utime(failed)  # отсчёт до повтора — от момента ошибки
+                    continue
+                os.remove(path)
+                results.append(result)
+            failed = self.failed_count()
+        finally:
+            cache.delete(self.lock_key)
+
+        if failed:
+            logger.error(
+                f"⚠️ Очередь {self.label}: {failed} файл(ов) не обработано, "
+                f"повтор через {self.failed_retry_seconds} с"
+            )
+        return {'results': results, 'failed': failed}
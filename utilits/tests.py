@@ -0,0 +1,90 @@
+"""
+Тесты для утилит проекта
+"""
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from PIL import Image
+
+
+class ResponsiveVariantStoreTests(TestCase):
+    """Манифест responsive-вариантов: генерация один раз, промах не повторяется"""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=self.media_root, MEDIA_URL='/media/')
+        override.enable()
+        self.addCleanup(override.disable)
+
+        from utilits.responsive_variants import ResponsiveVariantStore
+        self.store = ResponsiveVariantStore()
+
+    def _image(self, name, width, height=100):
+        path = os.path.join(self.media_root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        Image.new('RGB', (width, height), 'red').save(path, 'JPEG')
+        return name
+
+    def test_variants_are_generated_up_to_source_width(self):
+        from utilits.responsive_variants import variant_relpath
+
+        entry = self.store.ensure(self._image('images/wide.jpg', 1200))
+
+        self.assertEqual(entry['widths'], [320, 640, 1024])
+        for width in entry['widths']:
+            self.assertTrue(os.path.exists(os.path.join(self.media_root, variant_relpath(entry['key'], width))))
+        self.assertIn('1024w', self.store.get_srcset('images/wide.jpg'))
+        self.assertIs(self.store.ensure('images/wide.jpg'), self.store.get('images/wide.jpg'))
+
+    def test_narrow_source_is_stored_as_hit(self):
+        name = self._image('images/narrow.jpg', 200)
+
+        entry = self.store.ensure(name)
+        self.assertEqual(entry['widths'], [200])
+        self.assertTrue(self.store.get_srcset(name).endswith(' 200w'))
+
+        # Запись старого формата с пустым widths перегенерируется
+        self.store._write_entry(name, {**entry, 'widths': []})
+        self.assertEqual(self.store.ensure(name)['widths'], [200])
+
+    def test_template_tag_does_not_reschedule_generated_image(self):
+        from blog.templatetags.responsive_images import responsive_image_srcset
+        from utilits import responsive_variants
+
+        name = self._image('images/narrow.jpg', 200)
+        self.store.ensure(name)
+        field = mock.Mock(url=f'/media/{name}')
+        field.name = name
+
+        with mock.patch.object(responsive_variants, 'get_variant_store', return_value=self.store), \
+                mock.patch.object(responsive_variants, 'schedule_variants') as schedule:
+            srcset = responsive_image_srcset(field)
+
+        schedule.assert_not_called()
+        self.assertIn('200w', srcset)
+
+    def test_batch_writes_manifest_once(self):
+        from utilits import responsive_variants
+
+        names = [self._image(f'images/batch-{index}.jpg', 200) for index in range(5)]
+        self.store.ensure(names[0])
+        stale_key = self.store.get(names[0])['key']
+        os.utime(os.path.join(self.media_root, names[0]), (1, 1))  # исходник заменён
+
+        with mock.patch.object(self.store, '_read_manifest', wraps=self.store._read_manifest) as read:
+            with self.store.batch():
+                for name in names:
+                    self.assertEqual(self.store.ensure(name)['widths'], [200])
+                self.assertIsNone(self.store._entries.get(names[1]))  # ещё не записано
+            # Один раз при входе в batch() и один раз под блокировкой при записи
+            self.assertEqual(read.call_count, 2)
+
+        fresh = responsive_variants.ResponsiveVariantStore()
+        self.assertEqual(sorted(fresh._read_manifest()), sorted(names))
+        self.assertNotEqual(fresh.get(names[0])['key'], stale_key)
+        stale_path = os.path.join(self.media_root, responsive_variants.variant_relpath(stale_key, 200))
+        self.assertFalse(os.path.exists(stale_path))
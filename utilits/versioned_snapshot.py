@@ -0,0 +1,83 @@
+"""
+Снимок в памяти процесса, привязанный к общей версии в Django cache
+
+Общая механика снимков рекламы (advertising.ad_engine), таблицы редиректов
+(blog.redirect_table) и индексов FAQ (ChatBot_AI.services.faq_index):
+- снимок строится в каждом процессе и отдаётся без запросов к БД;
+- раз в VERSION_CHECK_INTERVAL секунд процесс сверяет версию по ключу
+  version_key в Django cache и перестраивает снимок, если её увеличил
+  другой процесс (bump_version из сигналов);
+- max_age — принудительная перестройка через N секунд (None — только по версии).
+"""
+import logging
+import threading
+import time
+from typing import Optional
+
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+VERSION_CHECK_INTERVAL = 5  # секунд между проверками версии в Django cache
+
+
+def bump_version(version_key: str) -> bool:
+    """Увеличивает общую версию; False если Django cache недоступен"""
+    try:
+        cache.add(version_key, 0, None)
+        cache.incr(version_key)
+        return True
+    except Exception as e:
+        logger.warning(f"Не удалось обновить версию {version_key}: {e}")
+        return False
+
+
+class VersionedSnapshot:
+    """
+    Подклассы задают version_key и build().
+
+    Args:
+        max_age: Принудительная перестройка через N секунд (None — только по версии)
+        version_key: Ключ версии в Django cache (по умолчанию атрибут класса)
+    """
+
+    version_key: str = ''
+
+    def __init__(self, max_age: Optional[float] = None, version_key: Optional[str] = None):
+        if version_key:
+            self.version_key = version_key
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._version = None
+        self._built_at = 0.0
+        self._checked_at = 0.0
+
+    def build(self):
+        raise NotImplementedError
+
+    def _fresh(self, now: float) -> bool:
+        return self.max_age is None or now - self._built_at < self.max_age
+
+    def snapshot(self):
+        now = time.monotonic()
+        if (
+            self._snapshot is not None
+            and self._fresh(now)
+            and now - self._checked_at < VERSION_CHECK_INTERVAL
+        ):
+            return self._snapshot
+
+        with self._lock:
+            shared_version = cache.get(self.version_key, 0)
+            if self._snapshot is None or shared_version != self._version or not self._fresh(time.monotonic()):
+                self._snapshot = self.build()
+                self._version = shared_version
+                self._built_at = time.monotonic()
+            self._checked_at = time.monotonic()
+            return self._snapshot
+
+    def reset(self):
+        with self._lock:
+            self._snapshot = None
+            self._version = None